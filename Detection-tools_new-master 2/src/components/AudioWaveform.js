@@ -1,7 +1,23 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { motion } from 'framer-motion';
 
-const AudioWaveform = ({ audioUrl, className = "", height = 100 }) => {
+const WAVEFORM_POINTS = 200; // Number of samples to display
+
+// Precomputed min/max peaks from the backend: no need to download and decode the audio
+const loadPeaks = async (peaksUrl) => {
+  const response = await fetch(`${peaksUrl}?width=${WAVEFORM_POINTS}&bits=8`);
+  if (!response.ok) {
+    throw new Error(`HTTP ${response.status}`);
+  }
+  const { data } = await response.json();
+  const waveform = [];
+  for (let i = 0; i + 1 < data.length; i += 2) {
+    waveform.push((data[i + 1] - data[i]) / 2 / 127);
+  }
+  return waveform;
+};
+
+const AudioWaveform = ({ audioUrl, peaksUrl, className = "", height = 100 }) => {
   const canvasRef = useRef(null);
   // const audioRef = useRef(null);
   const [isLoading, setIsLoading] = useState(true);
@@ -16,6 +32,19 @@ const AudioWaveform = ({ audioUrl, className = "", height = 100 }) => {
         setIsLoading(true);
         setError(null);
 
+        if (peaksUrl) {
+          try {
+            const waveform = await loadPeaks(peaksUrl);
+            if (waveform.length > 0) {
+              setWaveformData(waveform);
+              setIsLoading(false);
+              return;
+            }
+          } catch (err) {
+            console.warn('Waveform peaks unavailable, decoding audio instead:', err);
+          }
+        }
+
         // Create audio context for analysis
         const audioContext = new (window.AudioContext || window.webkitAudioContext)();
         const response = await fetch(audioUrl);
@@ -24,7 +53,7 @@ const AudioWaveform = ({ audioUrl, className = "", height = 100 }) => {
 
         // Extract waveform data
         const channelData = audioBuffer.getChannelData(0);
-        const samples = 200; // Number of samples to display
+        const samples = WAVEFORM_POINTS;
         const blockSize = Math.floor(channelData.length / samples);
         const waveform = [];
 
@@ -52,7 +81,7 @@ const AudioWaveform = ({ audioUrl, className = "", height = 100 }) => {
     };
 
     loadAudio();
-  }, [audioUrl]);
+  }, [audioUrl, peaksUrl]);
 
   useEffect(() => {
     if (!waveformData || !canvasRef.current) return;
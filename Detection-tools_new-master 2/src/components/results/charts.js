@@ -88,7 +88,11 @@ function ChartsAnalysis({ result }) {
             title={result.filename || "Audio File"}
           />
         </div>
-        <AudioWaveform audioUrl={secureAudioUrl} height={120} />
+        <AudioWaveform
+          audioUrl={secureAudioUrl}
+          peaksUrl={`${apiBaseUrl}/audio/${fileId}/peaks`}
+          height={120}
+        />
         <AudioAnalysis analysisResult={result} />
       </div>
     );
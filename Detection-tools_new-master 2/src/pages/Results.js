@@ -1,6 +1,6 @@
 /** @format */
 
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import {
@@ -38,6 +38,10 @@ const Results = () => {
 	const [loading, setLoading] = useState(!!fileId);
 	const [activeTab, setActiveTab] = useState('summary');
 	const [debugInfo, setDebugInfo] = useState(null);
+	// Latest progress event of a running analysis
+	const [progress, setProgress] = useState(null);
+	// Stops the progress stream or polling of the current file
+	const watcherRef = useRef(null);
 
 	// If no fileId, show all files overview
 	const showAllFiles = !fileId;
@@ -61,6 +65,102 @@ const Results = () => {
 		});
 	}, [fileId, loading, result, files.length, showAllFiles]);
 
+	// Stop the progress stream or polling of the file being watched
+	const stopWatching = useCallback(() => {
+		if (watcherRef.current) {
+			watcherRef.current();
+			watcherRef.current = null;
+		}
+	}, []);
+
+	// Poll for the final result (used when progress events are unavailable)
+	const startPolling = useCallback(() => {
+		const pollInterval = setInterval(async () => {
+			try {
+				const pollResponse = await api.getResults(fileId);
+				if (pollResponse.status === 'completed') {
+					setResult(pollResponse.result);
+					setLoading(false);
+					stopWatching();
+				} else if (pollResponse.status === 'error') {
+					toast.error(`Analysis failed: ${pollResponse.error}`);
+					setLoading(false);
+					stopWatching();
+				}
+			} catch (error) {
+				console.error('Polling error:', error);
+			}
+		}, 2000);
+
+		// Cleanup interval after 5 minutes
+		const timeout = setTimeout(() => {
+			stopWatching();
+			setLoading((stillLoading) => {
+				if (stillLoading) {
+					toast.error('Analysis timed out');
+				}
+				return false;
+			});
+		}, 300000);
+
+		watcherRef.current = () => {
+			clearInterval(pollInterval);
+			clearTimeout(timeout);
+		};
+	}, [api, fileId, stopWatching]);
+
+	// Follow the analysis over Server-Sent Events, falling back to polling
+	const watchResults = useCallback(() => {
+		stopWatching();
+		if (typeof window.EventSource === 'undefined') {
+			startPolling();
+			return;
+		}
+
+		const events = new EventSource(`${API_BASE_URL}/results/${fileId}/events`);
+		watcherRef.current = () => events.close();
+
+		const showProgress = (event) => {
+			setProgress(JSON.parse(event.data));
+		};
+		[
+			'queued',
+			'started',
+			'decoded',
+			'faces_found',
+			'model_analysis',
+			'transcribed',
+			'segments_scored',
+		].forEach((stage) => events.addEventListener(stage, showProgress));
+		// First-frame and model verdicts are shown before the analysis finishes
+		events.addEventListener('frame_analyzed', showProgress);
+		events.addEventListener('verdict', showProgress);
+
+		events.addEventListener('completed', async () => {
+			stopWatching();
+			try {
+				const response = await api.getResults(fileId);
+				setResult(response.result);
+			} catch (error) {
+				console.error('Error fetching results:', error);
+				toast.error('Failed to fetch results');
+			}
+			setLoading(false);
+		});
+		events.addEventListener('error', (event) => {
+			if (event.data) {
+				// The analysis itself failed
+				stopWatching();
+				toast.error(`Analysis failed: ${JSON.parse(event.data).message}`);
+				setLoading(false);
+			} else if (events.readyState === EventSource.CLOSED) {
+				// The stream was refused or ended for good; look the result up instead
+				stopWatching();
+				startPolling();
+			}
+		});
+	}, [api, fileId, startPolling, stopWatching]);
+
 	// Define fetchResults function outside useEffect so it can be used by retry button
 	const fetchResults = useCallback(async () => {
 		try {
@@ -85,77 +185,27 @@ const Results = () => {
 				console.log('Setting result:', response.result);
 				setResult(response.result);
 				setLoading(false);
-			} else if (response.status === 'processing') {
-				// Start polling for results
-				const pollInterval = setInterval(async () => {
-					try {
-						const pollResponse = await api.getResults(fileId);
-						if (pollResponse.status === 'completed') {
-							setResult(pollResponse.result);
-							setLoading(false);
-							clearInterval(pollInterval);
-						} else if (pollResponse.status === 'error') {
-							toast.error(`Analysis failed: ${pollResponse.error}`);
-							setLoading(false);
-							clearInterval(pollInterval);
-						}
-					} catch (error) {
-						console.error('Polling error:', error);
-					}
-				}, 2000);
-
-				// Cleanup interval after 5 minutes
-				setTimeout(() => {
-					clearInterval(pollInterval);
-					if (loading) {
-						toast.error('Analysis timed out');
-						setLoading(false);
-					}
-				}, 300000);
 			} else if (response.status === 'error') {
 				toast.error(`Analysis failed: ${response.error}`);
 				setLoading(false);
 			} else {
-				// If status is unknown, start polling
-				const pollInterval = setInterval(async () => {
-					try {
-						const pollResponse = await api.getResults(fileId);
-						if (pollResponse.status === 'completed') {
-							setResult(pollResponse.result);
-							setLoading(false);
-							clearInterval(pollInterval);
-						} else if (pollResponse.status === 'error') {
-							toast.error(`Analysis failed: ${pollResponse.error}`);
-							setLoading(false);
-							clearInterval(pollInterval);
-						}
-					} catch (error) {
-						console.error('Polling error:', error);
-					}
-				}, 2000);
-
-				// Cleanup interval after 5 minutes
-				setTimeout(() => {
-					clearInterval(pollInterval);
-					if (loading) {
-						toast.error('Analysis timed out');
-						setLoading(false);
-					}
-				}, 300000);
+				// Still queued or processing: follow its progress until it finishes
+				watchResults();
 			}
 		} catch (error) {
 			console.error('Error fetching results:', error);
 			toast.error('Failed to fetch results');
 			setLoading(false);
 		}
-	}, [fileId, api, files, loading]);
+	}, [fileId, api, files, watchResults]);
 
 	// Call fetchResults when component mounts or fileId changes
 	useEffect(() => {
 		if (fileId) {
 			fetchResults();
 		}
-	}, [fileId, fetchResults]);
+		return stopWatching;
+	}, [fileId, fetchResults, stopWatching]);
 
 	const formatConfidence = (confidence) => {
 		// Handle both decimal (0-1) and percentage (0-100) formats
@@ -258,8 +308,29 @@ const Results = () => {
 						Loading Results
 					</h2>
 					<p className='text-gray-600'>
-						Please wait while we fetch your analysis results...
+						{progress?.message ||
+							'Please wait while we fetch your analysis results...'}
 					</p>
+					{progress?.progress != null && (
+						<div className='w-64 mx-auto mt-4 bg-gray-200 rounded-full h-2'>
+							<div
+								className='bg-blue-600 h-2 rounded-full transition-all'
+								style={{ width: `${Math.round(progress.progress * 100)}%` }}
+							></div>
+						</div>
+					)}
+					{(progress?.data?.running_prediction || progress?.data?.prediction) && (
+						<div className='mt-3 text-sm text-gray-700'>
+							Verdict so far:{' '}
+							<span className='font-semibold'>
+								{progress.data.running_prediction || progress.data.prediction}
+							</span>
+							{(progress.data.running_confidence ?? progress.data.confidence) != null &&
+								` (${formatConfidence(
+									progress.data.running_confidence ?? progress.data.confidence,
+								)}%)`}
+						</div>
+					)}
 					{fileId && (
 						<div className='mt-4 text-sm text-gray-500'>File ID: {fileId}</div>
 					)}
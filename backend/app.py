@@ -3,13 +3,13 @@ FastAPI Backend for Deepfake Detection Web Application
 Integrates with existing detection models while providing a modern web interface
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Depends, status
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Depends, status, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, Response
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 # Authentication removed - no longer needed
 from pydantic import BaseModel, EmailStr
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import os
 import uuid
 import shutil
@@ -22,6 +22,7 @@ from pathlib import Path
 import sys
 import numpy as np
 import base64
+import hashlib
 from io import BytesIO
 from PIL import Image as PILImage
 import cv2
@@ -34,7 +35,18 @@ from openai_video_detector import OpenAIVideoDeepfakeDetector
 from openai_audio_detector import OpenAIAudioDeepfakeDetector
 
 # Import PDF report generator
-from pdf_report_generator import PDFReportGenerator
+from pdf_report_generator import PDFReportGenerator, REPORT_TEMPLATE_VERSION
+from report_cache import ReportCache
+from audio_peaks import PeaksFile, to_bits
+from derivatives import DerivativeStore
+from media_server import AccelRedirect, MediaIndex, content_disposition, etag_matches, media_response
+from report_export import ExportManager
+from progress_events import ProgressBroker, format_sse
+from batch_jobs import BatchManager, RateBudget
+from cleanup_queue import CleanupQueue, create_cleanup_queue_table
+from response_cache import get_response_cache
+from audio_pipeline import reset_feature_pool
+from structured_output import parse_stats
 # Utility function to convert numpy types to JSON-serializable types
 def convert_numpy_types(obj):
     """Convert numpy types to native Python types for JSON serialization"""
@@ -113,6 +125,12 @@ audio_detector = None
 # Analysis results storage (in production, use a database)
 analysis_results = {}
 
+# Stage-level progress events for running analyses (served over SSE)
+progress_broker = ProgressBroker()
+
+# Batch scheduler (created on startup so its asyncio primitives bind to the server loop)
+batch_manager = None
+
 # Persistent storage for file metadata
 import json
 import sqlite3
@@ -291,6 +309,20 @@ def init_database():
             ON file_metadata(user_id)
         ''')
         
+        # Migration: content hash used to deduplicate batch submissions
+        cursor.execute("PRAGMA table_info(file_metadata)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'content_hash' not in columns:
+            logger.info("Migrating database: Adding content_hash column to file_metadata")
+            cursor.execute('ALTER TABLE file_metadata ADD COLUMN content_hash TEXT')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_file_metadata_content_hash 
+            ON file_metadata(content_hash)
+        ''')
+        
+        # Files waiting for their scheduled (delayed) deletion
+        create_cleanup_queue_table(cursor)
+        
         conn.commit()
         conn.close()
         logger.info(f"Database initialized successfully at {DB_PATH}")
@@ -309,6 +341,16 @@ def get_db_connection():
         timeout=30.0
     )
 
+def file_cleaned_up(file_id: str):
+    """Mark an upload removed by the cleanup reaper as deleted so it is no longer served"""
+    update_file_status(file_id, 'deleted')
+    media_index.discard(file_id)
+
+# Delayed deletions of analyzed uploads, drained by one periodic reaper
+cleanup_queue = CleanupQueue(get_db_connection, batch_size=int(os.getenv("CLEANUP_BATCH_SIZE", "100")),
+                             on_removed=file_cleaned_up)
+CLEANUP_DELAY_SECONDS = float(os.getenv("CLEANUP_DELAY_SECONDS", "3600"))
+
 def load_file_metadata():
     """Load file metadata from database into memory (without analysis results)"""
     global analysis_results
@@ -319,7 +361,7 @@ def load_file_metadata():
         
         cursor.execute('''
             SELECT file_id, user_id, filename, file_type, file_size, upload_time, 
-                   file_path, status
+                   file_path, status, content_hash
             FROM file_metadata
             ORDER BY created_at DESC
         ''')
@@ -327,7 +369,7 @@ def load_file_metadata():
         rows = cursor.fetchall()
         
         for row in rows:
-            file_id, user_id, filename, file_type, file_size, upload_time, file_path, status = row
+            file_id, user_id, filename, file_type, file_size, upload_time, file_path, status, content_hash = row
             
             # Check if file still exists
             if Path(file_path).exists():
@@ -341,8 +383,10 @@ def load_file_metadata():
                     },
                     'file_path': file_path,
                     'status': status,
-                    'user_id': user_id
+                    'user_id': user_id,
+                    'content_hash': content_hash
                 }
+                media_index.put(file_id, file_path, filename, file_type, content_hash)
                 # Don't load analysis results from database
             else:
                 # File doesn't exist, mark as deleted
@@ -361,7 +405,7 @@ def load_file_metadata():
     except Exception as e:
         logger.error(f"Failed to load file metadata: {e}")
 
-def save_file_metadata(file_id: str, file_info: dict, file_path: str, user_id: str, status: str = 'uploaded', analysis_result: dict = None):
+def save_file_metadata(file_id: str, file_info: dict, file_path: str, user_id: str, status: str = 'uploaded', analysis_result: dict = None, content_hash: Optional[str] = None):
     """Save file metadata to database (without analysis results)"""
     try:
         conn = get_db_connection()
@@ -370,8 +414,8 @@ def save_file_metadata(file_id: str, file_info: dict, file_path: str, user_id: s
         # Don't store analysis_result in database
         cursor.execute('''
             INSERT OR REPLACE INTO file_metadata 
-            (file_id, user_id, filename, file_type, file_size, upload_time, file_path, status, analysis_result)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)
+            (file_id, user_id, filename, file_type, file_size, upload_time, file_path, status, analysis_result, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL, ?)
         ''', (
             file_info['file_id'],
             user_id,
@@ -380,7 +424,8 @@ def save_file_metadata(file_id: str, file_info: dict, file_path: str, user_id: s
             file_info['file_size'],
             file_info['upload_time'],
             file_path,
-            status
+            status,
+            content_hash
         ))
         
         conn.commit()
@@ -442,6 +487,7 @@ def cleanup_old_files(max_age_hours: int = 24):
             if Path(file_path).exists():
                 Path(file_path).unlink()
                 logger.info(f"Deleted old file: {file_path}")
+            media_index.discard(file_id)
             
             # Mark as deleted in database
             cursor.execute('''
@@ -459,10 +505,8 @@ def cleanup_old_files(max_age_hours: int = 24):
     except Exception as e:
         logger.error(f"Failed to cleanup old files: {e}")
 
-# Supported file formats
-SUPPORTED_IMAGE_FORMATS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
-SUPPORTED_VIDEO_FORMATS = {'.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv', '.m4v', '.3gp', '.ogv'}
-SUPPORTED_AUDIO_FORMATS = {'.wav', '.mp3', '.flac', '.aac', '.ogg'}
+# Supported file formats (shared with the offline scanner)
+from media_types import SUPPORTED_IMAGE_FORMATS, SUPPORTED_VIDEO_FORMATS, SUPPORTED_AUDIO_FORMATS, get_file_type, get_media_type
 
 # Authentication helper functions are defined above (lines 126-151)
 # These are kept for backward compatibility but the actual functions use bcrypt directly
@@ -585,6 +629,7 @@ class AnalysisResult(BaseModel):
     result: Optional[Dict] = None
     error: Optional[str] = None
     timestamp: datetime
+    derivatives: Optional[Dict[str, str]] = None  # kind -> URL of thumbnail/preview/poster/waveform
 
 class FileInfo(BaseModel):
     file_id: str
@@ -593,6 +638,15 @@ class FileInfo(BaseModel):
     file_size: int
     upload_time: datetime
 
+class BatchManifest(BaseModel):
+    paths: List[str]  # Local paths under BATCH_MANIFEST_ROOT
+
+class ReportExportRequest(BaseModel):
+    file_ids: List[str]
+    format: str = 'zip'  # 'zip': one PDF per file, 'pdf': one combined PDF
+    summary_format: str = 'csv'  # or 'parquet' (needs pyarrow)
+    use_llm: bool = False  # Template text by default so bulk exports make no LLM calls
+
 # Initialize detectors lazily (on first use) to avoid startup timeout
 def get_image_detector():
     """Lazy initialization of OpenAI image detector"""
@@ -636,6 +690,21 @@ async def startup_event():
     """Initialize essential services on startup (models load lazily)"""
     import os
     
+    # Let detector worker threads hand progress events to SSE subscribers
+    progress_broker.bind_loop(asyncio.get_running_loop())
+    
+    # One rate budget shared by every batch so bulk submissions stay within API limits
+    global batch_manager
+    batch_manager = BatchManager(
+        run_item=run_batch_item,
+        budget=RateBudget(
+            max_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", "4")),
+            rate_per_minute=float(os.getenv("BATCH_RATE_PER_MINUTE", "60"))
+        ),
+        retention_seconds=float(os.getenv("BATCH_RETENTION_SECONDS", "3600")),
+        max_batches=int(os.getenv("BATCH_MAX_RETAINED", "1000"))
+    )
+    
     # Initialize database and load existing file metadata (fast)
     try:
         init_database()
@@ -650,23 +719,45 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"File cleanup error: {e}")
     
+    # One task deletes every file whose delayed cleanup is due, including any that fell due while down
+    asyncio.create_task(cleanup_reaper_loop(float(os.getenv("CLEANUP_REAP_INTERVAL", "60"))))
+    
+    # Regenerate visual evidence for results produced by older pipeline versions
+    repair_interval = float(os.getenv("VISUAL_EVIDENCE_REPAIR_INTERVAL", "300"))
+    asyncio.create_task(visual_evidence_repair_loop(repair_interval))
+    
     logger.info("Server started successfully - models will load on first use")
 
-# Utility functions
-def get_file_type(filename: str) -> str:
-    """Determine file type from extension"""
-    ext = Path(filename).suffix.lower()
-    if ext in SUPPORTED_IMAGE_FORMATS:
-        return 'image'
-    elif ext in SUPPORTED_VIDEO_FORMATS:
-        return 'video'
-    elif ext in SUPPORTED_AUDIO_FORMATS:
-        return 'audio'
-    else:
-        return 'unknown'
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the worker processes of the feature, derivative and export pools"""
+    reset_feature_pool()
+    derivative_store.shutdown()
+    export_manager.shutdown()
 
-def save_uploaded_file(file: UploadFile, file_id: str) -> str:
-    """Save uploaded file to temporary directory"""
+# Utility functions
+def copy_with_hash(source, destination: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Copy a binary stream to destination and return its SHA-256 hex digest"""
+    hasher = hashlib.sha256()
+    with open(destination, "wb") as buffer:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            buffer.write(chunk)
+    return hasher.hexdigest()
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file on disk"""
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def save_uploaded_file(file: UploadFile, file_id: str) -> Tuple[str, str]:
+    """Save uploaded file to temporary directory, returning (file_path, content_hash)"""
     # Create uploads directory if it doesn't exist
     upload_dir = Path("uploads")
     upload_dir.mkdir(exist_ok=True)
@@ -676,11 +767,44 @@ def save_uploaded_file(file: UploadFile, file_id: str) -> str:
     saved_filename = f"{file_id}{file_extension}"
     file_path = upload_dir / saved_filename
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Save file, hashing it on the way through
+    content_hash = copy_with_hash(file.file, file_path)
+    
+    return str(file_path), content_hash
+
+def register_uploaded_file(file_id: str, filename: str, file_type: str, file_path: str, content_hash: Optional[str] = None) -> "FileInfo":
+    """Record a saved upload in memory and in the metadata database"""
+    file_info = FileInfo(
+        file_id=file_id,
+        filename=filename,
+        file_type=file_type,
+        file_size=os.path.getsize(file_path),
+        upload_time=datetime.now()
+    )
+    
+    # Store file info in memory and database (no user_id needed)
+    analysis_results[file_id] = {
+        'file_info': file_info.dict(),
+        'file_path': file_path,
+        'status': 'uploaded',
+        'content_hash': content_hash
+    }
+    
+    # Save to persistent database (use 'anonymous' as user_id)
+    save_file_metadata(file_id, file_info.dict(), file_path, 'anonymous', 'uploaded', content_hash=content_hash)
+    media_index.put(file_id, file_path, filename, file_type, content_hash)
     
-    return str(file_path)
+    # Thumbnails/previews are generated in the background; the upload returns immediately
+    if os.getenv("DERIVATIVES", "1").lower() not in ("0", "false", "no"):
+        asyncio.create_task(generate_derivatives(file_id))
+    return file_info
+
+def find_analysis_by_hash(content_hash: str) -> Optional[str]:
+    """Return the file_id of an analyzed (or in-progress) upload with the same content"""
+    for file_id, file_data in analysis_results.items():
+        if file_data.get('content_hash') == content_hash and file_data.get('status') in ('processing', 'completed'):
+            return file_id
+    return None
 
 def generate_visual_evidence_data(details: dict, file_path: str) -> dict:
     """Generate visual evidence data for frontend display"""
@@ -1276,6 +1400,82 @@ def generate_video_visual_evidence_data(results: dict, file_path: str) -> dict:
             'overlay_data': {}
         }
 
+# Bump when the visual evidence structure or generation logic changes so the
+# background repair job regenerates evidence for results built by older code
+VISUAL_EVIDENCE_VERSION = 2
+
+def attach_visual_evidence(result: dict, file_path: str) -> dict:
+    """Pipeline step: generate visual evidence for a result exactly once per version"""
+    result_type = result.get('type')
+    if result_type == 'image':
+        result['visual_evidence'] = generate_visual_evidence_data(result.get('details', {}), file_path)
+    elif result_type == 'video':
+        result['visual_evidence'] = generate_video_visual_evidence_data(result.get('details', result), file_path)
+    else:
+        return result
+    
+    # Record the version even if detection found nothing so the step is not retried
+    result['visual_evidence_version'] = VISUAL_EVIDENCE_VERSION
+    return result
+
+def visual_evidence_needs_repair(result: Optional[dict]) -> bool:
+    """Check whether a stored result predates the current visual evidence pipeline"""
+    if not result or result.get('type') not in ('image', 'video'):
+        return False
+    if result.get('visual_evidence_version', 0) >= VISUAL_EVIDENCE_VERSION:
+        return False
+    return True
+
+async def repair_visual_evidence() -> int:
+    """Regenerate visual evidence for legacy results; returns the number repaired"""
+    repaired = 0
+    for file_id, file_data in list(analysis_results.items()):
+        result_data = file_data.get('result')
+        if file_data.get('status') != 'completed' or not visual_evidence_needs_repair(result_data):
+            continue
+        
+        file_path = file_data.get('file_path')
+        if not file_path or not Path(file_path).exists():
+            continue
+        
+        try:
+            # Work on a copy so readers never observe a half-built result
+            repaired_result = await run_in_threadpool(attach_visual_evidence, dict(result_data), file_path)
+            analysis_results[file_id]['result'] = repaired_result
+            repaired += 1
+            logger.info(f"Repaired visual evidence for {file_id} (version {VISUAL_EVIDENCE_VERSION})")
+        except Exception as e:
+            logger.error(f"Failed to repair visual evidence for {file_id}: {e}")
+    
+    return repaired
+
+async def cleanup_reaper_loop(interval_seconds: float):
+    """
+    Periodically delete files whose scheduled cleanup is due (the first pass
+    recovers overdue ones) and export archives past their retention
+    """
+    while True:
+        try:
+            removed = await run_in_threadpool(cleanup_queue.reap)
+            if removed:
+                logger.info(f"Cleanup reaper removed {removed} files")
+        except Exception as e:
+            logger.error(f"Cleanup reaper failed: {e}")
+        try:
+            export_manager.evict()
+        except Exception as e:
+            logger.error(f"Export eviction failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+async def visual_evidence_repair_loop(interval_seconds: float):
+    """Periodically repair legacy visual evidence in the background"""
+    while True:
+        try:
+            await repair_visual_evidence()
+        except Exception as e:
+            logger.error(f"Visual evidence repair job failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
 def get_heatmap_color(score: float) -> str:
     """Get color for heatmap based on score"""
     if score > 0.7:
@@ -1285,30 +1485,16 @@ def get_heatmap_color(score: float) -> str:
     else:
         return '#ef4444'  # Red for poor scores
 
-def cleanup_file(file_path: str, delay_audio: bool = True):
-    """Clean up uploaded file after analysis"""
+def cleanup_file(file_path: str, delay_audio: bool = True, file_id: Optional[str] = None):
+    """Clean up uploaded file after analysis (blocking: call it from the threadpool in async code)"""
     try:
         if os.path.exists(file_path):
             file_type = get_file_type(file_path)
             
             # For all file types, delay cleanup to allow viewing/playback
             if delay_audio:
-                # Schedule cleanup after 1 hour for all files
-                import threading
-                import time
-                
-                def delayed_cleanup():
-                    time.sleep(3600)  # 1 hour delay
-                    try:
-                        if os.path.exists(file_path):
-                            os.remove(file_path)
-                            logger.info(f"Delayed cleanup completed for {file_type} file: {file_path}")
-                    except Exception as e:
-                        logger.error(f"Failed delayed cleanup for {file_path}: {e}")
-                
-                # Start cleanup in background thread
-                cleanup_thread = threading.Thread(target=delayed_cleanup, daemon=True)
-                cleanup_thread.start()
+                # Persisted, so the deletion still happens after a restart; the reaper removes it when due
+                cleanup_queue.schedule(file_path, CLEANUP_DELAY_SECONDS, file_id=file_id)
                 logger.info(f"Scheduled delayed cleanup for {file_type} file: {file_path}")
             else:
                 # Immediate cleanup when explicitly requested
@@ -1352,6 +1538,17 @@ async def debug_analysis_results():
         "file_statuses": {file_id: data.get('status', 'unknown') for file_id, data in analysis_results.items()}
     }
 
+@app.get("/debug/parse_stats")
+async def debug_parse_stats():
+    """Structured-output parse outcomes and failure rates per model and response type"""
+    return parse_stats.snapshot()
+
+@app.get("/debug/llm_cache")
+async def debug_llm_cache():
+    """Model response cache hit/miss counters and size"""
+    cache = get_response_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
 @app.post("/cleanup")
 async def manual_cleanup(max_age_hours: int = 24):
     """Manually trigger cleanup of old files"""
@@ -1362,6 +1559,16 @@ async def manual_cleanup(max_age_hours: int = 24):
         logger.error(f"Manual cleanup error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/maintenance/repair-visual-evidence")
+async def trigger_visual_evidence_repair():
+    """Manually run the visual evidence repair job for legacy results"""
+    try:
+        repaired = await repair_visual_evidence()
+        return {"message": f"Repaired visual evidence for {repaired} results", "repaired": repaired}
+    except Exception as e:
+        logger.error(f"Visual evidence repair error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/upload", response_model=FileInfo)
 async def upload_file(
     file: UploadFile = File(...)
@@ -1383,29 +1590,9 @@ async def upload_file(
         file_id = str(uuid.uuid4())
         
         # Save file
-        file_path = save_uploaded_file(file, file_id)
-        
-        # Get file size
-        file_size = os.path.getsize(file_path)
-        
-        # Create file info
-        file_info = FileInfo(
-            file_id=file_id,
-            filename=file.filename,
-            file_type=file_type,
-            file_size=file_size,
-            upload_time=datetime.now()
-        )
+        file_path, content_hash = save_uploaded_file(file, file_id)
         
-        # Store file info in memory and database (no user_id needed)
-        analysis_results[file_id] = {
-            'file_info': file_info.dict(),
-            'file_path': file_path,
-            'status': 'uploaded'
-        }
-        
-        # Save to persistent database (use 'anonymous' as user_id)
-        save_file_metadata(file_id, file_info.dict(), file_path, 'anonymous', 'uploaded')
+        file_info = register_uploaded_file(file_id, file.filename, file_type, file_path, content_hash)
         
         logger.info(f"File uploaded: {file.filename} ({file_type})")
         return file_info
@@ -1433,6 +1620,8 @@ async def analyze_file(
         analysis_results[file_id]['status'] = 'processing'
         analysis_results[file_id]['timestamp'] = datetime.now()
         
+        announce_queued(file_id, file_type)
+        
         # Start background analysis
         background_tasks.add_task(perform_analysis, file_id, file_path, file_type)
         
@@ -1442,6 +1631,116 @@ async def analyze_file(
         logger.error(f"Analysis start error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def prepare_batch_item(source: str, file_id: str, file_type: str, file_path: str,
+                       content_hash: str, seen_hashes: Dict[str, str]) -> Dict:
+    """Register one saved batch file, or drop it in favour of an existing analysis"""
+    duplicate_of = seen_hashes.get(content_hash) or find_analysis_by_hash(content_hash)
+    if duplicate_of:
+        try:
+            os.remove(file_path)
+        except OSError as e:
+            logger.warning(f"Failed to remove duplicate batch file {file_path}: {e}")
+        return {'source': source, 'duplicate_of': duplicate_of, 'content_hash': content_hash}
+    
+    register_uploaded_file(file_id, Path(source).name, file_type, file_path, content_hash)
+    seen_hashes[content_hash] = file_id
+    return {'source': source, 'file_id': file_id, 'content_hash': content_hash}
+
+@app.post("/batch")
+async def create_batch(
+    files: List[UploadFile] = File(...)
+):
+    """Upload many files at once and schedule them as a single batch"""
+    try:
+        items = []
+        seen_hashes: Dict[str, str] = {}
+        for file in files:
+            source = file.filename or ''
+            file_type = get_file_type(source)
+            if file_type == 'unknown':
+                items.append({'source': source, 'error': 'Unsupported file format'})
+                continue
+            
+            file_id = str(uuid.uuid4())
+            file_path, content_hash = await run_in_threadpool(save_uploaded_file, file, file_id)
+            items.append(prepare_batch_item(source, file_id, file_type, file_path, content_hash, seen_hashes))
+        
+        batch = batch_manager.create_batch(items)
+        return batch_manager.get_status(batch['batch_id'])
+        
+    except Exception as e:
+        logger.error(f"Batch upload error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/batch/manifest")
+async def create_batch_from_manifest(manifest: BatchManifest):
+    """Schedule a batch from server-local paths (restricted to BATCH_MANIFEST_ROOT)"""
+    manifest_root = os.getenv("BATCH_MANIFEST_ROOT")
+    if not manifest_root:
+        raise HTTPException(status_code=403, detail="Manifest submissions are disabled (BATCH_MANIFEST_ROOT not set)")
+    root = Path(manifest_root).resolve()
+    
+    try:
+        upload_dir = Path("uploads")
+        upload_dir.mkdir(exist_ok=True)
+        
+        items = []
+        seen_hashes: Dict[str, str] = {}
+        for raw_path in manifest.paths:
+            source_path = Path(raw_path).resolve()
+            file_type = get_file_type(source_path.name)
+            if not source_path.is_relative_to(root):
+                items.append({'source': raw_path, 'error': 'Path is outside BATCH_MANIFEST_ROOT'})
+                continue
+            if not source_path.is_file():
+                items.append({'source': raw_path, 'error': 'File not found'})
+                continue
+            if file_type == 'unknown':
+                items.append({'source': raw_path, 'error': 'Unsupported file format'})
+                continue
+            
+            # Hash first so duplicates are never copied; originals are copied because
+            # analyzed uploads are cleaned up afterwards
+            content_hash = await run_in_threadpool(hash_file, str(source_path))
+            duplicate_of = seen_hashes.get(content_hash) or find_analysis_by_hash(content_hash)
+            if duplicate_of:
+                items.append({'source': raw_path, 'duplicate_of': duplicate_of, 'content_hash': content_hash})
+                continue
+            
+            file_id = str(uuid.uuid4())
+            file_path = upload_dir / f"{file_id}{source_path.suffix}"
+            await run_in_threadpool(shutil.copyfile, source_path, file_path)
+            items.append(prepare_batch_item(raw_path, file_id, file_type, str(file_path), content_hash, seen_hashes))
+        
+        batch = batch_manager.create_batch(items)
+        return batch_manager.get_status(batch['batch_id'])
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch manifest error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/batch/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """Get aggregate progress and per-item state for a batch"""
+    status_data = batch_manager.get_status(batch_id)
+    if status_data is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return status_data
+
+@app.get("/batch/{batch_id}/results")
+async def stream_batch_results(batch_id: str):
+    """Stream per-item batch results as newline-delimited JSON as they finish"""
+    if batch_manager.get_status(batch_id) is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    async def result_lines():
+        async for record in batch_manager.stream_results(batch_id):
+            yield json.dumps(record, default=str) + "\n"
+    
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
 @app.get("/results/{file_id}", response_model=AnalysisResult)
 async def get_results(
     file_id: str
@@ -1454,56 +1753,17 @@ async def get_results(
         if file_id in analysis_results:
             file_data = analysis_results[file_id]
             
+            # Pure lookup: visual evidence is produced by the analysis pipeline and
+            # legacy records are fixed up by the background repair job
             result_data = file_data.get('result')
             
-            # Ensure visual_evidence is present and has bounding box for images/videos
-            if result_data and result_data.get('type') in ['image', 'video']:
-                file_path = file_data.get('file_path')
-                if file_path and Path(file_path).exists():
-                    visual_evidence = result_data.get('visual_evidence', {})
-                    # Regenerate if missing or if bounding box is missing for images
-                    needs_regeneration = False
-                    if not visual_evidence:
-                        needs_regeneration = True
-                        logger.info(f"Visual evidence missing, regenerating for {file_id}")
-                    elif result_data.get('type') == 'image':
-                        face_detection = visual_evidence.get('face_detection', {})
-                        # Always regenerate if face is detected but bounding box is missing
-                        if face_detection.get('detected') and not face_detection.get('bounding_box'):
-                            needs_regeneration = True
-                            logger.warning(f"Bounding box missing in visual evidence (detected={face_detection.get('detected')}, bbox={face_detection.get('bounding_box')}), forcing regeneration for {file_id}")
-                            logger.warning(f"Full visual_evidence: {visual_evidence}")
-                            logger.warning(f"Full details: {result_data.get('details', {})}")
-                    
-                    if needs_regeneration:
-                        try:
-                            if result_data.get('type') == 'image':
-                                logger.info(f"Calling generate_visual_evidence_data with details keys: {list(result_data.get('details', {}).keys())}")
-                                new_visual_evidence = generate_visual_evidence_data(
-                                    result_data.get('details', {}), 
-                                    file_path
-                                )
-                                logger.info(f"Generated visual evidence - face_detected: {new_visual_evidence.get('face_detection', {}).get('detected')}, bounding_box: {new_visual_evidence.get('face_detection', {}).get('bounding_box')}")
-                                result_data['visual_evidence'] = new_visual_evidence
-                            elif result_data.get('type') == 'video':
-                                result_data['visual_evidence'] = generate_video_visual_evidence_data(
-                                    result_data, 
-                                    file_path
-                                )
-                            # Update in memory only (no database storage)
-                            analysis_results[file_id]['result'] = result_data
-                            logger.info(f"Successfully regenerated visual evidence for {file_id} (in memory only)")
-                        except Exception as e:
-                            logger.error(f"Failed to regenerate visual evidence: {e}")
-                            import traceback
-                            logger.error(traceback.format_exc())
-            
             result = AnalysisResult(
                 file_id=file_id,
                 status=file_data['status'],
                 result=result_data,
                 error=file_data.get('error'),
-                timestamp=file_data.get('timestamp', datetime.now())
+                timestamp=file_data.get('timestamp', datetime.now()),
+                derivatives=file_data.get('derivatives')
             )
             return result
         
@@ -1516,6 +1776,60 @@ async def get_results(
         logger.error(f"Get results error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/results/{file_id}/events")
+async def stream_progress(
+    file_id: str,
+    last_event_id: Optional[str] = Header(default=None)
+):
+    """Stream stage-level analysis progress as Server-Sent Events"""
+    if file_id not in analysis_results:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    try:
+        after_id = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        after_id = 0
+    
+    # A client that already saw the terminal event (or the snapshot below) is told
+    # with 204 that nothing more will come, which stops EventSource reconnecting
+    file_data = analysis_results.get(file_id, {})
+    snapshot_only = not progress_broker.history(file_id) and file_data.get('status') in ('completed', 'error')
+    if progress_broker.finished(file_id, after_id) or (snapshot_only and after_id >= 1):
+        return Response(status_code=204)
+    
+    async def event_stream():
+        # Jobs that finished before this process recorded any events (e.g. after a
+        # restart) get a single terminal snapshot instead of an open stream
+        if snapshot_only:
+            result_data = file_data.get('result') or {}
+            yield format_sse({
+                'id': 1,
+                'file_id': file_id,
+                'stage': file_data['status'],
+                'progress': 1.0 if file_data['status'] == 'completed' else None,
+                'message': file_data.get('error') or 'Report ready',
+                'data': {
+                    'type': result_data.get('type'),
+                    'prediction': result_data.get('prediction'),
+                    'confidence': result_data.get('confidence')
+                },
+                'timestamp': datetime.now().timestamp()
+            })
+            return
+        
+        async for event in progress_broker.subscribe(file_id, after_id=after_id):
+            yield format_sse(event)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.get("/files")
 async def list_files():
     """List all uploaded files"""
@@ -1526,7 +1840,7 @@ async def list_files():
         
         cursor.execute('''
             SELECT file_id, filename, file_type, file_size, upload_time, 
-                   status, analysis_result, created_at
+                   status, analysis_result, created_at, content_hash
             FROM file_metadata
             ORDER BY created_at DESC
         ''')
@@ -1536,7 +1850,7 @@ async def list_files():
         
         files = []
         for row in rows:
-            file_id, filename, file_type, file_size, upload_time, status, analysis_result, created_at = row
+            file_id, filename, file_type, file_size, upload_time, status, analysis_result, created_at, content_hash = row
             
             file_data = {
                 'file_id': file_id,
@@ -1545,7 +1859,9 @@ async def list_files():
                 'file_size': file_size,
                 'status': status,
                 'uploaded_at': upload_time,
-                'created_at': created_at
+                'created_at': created_at,
+                # Derivatives outlive the original upload, so list thumbnails even after cleanup
+                'derivatives': derivative_store.urls(derivative_store.names(content_hash, file_type)) or None
             }
             
             # Include analysis results if available
@@ -1572,9 +1888,11 @@ async def delete_file(
     try:
         # Check in memory first
         file_path = None
+        content_hash = None
         if file_id in analysis_results:
             file_data = analysis_results[file_id]
             file_path = file_data.get('file_path')
+            content_hash = file_data.get('content_hash')
         else:
             # Check database if not in memory
             conn = get_db_connection()
@@ -1601,6 +1919,12 @@ async def delete_file(
         # Remove from memory if present
         if file_id in analysis_results:
             del analysis_results[file_id]
+        progress_broker.discard(file_id)
+        report_cache.discard(file_id)
+        media_index.discard(file_id)
+        # Derivatives are shared by uploads with the same content
+        if content_hash and not any(data.get('content_hash') == content_hash for data in analysis_results.values()):
+            derivative_store.discard(content_hash)
         
         # Remove from database
         delete_file_metadata(file_id)
@@ -1661,17 +1985,26 @@ async def get_educational_content():
     }
 
 # Background analysis function
+def announce_queued(file_id: str, file_type: str):
+    """Start a fresh progress stream for a (re-)analysis of a file"""
+    # A previous run's history ends in a terminal event that would end new streams at once;
+    # event IDs carry on from that run so a reconnect with its Last-Event-ID still gets this one
+    progress_broker.reset(file_id)
+    progress_broker.publish(file_id, 'queued', 0.0, 'Analysis queued', {'file_type': file_type})
+
 async def perform_analysis(file_id: str, file_path: str, file_type: str):
     """Perform the actual analysis in background"""
+    report_progress = progress_broker.reporter(file_id)
     try:
         logger.info(f"Starting analysis for {file_id} ({file_type})")
+        report_progress('started', 0.0, f'Starting {file_type} analysis')
         
         if file_type == 'image':
-            result = await analyze_image(file_path)
+            result = await analyze_image(file_path, report_progress)
         elif file_type == 'video':
-            result = await analyze_video(file_path)
+            result = await analyze_video(file_path, report_progress)
         elif file_type == 'audio':
-            result = await analyze_audio(file_path)
+            result = await analyze_audio(file_path, report_progress)
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
         
@@ -1683,9 +2016,17 @@ async def perform_analysis(file_id: str, file_path: str, file_type: str):
         
         logger.info(f"Results stored. Status: {analysis_results[file_id]['status']}")
         logger.info(f"Available file IDs after storing: {list(analysis_results.keys())}")
+        report_progress('completed', 1.0, 'Report ready',
+                        type=result.get('type'),
+                        prediction=result.get('prediction'),
+                        confidence=result.get('confidence'))
+        
+        # Render the PDF report now so the first download is served from cache
+        if os.getenv("REPORT_PREGENERATE", "1").lower() not in ("0", "false", "no"):
+            asyncio.create_task(report_cache.pregenerate(file_id, analysis_results[file_id]['file_info'], result))
         
         # Clean up file after analysis (with delay for visual evidence)
-        cleanup_file(file_path, delay_audio=True)
+        await run_in_threadpool(cleanup_file, file_path, delay_audio=True, file_id=file_id)
         
         logger.info(f"Analysis completed for {file_id}")
         
@@ -1694,11 +2035,38 @@ async def perform_analysis(file_id: str, file_path: str, file_type: str):
         analysis_results[file_id]['status'] = 'error'
         analysis_results[file_id]['error'] = str(e)
         analysis_results[file_id]['timestamp'] = datetime.now()
+        report_progress('error', None, str(e))
         
         # Clean up file even on error
-        cleanup_file(file_path)
+        await run_in_threadpool(cleanup_file, file_path, file_id=file_id)
+
+async def run_batch_item(file_id: str) -> Dict:
+    """Make sure a file has been analyzed and return its final state (used by batches)"""
+    file_data = analysis_results.get(file_id)
+    if file_data is None:
+        return {'status': 'error', 'error': 'File not found'}
+    
+    if file_data.get('status') == 'processing':
+        # Analysis was started elsewhere (e.g. an earlier duplicate upload): wait for its
+        # terminal progress event, re-checking the status in case that event was missed
+        async for event in progress_broker.subscribe(file_id, keepalive=5.0):
+            if event is None and analysis_results.get(file_id, {}).get('status') != 'processing':
+                break
+    elif file_data.get('status') not in ('completed', 'error'):
+        file_type = file_data['file_info']['file_type']
+        file_data['status'] = 'processing'
+        file_data['timestamp'] = datetime.now()
+        announce_queued(file_id, file_type)
+        await perform_analysis(file_id, file_data['file_path'], file_type)
+    
+    file_data = analysis_results.get(file_id, {})
+    return {
+        'status': file_data.get('status', 'error'),
+        'result': file_data.get('result'),
+        'error': file_data.get('error')
+    }
 
-async def analyze_image(file_path: str) -> Dict:
+async def analyze_image(file_path: str, progress_callback=None) -> Dict:
     """Analyze image using existing detector"""
     try:
         # Use lazy initialization
@@ -1706,8 +2074,10 @@ async def analyze_image(file_path: str) -> Dict:
         if detector is None:
             raise HTTPException(status_code=503, detail="Image detector not available")
         
-        # Use existing detection method
-        confidence, prediction, details = detector.detect_deepfake(file_path)
+        # Run the blocking detector off the event loop so progress events can stream
+        confidence, prediction, details = await run_in_threadpool(
+            detector.detect_deepfake, file_path, progress_callback
+        )
         
         # Convert details to ensure JSON serializable
         details_serializable = convert_numpy_types(details)
@@ -1723,16 +2093,18 @@ async def analyze_image(file_path: str) -> Dict:
                 'models_used': list(details.get('model_predictions', {}).keys()),
                 'ensemble_confidence': float(confidence)
             },
-            'visual_evidence': generate_visual_evidence_data(details_serializable, file_path)
         }
         
+        # Visual evidence re-reads the image and runs face detection, keep it off the loop
+        result = await run_in_threadpool(attach_visual_evidence, result, file_path)
+        
         return result
         
     except Exception as e:
         logger.error(f"Image analysis error: {e}")
         raise
 
-async def analyze_video(file_path: str) -> Dict:
+async def analyze_video(file_path: str, progress_callback=None) -> Dict:
     """Analyze video using OpenAI detector"""
     try:
         # Use lazy initialization
@@ -1741,7 +2113,9 @@ async def analyze_video(file_path: str) -> Dict:
             raise HTTPException(status_code=503, detail="Video detector not available")
         
         # Use OpenAI detection method
-        results = detector.detect_video_deepfake(file_path)
+        results = await run_in_threadpool(
+            detector.detect_video_deepfake, file_path, progress_callback
+        )
         
         # Convert results to ensure JSON serializable
         results_serializable = convert_numpy_types(results)
@@ -1775,17 +2149,18 @@ async def analyze_video(file_path: str) -> Dict:
             'model_info': model_info,
             'video_info': video_info,
             'frame_analysis': frame_analysis,
-            'video_score': results_serializable.get('video_score', {}),
-            'visual_evidence': generate_video_visual_evidence_data(results_serializable, file_path)
+            'video_score': results_serializable.get('video_score', {})
         }
         
+        result = await run_in_threadpool(attach_visual_evidence, result, file_path)
+        
         return result
         
     except Exception as e:
         logger.error(f"Video analysis error: {e}")
         raise
 
-async def analyze_audio(file_path: str) -> Dict:
+async def analyze_audio(file_path: str, progress_callback=None) -> Dict:
     """Analyze audio using hybrid approach combining AASIST, RawNet2, and comprehensive feature analysis"""
     try:
         # Use lazy initialization
@@ -1796,7 +2171,9 @@ async def analyze_audio(file_path: str) -> Dict:
         logger.info(f"Starting audio analysis for: {file_path}")
         
         # Use audio detection method with timeout handling
-        confidence, prediction, details = detector.detect_deepfake(file_path)
+        confidence, prediction, details = await run_in_threadpool(
+            detector.detect_deepfake, file_path, progress_callback
+        )
         
         logger.info(f"Audio analysis completed: {prediction} ({confidence:.1f}%)")
         
@@ -1843,221 +2220,312 @@ async def serve_file_options(file_path: str):
         status_code=200,
         headers={
             "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, OPTIONS",
+            "Access-Control-Allow-Methods": "GET, HEAD, OPTIONS",
             "Access-Control-Allow-Headers": "*",
         }
     )
 
-# Custom file serving endpoint to handle missing files gracefully
-@app.get("/uploads/{file_path:path}")
-async def serve_file(
-    file_path: str
-):
-    """Serve uploaded file with proper error handling"""
+def lookup_media_entry(file_id: str) -> Optional[Dict]:
+    """Media index fallback: the stored file for an ID not yet in memory"""
+    conn = get_db_connection()
     try:
-        # Extract file_id from path (handle both with and without extension)
-        # Path format: {file_id} or {file_id}.{ext}
-        file_id = Path(file_path).stem  # Get filename without extension
-        
-        # Check if file exists in database
-        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT filename, file_type, file_path 
+            SELECT filename, file_type, file_path, content_hash
             FROM file_metadata 
             WHERE file_id = ?
         ''', (file_id,))
-        result = cursor.fetchone()
+        row = cursor.fetchone()
+    finally:
         conn.close()
+    if not row:
+        return None
+    filename, file_type, stored_file_path, content_hash = row
+    return {'path': stored_file_path, 'filename': filename, 'file_type': file_type, 'content_hash': content_hash}
+
+# file_id -> stored file, so media (and every Range request while seeking) is served without a DB query
+media_index = MediaIndex(lookup=lookup_media_entry)
+
+# Optional nginx offload: set MEDIA_ACCEL_REDIRECT to the internal location nginx aliases to MEDIA_ACCEL_ROOT
+media_accel = AccelRedirect(os.getenv("MEDIA_ACCEL_REDIRECT", ""), os.getenv("MEDIA_ACCEL_ROOT", "uploads"))
+
+# Custom file serving endpoint to handle missing files gracefully
+# HEAD is answered here too; nothing else under /uploads is served
+@app.api_route("/uploads/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_file(
+    file_path: str,
+    request: Request
+):
+    """Serve uploaded file with range, ETag and Last-Modified support"""
+    try:
+        # Extract file_id from path (handle both with and without extension)
+        # Path format: {file_id} or {file_id}.{ext}
+        file_id = Path(file_path).stem  # Get filename without extension
         
-        if not result:
+        entry = media_index.get(file_id)
+        if not entry:
             logger.warning(f"File {file_id} not found in database")
             raise HTTPException(status_code=404, detail="File not found in database")
         
-        filename, file_type, stored_file_path = result
-        
-        # Check if file exists on disk
-        if not os.path.exists(stored_file_path):
-            logger.warning(f"File {file_id} ({filename}) not found on disk at {stored_file_path}")
+        headers = {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET, HEAD, OPTIONS",
+            "Access-Control-Allow-Headers": "*",
+            "Access-Control-Expose-Headers": "Content-Length, Content-Range, Accept-Ranges, ETag, Last-Modified",
+            # Revalidate with ETag/Last-Modified rather than re-downloading
+            "Cache-Control": "public, max-age=3600" if entry['file_type'] == 'audio' else "private, no-cache"
+        }
+        try:
+            offloaded = media_accel.response(
+                entry['path'],
+                dict(headers, **{"Content-Disposition": content_disposition(entry['filename'])}),
+                get_media_type(entry['path'])
+            )
+            return offloaded or media_response(entry, request.headers, headers)
+        except FileNotFoundError:
+            logger.warning(f"File {file_id} ({entry['filename']}) not found on disk at {entry['path']}")
+            media_index.discard(file_id)
             # Update database to mark file as deleted
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE file_metadata 
-                    SET status = 'deleted', updated_at = CURRENT_TIMESTAMP
-                    WHERE file_id = ?
-                ''', (file_id,))
-                conn.commit()
-                conn.close()
-            except Exception as db_error:
-                logger.error(f"Failed to update file status in database: {db_error}")
-            
+            update_file_status(file_id, 'deleted')
             raise HTTPException(status_code=404, detail="File not found on disk")
         
-        # Determine media type based on file extension
-        file_ext = Path(stored_file_path).suffix.lower()
-        media_type_map = {
-            '.wav': 'audio/wave',  # Use audio/wave for better browser compatibility
-            '.mp3': 'audio/mpeg',
-            '.flac': 'audio/flac',
-            '.aac': 'audio/aac',
-            '.ogg': 'audio/ogg',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.mp4': 'video/mp4',
-            '.avi': 'video/x-msvideo',
-            '.mov': 'video/quicktime',
-            '.webm': 'video/webm'
-        }
-        media_type = media_type_map.get(file_ext, 'application/octet-stream')
-        
-        # Return file response with proper headers
-        response = FileResponse(
-            stored_file_path, 
-            filename=filename,
-            media_type=media_type
-        )
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "GET, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "*"
-        response.headers["Accept-Ranges"] = "bytes"
-        
-        # Add enhanced headers for audio files to help with playback
-        if file_type == 'audio':
-            response.headers["Cache-Control"] = "public, max-age=3600"
-            # Add Content-Type explicitly for better browser compatibility
-            if file_ext == '.wav':
-                response.headers["Content-Type"] = "audio/wave"
-            # Enable range requests for audio streaming
-            response.headers["Accept-Ranges"] = "bytes"
-            # Add CORS headers specifically for audio
-            response.headers["Access-Control-Expose-Headers"] = "Content-Length, Content-Range, Accept-Ranges"
-        
-        return response
-        
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error serving file {file_path}: {e}")
         raise HTTPException(status_code=500, detail="Error serving file")
 
-# Initialize PDF report generator
-pdf_generator = PDFReportGenerator()
+# Thumbnails, previews, video posters and audio waveforms, named by content hash
+derivative_store = DerivativeStore(
+    os.getenv("DERIVATIVE_DIR", os.path.join("uploads", "derivatives")),
+    max_workers=int(os.getenv("DERIVATIVE_WORKERS", "2"))
+)
 
-@app.get("/report/{file_id}")
-async def generate_pdf_report(
-    file_id: str
+async def generate_derivatives(file_id: str):
+    """Generate display derivatives for an upload and attach their URLs to its record"""
+    file_data = analysis_results.get(file_id)
+    if not file_data:
+        return
+    names = await derivative_store.ensure(file_data['file_path'], file_data['file_info']['file_type'],
+                                          file_data.get('content_hash'))
+    if names and file_id in analysis_results:
+        analysis_results[file_id]['derivatives'] = derivative_store.urls(names)
+        logger.info(f"Derivatives ready for {file_id}: {sorted(names)}")
+
+@app.get("/derivatives/{name}")
+async def serve_derivative(name: str, request: Request):
+    """Serve a thumbnail, preview, poster frame or waveform (immutable, content-hash named)"""
+    path = derivative_store.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Derivative not found")
+    headers = {
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Expose-Headers": "Content-Length, ETag",
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+    entry = {'path': str(path), 'filename': name, 'file_type': 'derivative', 'content_hash': None}
+    try:
+        offloaded = media_accel.response(
+            str(path), dict(headers, **{"Content-Disposition": content_disposition(name)}), get_media_type(name)
+        )
+        return offloaded or media_response(entry, request.headers, headers)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Derivative not found")
+
+PEAKS_MAX_WIDTH = 20000
+
+@app.get("/audio/{file_id}/peaks")
+async def get_audio_peaks(
+    file_id: str,
+    start: float = 0.0,
+    end: Optional[float] = None,
+    width: int = 1000,
+    bits: int = 8,
+    format: str = "json"
 ):
-    """Generate and download PDF report for analysis results"""
+    """
+    Waveform min/max peaks for [start, end) seconds in at most ``width`` points
+    (zooming in picks a finer stored level). ``format=binary`` returns raw
+    interleaved int8/int16 min/max pairs with the metadata in X-Peaks-* headers.
+    """
+    if not 1 <= width <= PEAKS_MAX_WIDTH:
+        raise HTTPException(status_code=400, detail=f"width must be between 1 and {PEAKS_MAX_WIDTH}")
+    if bits not in (8, 16):
+        raise HTTPException(status_code=400, detail="bits must be 8 or 16")
+    if format not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'binary'")
+    if start < 0 or (end is not None and end <= start):
+        raise HTTPException(status_code=400, detail="Invalid time range")
+    
+    entry = media_index.get(file_id)
+    if not entry or entry['file_type'] != 'audio':
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    
+    peaks_name = derivative_store.names(entry.get('content_hash'), 'audio').get('peaks')
+    if peaks_name is None and os.path.exists(entry['path']):
+        # Not generated yet (upload still being processed, or uploaded before peaks existed)
+        peaks_name = (await derivative_store.ensure(entry['path'], 'audio', entry.get('content_hash'))).get('peaks')
+    if peaks_name is None:
+        raise HTTPException(status_code=404, detail="Waveform peaks not available")
+    
     try:
-        logger.info(f"Generating PDF report for file_id: {file_id}")
+        peaks = PeaksFile(str(derivative_store.directory / peaks_name))
+        end = peaks.duration if end is None else min(end, peaks.duration)
+        rows, samples_per_peak = peaks.select(start, end, width)
+        data = to_bits(rows, bits)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to read waveform peaks for {file_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to read waveform peaks")
+    
+    headers = {
+        "Access-Control-Allow-Origin": "*",
+        "Cache-Control": "public, max-age=86400"
+    }
+    if format == "binary":
+        headers.update({
+            "X-Peaks-Sample-Rate": str(peaks.sample_rate),
+            "X-Peaks-Samples-Per-Peak": f"{samples_per_peak:g}",
+            "X-Peaks-Bits": str(bits),
+            "X-Peaks-Length": str(len(data)),
+            "X-Peaks-Start": f"{start:g}",
+            "X-Peaks-End": f"{end:g}",
+            "X-Peaks-Duration": f"{peaks.duration:g}",
+            "Access-Control-Expose-Headers": "X-Peaks-Sample-Rate, X-Peaks-Samples-Per-Peak, X-Peaks-Bits, "
+                                             "X-Peaks-Length, X-Peaks-Start, X-Peaks-End, X-Peaks-Duration"
+        })
+        return Response(content=data.tobytes(), media_type="application/octet-stream", headers=headers)
+    
+    return JSONResponse(content={
+        'sample_rate': peaks.sample_rate,
+        'samples_per_peak': samples_per_peak,
+        'bits': bits,
+        'length': len(data),
+        'start': start,
+        'end': end,
+        'duration': peaks.duration,
+        # Interleaved min/max pairs
+        'data': data.reshape(-1).tolist()
+    }, headers=headers)
+
+# Initialize PDF report generator
+pdf_generator = PDFReportGenerator()
+
+# Rendered reports, keyed by file, result version and template version
+report_cache = ReportCache(
+    os.getenv("REPORT_CACHE_DIR", os.path.join("uploads", "reports")),
+    render=pdf_generator.render_report,
+    template_version=REPORT_TEMPLATE_VERSION,
+    persist=os.getenv("REPORT_CACHE_PERSIST", "1").lower() not in ("0", "false", "no")
+)
+
+REPORT_STREAM_CHUNK = 64 * 1024
+
+def iter_bytes(data: bytes, chunk_size: int = REPORT_STREAM_CHUNK):
+    """Yield an in-memory body in chunks without copying it"""
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+def load_report_inputs(file_id: str) -> Tuple[Dict, Dict]:
+    """File info and analysis result for a completed analysis (memory first, then database)"""
+    file_info = None
+    analysis_result = None
+    status = None
+    
+    if file_id in analysis_results:
+        file_data = analysis_results[file_id]
+        file_info = file_data.get('file_info', {})
+        analysis_result = file_data.get('result')
+        status = file_data.get('status')
+    else:
+        # Query database if not in memory
+        conn = get_db_connection()
+        cursor = conn.cursor()
         
-        # Check in memory first, then database
-        file_info = None
-        analysis_result = None
-        status = None
+        cursor.execute('''
+            SELECT filename, file_type, file_size, upload_time, 
+                   status, analysis_result
+            FROM file_metadata
+            WHERE file_id = ?
+        ''', (file_id,))
         
-        if file_id in analysis_results:
-            file_data = analysis_results[file_id]
-            file_info = file_data.get('file_info', {})
-            analysis_result = file_data.get('result')
-            status = file_data.get('status')
-        else:
-            # Query database if not in memory
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT filename, file_type, file_size, upload_time, 
-                       status, analysis_result
-                FROM file_metadata
-                WHERE file_id = ?
-            ''', (file_id,))
-            
-            row = cursor.fetchone()
-            conn.close()
-            
-            if not row:
-                raise HTTPException(status_code=404, detail="File not found")
-            
-            filename, file_type, file_size, upload_time, db_status, analysis_result_json = row
-            
-            file_info = {
-                'file_id': file_id,
-                'filename': filename,
-                'file_type': file_type,
-                'file_size': file_size,
-                'upload_time': upload_time
-            }
-            
-            status = db_status
-            
-            # Parse analysis result
-            if analysis_result_json:
-                try:
-                    analysis_result = json.loads(analysis_result_json)
-                except json.JSONDecodeError:
-                    logger.warning(f"Failed to parse analysis result for {file_id}")
+        row = cursor.fetchone()
+        conn.close()
         
-        # Check if analysis is completed
-        if status != 'completed':
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Analysis not completed. Current status: {status}"
-            )
+        if not row:
+            raise HTTPException(status_code=404, detail="File not found")
         
-        if not analysis_result:
-            raise HTTPException(status_code=404, detail="Analysis results not found")
+        filename, file_type, file_size, upload_time, db_status, analysis_result_json = row
         
-        # Create reports directory if it doesn't exist
-        reports_dir = Path("uploads/reports")
-        reports_dir.mkdir(parents=True, exist_ok=True)
+        file_info = {
+            'file_id': file_id,
+            'filename': filename,
+            'file_type': file_type,
+            'file_size': file_size,
+            'upload_time': upload_time
+        }
         
-        # Generate PDF report
-        pdf_filename = f"{file_id}_report.pdf"
-        pdf_path = reports_dir / pdf_filename
+        status = db_status
         
-        # Generate the PDF report
-        pdf_generator.generate_report(
-            file_id=file_id,
-            file_info=file_info,
-            analysis_result=analysis_result,
-            output_path=str(pdf_path)
+        # Parse analysis result
+        if analysis_result_json:
+            try:
+                analysis_result = json.loads(analysis_result_json)
+            except json.JSONDecodeError:
+                logger.warning(f"Failed to parse analysis result for {file_id}")
+    
+    # Check if analysis is completed
+    if status != 'completed':
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Analysis not completed. Current status: {status}"
         )
+    
+    if not analysis_result:
+        raise HTTPException(status_code=404, detail="Analysis results not found")
+    
+    return file_info, analysis_result
+
+@app.get("/report/{file_id}")
+async def generate_pdf_report(
+    file_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Download the PDF report for analysis results (rendered once, then served from cache)"""
+    try:
+        file_info, analysis_result = load_report_inputs(file_id)
         
-        # Ensure file exists and is readable
-        if not pdf_path.exists():
-            raise HTTPException(status_code=500, detail="PDF report file was not created")
-        
-        # Read the file into memory to avoid Content-Length issues
-        try:
-            with open(str(pdf_path), 'rb') as f:
-                pdf_content = f.read()
-            
-            if not pdf_content:
-                raise HTTPException(status_code=500, detail="PDF report file is empty")
-            
-            # Return PDF file as Response with proper headers
-            response = Response(
-                content=pdf_content,
-                media_type="application/pdf",
-                headers={
-                    "Content-Disposition": f'attachment; filename="deepfake_analysis_report_{file_id}.pdf"',
-                    "Access-Control-Allow-Origin": "*",
-                    "Access-Control-Allow-Methods": "GET, OPTIONS",
-                    "Access-Control-Allow-Headers": "*"
-                }
+        etag = report_cache.etag(file_id, analysis_result)
+        headers = {
+            "ETag": f'"{etag}"',
+            "Cache-Control": "private, no-cache",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET, OPTIONS",
+            "Access-Control-Allow-Headers": "*",
+            "Access-Control-Expose-Headers": "ETag"
+        }
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        
+        # Usually already rendered in the background when analysis completed
+        pdf_path, pdf_bytes = await report_cache.get_or_render(file_id, file_info, analysis_result)
+        filename = f"deepfake_analysis_report_{file_id}.pdf"
+        
+        if pdf_path is not None:
+            logger.info(f"Serving cached PDF report for {file_id}: {pdf_path}")
+            offloaded = media_accel.response(
+                str(pdf_path),
+                dict(headers, **{"Content-Disposition": content_disposition(filename, "attachment")}),
+                "application/pdf"
             )
-            
-            logger.info(f"PDF report generated successfully: {pdf_path} (size: {len(pdf_content)} bytes)")
-            return response
-            
-        except IOError as e:
-            logger.error(f"Error reading PDF file {pdf_path}: {e}")
-            raise HTTPException(status_code=500, detail=f"Error reading PDF report: {str(e)}")
+            return offloaded or FileResponse(str(pdf_path), media_type="application/pdf", filename=filename,
+                                             headers=headers)
+        
+        # Fresh render: stream it straight from memory
+        logger.info(f"Streaming PDF report for {file_id} ({len(pdf_bytes)} bytes)")
+        headers["Content-Length"] = str(len(pdf_bytes))
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return StreamingResponse(iter_bytes(pdf_bytes), media_type="application/pdf", headers=headers)
         
     except HTTPException:
         raise
@@ -2065,8 +2533,47 @@ async def generate_pdf_report(
         logger.error(f"Error generating PDF report for {file_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Error generating PDF report: {str(e)}")
 
-# Mount static files for direct access (fallback)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Bulk report exports (rendered in a process pool, archived under uploads/exports)
+export_manager = ExportManager(
+    os.getenv("REPORT_EXPORT_DIR", os.path.join("uploads", "exports")),
+    load_inputs=load_report_inputs,
+    max_workers=int(os.getenv("REPORT_EXPORT_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    retention_seconds=float(os.getenv("REPORT_EXPORT_RETENTION_SECONDS", "3600")),
+    max_jobs=int(os.getenv("REPORT_EXPORT_MAX_RETAINED", "100"))
+)
+
+@app.post("/reports/export")
+async def create_report_export(request: ReportExportRequest):
+    """Start a background job exporting the reports of many analyzed files"""
+    if not request.file_ids:
+        raise HTTPException(status_code=400, detail="No file_ids given")
+    try:
+        return export_manager.create_job(request.file_ids, request.format,
+                                         use_llm=request.use_llm, summary_format=request.summary_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/reports/export/{job_id}")
+async def get_report_export_status(job_id: str):
+    """Progress of a report export job"""
+    status_data = export_manager.get_status(job_id)
+    if status_data is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return status_data
+
+@app.get("/reports/export/{job_id}/download")
+async def download_report_export(job_id: str):
+    """Download a finished export (ZIP of reports plus the verdict summary)"""
+    status_data = export_manager.get_status(job_id)
+    if status_data is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    archive_path = export_manager.output_path(job_id)
+    if archive_path is None or not archive_path.exists():
+        raise HTTPException(status_code=409, detail=f"Export not ready. Current status: {status_data['status']}")
+    filename = f"deepfake_reports_{job_id}.zip"
+    offloaded = media_accel.response(str(archive_path), {"Content-Disposition": content_disposition(filename, "attachment")},
+                                     "application/zip")
+    return offloaded or FileResponse(str(archive_path), media_type="application/zip", filename=filename)
 
 if __name__ == "__main__":
     import uvicorn
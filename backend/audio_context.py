@@ -0,0 +1,107 @@
+"""
+Per-request Audio Context
+Holds everything derived from one audio file during a detection request so
+each stage decodes, resamples and featurizes at most once
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_segments import FeatureTrack
+from audio_stream import audio_duration
+from audio_vad import detect_speech_regions, extract_regions
+
+logger = logging.getLogger(__name__)
+
+
+class AudioContext:
+    """
+    Lazily decoded audio plus the stage results computed from it.
+
+    The transcription, feature and fallback stages of a request all read
+    from the same context instead of going back to the file.
+    """
+
+    def __init__(self, audio_path: str, sr: int = 16000, vad: bool = False):
+        self.path = audio_path
+        self.sr = sr
+        # Restrict feature extraction and transcription to speech regions
+        self.vad = vad
+        self._lock = threading.RLock()
+        self._waveform: Optional[np.ndarray] = None
+        self._speech_regions: Optional[List[Tuple[float, float]]] = None
+        self._resampled: Dict[int, np.ndarray] = {}
+        self._header_probed = False
+        self._header_duration: Optional[float] = None
+
+        # Stage results; None until the stage has run
+        self.features: Optional[Dict] = None
+        self.transcript: Optional[Dict] = None
+        # Time-binned frame features for per-segment statistics
+        self.track: Optional[FeatureTrack] = None
+
+    @property
+    def header_duration(self) -> Optional[float]:
+        """Duration from the container header, without decoding (None if unreadable)"""
+        if not self._header_probed:
+            self._header_duration = audio_duration(self.path)
+            self._header_probed = True
+        return self._header_duration
+
+    @property
+    def file_size(self) -> int:
+        return os.path.getsize(self.path)
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._waveform is not None
+
+    def set_decoded(self, waveform: np.ndarray, speech_regions: Optional[List[Tuple[float, float]]] = None):
+        """Adopt audio already decoded (and optionally VAD-segmented) by another process"""
+        with self._lock:
+            self._waveform = waveform
+            if speech_regions is not None:
+                self._speech_regions = [tuple(region) for region in speech_regions]
+
+    @property
+    def waveform(self) -> np.ndarray:
+        """Mono waveform at ``sr``, decoded on first access"""
+        with self._lock:
+            if self._waveform is None:
+                import librosa
+                self._waveform, _ = librosa.load(self.path, sr=self.sr)
+            return self._waveform
+
+    def waveform_at(self, sr: int) -> np.ndarray:
+        """The decoded waveform resampled to ``sr``, cached per rate"""
+        if sr == self.sr:
+            return self.waveform
+        with self._lock:
+            if sr not in self._resampled:
+                import librosa
+                self._resampled[sr] = librosa.resample(self.waveform, orig_sr=self.sr, target_sr=sr)
+            return self._resampled[sr]
+
+    @property
+    def speech_regions(self) -> List[Tuple[float, float]]:
+        """(start, end) seconds of detected speech, computed once"""
+        with self._lock:
+            if self._speech_regions is None:
+                self._speech_regions = detect_speech_regions(self.waveform, self.sr)
+            return self._speech_regions
+
+    @property
+    def speech_waveform(self) -> np.ndarray:
+        """Samples of the speech regions only, concatenated"""
+        return extract_regions(self.waveform, self.sr, self.speech_regions)
+
+    @property
+    def duration(self) -> float:
+        """Best known duration in seconds"""
+        if self._waveform is not None:
+            return len(self._waveform) / self.sr
+        return self.header_duration or 0.0
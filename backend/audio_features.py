@@ -0,0 +1,239 @@
+"""
+Audio Feature Engine
+Computes the magnitude STFT and mel spectrogram of a waveform once and derives
+every spectral feature used by the audio detector from those intermediates
+"""
+
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from audio_pitch import PITCH_MODES, PYIN_SAMPLE_RATE, f0_statistics, pitch_statistics, piptrack_track
+from audio_segments import FeatureTrack
+
+logger = logging.getLogger(__name__)
+
+# Expensive optional features enabled per profile
+FEATURE_PROFILES = {
+    # Spectral statistics, MFCC, chroma, contrast and pitch only
+    'fast': {'tonnetz': False, 'hpss': False, 'beat': False},
+    # Adds rhythm and harmonic/percussive balance
+    'standard': {'tonnetz': False, 'hpss': True, 'beat': True},
+    # Everything the detector has historically reported
+    'full': {'tonnetz': True, 'hpss': True, 'beat': True},
+}
+
+DEFAULT_PROFILE = 'full'
+
+
+class SharedSpectrogram:
+    """STFT-domain intermediates shared by all feature computations for one waveform"""
+
+    def __init__(self, waveform: np.ndarray, sr: int, n_fft: int, hop_length: int, n_mels: int):
+        import librosa
+
+        self.waveform = waveform
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+
+        # One STFT for the whole feature pass
+        self.stft = librosa.stft(waveform, n_fft=n_fft, hop_length=hop_length)
+        self.magnitude = np.abs(self.stft)
+        self.power = self.magnitude ** 2
+
+        # Mel spectrogram and its dB form feed MFCC and onset strength
+        self.mel = librosa.feature.melspectrogram(S=self.power, sr=sr, n_mels=n_mels)
+        self.mel_db = librosa.power_to_db(self.mel)
+
+    @property
+    def n_frames(self) -> int:
+        return self.magnitude.shape[1]
+
+    def frame_times(self) -> np.ndarray:
+        """Start time in seconds of each STFT frame"""
+        import librosa
+        return librosa.frames_to_time(np.arange(self.n_frames), sr=self.sr, hop_length=self.hop_length)
+
+
+class AudioFeatureEngine:
+    """
+    Extracts the detector's comprehensive audio features from a shared spectrogram.
+
+    Every librosa feature is called with precomputed ``S=`` inputs instead of
+    the raw waveform, so the STFT and mel projection are computed exactly once
+    per waveform. Tonnetz, HPSS and beat tracking can be switched off through
+    the profile.
+    """
+
+    def __init__(self, sr: int = 16000, n_fft: int = 2048, hop_length: int = 512,
+                 n_mels: int = 128, n_mfcc: int = 13, profile: str = DEFAULT_PROFILE,
+                 pitch_mode: str = 'piptrack'):
+        if profile not in FEATURE_PROFILES:
+            raise ValueError(f"Unknown audio feature profile '{profile}'. Choose from {list(FEATURE_PROFILES)}")
+        if pitch_mode not in PITCH_MODES:
+            raise ValueError(f"Unknown pitch mode '{pitch_mode}'. Choose from {list(PITCH_MODES)}")
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.n_mfcc = n_mfcc
+        self.profile = profile
+        self.options = FEATURE_PROFILES[profile]
+        self.pitch_mode = pitch_mode
+
+    def spectrogram(self, waveform: np.ndarray) -> SharedSpectrogram:
+        """Compute the shared STFT-domain intermediates for a waveform"""
+        return SharedSpectrogram(waveform, self.sr, self.n_fft, self.hop_length, self.n_mels)
+
+    def frame_features(self, spec: SharedSpectrogram) -> Dict[str, np.ndarray]:
+        """Frame-level feature matrices (features x frames) derived from the spectrogram"""
+        import librosa
+
+        sr = spec.sr
+        frames = {
+            'zcr': librosa.feature.zero_crossing_rate(
+                spec.waveform, frame_length=self.n_fft, hop_length=self.hop_length
+            ),
+            'rms': librosa.feature.rms(S=spec.magnitude, frame_length=self.n_fft, hop_length=self.hop_length),
+            'spectral_centroid': librosa.feature.spectral_centroid(S=spec.magnitude, sr=sr),
+            'spectral_rolloff': librosa.feature.spectral_rolloff(S=spec.magnitude, sr=sr),
+            'spectral_bandwidth': librosa.feature.spectral_bandwidth(S=spec.magnitude, sr=sr),
+            'mfcc': librosa.feature.mfcc(S=spec.mel_db, sr=sr, n_mfcc=self.n_mfcc),
+            'chroma': librosa.feature.chroma_stft(S=spec.power, sr=sr),
+            'spectral_contrast': librosa.feature.spectral_contrast(S=spec.magnitude, sr=sr),
+        }
+
+        if self.options['tonnetz']:
+            # Tonnetz is projected from the shared STFT chroma instead of a separate CQT
+            frames['tonnetz'] = librosa.feature.tonnetz(chroma=frames['chroma'], sr=sr)
+
+        return frames
+
+    def pitch_statistics(self, spec: SharedSpectrogram,
+                         resample: Optional[Callable[[int], np.ndarray]] = None) -> Dict[str, float]:
+        """F0 statistics using the configured pitch mode"""
+        if self.pitch_mode == 'pyin' and resample is not None:
+            # Reuse the caller's cached downsampled waveform
+            return pitch_statistics('pyin', resample(PYIN_SAMPLE_RATE), PYIN_SAMPLE_RATE)
+        return pitch_statistics(self.pitch_mode, spec.waveform, spec.sr,
+                                magnitude=spec.magnitude, hop_length=spec.hop_length)
+
+    def piptrack_f0(self, spec: SharedSpectrogram) -> Optional[np.ndarray]:
+        """Per-frame piptrack F0 on the shared magnitude, or None if estimation fails"""
+        try:
+            return piptrack_track(spec.magnitude, spec.sr, spec.hop_length)
+        except Exception as e:
+            logger.warning(f"Pitch estimation failed: {e}")
+            return None
+
+    def fill_track(self, spec: SharedSpectrogram, frames: Dict[str, np.ndarray], f0: Optional[np.ndarray],
+                   track: FeatureTrack, time_map: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                   offset: float = 0.0):
+        """
+        Add this spectrogram's frames to a time-binned feature track.
+
+        ``time_map`` maps frame times to original-recording times (e.g. across
+        VAD cuts); ``offset`` is then added for streamed blocks.
+        """
+        times = spec.frame_times()
+        if time_map is not None:
+            times = time_map(times)
+        values = {name: frames[name][0] for name in ('rms', 'zcr', 'spectral_centroid', 'spectral_bandwidth')}
+        if f0 is not None:
+            values['f0'] = f0
+        track.add(times + offset, values)
+
+    def rhythm_features(self, spec: SharedSpectrogram) -> Dict:
+        """Tempo and beat count from an onset envelope built on the shared mel spectrogram"""
+        import librosa
+
+        onset_envelope = librosa.onset.onset_strength(S=spec.mel_db, sr=spec.sr)
+        tempo, beats = librosa.beat.beat_track(onset_envelope=onset_envelope, sr=spec.sr,
+                                               hop_length=spec.hop_length)
+        # librosa >= 0.10 returns tempo as a 1-element array
+        return {'tempo': float(np.atleast_1d(tempo)[0]), 'beat_count': int(len(beats))}
+
+    def harmonic_ratio(self, spec: SharedSpectrogram) -> float:
+        """
+        Harmonic-to-percussive energy ratio from median-filter HPSS on the shared STFT.
+
+        Energies are summed in the STFT domain (Parseval) rather than after
+        inverting both components back to waveforms.
+        """
+        harmonic_energy, percussive_energy = self.hpss_energy(spec)
+        return float(harmonic_energy / (percussive_energy + 1e-8))
+
+    def hpss_energy(self, spec: SharedSpectrogram) -> Tuple[float, float]:
+        """Mean harmonic and percussive energy per STFT bin"""
+        import librosa
+
+        harmonic, percussive = librosa.decompose.hpss(spec.magnitude)
+        return float(np.mean(harmonic ** 2)), float(np.mean(percussive ** 2))
+
+    def summarize(self, frames: Dict[str, np.ndarray]) -> Dict:
+        """Mean/std statistics over frames in the detector's comprehensive_features layout"""
+        summary = {
+            'zcr_mean': float(np.mean(frames['zcr'])),
+            'zcr_std': float(np.std(frames['zcr'])),
+        }
+        for name in ('spectral_centroid', 'spectral_rolloff', 'spectral_bandwidth'):
+            summary[f'{name}_mean'] = float(np.mean(frames[name]))
+            summary[f'{name}_std'] = float(np.std(frames[name]))
+        for name in ('mfcc', 'chroma', 'tonnetz', 'spectral_contrast'):
+            if name in frames:
+                summary[f'{name}_mean'] = [float(x) for x in np.mean(frames[name], axis=1)]
+                summary[f'{name}_std'] = [float(x) for x in np.std(frames[name], axis=1)]
+        return summary
+
+    def extract(self, waveform: np.ndarray, spec: Optional[SharedSpectrogram] = None,
+                resample: Optional[Callable[[int], np.ndarray]] = None,
+                track: Optional[FeatureTrack] = None,
+                time_map: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> Dict:
+        """
+        Compute the full feature dictionary returned by the audio detector.
+
+        ``resample(sr)`` may supply cached resampled copies of the waveform.
+        When ``track`` is given, frame features are also binned into it for
+        per-segment statistics; its F0 always comes from piptrack on the
+        shared magnitude, whatever the pitch mode.
+        """
+        if spec is None:
+            spec = self.spectrogram(waveform)
+
+        duration = len(waveform) / self.sr
+        rms_energy = np.sqrt(np.mean(waveform ** 2)) if len(waveform) else 0.0
+
+        frames = self.frame_features(spec)
+        comprehensive_features = {
+            # Energy statistics are computed over the global RMS as they always have been
+            'energy_mean': float(np.mean(rms_energy)),
+            'energy_std': float(np.std(rms_energy)),
+        }
+        if track is not None and self.pitch_mode == 'piptrack':
+            # One piptrack pass feeds both the statistics and the track
+            f0 = self.piptrack_f0(spec)
+            comprehensive_features.update(
+                f0_statistics(f0) if f0 is not None else {'f0_mean': 0.0, 'f0_std': 0.0}
+            )
+        else:
+            comprehensive_features.update(self.pitch_statistics(spec, resample))
+            f0 = self.piptrack_f0(spec) if track is not None else None
+        comprehensive_features.update(self.summarize(frames))
+        if track is not None:
+            self.fill_track(spec, frames, f0, track, time_map)
+
+        if self.options['beat']:
+            comprehensive_features.update(self.rhythm_features(spec))
+        if self.options['hpss']:
+            comprehensive_features['harmonic_ratio'] = self.harmonic_ratio(spec)
+
+        return {
+            'duration': duration,
+            'sample_rate': self.sr,
+            'rms_energy': float(rms_energy),
+            'zero_crossing_rate': comprehensive_features['zcr_mean'],
+            'feature_profile': self.profile,
+            'comprehensive_features': comprehensive_features
+        }
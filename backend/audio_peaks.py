@@ -0,0 +1,168 @@
+"""
+Audio Waveform Peaks
+Multi-resolution min/max peaks for drawing waveforms. Peaks are computed once
+per file from a streaming block decode and stored as a compact int16 binary,
+so any time range and zoom level can be sliced out without decoding the
+audio again or shipping PCM to the browser
+"""
+
+import logging
+import math
+import struct
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'WFPK'
+FORMAT_VERSION = 1
+# magic, version, sample rate, samples per peak (finest level), level factor, level count, total samples
+HEADER = struct.Struct('<4sHIIHHQ')
+LEVEL_LENGTH = struct.Struct('<I')
+
+BASE_SAMPLES_PER_PEAK = 256
+LEVEL_FACTOR = 4
+# Coarser levels are added until one has about this many peaks
+MIN_LEVEL_PEAKS = 1024
+DECODE_BLOCK_SECONDS = 30.0
+
+
+def _decode_blocks(audio_path: str, block_seconds: float) -> Tuple[int, Iterator[np.ndarray]]:
+    """(native sample rate, mono float32 blocks); falls back to a full decode for containers soundfile can't read"""
+    import soundfile as sf
+
+    try:
+        sample_rate = sf.info(audio_path).samplerate
+    except RuntimeError:
+        import librosa
+
+        samples, sample_rate = librosa.load(audio_path, sr=None, mono=True)
+        step = int(block_seconds * sample_rate)
+        return sample_rate, (samples[i:i + step] for i in range(0, len(samples), step))
+
+    def blocks():
+        for block in sf.blocks(audio_path, blocksize=int(block_seconds * sample_rate), always_2d=True,
+                               dtype='float32'):
+            yield block.mean(axis=1)
+
+    return sample_rate, blocks()
+
+
+def reduce_peaks(peaks: np.ndarray, factor: int) -> np.ndarray:
+    """Merge each run of ``factor`` (min, max) rows into one (the last run may be shorter)"""
+    starts = np.arange(0, len(peaks), factor)
+    return np.stack([np.minimum.reduceat(peaks[:, 0], starts), np.maximum.reduceat(peaks[:, 1], starts)], axis=1)
+
+
+def compute_peaks(audio_path: str, samples_per_peak: int = BASE_SAMPLES_PER_PEAK,
+                  block_seconds: float = DECODE_BLOCK_SECONDS) -> Tuple[int, int, List[np.ndarray]]:
+    """
+    Decode ``audio_path`` block by block into (min, max) peaks.
+
+    Returns:
+        (sample rate, total samples, levels) where level ``i`` holds float
+        peaks over ``samples_per_peak * LEVEL_FACTOR ** i`` samples each
+    """
+    sample_rate, blocks = _decode_blocks(audio_path, block_seconds)
+    mins, maxs = [], []
+    carry = np.zeros(0, dtype=np.float32)
+    total = 0
+    for block in blocks:
+        total += len(block)
+        if len(carry):
+            block = np.concatenate([carry, block])
+        # Peaks must not straddle block edges: keep the tail for the next block
+        usable = len(block) - len(block) % samples_per_peak
+        if usable:
+            starts = np.arange(0, usable, samples_per_peak)
+            mins.append(np.minimum.reduceat(block[:usable], starts))
+            maxs.append(np.maximum.reduceat(block[:usable], starts))
+        carry = block[usable:]
+    if len(carry):
+        mins.append(carry.min(keepdims=True))
+        maxs.append(carry.max(keepdims=True))
+
+    if not mins:
+        return sample_rate, 0, [np.zeros((0, 2), dtype=np.float32)]
+    levels = [np.stack([np.concatenate(mins), np.concatenate(maxs)], axis=1)]
+    while len(levels[-1]) > MIN_LEVEL_PEAKS * LEVEL_FACTOR:
+        levels.append(reduce_peaks(levels[-1], LEVEL_FACTOR))
+    return sample_rate, total, levels
+
+
+def encode_peaks(sample_rate: int, total_samples: int, levels: List[np.ndarray],
+                 samples_per_peak: int = BASE_SAMPLES_PER_PEAK) -> bytes:
+    """Binary peaks file: header, level lengths, then each level as interleaved int16 min/max"""
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, sample_rate, samples_per_peak, LEVEL_FACTOR, len(levels),
+                         total_samples)]
+    parts.extend(LEVEL_LENGTH.pack(len(level)) for level in levels)
+    for level in levels:
+        parts.append(np.clip(np.round(level * 32767), -32767, 32767).astype('<i2').tobytes())
+    return b''.join(parts)
+
+
+class PeaksFile:
+    """Memory-mapped view of a stored peaks file"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            header = f.read(HEADER.size)
+            magic, version, self.sample_rate, self.samples_per_peak, self.factor, level_count, self.total_samples = \
+                HEADER.unpack(header)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"Not a peaks file (v{FORMAT_VERSION}): {path}")
+            lengths = [LEVEL_LENGTH.unpack(f.read(LEVEL_LENGTH.size))[0] for _ in range(level_count)]
+
+        offset = HEADER.size + LEVEL_LENGTH.size * level_count
+        self.levels = []
+        for length in lengths:
+            self.levels.append(np.memmap(self.path, dtype='<i2', mode='r', offset=offset, shape=(length, 2))
+                               if length else np.zeros((0, 2), dtype='<i2'))
+            offset += length * 4
+
+    @property
+    def duration(self) -> float:
+        return self.total_samples / self.sample_rate if self.sample_rate else 0.0
+
+    def level_samples_per_peak(self, index: int) -> int:
+        return self.samples_per_peak * self.factor ** index
+
+    def select(self, start: float, end: float, width: int) -> Tuple[np.ndarray, float]:
+        """
+        At most ``width`` int16 (min, max) rows covering [start, end) seconds.
+
+        Uses the coarsest stored level that still has ``width`` peaks in range
+        (or the finest level when zoomed in further), then merges rows down to
+        ``width``. Returns the rows and the samples each row covers.
+        """
+        end = min(end, self.duration)
+        if end <= start:
+            return np.zeros((0, 2), dtype='<i2'), float(self.samples_per_peak)
+
+        chosen = 0
+        for index in reversed(range(len(self.levels))):
+            spp = self.level_samples_per_peak(index)
+            if (end - start) * self.sample_rate / spp >= width:
+                chosen = index
+                break
+        spp = self.level_samples_per_peak(chosen)
+        first = int(start * self.sample_rate // spp)
+        last = math.ceil(end * self.sample_rate / spp)
+        rows = np.asarray(self.levels[chosen][first:last])
+
+        if len(rows) > width:
+            starts = np.linspace(0, len(rows), width + 1).astype(np.int64)[:-1]
+            rows = np.stack([np.minimum.reduceat(rows[:, 0], starts), np.maximum.reduceat(rows[:, 1], starts)],
+                            axis=1)
+            return rows, spp * (last - first) / width
+        return rows, float(spp)
+
+
+def to_bits(rows: np.ndarray, bits: int) -> np.ndarray:
+    """int16 peaks as int8 (``bits=8``) or unchanged (``bits=16``)"""
+    if bits == 8:
+        return np.clip(rows.astype(np.int16) >> 8, -127, 127).astype(np.int8)
+    return rows.astype('<i2')
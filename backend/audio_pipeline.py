@@ -0,0 +1,178 @@
+"""
+Audio Stage Pipeline
+Runs the stages of an audio detection as a small dependency graph so that
+CPU-bound feature extraction (in a process pool) overlaps network-bound
+transcription, and records per-stage timings
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from audio_context import AudioContext
+from audio_features import AudioFeatureEngine
+from audio_segments import FeatureTrack
+from audio_stream import StreamingFeatureExtractor
+from audio_vad import TrimmedTimeline, speech_summary
+from process_pool import LazyProcessPool
+
+logger = logging.getLogger(__name__)
+
+
+def compute_features(context: AudioContext, engine: AudioFeatureEngine,
+                     streaming_extractor: StreamingFeatureExtractor,
+                     stream_threshold_seconds: float, track: Optional[FeatureTrack] = None) -> Dict:
+    """
+    Feature dictionary for a context: streamed for long files, whole-file otherwise.
+
+    ``track`` is filled with time-binned frame features at original offsets.
+    """
+    duration = context.header_duration
+    if duration and duration > stream_threshold_seconds and not context.is_decoded:
+        logger.info(f"Streaming features for {duration:.0f}s recording")
+        return streaming_extractor.extract_file(context.path, vad=context.vad, track=track)
+
+    if not context.vad:
+        # All spectral features share one STFT and mel spectrogram
+        return engine.extract(context.waveform, resample=context.waveform_at, track=track)
+
+    speech = context.speech_waveform
+    time_map = TrimmedTimeline(context.speech_regions).to_original_array
+    if len(speech) < engine.n_fft:
+        # No usable speech: describe the whole recording rather than nothing
+        speech = context.waveform
+        time_map = None
+    features = engine.extract(speech, track=track, time_map=time_map)
+    features['duration'] = context.duration
+    features['vad'] = speech_summary(context.speech_regions, context.duration)
+    return features
+
+
+# Engines are built once per worker process and reused across requests
+_worker_engines: Dict[Tuple, Tuple[AudioFeatureEngine, StreamingFeatureExtractor]] = {}
+
+
+def extract_features_worker(audio_path: str, sr: int, profile: str, pitch_mode: str,
+                            stream_threshold_seconds: float, vad: bool = False,
+                            waveform: Optional[np.ndarray] = None,
+                            speech_regions: Optional[List[Tuple[float, float]]] = None) -> Tuple[Dict, FeatureTrack]:
+    """
+    Process-pool entry point: featurize a file in the worker, returning features and track.
+
+    ``waveform`` and ``speech_regions`` are the requesting context's decoded
+    audio and VAD result; the file is only decoded (or streamed) here, and
+    speech only detected, when they are not given.
+    """
+    key = (sr, profile, pitch_mode)
+    if key not in _worker_engines:
+        engine = AudioFeatureEngine(sr=sr, profile=profile, pitch_mode=pitch_mode)
+        _worker_engines[key] = (engine, StreamingFeatureExtractor(engine))
+    engine, streaming_extractor = _worker_engines[key]
+    context = AudioContext(audio_path, sr=sr, vad=vad)
+    if waveform is not None:
+        context.set_decoded(waveform, speech_regions)
+    track = FeatureTrack()
+    features = compute_features(context, engine, streaming_extractor, stream_threshold_seconds, track)
+    return features, track
+
+
+_feature_pool = LazyProcessPool()
+
+
+def get_feature_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool shared by all detectors in this process, created on first use"""
+    return _feature_pool.get(workers)
+
+
+def reset_feature_pool():
+    """Drop a broken pool so the next request starts a fresh one; also stops it at app shutdown"""
+    _feature_pool.shutdown()
+
+
+class StageGraph:
+    """
+    Dependency-ordered stage executor.
+
+    Each stage runs on its own executor (a thread or process pool) as soon as
+    all of its dependencies have finished; stages without an executor run
+    inline in the calling thread, after every executor stage that became
+    ready with them has been submitted. Dependent stages receive the results
+    dict as their last argument. The first failing stage aborts the graph and
+    its exception is re-raised.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Dict] = {}
+        self.results: Dict[str, Any] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self._origin: Optional[float] = None
+
+    def add(self, name: str, fn: Callable, args: Iterable = (), deps: Iterable[str] = (),
+            executor: Optional[Executor] = None, on_complete: Optional[Callable[[Any], None]] = None):
+        """Register a stage; ``on_complete(result)`` runs in the calling thread when it finishes"""
+        self._stages[name] = {
+            'fn': fn,
+            'args': tuple(args),
+            'deps': tuple(deps),
+            'executor': executor,
+            'on_complete': on_complete
+        }
+
+    def _stamp(self, name: str, key: str):
+        self.timings.setdefault(name, {})[key] = round(time.monotonic() - self._origin, 4)
+
+    def _call_args(self, stage: Dict) -> Tuple:
+        return stage['args'] + ((self.results,) if stage['deps'] else ())
+
+    def _finish(self, name: str, result: Any):
+        self.results[name] = result
+        timing = self.timings[name]
+        timing['seconds'] = round(timing['end'] - timing['start'], 4)
+        callback = self._stages[name]['on_complete']
+        if callback:
+            callback(result)
+
+    def run(self) -> Dict[str, Any]:
+        """Run every stage and return their results keyed by stage name"""
+        self._origin = time.monotonic()
+        pending = dict(self._stages)
+        running: Dict[Future, str] = {}
+
+        try:
+            while pending or running:
+                ready = [name for name, stage in pending.items()
+                         if all(dep in self.results for dep in stage['deps'])]
+                # Submit executor stages first so they overlap the inline ones
+                ready.sort(key=lambda name: pending[name]['executor'] is None)
+                for name in ready:
+                    stage = pending.pop(name)
+                    self._stamp(name, 'start')
+                    if stage['executor'] is None:
+                        result = stage['fn'](*self._call_args(stage))
+                        self._stamp(name, 'end')
+                        self._finish(name, result)
+                    else:
+                        future = stage['executor'].submit(stage['fn'], *self._call_args(stage))
+                        running[future] = name
+                if ready:
+                    # Finished inline stages may have unblocked others
+                    continue
+                if not running:
+                    if pending:
+                        raise ValueError(f"Unsatisfiable stage dependencies: {sorted(pending)}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    self._stamp(name, 'end')
+                    self._finish(name, future.result())
+        finally:
+            for future in running:
+                future.cancel()
+
+        self.timings['total'] = {'seconds': round(time.monotonic() - self._origin, 4)}
+        return self.results
@@ -0,0 +1,103 @@
+"""
+Pitch (F0) Extraction
+Vectorized F0 statistics from piptrack output, plus an optional pYIN mode on
+downsampled audio that also reports voiced/unvoiced statistics
+"""
+
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PITCH_MODES = ('piptrack', 'pyin')
+
+# pYIN runs on telephone-band audio: speech F0 sits far below 4 kHz
+PYIN_SAMPLE_RATE = 8000
+PYIN_FMIN = 65.0
+PYIN_FMAX = 500.0
+
+
+def piptrack_f0(pitches: np.ndarray, magnitudes: np.ndarray) -> np.ndarray:
+    """
+    Per-frame F0 from piptrack output: the pitch of the strongest bin in each column.
+
+    Frames where that bin carries no pitch come back as 0.
+    """
+    if pitches.size == 0:
+        return np.zeros(0, dtype=pitches.dtype)
+    strongest = magnitudes.argmax(axis=0)
+    return pitches[strongest, np.arange(pitches.shape[1])]
+
+
+def f0_statistics(f0: np.ndarray) -> Dict[str, float]:
+    """Mean/std over frames with a positive pitch"""
+    voiced = f0[f0 > 0]
+    if voiced.size == 0:
+        return {'f0_mean': 0.0, 'f0_std': 0.0}
+    return {'f0_mean': float(np.mean(voiced)), 'f0_std': float(np.std(voiced))}
+
+
+def piptrack_track(magnitude: np.ndarray, sr: int, hop_length: int) -> np.ndarray:
+    """Per-frame F0 from piptrack on a precomputed magnitude spectrogram"""
+    import librosa
+
+    pitches, magnitudes = librosa.piptrack(S=magnitude, sr=sr, hop_length=hop_length)
+    return piptrack_f0(pitches, magnitudes)
+
+
+def piptrack_statistics(magnitude: np.ndarray, sr: int, hop_length: int) -> Dict[str, float]:
+    """F0 statistics from piptrack on a precomputed magnitude spectrogram"""
+    return f0_statistics(piptrack_track(magnitude, sr, hop_length))
+
+
+def pyin_track(waveform: np.ndarray, sr: int, target_sr: int = PYIN_SAMPLE_RATE,
+               fmin: float = PYIN_FMIN, fmax: float = PYIN_FMAX) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-frame F0 (0 where unvoiced) and voicing probability from pYIN on audio
+    resampled to ``target_sr``
+    """
+    import librosa
+
+    if sr > target_sr:
+        waveform = librosa.resample(waveform, orig_sr=sr, target_sr=target_sr)
+        sr = target_sr
+
+    # 128 ms frames / 32 ms hop at 8 kHz; long enough for a 65 Hz period
+    frame_length = 1024 * sr // PYIN_SAMPLE_RATE
+    f0, voiced_flag, voiced_probs = librosa.pyin(
+        waveform, fmin=fmin, fmax=fmax, sr=sr,
+        frame_length=frame_length, hop_length=frame_length // 4
+    )
+    f0 = np.where(voiced_flag & np.isfinite(f0), f0, 0.0)
+    return f0, np.nan_to_num(voiced_probs)
+
+
+def pyin_statistics(waveform: np.ndarray, sr: int) -> Dict[str, float]:
+    """
+    F0 and voicing statistics from pYIN.
+
+    Returns the same f0_mean/f0_std keys as the piptrack path plus
+    voiced_ratio and voiced_probability_mean.
+    """
+    f0, voiced_probs = pyin_track(waveform, sr)
+    stats = f0_statistics(f0)
+    stats['voiced_ratio'] = float(np.mean(f0 > 0)) if f0.size else 0.0
+    stats['voiced_probability_mean'] = float(np.mean(voiced_probs)) if voiced_probs.size else 0.0
+    return stats
+
+
+def pitch_statistics(mode: str, waveform: np.ndarray, sr: int,
+                     magnitude: Optional[np.ndarray] = None, hop_length: int = 512) -> Dict[str, float]:
+    """Dispatch to the configured pitch mode, falling back to zeros on failure"""
+    try:
+        if mode == 'pyin':
+            return pyin_statistics(waveform, sr)
+        if magnitude is None:
+            import librosa
+            magnitude = np.abs(librosa.stft(waveform, hop_length=hop_length))
+        return piptrack_statistics(magnitude, sr, hop_length)
+    except Exception as e:
+        logger.warning(f"Pitch estimation failed: {e}")
+        return {'f0_mean': 0.0, 'f0_std': 0.0}
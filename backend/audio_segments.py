@@ -0,0 +1,237 @@
+"""
+Segment-level Audio Scoring
+Per-segment acoustic statistics from a coarse feature track, batched GPT
+verdicts over groups of Whisper segments, and a timeline of suspicious spans
+so partially spliced audio is not averaged away by a single global verdict
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from response_cache import ResponseCache, hash_bytes
+from structured_output import SegmentVerdict, SegmentVerdicts, request_structured
+
+logger = logging.getLogger(__name__)
+
+TRACK_FEATURES = ('rms', 'zcr', 'spectral_centroid', 'spectral_bandwidth', 'f0')
+
+# Bump whenever the group prompt changes so cached verdicts are not reused
+PROMPT_VERSION = "1"
+
+
+class FeatureTrack:
+    """
+    Frame features binned in time: per-bin count, sum and sum of squares.
+
+    Memory grows with duration only at ``bin_seconds`` resolution, so the
+    track can be built from streamed blocks and shipped between processes.
+    F0 bins only count voiced frames.
+    """
+
+    def __init__(self, bin_seconds: float = 0.25):
+        self.bin_seconds = bin_seconds
+        self.count: Dict[str, np.ndarray] = {name: np.zeros(0) for name in TRACK_FEATURES}
+        self.total: Dict[str, np.ndarray] = {name: np.zeros(0) for name in TRACK_FEATURES}
+        self.total_sq: Dict[str, np.ndarray] = {name: np.zeros(0) for name in TRACK_FEATURES}
+
+    def add(self, times: np.ndarray, values: Dict[str, np.ndarray]):
+        """Accumulate per-frame values at original-recording times (seconds)"""
+        bins = np.floor(np.asarray(times) / self.bin_seconds).astype(np.int64)
+        for name in TRACK_FEATURES:
+            if name not in values:
+                continue
+            v = np.asarray(values[name], dtype=np.float64)[:len(bins)]
+            mask = np.isfinite(v) & (bins[:len(v)] >= 0)
+            if name == 'f0':
+                mask &= v > 0
+            b = bins[:len(v)][mask]
+            if b.size == 0:
+                continue
+            size = max(int(b.max()) + 1, len(self.count[name]))
+            for store, weights in ((self.count, None), (self.total, v[mask]), (self.total_sq, v[mask] ** 2)):
+                grown = np.zeros(size)
+                grown[:len(store[name])] = store[name]
+                grown += np.bincount(b, weights=weights, minlength=size)
+                store[name] = grown
+
+    def _bins(self, start: float, end: float) -> slice:
+        first = int(np.floor(start / self.bin_seconds))
+        return slice(first, max(first + 1, int(np.ceil(end / self.bin_seconds))))
+
+    def stats(self, start: float, end: float) -> Dict[str, Optional[Dict[str, float]]]:
+        """Mean/std of every tracked feature over [start, end), None where no frames fell"""
+        bins = self._bins(start, end)
+        stats = {}
+        for name in TRACK_FEATURES:
+            n = float(self.count[name][bins].sum())
+            if n == 0:
+                stats[name] = None
+                continue
+            mean = float(self.total[name][bins].sum()) / n
+            var = max(0.0, float(self.total_sq[name][bins].sum()) / n - mean ** 2)
+            stats[name] = {'mean': mean, 'std': float(np.sqrt(var))}
+        return stats
+
+    def frame_count(self, start: float, end: float, name: str = 'rms') -> int:
+        """Frames of ``name`` accumulated over [start, end)"""
+        return int(self.count[name][self._bins(start, end)].sum())
+
+
+def segment_features(track: Optional[FeatureTrack], segments: List[Dict]) -> List[Dict]:
+    """Transcript segments annotated with their acoustic statistics"""
+    annotated = []
+    for index, seg in enumerate(segments):
+        entry = {'index': index, 'start': float(seg['start']), 'end': float(seg['end']),
+                 'text': seg.get('text', '').strip(), 'features': {}}
+        if track is not None:
+            stats = track.stats(entry['start'], entry['end'])
+            features = {}
+            for name in TRACK_FEATURES:
+                features[f'{name}_mean'] = stats[name]['mean'] if stats[name] else None
+                features[f'{name}_std'] = stats[name]['std'] if stats[name] else None
+            frames = track.frame_count(entry['start'], entry['end'])
+            features['voiced_ratio'] = (
+                track.frame_count(entry['start'], entry['end'], 'f0') / frames if frames else None
+            )
+            entry['features'] = features
+        annotated.append(entry)
+    return annotated
+
+
+def group_segments(segments: List[Dict], group_size: int = 20, max_chars: int = 6000) -> List[List[Dict]]:
+    """Consecutive segment groups small enough for one request"""
+    groups: List[List[Dict]] = []
+    current: List[Dict] = []
+    chars = 0
+    for seg in segments:
+        if current and (len(current) >= group_size or chars + len(seg['text']) > max_chars):
+            groups.append(current)
+            current, chars = [], 0
+        current.append(seg)
+        chars += len(seg['text'])
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _fmt(value: Optional[float], spec: str) -> str:
+    return format(value, spec) if value is not None else "n/a"
+
+
+def build_group_prompt(group: List[Dict], global_features: Dict) -> str:
+    """Prompt listing each segment's timing, acoustics and text"""
+    lines = []
+    for seg in group:
+        f = seg['features']
+        lines.append(
+            f"[{seg['index']}] {seg['start']:.2f}-{seg['end']:.2f}s | "
+            f"F0 {_fmt(f.get('f0_mean'), '.0f')}±{_fmt(f.get('f0_std'), '.0f')} Hz | "
+            f"voiced {_fmt(f.get('voiced_ratio'), '.2f')} | "
+            f"centroid {_fmt(f.get('spectral_centroid_mean'), '.0f')}±{_fmt(f.get('spectral_centroid_std'), '.0f')} Hz | "
+            f"RMS {_fmt(f.get('rms_mean'), '.4f')}±{_fmt(f.get('rms_std'), '.4f')} | "
+            f"ZCR {_fmt(f.get('zcr_mean'), '.3f')} | "
+            f"text: {seg['text']!r}"
+        )
+
+    return f"""You are an expert audio deepfake analyst looking for spliced or partially synthetic speech.
+
+Recording-level reference: F0 mean {_fmt(global_features.get('f0_mean'), '.0f')} Hz, F0 std {_fmt(global_features.get('f0_std'), '.0f')} Hz, spectral centroid mean {_fmt(global_features.get('spectral_centroid_mean'), '.0f')} Hz.
+
+Below are consecutive transcript segments with their acoustic statistics. Judge each segment on its own and against its neighbours: abrupt shifts in pitch, timbre (centroid), loudness or voicing, or text that does not fit the surrounding speech, suggest inserted or synthetic audio.
+
+{chr(10).join(lines)}
+
+Return one entry per segment index above with:
+- prediction: "REAL" or "FAKE"
+- suspicion: 0.0-1.0 (how likely this segment is synthetic or spliced in)
+- reason: one short sentence"""
+
+
+def suspicious_spans(scored: List[Dict], threshold: float = 0.6, merge_gap: float = 1.0) -> List[Dict]:
+    """Merge consecutive suspicious segments into time spans"""
+    spans: List[Dict] = []
+    for seg in scored:
+        suspicion = seg.get('suspicion')
+        if suspicion is None or suspicion < threshold:
+            continue
+        if spans and seg['start'] - spans[-1]['end'] <= merge_gap:
+            span = spans[-1]
+            span['end'] = max(span['end'], seg['end'])
+            span['max_suspicion'] = max(span['max_suspicion'], suspicion)
+            span['segment_indices'].append(seg['index'])
+            if seg.get('reason'):
+                span['reasons'].append(seg['reason'])
+        else:
+            spans.append({
+                'start': seg['start'],
+                'end': seg['end'],
+                'max_suspicion': suspicion,
+                'segment_indices': [seg['index']],
+                'reasons': [seg['reason']] if seg.get('reason') else []
+            })
+    return spans
+
+
+class SegmentScorer:
+    """Scores transcript segments with one structured-output GPT request per group"""
+
+    def __init__(self, client, model: str = "gpt-4o", group_size: int = 20, max_workers: int = 4,
+                 threshold: float = 0.6, cache: Optional[ResponseCache] = None):
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.group_size = group_size
+        self.max_workers = max_workers
+        self.threshold = threshold
+
+    def _score_group(self, group: List[Dict], global_features: Dict) -> List[SegmentVerdict]:
+        """One strict structured-output request for a whole group"""
+        prompt = build_group_prompt(group, global_features)
+        result = request_structured(
+            self.client, self.model,
+            [
+                {"role": "system", "content": "You are an expert in audio deepfake detection. Respond with JSON only."},
+                {"role": "user", "content": prompt}
+            ],
+            SegmentVerdicts, max_tokens=200 + 80 * len(group), temperature=0.2,
+            cache=self.cache, cache_key=(PROMPT_VERSION, hash_bytes(prompt.encode('utf-8')))
+        )
+        if result.outcome == 'failed':
+            raise ValueError("segment verdicts could not be parsed")
+        return result.value.segments
+
+    def score(self, segments: List[Dict], global_features: Dict) -> Dict:
+        """Verdicts for every segment plus the merged suspicious spans"""
+        groups = group_segments(segments, self.group_size)
+        by_index = {seg['index']: dict(seg) for seg in segments}
+        errors = []
+
+        def run(group: List[Dict]):
+            try:
+                return self._score_group(group, global_features)
+            except Exception as e:
+                logger.error(f"Segment group {group[0]['index']}-{group[-1]['index']} scoring failed: {e}")
+                errors.append(str(e))
+                return []
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(groups)))) as pool:
+            for verdicts in pool.map(run, groups):
+                for verdict in verdicts:
+                    seg = by_index.get(verdict.index)
+                    if seg is not None:
+                        seg.update(prediction=verdict.prediction, suspicion=verdict.suspicion,
+                                   reason=verdict.reason)
+
+        scored = [by_index[seg['index']] for seg in segments]
+        result = {
+            'segments': scored,
+            'suspicious_spans': suspicious_spans(scored, self.threshold),
+            'group_count': len(groups),
+            'scored_count': sum(1 for seg in scored if seg.get('suspicion') is not None)
+        }
+        if errors:
+            result['errors'] = errors
+        return result
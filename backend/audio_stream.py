@@ -0,0 +1,384 @@
+"""
+Streaming Audio Analysis
+Decodes long recordings in fixed-size blocks, folds per-block features into
+running aggregates, and transcribes them as overlapping segments so memory
+stays bounded regardless of duration
+"""
+
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from audio_features import AudioFeatureEngine
+from audio_pitch import piptrack_track, pyin_track
+from audio_segments import FeatureTrack
+from audio_vad import TrimmedTimeline, detect_speech_regions, extract_regions, speech_summary
+
+logger = logging.getLogger(__name__)
+
+# Whisper rejects uploads above 25 MB; 16 kHz mono PCM16 is ~1.9 MB per minute
+WHISPER_MAX_UPLOAD_BYTES = 24 * 1024 * 1024
+TRANSCRIPTION_SEGMENT_SECONDS = 600.0
+TRANSCRIPTION_OVERLAP_SECONDS = 5.0
+
+
+class RunningStats:
+    """
+    Mean and population standard deviation over the last axis, updated one
+    block at a time (Welford/Chan parallel update)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean: Optional[np.ndarray] = None
+        self.m2: Optional[np.ndarray] = None
+
+    def update(self, values: np.ndarray):
+        """Fold a (features x frames) or (frames,) block into the aggregate"""
+        values = np.asarray(values, dtype=np.float64)
+        n = values.shape[-1]
+        if n == 0:
+            return
+        block_mean = values.mean(axis=-1)
+        block_m2 = ((values - block_mean[..., None]) ** 2).sum(axis=-1)
+        if self.count == 0:
+            self.count, self.mean, self.m2 = n, block_mean, block_m2
+            return
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + block_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    @property
+    def std(self) -> Optional[np.ndarray]:
+        if self.count == 0:
+            return None
+        return np.sqrt(self.m2 / self.count)
+
+
+def audio_duration(audio_path: str) -> Optional[float]:
+    """Duration from the file header, or None if soundfile cannot read the container"""
+    try:
+        import soundfile as sf
+        return float(sf.info(audio_path).duration)
+    except Exception:
+        return None
+
+
+def _to_mono_resampled(block: np.ndarray, native_sr: int, sr: int) -> np.ndarray:
+    """Mix a (frames x channels) block down to mono float32 at ``sr``"""
+    import librosa
+
+    mono = block.mean(axis=1) if block.ndim == 2 else block
+    mono = mono.astype(np.float32)
+    if native_sr != sr:
+        mono = librosa.resample(mono, orig_sr=native_sr, target_sr=sr)
+    return mono
+
+
+def iter_audio_blocks(audio_path: str, sr: int = 16000, block_seconds: float = 60.0) -> Iterator[np.ndarray]:
+    """Yield consecutive mono blocks of roughly ``block_seconds`` resampled to ``sr``"""
+    import soundfile as sf
+
+    native_sr = sf.info(audio_path).samplerate
+    blocksize = int(block_seconds * native_sr)
+    for block in sf.blocks(audio_path, blocksize=blocksize, always_2d=True, dtype='float32'):
+        yield _to_mono_resampled(block, native_sr, sr)
+
+
+def read_audio_span(audio_path: str, start: float, end: float, sr: int = 16000) -> np.ndarray:
+    """Decode only [start, end) seconds of a file as mono at ``sr``"""
+    import soundfile as sf
+
+    with sf.SoundFile(audio_path) as f:
+        native_sr = f.samplerate
+        first = int(start * native_sr)
+        f.seek(min(first, f.frames))
+        block = f.read(int((end - start) * native_sr), dtype='float32', always_2d=True)
+    return _to_mono_resampled(block, native_sr, sr)
+
+
+class StreamingFeatureExtractor:
+    """
+    Computes the AudioFeatureEngine feature dictionary block by block.
+
+    Frame statistics are merged exactly with RunningStats; tempo is the
+    duration-weighted mean of per-block estimates, beat counts are summed and
+    the harmonic ratio uses the summed per-block HPSS energies. STFT frames
+    at block edges are padded per block and chroma tuning and the piptrack
+    threshold are estimated per block, so values can differ slightly from a
+    single whole-file pass.
+
+    With ``vad`` enabled each block is reduced to its speech regions before
+    featurization; duration still reflects the whole recording. A
+    ``track`` passed to the extract methods is filled at original-recording
+    times.
+    """
+
+    def __init__(self, engine: AudioFeatureEngine, block_seconds: float = 60.0, vad: bool = False):
+        self.engine = engine
+        self.block_seconds = block_seconds
+        self.vad = vad
+
+    def extract_file(self, audio_path: str, vad: Optional[bool] = None,
+                     track: Optional[FeatureTrack] = None) -> Dict:
+        """Stream a file from disk and return its feature dictionary"""
+        return self.extract_blocks(iter_audio_blocks(audio_path, self.engine.sr, self.block_seconds), vad, track)
+
+    def extract_blocks(self, blocks: Iterator[np.ndarray], vad: Optional[bool] = None,
+                       track: Optional[FeatureTrack] = None) -> Dict:
+        """Fold an iterator of waveform blocks into one feature dictionary"""
+        engine = self.engine
+        vad = self.vad if vad is None else vad
+        frame_stats: Dict[str, RunningStats] = {}
+        f0_stats = RunningStats()
+        pitch_frames = 0
+        voiced_probability_sum = 0.0
+        samples = 0
+        sum_squares = 0.0
+        tempo_weighted = 0.0
+        beat_count = 0
+        harmonic_energy = 0.0
+        percussive_energy = 0.0
+        hpss_frames = 0
+        total_samples = 0
+        speech_regions: List[Tuple[float, float]] = []
+
+        for waveform in blocks:
+            block_offset = total_samples / engine.sr
+            total_samples += len(waveform)
+            time_map = None
+            if vad:
+                regions = detect_speech_regions(waveform, engine.sr)
+                time_map = TrimmedTimeline(regions).to_original_array
+                speech_regions.extend((block_offset + start, block_offset + end) for start, end in regions)
+                waveform = extract_regions(waveform, engine.sr, regions)
+
+            samples += len(waveform)
+            sum_squares += float(np.sum(waveform.astype(np.float64) ** 2))
+            if len(waveform) < engine.n_fft:
+                # A sliver at the end of the file carries no usable frames
+                continue
+
+            spec = engine.spectrogram(waveform)
+
+            frames = engine.frame_features(spec)
+            for name, values in frames.items():
+                frame_stats.setdefault(name, RunningStats()).update(values)
+
+            f0 = None
+            try:
+                if engine.pitch_mode == 'pyin':
+                    f0, voiced_probs = pyin_track(waveform, spec.sr)
+                    voiced_probability_sum += float(np.sum(voiced_probs))
+                else:
+                    f0 = piptrack_track(spec.magnitude, spec.sr, spec.hop_length)
+                pitch_frames += len(f0)
+                f0_stats.update(f0[f0 > 0])
+            except Exception as e:
+                logger.warning(f"Pitch estimation failed for block: {e}")
+
+            if track is not None:
+                # pYIN frames do not line up with the STFT; the track uses piptrack
+                track_f0 = f0 if engine.pitch_mode == 'piptrack' else engine.piptrack_f0(spec)
+                engine.fill_track(spec, frames, track_f0, track, time_map, offset=block_offset)
+
+            block_duration = len(waveform) / spec.sr
+            if engine.options['beat']:
+                rhythm = engine.rhythm_features(spec)
+                tempo_weighted += rhythm['tempo'] * block_duration
+                beat_count += rhythm['beat_count']
+            if engine.options['hpss']:
+                h, p = engine.hpss_energy(spec)
+                harmonic_energy += h * spec.n_frames
+                percussive_energy += p * spec.n_frames
+                hpss_frames += spec.n_frames
+
+        if not frame_stats:
+            raise ValueError("Audio stream contained no decodable frames")
+
+        duration = total_samples / engine.sr
+        analyzed_duration = samples / engine.sr
+        rms_energy = float(np.sqrt(sum_squares / samples)) if samples else 0.0
+
+        comprehensive_features = {
+            'energy_mean': rms_energy,
+            'energy_std': 0.0,
+            'f0_mean': float(f0_stats.mean) if f0_stats.count else 0.0,
+            'f0_std': float(f0_stats.std) if f0_stats.count else 0.0,
+        }
+        if engine.pitch_mode == 'pyin':
+            comprehensive_features['voiced_ratio'] = f0_stats.count / pitch_frames if pitch_frames else 0.0
+            comprehensive_features['voiced_probability_mean'] = (
+                voiced_probability_sum / pitch_frames if pitch_frames else 0.0
+            )
+
+        for name, stats in frame_stats.items():
+            if name == 'rms':
+                continue
+            mean, std = stats.mean, stats.std
+            if mean.shape[0] == 1:
+                comprehensive_features[f'{name}_mean'] = float(mean[0])
+                comprehensive_features[f'{name}_std'] = float(std[0])
+            else:
+                comprehensive_features[f'{name}_mean'] = [float(x) for x in mean]
+                comprehensive_features[f'{name}_std'] = [float(x) for x in std]
+
+        if engine.options['beat']:
+            comprehensive_features['tempo'] = tempo_weighted / analyzed_duration if analyzed_duration else 0.0
+            comprehensive_features['beat_count'] = beat_count
+        if engine.options['hpss'] and hpss_frames:
+            comprehensive_features['harmonic_ratio'] = float(
+                (harmonic_energy / hpss_frames) / (percussive_energy / hpss_frames + 1e-8)
+            )
+
+        features = {
+            'duration': duration,
+            'sample_rate': engine.sr,
+            'rms_energy': rms_energy,
+            'zero_crossing_rate': comprehensive_features['zcr_mean'],
+            'feature_profile': engine.profile,
+            'streamed': True,
+            'comprehensive_features': comprehensive_features
+        }
+        if vad:
+            features['vad'] = speech_summary(speech_regions, duration)
+        return features
+
+
+def plan_transcription_segments(duration: float, segment_seconds: float = TRANSCRIPTION_SEGMENT_SECONDS,
+                                overlap_seconds: float = TRANSCRIPTION_OVERLAP_SECONDS) -> List[Tuple[float, float]]:
+    """Split [0, duration) into segments that overlap by ``overlap_seconds``"""
+    if duration <= segment_seconds:
+        return [(0.0, duration)]
+    step = segment_seconds - overlap_seconds
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(start + segment_seconds, duration)
+        segments.append((start, end))
+        if end >= duration:
+            break
+        start += step
+    return segments
+
+
+def encode_wav(waveform: np.ndarray, sr: int, name: str = "segment.wav") -> io.BytesIO:
+    """In-memory 16-bit PCM WAV suitable for a Whisper upload"""
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    sf.write(buffer, waveform, sr, format='WAV', subtype='PCM_16')
+    buffer.seek(0)
+    buffer.name = name
+    return buffer
+
+
+def merge_transcripts(spans: List[Tuple[float, float]], transcripts: List[Dict],
+                      overlap_seconds: float = TRANSCRIPTION_OVERLAP_SECONDS) -> Dict:
+    """
+    Stitch per-span Whisper results into one transcript.
+
+    Segment times are shifted to file offsets. Inside each overlap, segments
+    are taken from the earlier span up to the overlap midpoint and from the
+    later span after it, so overlapped speech is not duplicated.
+    """
+    segments = []
+    texts = []
+    languages = []
+    errors = []
+    for index, ((start, end), transcript) in enumerate(zip(spans, transcripts)):
+        if transcript.get('error'):
+            errors.append(f"{start:.0f}-{end:.0f}s: {transcript['error']}")
+            continue
+        if transcript.get('language'):
+            languages.append(transcript['language'])
+
+        keep_from = start + overlap_seconds / 2 if index > 0 else float('-inf')
+        keep_until = spans[index + 1][0] + overlap_seconds / 2 if index + 1 < len(spans) else float('inf')
+
+        span_segments = transcript.get('segments') or []
+        if not span_segments:
+            texts.append(transcript.get('text', '').strip())
+            continue
+        for seg in span_segments:
+            seg_start = start + seg['start']
+            seg_end = start + seg['end']
+            midpoint = (seg_start + seg_end) / 2
+            if keep_from <= midpoint < keep_until:
+                segments.append({'start': seg_start, 'end': seg_end, 'text': seg['text']})
+                texts.append(seg['text'].strip())
+
+    if errors and not (segments or any(texts)):
+        return {'error': '; '.join(errors)}
+
+    merged = {
+        'text': ' '.join(t for t in texts if t),
+        'language': max(set(languages), key=languages.count) if languages else 'unknown',
+        'duration': spans[-1][1] if spans else 0.0,
+        'segments': segments,
+        'chunked': True,
+        'chunk_count': len(spans)
+    }
+    if errors:
+        merged['chunk_errors'] = errors
+    return merged
+
+
+def transcribe_speech(waveform: np.ndarray, sr: int, transcribe: Callable[[io.BytesIO], Dict],
+                      regions: Optional[List[Tuple[float, float]]] = None, name: str = "speech.wav") -> Dict:
+    """
+    Upload only the speech regions of ``waveform`` and map segment times back.
+
+    Audio without speech is not sent at all.
+    """
+    if regions is None:
+        regions = detect_speech_regions(waveform, sr)
+    if not regions:
+        return {'text': '', 'language': None, 'duration': len(waveform) / sr, 'segments': []}
+
+    transcript = transcribe(encode_wav(extract_regions(waveform, sr, regions), sr, name=name))
+    if transcript.get('segments'):
+        transcript['segments'] = TrimmedTimeline(regions).remap_segments(transcript['segments'])
+    transcript['duration'] = len(waveform) / sr
+    return transcript
+
+
+def transcribe_in_segments(audio_path: str, duration: float, transcribe: Callable[[io.BytesIO], Dict],
+                           sr: int = 16000, max_workers: int = 4,
+                           segment_seconds: float = TRANSCRIPTION_SEGMENT_SECONDS,
+                           overlap_seconds: float = TRANSCRIPTION_OVERLAP_SECONDS,
+                           waveform: Optional[np.ndarray] = None, vad: bool = False) -> Dict:
+    """
+    Transcribe a long file as overlapping WAV segments sent concurrently.
+
+    Spans are sliced from ``waveform`` (at ``sr``) when it is already decoded;
+    otherwise only ``max_workers`` segments are decoded from disk at a time.
+    With ``vad`` only the speech regions of each span are uploaded and the
+    returned segment times are mapped back to the span.
+    """
+    spans = plan_transcription_segments(duration, segment_seconds, overlap_seconds)
+
+    def run(span: Tuple[float, float]) -> Dict:
+        start, end = span
+        try:
+            if waveform is not None:
+                segment = waveform[int(start * sr):int(end * sr)]
+            else:
+                segment = read_audio_span(audio_path, start, end, sr)
+            if not vad:
+                return transcribe(encode_wav(segment, sr, name=f"segment_{int(start)}.wav"))
+            return transcribe_speech(segment, sr, transcribe, name=f"segment_{int(start)}.wav")
+        except Exception as e:
+            logger.error(f"Error transcribing segment {start:.0f}-{end:.0f}s: {e}")
+            return {'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        transcripts = list(pool.map(run, spans))
+
+    logger.info(f"Transcribed {len(spans)} overlapping segments of {audio_path}")
+    return merge_transcripts(spans, transcripts, overlap_seconds)
@@ -0,0 +1,118 @@
+"""
+Voice Activity Detection
+Energy/ZCR-based speech region detection used to drop silence before
+feature extraction and transcription, with helpers to map times in the
+trimmed audio back to offsets in the original recording
+"""
+
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRAME_SECONDS = 0.032
+HOP_SECONDS = 0.016
+
+
+def detect_speech_regions(waveform: np.ndarray, sr: int,
+                          min_speech: float = 0.2, merge_gap: float = 0.3,
+                          padding: float = 0.15, zcr_threshold: float = 0.25,
+                          silence_db: float = -50.0) -> List[Tuple[float, float]]:
+    """
+    Speech regions as (start, end) seconds.
+
+    A frame is speech when its RMS level is well above the recording's noise
+    floor, or moderately above it with a high zero-crossing rate (unvoiced
+    consonants). Regions are padded, gaps shorter than ``merge_gap`` are
+    bridged and regions shorter than ``min_speech`` are dropped. Audio that
+    never rises above ``silence_db`` has no speech; louder audio without a
+    usable dynamic range is treated as all speech.
+    """
+    import librosa
+
+    duration = len(waveform) / sr
+    if len(waveform) == 0:
+        return []
+
+    frame_length = int(FRAME_SECONDS * sr)
+    hop_length = int(HOP_SECONDS * sr)
+    rms = librosa.feature.rms(y=waveform, frame_length=frame_length, hop_length=hop_length)[0]
+    zcr = librosa.feature.zero_crossing_rate(waveform, frame_length=frame_length, hop_length=hop_length)[0]
+
+    level = 20 * np.log10(rms + 1e-10)
+    floor = np.percentile(level, 10)
+    peak = np.percentile(level, 99)
+    if peak < silence_db:
+        return []
+    if peak - floor < 10.0:
+        return [(0.0, duration)]
+
+    threshold = floor + 0.3 * (peak - floor)
+    speech = (level > threshold) | ((level > floor + 6.0) & (zcr > zcr_threshold))
+
+    # Frame runs -> time regions
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    regions = []
+    for start_frame, end_frame in zip(starts, ends):
+        start = max(0.0, start_frame * hop_length / sr - padding)
+        end = min(duration, end_frame * hop_length / sr + padding)
+        if regions and start - regions[-1][1] < merge_gap:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return [(float(start), float(end)) for start, end in regions if end - start >= min_speech]
+
+
+def extract_regions(waveform: np.ndarray, sr: int, regions: List[Tuple[float, float]]) -> np.ndarray:
+    """Concatenate the samples of every region"""
+    if not regions:
+        return waveform[:0]
+    return np.concatenate([waveform[int(start * sr):int(end * sr)] for start, end in regions])
+
+
+def speech_summary(regions: List[Tuple[float, float]], duration: float) -> Dict:
+    """Speech/silence totals for reporting alongside features"""
+    speech_seconds = float(sum(end - start for start, end in regions))
+    return {
+        'speech_regions': [{'start': round(start, 3), 'end': round(end, 3)} for start, end in regions],
+        'speech_seconds': round(speech_seconds, 3),
+        'silence_ratio': round(1.0 - speech_seconds / duration, 4) if duration else 0.0
+    }
+
+
+class TrimmedTimeline:
+    """Maps times in concatenated speech regions back to original offsets"""
+
+    def __init__(self, regions: List[Tuple[float, float]]):
+        self.starts = np.array([start for start, _ in regions], dtype=np.float64)
+        lengths = np.array([end - start for start, end in regions], dtype=np.float64)
+        self.trimmed_starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1])) if len(regions) else np.zeros(0)
+
+    def to_original(self, t: float) -> float:
+        """Original offset of time ``t`` in the trimmed audio"""
+        if len(self.starts) == 0:
+            return t
+        index = max(0, int(np.searchsorted(self.trimmed_starts, t, side='right')) - 1)
+        return float(self.starts[index] + (t - self.trimmed_starts[index]))
+
+    def to_original_array(self, times: np.ndarray) -> np.ndarray:
+        """Vectorized :meth:`to_original` for frame-time arrays"""
+        times = np.asarray(times, dtype=np.float64)
+        if len(self.starts) == 0:
+            return times
+        index = np.maximum(0, np.searchsorted(self.trimmed_starts, times, side='right') - 1)
+        return self.starts[index] + (times - self.trimmed_starts[index])
+
+    def remap_segments(self, segments: List[Dict]) -> List[Dict]:
+        """Whisper segments with start/end moved to original offsets"""
+        remapped = []
+        for seg in segments:
+            start = self.to_original(seg['start'])
+            # An end exactly on a join belongs to the region before it
+            end = self.to_original(max(seg['start'], seg['end'] - 1e-6)) + 1e-6
+            remapped.append({**seg, 'start': round(start, 3), 'end': round(end, 3)})
+        return remapped
@@ -0,0 +1,295 @@
+"""
+Batch Analysis Jobs
+Schedules many uploaded files as one batch under a shared rate budget and
+tracks aggregate progress and per-item results
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RateBudget:
+    """
+    Concurrency cap plus token bucket shared by every batch item.
+
+    ``max_concurrency`` bounds how many analyses run at once and
+    ``rate_per_minute`` bounds how many may start per minute, which keeps
+    large batches inside the OpenAI account's request budget.
+    """
+
+    def __init__(self, max_concurrency: int = 4, rate_per_minute: float = 60.0):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.rate_per_minute = float(rate_per_minute)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._tokens = float(self.max_concurrency)
+        self._last_refill = time.monotonic()
+        self._token_lock = asyncio.Lock()
+
+    async def _take_token(self):
+        """Wait until the token bucket allows another start"""
+        if self.rate_per_minute <= 0:
+            return
+        rate_per_second = self.rate_per_minute / 60.0
+        capacity = max(1.0, float(self.max_concurrency))
+        async with self._token_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(capacity, self._tokens + (now - self._last_refill) * rate_per_second)
+                self._last_refill = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / rate_per_second)
+
+    async def run(self, coro_factory: Callable[[], Awaitable]):
+        """Run a coroutine once both a concurrency slot and a rate token are free"""
+        async with self._semaphore:
+            await self._take_token()
+            return await coro_factory()
+
+
+def verdict(result: Optional[Dict]) -> Optional[Dict]:
+    """The part of an analysis result a batch keeps per item (full results stay with the file)"""
+    if not result:
+        return None
+    return {key: result.get(key) for key in ('type', 'prediction', 'confidence')}
+
+
+class BatchManager:
+    """
+    In-memory registry of batches and their scheduling tasks.
+
+    Items only keep their verdict, and finished batches are evicted once
+    they are older than ``retention_seconds`` or more than ``max_batches``
+    are held, so a steady stream of batches does not grow memory.
+    """
+
+    def __init__(self, run_item: Callable[[str], Awaitable[Dict]], budget: RateBudget,
+                 retention_seconds: float = 3600.0, max_batches: int = 1000):
+        """
+        Args:
+            run_item: Coroutine function taking a file_id, running its analysis and
+                returning a dict with at least 'status' and optionally 'result'/'error'
+            budget: Rate budget shared by all batches
+            retention_seconds: How long a finished batch stays queryable
+            max_batches: Finished batches kept at most (oldest are evicted first)
+        """
+        self.run_item = run_item
+        self.budget = budget
+        self.retention_seconds = float(retention_seconds)
+        self.max_batches = max(1, int(max_batches))
+        self.batches: Dict[str, Dict] = {}
+        self._conditions: Dict[str, asyncio.Condition] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # batch_id -> monotonic finish time, in finishing order
+        self._finished: Dict[str, float] = {}
+
+    def create_batch(self, items: List[Dict]) -> Dict:
+        """
+        Register a batch and start scheduling it.
+
+        Each item dict carries 'source' plus either 'file_id' (to analyze),
+        'duplicate_of' (an existing file_id whose analysis is reused) or
+        'error' (rejected before scheduling).
+        """
+        self.evict()
+        batch_id = str(uuid.uuid4())
+        batch_items = []
+        for index, item in enumerate(items):
+            if item.get('error'):
+                status = 'skipped'
+            elif item.get('duplicate_of'):
+                status = 'deduplicated'
+            else:
+                status = 'queued'
+            batch_items.append({
+                'index': index,
+                'source': item.get('source'),
+                'file_id': item.get('file_id') or item.get('duplicate_of'),
+                'content_hash': item.get('content_hash'),
+                'duplicate_of': item.get('duplicate_of'),
+                'status': status,
+                'error': item.get('error'),
+                'verdict': None,
+                'started_at': None,
+                'finished_at': None
+            })
+
+        batch = {
+            'batch_id': batch_id,
+            'created_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'items': batch_items,
+            # Rejected items are streamed first; the rest as they finish
+            'completion_order': [i['index'] for i in batch_items if i['status'] == 'skipped']
+        }
+        self.batches[batch_id] = batch
+        self._conditions[batch_id] = asyncio.Condition()
+        self._tasks[batch_id] = asyncio.create_task(self._schedule(batch_id))
+        logger.info(f"Batch {batch_id} created with {len(batch_items)} items")
+        return batch
+
+    def evict(self, now: Optional[float] = None):
+        """Forget finished batches past their retention, then the oldest beyond max_batches"""
+        now = time.monotonic() if now is None else now
+        expired = [batch_id for batch_id, finished in self._finished.items()
+                   if now - finished >= self.retention_seconds]
+        overflow = len(self._finished) - len(expired) - self.max_batches
+        if overflow > 0:
+            expired += [batch_id for batch_id in self._finished if batch_id not in expired][:overflow]
+        for batch_id in expired:
+            # Open result streams keep their own references and still finish
+            self._finished.pop(batch_id, None)
+            self.batches.pop(batch_id, None)
+            self._conditions.pop(batch_id, None)
+        if expired:
+            logger.info(f"Evicted {len(expired)} finished batches")
+
+    def get_status(self, batch_id: str) -> Optional[Dict]:
+        """Return aggregate progress and compact per-item state for a batch"""
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+
+        counts: Dict[str, int] = {}
+        for item in batch['items']:
+            counts[item['status']] = counts.get(item['status'], 0) + 1
+        total = len(batch['items'])
+        done = len(batch['completion_order'])
+
+        return {
+            'batch_id': batch_id,
+            'created_at': batch['created_at'],
+            'finished_at': batch['finished_at'],
+            'status': 'completed' if done == total else 'processing',
+            'total': total,
+            'done': done,
+            'progress': done / total if total else 1.0,
+            'counts': counts,
+            'items': [
+                {
+                    'index': item['index'],
+                    'source': item['source'],
+                    'file_id': item['file_id'],
+                    'status': item['status'],
+                    'duplicate_of': item['duplicate_of'],
+                    'error': item['error']
+                }
+                for item in batch['items']
+            ]
+        }
+
+    async def stream_results(self, batch_id: str) -> AsyncIterator[Dict]:
+        """Yield each item's final record as soon as it finishes"""
+        batch = self.batches[batch_id]
+        condition = self._conditions[batch_id]
+        sent = 0
+        while True:
+            async with condition:
+                await condition.wait_for(
+                    lambda: len(batch['completion_order']) > sent or batch['finished_at'] is not None
+                )
+                pending = batch['completion_order'][sent:]
+            for index in pending:
+                yield self._item_record(batch['items'][index])
+            sent += len(pending)
+            if batch['finished_at'] is not None and sent >= len(batch['completion_order']):
+                return
+
+    def _item_record(self, item: Dict) -> Dict:
+        """Per-item result line for the results stream"""
+        summary = item.get('verdict') or {}
+        return {
+            'index': item['index'],
+            'source': item['source'],
+            'file_id': item['file_id'],
+            'status': item['status'],
+            'duplicate_of': item['duplicate_of'],
+            'error': item['error'],
+            'prediction': summary.get('prediction'),
+            'confidence': summary.get('confidence'),
+            'type': summary.get('type')
+        }
+
+    async def _finish_item(self, batch_id: str, item: Dict):
+        """Record an item as final and wake stream readers"""
+        item['finished_at'] = datetime.now().isoformat()
+        condition = self._conditions[batch_id]
+        async with condition:
+            self.batches[batch_id]['completion_order'].append(item['index'])
+            condition.notify_all()
+
+    async def _run_one(self, batch_id: str, item: Dict):
+        """Analyze a single item inside the shared budget"""
+        async def analyze():
+            item['status'] = 'processing'
+            item['started_at'] = datetime.now().isoformat()
+            return await self.run_item(item['file_id'])
+
+        try:
+            outcome = await self.budget.run(analyze)
+            item['status'] = outcome.get('status', 'error')
+            item['verdict'] = verdict(outcome.get('result'))
+            item['error'] = outcome.get('error')
+        except Exception as e:
+            logger.error(f"Batch {batch_id} item {item['index']} failed: {e}")
+            item['status'] = 'error'
+            item['error'] = str(e)
+        await self._finish_item(batch_id, item)
+
+    async def _resolve_duplicate(self, batch_id: str, item: Dict, queued_by_file: Dict[str, Dict],
+                                 earlier: Dict[str, asyncio.Future]):
+        """Report a deduplicated item once the analysis it reuses is available"""
+        try:
+            original = queued_by_file.get(item['duplicate_of'])
+            if original is not None:
+                # Duplicate of another item in this batch: wait for that item
+                condition = self._conditions[batch_id]
+                async with condition:
+                    await condition.wait_for(lambda: original['finished_at'] is not None)
+                item['verdict'] = original.get('verdict')
+                item['error'] = original.get('error')
+            else:
+                # Duplicate of an earlier upload: it may still need analyzing, so it
+                # goes through the budget once however many items share it
+                task = earlier.get(item['duplicate_of'])
+                if task is None:
+                    file_id = item['duplicate_of']
+                    task = asyncio.ensure_future(self.budget.run(lambda: self.run_item(file_id)))
+                    earlier[file_id] = task
+                outcome = await task
+                item['verdict'] = verdict(outcome.get('result'))
+                item['error'] = outcome.get('error')
+        except Exception as e:
+            logger.error(f"Batch {batch_id} duplicate item {item['index']} failed: {e}")
+            item['error'] = str(e)
+        await self._finish_item(batch_id, item)
+
+    async def _schedule(self, batch_id: str):
+        """Run every queued item of a batch and mark the batch finished"""
+        batch = self.batches[batch_id]
+        try:
+            queued = [item for item in batch['items'] if item['status'] == 'queued']
+            queued_by_file = {item['file_id']: item for item in queued}
+            duplicates = [item for item in batch['items'] if item['status'] == 'deduplicated']
+            earlier: Dict[str, asyncio.Future] = {}
+            await asyncio.gather(
+                *(self._run_one(batch_id, item) for item in queued),
+                *(self._resolve_duplicate(batch_id, item, queued_by_file, earlier) for item in duplicates)
+            )
+        except Exception as e:
+            logger.error(f"Batch {batch_id} scheduling error: {e}")
+        finally:
+            condition = self._conditions[batch_id]
+            async with condition:
+                batch['finished_at'] = datetime.now().isoformat()
+                condition.notify_all()
+            self._tasks.pop(batch_id, None)
+            self._finished[batch_id] = time.monotonic()
+            logger.info(f"Batch {batch_id} finished")
@@ -0,0 +1,123 @@
+"""
+Scheduled File Cleanup
+Persistent queue of files to delete at a due time, kept in SQLite and drained
+in batches by one periodic reaper, so delayed deletions cost no threads and
+survive restarts
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60.0
+RETRY_MAX_SECONDS = 3600.0
+
+
+def create_cleanup_queue_table(cursor: sqlite3.Cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cleanup_queue (
+            path TEXT PRIMARY KEY,
+            file_id TEXT,
+            due_at REAL NOT NULL,
+            attempts INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cleanup_queue_due_at
+        ON cleanup_queue(due_at)
+    ''')
+
+
+class CleanupQueue:
+    """
+    Files scheduled for deletion, keyed by path.
+
+    ``schedule`` only writes a row; ``reap`` (run periodically from one task)
+    deletes every due file. Failed deletions are retried with backoff and
+    given up after MAX_ATTEMPTS. ``on_removed`` is called with the file_id of
+    every file that is gone, once its batch is committed.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], batch_size: int = 100,
+                 on_removed: Optional[Callable[[str], None]] = None):
+        self.connect = connect
+        self.batch_size = max(1, int(batch_size))
+        self.on_removed = on_removed
+
+    def schedule(self, path: str, delay_seconds: float, file_id: Optional[str] = None):
+        """Delete ``path`` after ``delay_seconds`` (rescheduling replaces an earlier due time)"""
+        conn = self.connect()
+        try:
+            conn.execute('''
+                INSERT INTO cleanup_queue (path, file_id, due_at, attempts) VALUES (?, ?, ?, 0)
+                ON CONFLICT(path) DO UPDATE SET due_at = excluded.due_at, attempts = 0
+            ''', (str(path), file_id, time.time() + delay_seconds))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def pending(self) -> int:
+        conn = self.connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM cleanup_queue').fetchone()[0]
+        finally:
+            conn.close()
+
+    def _reap_batch(self, now: float) -> Tuple[int, int]:
+        conn = self.connect()
+        try:
+            rows = conn.execute('''
+                SELECT path, file_id, attempts FROM cleanup_queue
+                WHERE due_at <= ?
+                ORDER BY due_at
+                LIMIT ?
+            ''', (now, self.batch_size)).fetchall()
+
+            removed = 0
+            gone = []
+            for path, file_id, attempts in rows:
+                try:
+                    os.remove(path)
+                    removed += 1
+                    logger.info(f"Scheduled cleanup removed {path}")
+                    gone.append(file_id)
+                except FileNotFoundError:
+                    gone.append(file_id)
+                except OSError as e:
+                    attempts += 1
+                    if attempts < MAX_ATTEMPTS:
+                        retry_at = now + min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempts)
+                        logger.warning(f"Scheduled cleanup of {path} failed (attempt {attempts}): {e}")
+                        conn.execute('UPDATE cleanup_queue SET due_at = ?, attempts = ? WHERE path = ?',
+                                     (retry_at, attempts, path))
+                        continue
+                    logger.error(f"Giving up on scheduled cleanup of {path} after {attempts} attempts: {e}")
+                conn.execute('DELETE FROM cleanup_queue WHERE path = ?', (path,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        # After the commit, so the callback can write to the same database
+        for file_id in gone:
+            if file_id and self.on_removed is not None:
+                try:
+                    self.on_removed(file_id)
+                except Exception as e:
+                    logger.warning(f"Cleanup callback for {file_id} failed: {e}")
+        return len(rows), removed
+
+    def reap(self, now: Optional[float] = None) -> int:
+        """Delete every due file, one batch per transaction; returns the number of files removed"""
+        now = time.time() if now is None else now
+        removed = 0
+        while True:
+            processed, batch_removed = self._reap_batch(now)
+            removed += batch_removed
+            if processed < self.batch_size:
+                return removed
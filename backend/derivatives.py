@@ -0,0 +1,224 @@
+"""
+Media Derivatives
+Small display versions of uploads: WebP thumbnails and previews for images,
+a poster frame for videos and, for audio, multi-resolution waveform peaks
+with an overview (PNG plus peak JSON). Each is generated once in a process
+pool and stored on disk under a name derived from the upload's content hash,
+so duplicate uploads share them
+"""
+
+import asyncio
+import json
+import logging
+import re
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Optional
+
+from audio_peaks import PeaksFile, compute_peaks, encode_peaks, to_bits
+from file_utils import write_atomic
+from process_pool import LazyProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Bump when sizes or encodings change so stale derivatives are regenerated
+DERIVATIVE_VERSION = 2
+
+THUMBNAIL_SIDE = 256
+PREVIEW_SIDE = 1024
+POSTER_SECONDS = 1.0
+WAVEFORM_BUCKETS = 800
+WAVEFORM_HEIGHT = 120
+WAVEFORM_COLOR = (124, 58, 237, 255)
+
+DERIVATIVE_KINDS = {
+    'image': ('thumbnail', 'preview'),
+    'video': ('thumbnail', 'poster'),
+    'audio': ('peaks', 'waveform', 'waveform_data')
+}
+EXTENSIONS = {'thumbnail': 'webp', 'preview': 'webp', 'poster': 'webp', 'waveform': 'png', 'waveform_data': 'json',
+              'peaks': 'dat'}
+NAME_PATTERN = re.compile(r'^[0-9a-f]{32}_[a-z_]+_v\d+\.(webp|png|json|dat)$')
+
+
+def derivative_name(content_hash: str, kind: str) -> str:
+    return f"{content_hash[:32]}_{kind}_v{DERIVATIVE_VERSION}.{EXTENSIONS[kind]}"
+
+
+def _load_image(path: str):
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as image:
+        return ImageOps.exif_transpose(image).convert('RGB')
+
+
+def _poster_frame(path: str):
+    """A frame about a second in (skipping fade-ins), or the first frame for short clips"""
+    import cv2
+    from PIL import Image
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        target = min(int(fps * POSTER_SECONDS), frame_count // 10) if frame_count > 0 else 0
+        if target:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+        ok, frame = cap.read()
+        if not ok and target:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = cap.read()
+        if not ok:
+            return None
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    finally:
+        cap.release()
+
+
+def _webp(image, side: int, quality: int) -> bytes:
+    from PIL import Image
+
+    image = image.copy()
+    image.thumbnail((side, side), Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def waveform_overview(peaks: PeaksFile, buckets: int = WAVEFORM_BUCKETS) -> Dict:
+    """Whole-file int8 min/max in at most ``buckets`` points, from the stored peaks"""
+    rows, _ = peaks.select(0.0, peaks.duration, buckets)
+    rows = to_bits(rows, 8)
+    return {
+        'version': DERIVATIVE_VERSION,
+        'duration': peaks.duration,
+        'bits': 8,
+        'min': rows[:, 0].astype(int).tolist(),
+        'max': rows[:, 1].astype(int).tolist()
+    }
+
+
+def _waveform_png(peaks: Dict) -> bytes:
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGBA', (WAVEFORM_BUCKETS, WAVEFORM_HEIGHT), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    middle = (WAVEFORM_HEIGHT - 1) / 2
+    # Short recordings have fewer points than pixels: stretch them across the width
+    step = WAVEFORM_BUCKETS / max(1, len(peaks['min']))
+    for i, (low, high) in enumerate(zip(peaks['min'], peaks['max'])):
+        top, bottom = middle - high / 127 * middle, middle - low / 127 * middle
+        draw.rectangle([(int(i * step), top), (max(int(i * step), int((i + 1) * step) - 1), bottom)],
+                       fill=WAVEFORM_COLOR)
+    buffer = BytesIO()
+    image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def render_derivatives(source_path: str, file_type: str, content_hash: str, directory: str) -> Dict[str, str]:
+    """Worker: write whichever derivatives of a file are missing; returns kind -> file name"""
+    directory = Path(directory)
+    names = {kind: derivative_name(content_hash, kind) for kind in DERIVATIVE_KINDS.get(file_type, ())}
+    missing = [kind for kind, name in names.items() if not (directory / name).exists()]
+    if not missing:
+        return names
+
+    if file_type == 'image':
+        image = _load_image(source_path)
+        outputs = {'thumbnail': lambda: _webp(image, THUMBNAIL_SIDE, 70),
+                   'preview': lambda: _webp(image, PREVIEW_SIDE, 80)}
+    elif file_type == 'video':
+        poster = _poster_frame(source_path)
+        if poster is None:
+            raise ValueError(f"No decodable frame in {source_path}")
+        outputs = {'thumbnail': lambda: _webp(poster, THUMBNAIL_SIDE, 70),
+                   'poster': lambda: _webp(poster, PREVIEW_SIDE, 80)}
+    else:
+        # Everything else for audio is drawn from the stored peaks
+        peaks_path = directory / names['peaks']
+        if 'peaks' in missing:
+            directory.mkdir(parents=True, exist_ok=True)
+            write_atomic(peaks_path, encode_peaks(*compute_peaks(source_path)))
+            missing.remove('peaks')
+        overview = waveform_overview(PeaksFile(str(peaks_path)))
+        outputs = {'waveform': lambda: _waveform_png(overview),
+                   'waveform_data': lambda: json.dumps(overview, separators=(',', ':')).encode('utf-8')}
+
+    directory.mkdir(parents=True, exist_ok=True)
+    for kind in missing:
+        write_atomic(directory / names[kind], outputs[kind]())
+    return names
+
+
+class DerivativeStore:
+    """
+    Derivatives under ``directory``, named ``<content hash>_<kind>_v<version>``.
+
+    Names are immutable for a given content and version, so they can be cached
+    by clients indefinitely. Concurrent requests for the same content share one
+    render.
+    """
+
+    def __init__(self, directory: str, max_workers: int = 2):
+        self.directory = Path(directory)
+        self.max_workers = max(1, int(max_workers))
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._pool = LazyProcessPool(self.max_workers)
+
+    def shutdown(self):
+        self._pool.shutdown()
+
+    def names(self, content_hash: Optional[str], file_type: str) -> Dict[str, str]:
+        """kind -> file name for the derivatives of this content already on disk"""
+        if not content_hash:
+            return {}
+        names = {kind: derivative_name(content_hash, kind) for kind in DERIVATIVE_KINDS.get(file_type, ())}
+        return {kind: name for kind, name in names.items() if (self.directory / name).exists()}
+
+    @staticmethod
+    def urls(names: Dict[str, str]) -> Dict[str, str]:
+        return {kind: f"/derivatives/{name}" for kind, name in names.items()}
+
+    def path_for(self, name: str) -> Optional[Path]:
+        """Path of a stored derivative, or None for unknown (or malformed) names"""
+        if not NAME_PATTERN.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+    async def ensure(self, source_path: str, file_type: str, content_hash: Optional[str]) -> Dict[str, str]:
+        """Generate missing derivatives; failures are logged and give an empty result"""
+        kinds = DERIVATIVE_KINDS.get(file_type)
+        if not kinds or not content_hash:
+            return {}
+        existing = self.names(content_hash, file_type)
+        if len(existing) == len(kinds):
+            return existing
+
+        task = self._pending.get(content_hash)
+        if task is None:
+            loop = asyncio.get_running_loop()
+            task = asyncio.ensure_future(loop.run_in_executor(
+                self._pool.get(), render_derivatives, str(source_path), file_type, content_hash, str(self.directory)
+            ))
+            self._pending[content_hash] = task
+            task.add_done_callback(lambda _: self._pending.pop(content_hash, None))
+        try:
+            return await asyncio.shield(task)
+        except BrokenProcessPool:
+            logger.error("Derivative worker pool broke; it will be restarted")
+            self.shutdown()
+        except Exception as e:
+            logger.warning(f"Derivative generation failed for {source_path}: {e}")
+        return {}
+
+    def discard(self, content_hash: str):
+        """Remove every derivative of this content"""
+        for path in self.directory.glob(f"{content_hash[:32]}_*"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
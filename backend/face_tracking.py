@@ -0,0 +1,153 @@
+"""
+Face Tracking for Video Frames
+Locates the face in sampled video frames with one Haar-cascade detection that
+is then followed by template matching, so the vision model can be sent small
+face crops (optionally tiled several to an image) instead of full frames
+"""
+
+import logging
+import math
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]  # x, y, width, height
+
+
+def face_region(box: Box) -> Dict:
+    """Bounding box in the face_region layout used by the image detector"""
+    x, y, w, h = (int(v) for v in box)
+    return {
+        'x': x,
+        'y': y,
+        'width': w,
+        'height': h,
+        'left': x,
+        'top': y,
+        'right': x + w,
+        'bottom': y + h
+    }
+
+
+class FaceTracker:
+    """
+    Follows the largest face across frames given in time order.
+
+    A frame is matched against the previous face template inside a window
+    around its last position; the full-frame cascade only runs on the first
+    frame, when the match is weak, or every ``redetect_every`` frames.
+    """
+
+    def __init__(self, redetect_every: int = 5, match_threshold: float = 0.6,
+                 search_scale: float = 2.0, detect_width: int = 640):
+        self.redetect_every = redetect_every
+        self.match_threshold = match_threshold
+        self.search_scale = search_scale
+        self.detect_width = detect_width
+        self._cascade = None
+        self._template: Optional[np.ndarray] = None
+        self._box: Optional[Box] = None
+        self._since_detect = 0
+        self.counts = {'detected': 0, 'tracked': 0, 'missed': 0}
+
+    def _load_cascade(self):
+        if self._cascade is None:
+            try:
+                self._cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            except (AttributeError, cv2.error) as e:
+                logger.warning(f"Haar face cascade unavailable: {e}")
+                self._cascade = False
+            if self._cascade is not False and self._cascade.empty():
+                logger.warning("Haar face cascade could not be loaded; frames will be sent uncropped")
+                self._cascade = False
+        return self._cascade
+
+    def _detect(self, gray: np.ndarray) -> Optional[Box]:
+        cascade = self._load_cascade()
+        if cascade is False:
+            return None
+        # Detect on a downscaled copy: cascade cost grows with pixel count
+        scale = min(1.0, self.detect_width / gray.shape[1])
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+        min_side = max(24, int(min(small.shape) * 0.05))
+        faces = cascade.detectMultiScale(small, 1.1, 4, minSize=(min_side, min_side))
+        if len(faces) == 0:
+            return None
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        return tuple(int(round(v / scale)) for v in (x, y, w, h))
+
+    def _track(self, gray: np.ndarray) -> Optional[Tuple[Box, float]]:
+        x, y, w, h = self._box
+        pad_x = int(w * (self.search_scale - 1) / 2)
+        pad_y = int(h * (self.search_scale - 1) / 2)
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(gray.shape[1], x + w + pad_x), min(gray.shape[0], y + h + pad_y)
+        window = gray[y0:y1, x0:x1]
+        if window.shape[0] < h or window.shape[1] < w:
+            return None
+        scores = cv2.matchTemplate(window, self._template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (bx, by) = cv2.minMaxLoc(scores)
+        if best < self.match_threshold:
+            return None
+        return (x0 + bx, y0 + by, w, h), float(best)
+
+    def update(self, frame: np.ndarray) -> Tuple[Optional[Box], str, float]:
+        """
+        Face box in this frame, how it was found ('detected', 'tracked' or
+        'missed') and a confidence (the template match score when tracked)
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        box, source, confidence = None, 'missed', 0.0
+
+        if self._box is not None and self._since_detect < self.redetect_every:
+            tracked = self._track(gray)
+            if tracked is not None:
+                box, confidence = tracked
+                source = 'tracked'
+                self._since_detect += 1
+        if box is None:
+            box = self._detect(gray)
+            if box is not None:
+                source, confidence = 'detected', 1.0
+                self._since_detect = 0
+
+        self.counts[source] += 1
+        if box is None:
+            self._box = self._template = None
+            return None, source, 0.0
+
+        x, y, w, h = box
+        self._box = box
+        self._template = gray[y:y + h, x:x + w].copy()
+        return box, source, confidence
+
+
+def crop_face(frame: np.ndarray, box: Box, margin: float = 0.35, max_side: int = 384) -> Tuple[np.ndarray, Box]:
+    """Square crop around the face with ``margin`` (fraction of face size) and its box in the frame"""
+    x, y, w, h = box
+    side = int(max(w, h) * (1 + 2 * margin))
+    side = min(side, frame.shape[0], frame.shape[1])
+    cx, cy = x + w // 2, y + h // 2
+    x0 = min(max(0, cx - side // 2), frame.shape[1] - side)
+    y0 = min(max(0, cy - side // 2), frame.shape[0] - side)
+    crop = frame[y0:y0 + side, x0:x0 + side]
+    if side > max_side:
+        crop = cv2.resize(crop, (max_side, max_side), interpolation=cv2.INTER_AREA)
+    return crop, (x0, y0, side, side)
+
+
+def tile_crops(crops: List[np.ndarray], cell: int = 256) -> np.ndarray:
+    """Lay crops out on a near-square grid, each labelled with its 1-based tile number"""
+    columns = math.ceil(math.sqrt(len(crops)))
+    rows = math.ceil(len(crops) / columns)
+    mosaic = np.zeros((rows * cell, columns * cell, 3), dtype=np.uint8)
+    for index, crop in enumerate(crops):
+        row, col = divmod(index, columns)
+        tile = cv2.resize(crop, (cell, cell), interpolation=cv2.INTER_AREA)
+        cv2.putText(tile, str(index + 1), (6, 26), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 4)
+        cv2.putText(tile, str(index + 1), (6, 26), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        mosaic[row * cell:(row + 1) * cell, col * cell:(col + 1) * cell] = tile
+    return mosaic
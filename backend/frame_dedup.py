@@ -0,0 +1,136 @@
+"""
+Distinct Frame Sampling
+Picks video frames for vision analysis by spreading candidates over the whole
+video and skipping those whose difference hash (dHash) is too close to an
+already selected frame, so static shots do not consume the frame budget
+"""
+
+import logging
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Candidates further apart than this are reached by seeking instead of decoding every frame
+SEEK_MIN_STRIDE = 30
+
+
+def dhash(frame: np.ndarray, hash_size: int = 8) -> int:
+    """64-bit difference hash: sign of horizontal gradients on a tiny grayscale thumbnail"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def coverage_order(n: int) -> List[int]:
+    """Indices 0..n-1 ordered so every prefix is spread across the range (ends, middle, quarters, ...)"""
+    if n <= 0:
+        return []
+    order = [0] if n == 1 else [0, n - 1]
+    seen = set(order)
+    intervals = [(0, n - 1)]
+    while intervals:
+        next_intervals = []
+        for low, high in intervals:
+            if high - low < 2:
+                continue
+            mid = (low + high) // 2
+            if mid not in seen:
+                seen.add(mid)
+                order.append(mid)
+            next_intervals.extend(((low, mid), (mid, high)))
+        intervals = next_intervals
+    return order
+
+
+def select_distinct(signatures: List[int], max_frames: int, threshold: int) -> Tuple[List[int], int]:
+    """
+    Candidate indices to keep (in time order) and how many were suppressed.
+
+    Candidates are visited in coverage order; one within ``threshold`` bits
+    of a kept signature is a duplicate. Suppressed candidates free their
+    slot for later, more distinct content.
+    """
+    kept: List[int] = []
+    suppressed = 0
+    for index in coverage_order(len(signatures)):
+        if len(kept) >= max_frames:
+            break
+        if any(hamming(signatures[index], signatures[other]) <= threshold for other in kept):
+            suppressed += 1
+            continue
+        kept.append(index)
+    return sorted(kept), suppressed
+
+
+def _read_candidates(cap: cv2.VideoCapture, frame_numbers: List[int]):
+    """Yield (frame_number, frame) for sorted candidate frame numbers"""
+    stride = (frame_numbers[-1] - frame_numbers[0]) / max(1, len(frame_numbers) - 1)
+    if stride >= SEEK_MIN_STRIDE:
+        for frame_number in frame_numbers:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            ret, frame = cap.read()
+            if ret:
+                yield frame_number, frame
+        return
+
+    wanted = set(frame_numbers)
+    for frame_number in range(frame_numbers[-1] + 1):
+        if not cap.grab():
+            break
+        if frame_number in wanted:
+            ret, frame = cap.retrieve()
+            if ret:
+                yield frame_number, frame
+
+
+def sample_distinct_frames(video_path: str, max_frames: int = 10, candidates: int = 40,
+                           threshold: int = 6) -> Tuple[List[Tuple[int, np.ndarray]], Dict]:
+    """
+    Up to ``max_frames`` visually distinct (frame_number, frame) pairs and a sampling report.
+
+    ``candidates`` frames evenly spaced over the video are hashed; the
+    selected ones are decoded again so only they are held in memory.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        logger.error(f"Could not open video: {video_path}")
+        return [], {}
+
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count <= 0:
+            # No usable frame count: consider the first frames as candidates
+            frame_count = candidates
+        count = min(candidates, frame_count)
+        frame_numbers = sorted({int(round(i * (frame_count - 1) / max(1, count - 1))) for i in range(count)})
+
+        decoded, signatures = [], []
+        for frame_number, frame in _read_candidates(cap, frame_numbers):
+            decoded.append(frame_number)
+            signatures.append(dhash(frame))
+
+        kept, suppressed = select_distinct(signatures, max_frames, threshold)
+        selected_numbers = [decoded[i] for i in kept]
+
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        selected = list(_read_candidates(cap, selected_numbers)) if selected_numbers else []
+    finally:
+        cap.release()
+
+    report = {
+        'candidates': len(decoded),
+        'selected': len(selected),
+        'suppressed': suppressed,
+        'threshold_bits': threshold
+    }
+    logger.info(f"Sampled {len(selected)} distinct frames from {len(decoded)} candidates "
+                f"({suppressed} near-duplicates suppressed)")
+    return selected, report
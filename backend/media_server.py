@@ -0,0 +1,253 @@
+"""
+Media Serving
+Serves uploaded media by file_id from an in-memory index, with strong ETags,
+Last-Modified, conditional GETs and single-range 206 responses. Bodies are
+handed to the server through the ASGI zero-copy send extension when it is
+offered, otherwise read in chunks off the event loop. Behind nginx, bodies
+can be offloaded entirely with X-Accel-Redirect
+"""
+
+import logging
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+from media_types import get_media_type
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+
+class MediaIndex:
+    """
+    file_id -> {'path', 'filename', 'file_type', 'content_hash'}.
+
+    Filled as files are uploaded or loaded at startup; a miss falls back to
+    ``lookup`` (the metadata database) once and is remembered, so seeking
+    through a video does not query the database per Range request.
+    """
+
+    def __init__(self, lookup: Callable[[str], Optional[Dict]]):
+        self.lookup = lookup
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def put(self, file_id: str, path: str, filename: str, file_type: str, content_hash: Optional[str] = None):
+        with self._lock:
+            self._entries[file_id] = {
+                'path': str(path),
+                'filename': filename,
+                'file_type': file_type,
+                'content_hash': content_hash
+            }
+
+    def get(self, file_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(file_id)
+        if entry is None:
+            entry = self.lookup(file_id)
+            if entry is not None:
+                with self._lock:
+                    self._entries[file_id] = entry
+        return entry
+
+    def discard(self, file_id: str):
+        with self._lock:
+            self._entries.pop(file_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def content_disposition(filename: str, disposition: str = 'inline') -> str:
+    """Content-Disposition that survives non-ASCII filenames"""
+    return f"{disposition}; filename*=utf-8''{quote(filename)}"
+
+
+class AccelRedirect:
+    """
+    Offloads file bodies to nginx. The backend resolves and checks the file,
+    then answers with headers only and an ``X-Accel-Redirect`` into an
+    internal nginx location aliased to ``root``; nginx streams the file
+    (ranges, conditional GETs and sendfile included).
+
+    Disabled when ``prefix`` is empty.
+    """
+
+    def __init__(self, prefix: str = '', root: str = 'uploads'):
+        self.prefix = prefix.rstrip('/') + '/' if prefix else ''
+        self.root = os.path.realpath(root)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.prefix)
+
+    def location(self, path: str) -> Optional[str]:
+        """Internal URI for a file, or None when it lies outside ``root``"""
+        real = os.path.realpath(path)
+        if os.path.commonpath([real, self.root]) != self.root:
+            return None
+        return self.prefix + quote(os.path.relpath(real, self.root).replace(os.sep, '/'))
+
+    def response(self, path: str, headers: Dict[str, str], media_type: str) -> Optional[Response]:
+        """
+        Redirect response for nginx, or None to serve the file from Python.
+
+        Raises:
+            FileNotFoundError: The file is no longer on disk
+        """
+        if not self.enabled:
+            return None
+        os.stat(path)
+        location = self.location(path)
+        if location is None:
+            logger.warning(f"Not offloading {path}: outside {self.root}")
+            return None
+        return Response(status_code=200, headers=dict(headers, **{'X-Accel-Redirect': location}),
+                        media_type=media_type)
+
+
+def file_etag(stat: os.stat_result, content_hash: Optional[str] = None) -> str:
+    """Strong validator: the content hash when known, else size and mtime"""
+    if content_hash:
+        return content_hash[:32]
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) for a single ``bytes=`` range, or None to serve the
+    whole file (no header, malformed or multi-range requests).
+
+    Raises:
+        ValueError: The range does not overlap the file (416)
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start_text, sep, end_text = header[len('bytes='):].strip().partition('-')
+    if not sep:
+        return None
+    if not (start_text or end_text).isdigit() or (end_text and not end_text.isdigit()):
+        return None
+    if start_text == '':
+        # Suffix range: the last N bytes
+        length = int(end_text)
+        if length == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if start > end and end_text:
+        return None
+    if start >= size:
+        raise ValueError(f"Range starts past end of file ({size} bytes)")
+    return start, min(end, size - 1)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value covers the given (strong) ETag"""
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(',')]
+    return '*' in candidates or f'"{etag}"' in candidates or f'W/"{etag}"' in candidates
+
+
+def _not_modified_since(header: Optional[str], mtime: float) -> bool:
+    if not header:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+class MediaFileResponse(Response):
+    """Sends ``count`` bytes of a file starting at ``offset``"""
+
+    def __init__(self, path: str, status_code: int, headers: Dict[str, str], media_type: str,
+                 offset: int, count: int):
+        self.path = path
+        self.offset = offset
+        self.count = count
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+        if scope.get('method') == 'HEAD' or self.count == 0:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        extensions = scope.get('extensions') or {}
+        with open(self.path, 'rb') as f:
+            if 'http.response.zerocopysend' in extensions:
+                # The server sendfile()s straight from our descriptor
+                await send({'type': 'http.response.zerocopysend', 'file': f.fileno(),
+                            'offset': self.offset, 'count': self.count})
+                return
+
+            f.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+            if remaining > 0:
+                # File shrank underneath us; end the body rather than hang the client
+                await send({'type': 'http.response.body', 'body': b''})
+
+
+def media_response(entry: Dict, request_headers, extra_headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Full (200), partial (206), not-modified (304) or unsatisfiable (416)
+    response for an indexed file.
+
+    Raises:
+        FileNotFoundError: The file is no longer on disk
+    """
+    path = entry['path']
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = file_etag(stat, entry.get('content_hash'))
+    media_type = get_media_type(path)
+    headers = dict(extra_headers or {})
+    headers.update({
+        'ETag': f'"{etag}"',
+        'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': content_disposition(entry.get('filename') or os.path.basename(path))
+    })
+
+    if_none_match = request_headers.get('if-none-match')
+    if etag_matches(if_none_match, etag) or (
+            if_none_match is None and _not_modified_since(request_headers.get('if-modified-since'), stat.st_mtime)):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request_headers.get('if-range')
+    # A stale If-Range means the client's partial copy is outdated: send everything
+    if if_range is None or if_range.strip() == f'"{etag}"' or if_range.strip() == headers['Last-Modified']:
+        try:
+            byte_range = parse_range(request_headers.get('range'), size)
+        except ValueError:
+            headers['Content-Range'] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        headers['Content-Length'] = str(size)
+        return MediaFileResponse(path, 200, headers, media_type, 0, size)
+
+    start, end = byte_range
+    headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+    headers['Content-Length'] = str(end - start + 1)
+    return MediaFileResponse(path, 206, headers, media_type, start, end - start + 1)
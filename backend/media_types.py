@@ -0,0 +1,46 @@
+"""
+Supported Media Types
+File extension tables shared by the API server and the offline scanner
+"""
+
+from pathlib import Path
+
+# Supported file formats
+SUPPORTED_IMAGE_FORMATS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+SUPPORTED_VIDEO_FORMATS = {'.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv', '.m4v', '.3gp', '.ogv'}
+SUPPORTED_AUDIO_FORMATS = {'.wav', '.mp3', '.flac', '.aac', '.ogg'}
+
+def get_file_type(filename: str) -> str:
+    """Determine file type from extension"""
+    ext = Path(filename).suffix.lower()
+    if ext in SUPPORTED_IMAGE_FORMATS:
+        return 'image'
+    elif ext in SUPPORTED_VIDEO_FORMATS:
+        return 'video'
+    elif ext in SUPPORTED_AUDIO_FORMATS:
+        return 'audio'
+    else:
+        return 'unknown'
+
+# Content types for serving uploads (audio/wave plays more reliably than audio/x-wav)
+MEDIA_CONTENT_TYPES = {
+    '.wav': 'audio/wave',
+    '.mp3': 'audio/mpeg',
+    '.flac': 'audio/flac',
+    '.aac': 'audio/aac',
+    '.ogg': 'audio/ogg',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.mp4': 'video/mp4',
+    '.avi': 'video/x-msvideo',
+    '.mov': 'video/quicktime',
+    '.webm': 'video/webm',
+    '.json': 'application/json'
+}
+
+def get_media_type(filename: str) -> str:
+    """Content type to serve a stored file with"""
+    return MEDIA_CONTENT_TYPES.get(Path(filename).suffix.lower(), 'application/octet-stream')
@@ -5,21 +5,46 @@ Uses Whisper for transcription and GPT-4 for analysis
 
 import os
 import logging
-from typing import Dict, Tuple, Optional
+from typing import Callable, Dict, Tuple, Optional, Union
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
 from openai import OpenAI
 
+from audio_context import AudioContext
+from audio_features import AudioFeatureEngine, DEFAULT_PROFILE
+from audio_pipeline import (
+    StageGraph, compute_features, extract_features_worker, get_feature_pool, reset_feature_pool
+)
+from audio_segments import FeatureTrack, SegmentScorer, segment_features
+from audio_stream import (
+    StreamingFeatureExtractor, TRANSCRIPTION_SEGMENT_SECONDS, WHISPER_MAX_UPLOAD_BYTES,
+    transcribe_in_segments, transcribe_speech
+)
+from response_cache import get_response_cache, hash_bytes, make_key
+from structured_output import AudioAnalysis, request_structured
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump whenever the analysis prompt changes so cached verdicts are not reused
+PROMPT_VERSION = "1"
+
 class OpenAIAudioDeepfakeDetector:
     """
     Audio deepfake detector using OpenAI Whisper and GPT-4
     """
     
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the OpenAI audio detector"""
+    def __init__(self, api_key: Optional[str] = None, feature_workers: Optional[int] = None):
+        """
+        Initialize the OpenAI audio detector
+        
+        Args:
+            api_key: OpenAI API key (defaults to OPENAI_API_KEY)
+            feature_workers: Processes for feature extraction; 0 extracts in the calling
+                process (defaults to AUDIO_FEATURE_WORKERS or min(4, CPU count))
+        """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
@@ -27,135 +52,184 @@ class OpenAIAudioDeepfakeDetector:
         self.client = OpenAI(api_key=self.api_key)
         self.whisper_model = "whisper-1"
         self.gpt_model = "gpt-4o"
+        # Identical uploads and transcripts reuse cached responses (None when LLM_CACHE=0)
+        self.response_cache = get_response_cache()
+        
+        # Feature profile: fast, standard or full (default); pitch mode: piptrack (default) or pyin
+        self.feature_engine = AudioFeatureEngine(
+            sr=16000,
+            profile=os.getenv("AUDIO_FEATURE_PROFILE", DEFAULT_PROFILE),
+            pitch_mode=os.getenv("AUDIO_PITCH_MODE", "piptrack")
+        )
+        
+        # Recordings longer than this are streamed instead of decoded whole
+        self.stream_threshold_seconds = float(os.getenv("AUDIO_STREAM_THRESHOLD_SECONDS", "600"))
+        self.streaming_extractor = StreamingFeatureExtractor(self.feature_engine)
+        self.transcription_workers = int(os.getenv("AUDIO_TRANSCRIPTION_WORKERS", "4"))
+        
+        # Voice activity detection: silence is dropped before features and transcription.
+        # Short files are still uploaded whole when little of them is silence.
+        self.vad_enabled = os.getenv("AUDIO_VAD", "1").lower() not in ("0", "false", "no")
+        self.vad_min_silence_ratio = float(os.getenv("AUDIO_VAD_MIN_SILENCE_RATIO", "0.1"))
+        
+        # Feature extraction and transcription run side by side on these pools
+        if feature_workers is None:
+            feature_workers = int(os.getenv("AUDIO_FEATURE_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.feature_workers = max(0, feature_workers)
+        self.stage_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="audio-stage")
+        
+        # Per-segment verdicts: transcript segments are scored in batched groups
+        self.segment_scoring = os.getenv("AUDIO_SEGMENT_SCORING", "1").lower() not in ("0", "false", "no")
+        self.segment_scorer = SegmentScorer(
+            self.client,
+            model=self.gpt_model,
+            group_size=int(os.getenv("AUDIO_SEGMENT_GROUP_SIZE", "20")),
+            threshold=float(os.getenv("AUDIO_SEGMENT_SUSPICION_THRESHOLD", "0.6")),
+            cache=self.response_cache
+        )
         
         logger.info("OpenAI Audio Deepfake Detector initialized")
     
-    def _transcribe_audio(self, audio_path: str) -> Dict:
-        """Transcribe audio using Whisper"""
+    def _transcribe_file(self, audio_file) -> Dict:
+        """Send one file object to Whisper and normalize the verbose response, cached by content"""
+        if self.response_cache is None:
+            return self._request_transcription(audio_file)
+        
+        digest = hash_bytes(audio_file.read())
+        audio_file.seek(0)
+        key = make_key(self.whisper_model, 'verbose_json', digest)
+        transcript, _ = self.response_cache.get_or_compute(key, lambda: self._request_transcription(audio_file))
+        return transcript
+    
+    def _request_transcription(self, audio_file) -> Dict:
+        """One Whisper request"""
+        transcript = self.client.audio.transcriptions.create(
+            model=self.whisper_model,
+            file=audio_file,
+            response_format="verbose_json"
+        )
+        
+        return {
+            'text': transcript.text,
+            'language': transcript.language,
+            'duration': transcript.duration,
+            'segments': [
+                {
+                    'start': seg.start,
+                    'end': seg.end,
+                    'text': seg.text
+                } for seg in (getattr(transcript, 'segments', None) or [])
+            ]
+        }
+    
+    def _decode_audio(self, context: AudioContext) -> bool:
+        """Decode the recording (and find its speech) once for every stage; long recordings are streamed instead"""
+        duration = context.header_duration
+        if duration and duration > self.stream_threshold_seconds:
+            return False
+        if context.vad:
+            context.speech_regions
+        else:
+            context.waveform
+        return True
+    
+    def _transcribed_in_segments(self, context: AudioContext) -> bool:
+        """Whether Whisper gets overlapping spans read from the file rather than one upload"""
+        duration = context.header_duration
+        return bool(duration) and (context.file_size > WHISPER_MAX_UPLOAD_BYTES
+                                   or duration > TRANSCRIPTION_SEGMENT_SECONDS)
+    
+    def _silence_ratio(self, context: AudioContext) -> float:
+        """Fraction of the recording outside detected speech"""
+        duration = context.duration
+        if not duration:
+            return 0.0
+        return 1.0 - sum(end - start for start, end in context.speech_regions) / duration
+    
+    def _transcribe_audio(self, audio: Union[str, AudioContext]) -> Dict:
+        """Transcribe audio using Whisper, in overlapping segments for long or large files"""
+        context = audio if isinstance(audio, AudioContext) else AudioContext(audio)
+        if context.transcript is not None:
+            return context.transcript
         try:
-            with open(audio_path, "rb") as audio_file:
-                transcript = self.client.audio.transcriptions.create(
-                    model=self.whisper_model,
-                    file=audio_file,
-                    response_format="verbose_json"
+            if self._transcribed_in_segments(context):
+                transcript = transcribe_in_segments(
+                    context.path, context.header_duration, self._transcribe_file, sr=context.sr,
+                    max_workers=self.transcription_workers,
+                    waveform=context.waveform if context.is_decoded else None,
+                    vad=context.vad
                 )
-            
-            return {
-                'text': transcript.text,
-                'language': transcript.language,
-                'duration': transcript.duration,
-                'segments': [
-                    {
-                        'start': seg.start,
-                        'end': seg.end,
-                        'text': seg.text
-                    } for seg in (transcript.segments if hasattr(transcript, 'segments') else [])
-                ]
-            }
+            elif context.vad and self._silence_ratio(context) >= self.vad_min_silence_ratio:
+                # Upload only the speech; segment times come back as original offsets
+                transcript = transcribe_speech(context.waveform, context.sr, self._transcribe_file,
+                                               regions=context.speech_regions)
+            else:
+                with open(context.path, "rb") as audio_file:
+                    transcript = self._transcribe_file(audio_file)
         except Exception as e:
             logger.error(f"Error transcribing audio: {e}")
-            return {'error': str(e)}
+            transcript = {'error': str(e)}
+        context.transcript = transcript
+        return transcript
     
-    def _analyze_audio_features(self, audio_path: str) -> Dict:
+    def _analyze_audio_features(self, audio: Union[str, AudioContext]) -> Dict:
         """Extract comprehensive audio features"""
+        context = audio if isinstance(audio, AudioContext) else AudioContext(audio)
+        if context.features is not None:
+            return context.features
         try:
-            import librosa
-            
-            # Load audio
-            waveform, sr = librosa.load(audio_path, sr=16000)
-            duration = len(waveform) / sr
-            
-            # Basic features
-            rms_energy = np.sqrt(np.mean(waveform**2))
-            zcr = librosa.feature.zero_crossing_rate(waveform)
-            
-            # Spectral features
-            spectral_centroids = librosa.feature.spectral_centroid(y=waveform, sr=sr)
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=waveform, sr=sr)
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(y=waveform, sr=sr)
-            
-            # MFCC features
-            mfccs = librosa.feature.mfcc(y=waveform, sr=sr, n_mfcc=13)
-            
-            # Chroma features
-            chroma = librosa.feature.chroma_stft(y=waveform, sr=sr)
-            
-            # Tonnetz features
-            tonnetz = librosa.feature.tonnetz(y=waveform, sr=sr)
-            
-            # Spectral contrast
-            spectral_contrast = librosa.feature.spectral_contrast(y=waveform, sr=sr)
-            
-            # Pitch (F0) estimation
-            try:
-                pitches, magnitudes = librosa.piptrack(y=waveform, sr=sr)
-                pitch_values = []
-                for t in range(pitches.shape[1]):
-                    index = magnitudes[:, t].argmax()
-                    pitch = pitches[index, t]
-                    if pitch > 0:
-                        pitch_values.append(pitch)
-                f0_mean = np.mean(pitch_values) if pitch_values else 0.0
-                f0_std = np.std(pitch_values) if pitch_values else 0.0
-            except:
-                f0_mean = 0.0
-                f0_std = 0.0
-            
-            # Rhythm features
-            tempo, beats = librosa.beat.beat_track(y=waveform, sr=sr)
-            
-            # Harmonic and percussive components
-            harmonic, percussive = librosa.effects.hpss(waveform)
-            harmonic_ratio = np.mean(harmonic**2) / (np.mean(percussive**2) + 1e-8)
-            
-            # Comprehensive features structure
-            comprehensive_features = {
-                'energy_mean': float(np.mean(rms_energy)),
-                'energy_std': float(np.std(rms_energy)),
-                'zcr_mean': float(np.mean(zcr)),
-                'zcr_std': float(np.std(zcr)),
-                'f0_mean': float(f0_mean),
-                'f0_std': float(f0_std),
-                'spectral_centroid_mean': float(np.mean(spectral_centroids)),
-                'spectral_centroid_std': float(np.std(spectral_centroids)),
-                'spectral_rolloff_mean': float(np.mean(spectral_rolloff)),
-                'spectral_rolloff_std': float(np.std(spectral_rolloff)),
-                'spectral_bandwidth_mean': float(np.mean(spectral_bandwidth)),
-                'spectral_bandwidth_std': float(np.std(spectral_bandwidth)),
-                'mfcc_mean': [float(x) for x in np.mean(mfccs, axis=1)],
-                'mfcc_std': [float(x) for x in np.std(mfccs, axis=1)],
-                'chroma_mean': [float(x) for x in np.mean(chroma, axis=1)],
-                'chroma_std': [float(x) for x in np.std(chroma, axis=1)],
-                'tonnetz_mean': [float(x) for x in np.mean(tonnetz, axis=1)],
-                'tonnetz_std': [float(x) for x in np.std(tonnetz, axis=1)],
-                'spectral_contrast_mean': [float(x) for x in np.mean(spectral_contrast, axis=1)],
-                'spectral_contrast_std': [float(x) for x in np.std(spectral_contrast, axis=1)],
-                'tempo': float(tempo),
-                'beat_count': len(beats),
-                'harmonic_ratio': float(harmonic_ratio)
-            }
-            
-            features = {
-                'duration': duration,
-                'sample_rate': sr,
-                'rms_energy': float(rms_energy),
-                'zero_crossing_rate': float(np.mean(zcr)),
-                'comprehensive_features': comprehensive_features
-            }
-            
-            return features
+            if self.feature_workers > 0:
+                # CPU-bound librosa work runs in a worker process on the audio (and speech
+                # regions) this context already has; streamed recordings are read by the worker
+                waveform = speech_regions = None
+                if context.is_decoded:
+                    waveform = context.waveform
+                    speech_regions = context.speech_regions if context.vad else None
+                try:
+                    features, context.track = get_feature_pool(self.feature_workers).submit(
+                        extract_features_worker, context.path, context.sr, self.feature_engine.profile,
+                        self.feature_engine.pitch_mode, self.stream_threshold_seconds, context.vad,
+                        waveform, speech_regions
+                    ).result()
+                except BrokenProcessPool as e:
+                    logger.warning(f"Feature worker pool failed, extracting in-process: {e}")
+                    reset_feature_pool()
+                    context.track = FeatureTrack()
+                    features = compute_features(context, self.feature_engine, self.streaming_extractor,
+                                                self.stream_threshold_seconds, context.track)
+            else:
+                context.track = FeatureTrack()
+                features = compute_features(context, self.feature_engine, self.streaming_extractor,
+                                            self.stream_threshold_seconds, context.track)
         except Exception as e:
             logger.warning(f"Could not extract comprehensive audio features: {e}")
             import traceback
             logger.error(traceback.format_exc())
-            return {
+            features = {
                 'duration': 0,
                 'sample_rate': 16000,
                 'rms_energy': 0.0,
                 'zero_crossing_rate': 0.0
             }
+        # Failures are cached too so the fallback path never repeats the pass
+        context.features = features
+        return features
     
-    def _calculate_deepfake_indicators(self, audio_features: Dict, analysis_scores: Dict) -> Dict:
+    def _score_segments(self, context: AudioContext, results: Dict) -> Optional[Dict]:
+        """Per-segment verdicts and suspicious spans; None when there is nothing to compare"""
+        transcript = results['transcription']
+        segments = transcript.get('segments', [])
+        if not self.segment_scoring or 'error' in transcript or len(segments) < 2:
+            return None
+        try:
+            annotated = segment_features(context.track, segments)
+            return self.segment_scorer.score(annotated, results['features'].get('comprehensive_features', {}))
+        except Exception as e:
+            logger.error(f"Segment scoring failed: {e}")
+            return {'error': str(e)}
+    
+    def _calculate_deepfake_indicators(self, audio_features: Dict, analysis_scores: Dict,
+                                       segment_analysis: Optional[Dict] = None) -> Dict:
         """Calculate deepfake indicators from features and analysis"""
         try:
             comp_features = audio_features.get('comprehensive_features', {})
@@ -199,6 +273,12 @@ class OpenAIAudioDeepfakeDetector:
             voice_quality = analysis_scores.get('voice_quality', 0.5)
             indicators['voice_inconsistency'] = 1.0 - voice_quality
             
+            # Most suspicious segment, so a short spliced span is not averaged away
+            if segment_analysis and segment_analysis.get('scored_count'):
+                indicators['segment_suspicion'] = max(
+                    seg['suspicion'] for seg in segment_analysis['segments'] if seg.get('suspicion') is not None
+                )
+            
             # Overall suspiciousness
             suspicious_score = np.mean(list(indicators.values()))
             indicators['overall_suspiciousness'] = suspicious_score
@@ -222,6 +302,8 @@ class OpenAIAudioDeepfakeDetector:
         """Analyze transcript and audio features with GPT-4"""
         try:
             comp_features = audio_features.get('comprehensive_features', {})
+            # Tempo is only computed by feature profiles with beat tracking
+            tempo_line = f"- Tempo: {comp_features['tempo']:.2f} BPM\n" if 'tempo' in comp_features else ""
             
             prompt = f"""You are an expert audio deepfake detection analyst. Analyze this audio transcription and technical features comprehensively.
 
@@ -240,8 +322,7 @@ Technical Audio Features:
 - F0 Mean (Pitch): {comp_features.get('f0_mean', 'N/A'):.2f} Hz
 - F0 Std (Pitch Variation): {comp_features.get('f0_std', 'N/A'):.2f} Hz
 - Spectral Centroid: {comp_features.get('spectral_centroid_mean', 'N/A'):.2f} Hz
-- Tempo: {comp_features.get('tempo', 'N/A'):.2f} BPM
-- Energy Std: {comp_features.get('energy_std', 'N/A'):.4f}
+{tempo_line}- Energy Std: {comp_features.get('energy_std', 'N/A'):.4f}
 
 Transcription:
 {transcript}
@@ -267,84 +348,26 @@ IMPORTANT:
 - Only use low confidence (0.3-0.6) if you're genuinely uncertain
 - Be honest and accurate in your assessment"""
             
-            try:
-                # Try with JSON response format
-                response = self.client.chat.completions.create(
-                    model=self.gpt_model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are an expert in audio deepfake detection. Always respond with valid JSON only."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    max_tokens=2000,
-                    temperature=0.2,
-                    response_format={"type": "json_object"}
-                )
-            except Exception as e:
-                # Fallback if JSON format not supported
-                logger.warning(f"JSON response format not supported, using standard format: {e}")
-                response = self.client.chat.completions.create(
-                    model=self.gpt_model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are an expert in audio deepfake detection. Analyze audio transcriptions and features to detect synthetic or AI-generated speech."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    max_tokens=2000,
-                    temperature=0.2
-                )
-            
-            response_text = response.choices[0].message.content
-            logger.info(f"OpenAI raw response: {response_text[:500]}...")
-            
-            # Parse response with multiple methods
-            import json
-            import re
-            
-            analysis = None
-            
-            # Method 1: Look for JSON code block
-            json_block_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-            if json_block_match:
-                try:
-                    analysis = json.loads(json_block_match.group(1))
-                    logger.info("Successfully parsed JSON from code block")
-                except json.JSONDecodeError as e:
-                    logger.warning(f"Failed to parse JSON from code block: {e}")
-            
-            # Method 2: Look for JSON object
-            if analysis is None:
-                json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response_text, re.DOTALL)
-                if json_match:
-                    try:
-                        analysis = json.loads(json_match.group())
-                        logger.info("Successfully parsed JSON from object")
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"Failed to parse JSON from object: {e}")
-            
-            # Method 3: Try parsing entire response
-            if analysis is None:
-                try:
-                    analysis = json.loads(response_text.strip())
-                    logger.info("Successfully parsed entire response as JSON")
-                except json.JSONDecodeError:
-                    pass
-            
-            # Method 4: Fallback to text parsing
-            if analysis is None:
-                logger.warning("Could not parse JSON, using text parsing fallback")
-                analysis = self._parse_text_response(response_text)
-            
+            result = request_structured(
+                self.client, self.gpt_model,
+                [
+                    {
+                        "role": "system",
+                        "content": "You are an expert in audio deepfake detection. Always respond with valid JSON only."
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                AudioAnalysis, max_tokens=2000, temperature=0.2,
+                # The prompt carries the transcript and features, so it is the input to key on
+                cache=self.response_cache, cache_key=(PROMPT_VERSION, hash_bytes(prompt.encode('utf-8')))
+            )
+            logger.info(f"OpenAI raw response: {result.raw_text[:500]}...")
+            
+            analysis = result.value.model_dump()
+            analysis['parse_outcome'] = result.outcome
             return analysis
             
         except Exception as e:
@@ -357,88 +380,75 @@ IMPORTANT:
                 'naturalness_score': 0.5
             }
     
-    def _parse_text_response(self, text: str) -> Dict:
-        """Parse text response"""
-        result = {
-            'prediction': 'UNKNOWN',
-            'confidence': 0.5,
-            'reasoning': text,
-            'detailed_analysis': text,
-            'indicators': [],
-            'naturalness_score': 0.5,
-            'prosody_consistency': 0.5,
-            'voice_quality': 0.5,
-            'linguistic_coherence': 0.5,
-            'pause_patterns': 0.5,
-            'audio_quality_score': 0.5
-        }
-        
-        text_upper = text.upper()
-        if 'FAKE' in text_upper or 'SYNTHETIC' in text_upper or 'AI-GENERATED' in text_upper:
-            result['prediction'] = 'FAKE'
-        elif 'REAL' in text_upper or 'AUTHENTIC' in text_upper or 'NATURAL' in text_upper:
-            result['prediction'] = 'REAL'
-        
-        import re
-        conf_match = re.search(r'confidence[:\s]+([0-9.]+)', text, re.IGNORECASE)
-        if conf_match:
-            try:
-                conf = float(conf_match.group(1))
-                if conf > 1.0:
-                    conf = conf / 100.0
-                result['confidence'] = conf
-            except ValueError:
-                pass
-        
-        # Try to extract scores
-        score_patterns = {
-            'naturalness_score': r'naturalness[:\s]+([0-9.]+)',
-            'prosody_consistency': r'prosody[:\s]+([0-9.]+)',
-            'voice_quality': r'voice[_\s]?quality[:\s]+([0-9.]+)',
-            'linguistic_coherence': r'coherence[:\s]+([0-9.]+)',
-            'pause_patterns': r'pause[:\s]+([0-9.]+)',
-            'audio_quality_score': r'audio[_\s]?quality[:\s]+([0-9.]+)'
-        }
-        
-        for key, pattern in score_patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                try:
-                    score = float(match.group(1))
-                    if score > 1.0:
-                        score = score / 100.0
-                    result[key] = score
-                except ValueError:
-                    pass
-        
-        return result
-    
-    def detect_deepfake(self, audio_path: str) -> Tuple[float, str, Dict]:
+    def detect_deepfake(self, audio_path: str,
+                        progress_callback: Optional[Callable] = None) -> Tuple[float, str, Dict]:
         """
         Detect audio deepfake using OpenAI Whisper and GPT-4
         
         Args:
             audio_path: Path to audio file
+            progress_callback: Optional callable(stage, progress, message, **data) for stage events
             
         Returns:
             Tuple of (confidence, prediction, details)
         """
+        context = None
+        stage_timings = {}
         try:
             logger.info(f"Analyzing audio with OpenAI: {audio_path}")
             
-            # Extract audio features
-            audio_features = self._analyze_audio_features(audio_path)
-            
-            # Transcribe audio
-            transcript_data = self._transcribe_audio(audio_path)
-            
-            if 'error' in transcript_data:
-                raise ValueError(f"Transcription failed: {transcript_data['error']}")
+            # Every stage reads the decoded audio and stage results from one context
+            context = AudioContext(audio_path, sr=self.feature_engine.sr, vad=self.vad_enabled)
+            
+            def on_features(features: Dict):
+                if progress_callback:
+                    progress_callback('decoded', 0.3, 'Audio decoded and features extracted',
+                                      duration=features.get('duration', 0))
+            
+            def on_transcript(transcript: Dict):
+                if progress_callback and 'error' not in transcript:
+                    progress_callback('transcribed', 0.6, 'Transcription done',
+                                      language=transcript.get('language', 'unknown'),
+                                      text=transcript.get('text', '')[:500])
+            
+            def on_segments(segment_analysis: Optional[Dict]):
+                if progress_callback and segment_analysis and 'error' not in segment_analysis:
+                    progress_callback('segments_scored', 0.8, 'Transcript segments scored',
+                                      suspicious_spans=len(segment_analysis['suspicious_spans']))
+            
+            def analyze(results: Dict) -> Dict:
+                transcript = results['transcription']
+                if 'error' in transcript:
+                    raise ValueError(f"Transcription failed: {transcript['error']}")
+                return self._analyze_with_gpt4(transcript.get('text', ''), results['features'])
+            
+            # Features (worker process, fed the one shared decode) and Whisper run
+            # concurrently; GPT-4 starts once both finish
+            graph = StageGraph()
+            graph.add('decode', self._decode_audio, args=(context,), executor=self.stage_pool)
+            graph.add('features', lambda results: self._analyze_audio_features(context), deps=('decode',),
+                      executor=self.stage_pool, on_complete=on_features)
+            if context.vad and not self._transcribed_in_segments(context):
+                # Whether to upload only the speech depends on the silence found while decoding
+                graph.add('transcription', lambda results: self._transcribe_audio(context), deps=('decode',),
+                          executor=self.stage_pool, on_complete=on_transcript)
+            else:
+                graph.add('transcription', self._transcribe_audio, args=(context,),
+                          executor=self.stage_pool, on_complete=on_transcript)
+            graph.add('analysis', analyze, deps=('features', 'transcription'))
+            # Segment groups are scored alongside the whole-file analysis
+            graph.add('segments', self._score_segments, args=(context,), deps=('features', 'transcription'),
+                      executor=self.stage_pool, on_complete=on_segments)
+            try:
+                results = graph.run()
+            finally:
+                stage_timings = graph.timings
             
+            audio_features = results['features']
+            transcript_data = results['transcription']
             transcript_text = transcript_data.get('text', '')
-            
-            # Analyze with GPT-4
-            analysis = self._analyze_with_gpt4(transcript_text, audio_features)
+            analysis = results['analysis']
+            segment_analysis = results.get('segments')
             
             # Extract prediction and confidence with validation
             prediction_raw = analysis.get('prediction', '').upper().strip()
@@ -482,7 +492,8 @@ IMPORTANT:
                 'audio_quality_score': float(analysis.get('audio_quality_score', 0.5))
             }
             
-            deepfake_indicators = self._calculate_deepfake_indicators(audio_features, analysis_scores)
+            deepfake_indicators = self._calculate_deepfake_indicators(audio_features, analysis_scores,
+                                                                      segment_analysis)
             
             confidence_percent = confidence * 100
             
@@ -501,6 +512,8 @@ IMPORTANT:
                 'audio_features': audio_features,
                 'comprehensive_features': audio_features.get('comprehensive_features', {}),
                 'deepfake_indicators': deepfake_indicators,
+                'stage_timings': stage_timings,
+                'segment_analysis': segment_analysis,
                 'preprocessing_info': {
                     'duration': float(audio_duration),
                     'sample_rate': int(audio_sample_rate),
@@ -558,11 +571,12 @@ IMPORTANT:
             
         except Exception as e:
             logger.error(f"Error in audio detection: {e}")
-            # Return default result
-            audio_features = self._analyze_audio_features(audio_path)
+            # Return default result, reusing features the try block already computed
+            audio_features = self._analyze_audio_features(context if context is not None else audio_path)
             details = {
                 'error': str(e),
                 'audio_features': audio_features,
+                'stage_timings': stage_timings,
                 'preprocessing_info': {
                     'duration': float(audio_features.get('duration', 0)),
                     'sample_rate': int(audio_features.get('sample_rate', 16000)),
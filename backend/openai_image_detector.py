@@ -6,16 +6,22 @@ Uses GPT-4 Vision API for deepfake detection
 import os
 import base64
 import logging
-from typing import Dict, Tuple, Optional
+from typing import Callable, Dict, Tuple, Optional
 from pathlib import Path
 from PIL import Image
 import cv2
 import numpy as np
 from openai import OpenAI
 
+from response_cache import get_response_cache, hash_bytes
+from structured_output import ImageAnalysis, request_structured
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump whenever the analysis prompt changes so cached verdicts are not reused
+PROMPT_VERSION = "1"
+
 class OpenAIImageDeepfakeDetector:
     """
     Image deepfake detector using OpenAI GPT-4 Vision API
@@ -29,6 +35,8 @@ class OpenAIImageDeepfakeDetector:
         
         self.client = OpenAI(api_key=self.api_key)
         self.model = "gpt-4o"  # Use latest GPT-4 Vision model
+        # Identical images reuse the cached verdict (None when LLM_CACHE=0)
+        self.response_cache = get_response_cache()
         
         logger.info("OpenAI Image Deepfake Detector initialized")
     
@@ -254,12 +262,14 @@ class OpenAIImageDeepfakeDetector:
         
         return face_features
     
-    def detect_deepfake(self, image_path: str) -> Tuple[float, str, Dict]:
+    def detect_deepfake(self, image_path: str,
+                        progress_callback: Optional[Callable] = None) -> Tuple[float, str, Dict]:
         """
         Detect deepfake using OpenAI GPT-4 Vision API with comprehensive analysis
         
         Args:
             image_path: Path to the image file
+            progress_callback: Optional callable(stage, progress, message, **data) for stage events
             
         Returns:
             Tuple of (confidence, prediction, details)
@@ -269,9 +279,18 @@ class OpenAIImageDeepfakeDetector:
             
             # Encode image
             base64_image = self._encode_image_to_base64(image_path)
+            if progress_callback:
+                progress_callback('decoded', 0.1, 'Image loaded')
             
             # Extract comprehensive face features with CV analysis
             face_features = self._extract_comprehensive_face_features(image_path)
+            if progress_callback:
+                progress_callback(
+                    'faces_found', 0.3,
+                    'Face detected' if face_features.get('face_detected') else 'No face detected',
+                    face_detected=bool(face_features.get('face_detected', False)),
+                    face_region=face_features.get('face_region')
+                )
             
             # Prepare comprehensive prompt for deepfake detection
             prompt = """You are an expert deepfake detection analyst. Analyze this image carefully and determine if it is REAL (authentic) or FAKE (deepfake/AI-generated).
@@ -305,104 +324,40 @@ IMPORTANT:
 - Be honest and accurate in your assessment
 - The "reasoning" field is critical - provide a clear, detailed explanation that users can understand"""
             
-            # Call OpenAI API with JSON response format if supported
-            try:
-                # Try with response_format for structured output (gpt-4o supports this)
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are an expert deepfake detection analyst. Always respond with valid JSON only."
-                        },
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": prompt
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
-                                    }
-                                }
-                            ]
-                        }
-                    ],
-                    max_tokens=2000,
-                    temperature=0.2,  # Lower temperature for more consistent results
-                    response_format={"type": "json_object"}  # Force JSON output
-                )
-            except Exception as e:
-                # Fallback if response_format not supported
-                logger.warning(f"JSON response format not supported, using standard format: {e}")
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": prompt
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/jpeg;base64,{base64_image}"
-                                    }
-                                }
-                            ]
-                        }
-                    ],
-                    max_tokens=2000,
-                    temperature=0.2
-                )
+            if progress_callback:
+                progress_callback('model_analysis', 0.4, 'Running GPT-4 Vision analysis')
             
-            # Parse response
-            response_text = response.choices[0].message.content
-            logger.info(f"OpenAI raw response: {response_text[:500]}...")  # Log first 500 chars
-            
-            # Try to extract JSON from response
-            import json
-            import re
-            
-            # Try multiple JSON extraction methods
-            analysis_result = None
-            
-            # Method 1: Look for JSON code block
-            json_block_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-            if json_block_match:
-                try:
-                    analysis_result = json.loads(json_block_match.group(1))
-                    logger.info("Successfully parsed JSON from code block")
-                except json.JSONDecodeError as e:
-                    logger.warning(f"Failed to parse JSON from code block: {e}")
-            
-            # Method 2: Look for JSON object
-            if analysis_result is None:
-                json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response_text, re.DOTALL)
-                if json_match:
-                    try:
-                        analysis_result = json.loads(json_match.group())
-                        logger.info("Successfully parsed JSON from object")
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"Failed to parse JSON from object: {e}")
-            
-            # Method 3: Try parsing the entire response as JSON
-            if analysis_result is None:
-                try:
-                    analysis_result = json.loads(response_text.strip())
-                    logger.info("Successfully parsed entire response as JSON")
-                except json.JSONDecodeError:
-                    pass
-            
-            # Method 4: Fallback to text parsing
-            if analysis_result is None:
-                logger.warning("Could not parse JSON, using text parsing fallback")
-                analysis_result = self._parse_text_response(response_text)
+            # Strict JSON-schema output, validated into ImageAnalysis
+            result = request_structured(
+                self.client, self.model,
+                [
+                    {
+                        "role": "system",
+                        "content": "You are an expert deepfake detection analyst. Always respond with valid JSON only."
+                    },
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": prompt
+                            },
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": f"data:image/jpeg;base64,{base64_image}"
+                                }
+                            }
+                        ]
+                    }
+                ],
+                ImageAnalysis, max_tokens=2000, temperature=0.2,  # Lower temperature for more consistent results
+                cache=self.response_cache,
+                cache_key=(PROMPT_VERSION, hash_bytes(base64_image.encode('ascii')))
+            )
+            logger.info(f"OpenAI raw response: {result.raw_text[:500]}...")  # Log first 500 chars
+            analysis_result = result.value.model_dump()
+            analysis_result['parse_outcome'] = result.outcome
             
             # Extract prediction and confidence with validation
             prediction_raw = analysis_result.get('prediction', '').upper().strip()
@@ -436,6 +391,9 @@ IMPORTANT:
                 confidence = 0.5
             
             logger.info(f"Parsed prediction: {prediction}, confidence: {confidence}")
+            if progress_callback:
+                progress_callback('verdict', 0.8, f'Model verdict: {prediction}',
+                                  prediction=prediction, confidence=confidence * 100)
             
             # Update face_features with OpenAI analysis scores
             if face_features.get('artifact_analysis'):
@@ -557,7 +515,7 @@ IMPORTANT:
                 'face_features': face_features,
                 'heatmaps': heatmaps,  # Add heatmaps
                 'openai_analysis': {
-                    'reasoning': analysis_result.get('reasoning', response_text),
+                    'reasoning': analysis_result.get('reasoning') or result.raw_text,
                     'artifacts_detected': analysis_result.get('artifacts_detected', []),
                     'confidence_factors': analysis_result.get('confidence_factors', []),
                     'detailed_scores': {
@@ -567,7 +525,7 @@ IMPORTANT:
                         'skin_texture_score': analysis_result.get('skin_texture_score', 0.7),
                         'facial_symmetry_score': analysis_result.get('facial_symmetry_score', 0.7)
                     },
-                    'raw_response': response_text
+                    'raw_response': result.raw_text
                 },
                 'model_info': {
                     'models_used': ['openai_gpt4_vision'],
@@ -692,60 +650,3 @@ IMPORTANT:
             import traceback
             logger.error(traceback.format_exc())
             return {}
-    
-    def _parse_text_response(self, text: str) -> Dict:
-        """Parse text response when JSON parsing fails"""
-        result = {
-            'prediction': 'UNKNOWN',
-            'confidence': 0.5,
-            'reasoning': text,
-            'artifacts_detected': [],
-            'confidence_factors': [],
-            'border_quality': 0.7,
-            'edge_uniformity': 0.7,
-            'lighting_consistency': 0.7,
-            'skin_texture_score': 0.7,
-            'facial_symmetry_score': 0.7
-        }
-        
-        # Try to extract prediction
-        text_upper = text.upper()
-        if 'FAKE' in text_upper or 'DEEPFAKE' in text_upper or 'SYNTHETIC' in text_upper:
-            result['prediction'] = 'FAKE'
-        elif 'REAL' in text_upper or 'AUTHENTIC' in text_upper or 'GENUINE' in text_upper:
-            result['prediction'] = 'REAL'
-        
-        # Try to extract confidence
-        import re
-        confidence_match = re.search(r'confidence[:\s]+([0-9.]+)', text, re.IGNORECASE)
-        if confidence_match:
-            try:
-                conf = float(confidence_match.group(1))
-                if conf > 1.0:
-                    conf = conf / 100.0
-                result['confidence'] = conf
-            except ValueError:
-                pass
-        
-        # Try to extract scores from text
-        score_patterns = {
-            'border_quality': r'border[_\s]?quality[:\s]+([0-9.]+)',
-            'edge_uniformity': r'edge[_\s]?uniformity[:\s]+([0-9.]+)',
-            'lighting_consistency': r'lighting[_\s]?consistency[:\s]+([0-9.]+)',
-            'skin_texture_score': r'skin[_\s]?texture[:\s]+([0-9.]+)',
-            'facial_symmetry_score': r'facial[_\s]?symmetry[:\s]+([0-9.]+)'
-        }
-        
-        for key, pattern in score_patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                try:
-                    score = float(match.group(1))
-                    if score > 1.0:
-                        score = score / 100.0
-                    result[key] = score
-                except ValueError:
-                    pass
-        
-        return result
-
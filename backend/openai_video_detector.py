@@ -7,15 +7,41 @@ import os
 import base64
 import logging
 import tempfile
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 import cv2
 import numpy as np
 from openai import OpenAI
 
+from face_tracking import FaceTracker, crop_face, face_region, tile_crops
+from frame_dedup import sample_distinct_frames
+from response_cache import get_response_cache, hash_bytes
+from structured_output import FrameAnalysis, TileAnalyses, request_structured
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump whenever the frame prompt changes so cached verdicts are not reused
+PROMPT_VERSION = "2"
+
+FRAME_CRITERIA = """Analyze and provide scores (0.0-1.0) for:
+1. Border Quality: Blur artifacts around face boundaries (0.0 = very blurry, 1.0 = sharp)
+2. Edge Uniformity: Edge consistency (0.0 = inconsistent, 1.0 = uniform)
+3. Lighting Consistency: Lighting uniformity (0.0 = inconsistent, 1.0 = uniform)
+4. Skin Texture: Skin texture naturalness (0.0 = unnatural, 1.0 = natural)
+5. Facial Symmetry: Face symmetry (0.0 = asymmetric, 1.0 = symmetric)
+6. Overall Artifacts: List specific artifacts"""
+
+FRAME_FIELDS = """  "prediction": "REAL" or "FAKE",
+  "confidence": 0.0-1.0,
+  "reasoning": "Provide a comprehensive, detailed explanation (3-5 sentences) explaining WHY you determined this video frame is REAL or FAKE. Describe specific visual evidence you observed, such as: unnatural skin texture, inconsistent lighting patterns, blurry edges, artifacts around facial features, temporal inconsistencies, or any other indicators. Be specific about what you see that led to your conclusion. This explanation should help users understand the reasoning behind the detection.",
+  "border_quality": 0.0-1.0,
+  "edge_uniformity": 0.0-1.0,
+  "lighting_consistency": 0.0-1.0,
+  "skin_texture_score": 0.0-1.0,
+  "facial_symmetry_score": 0.0-1.0,
+  "artifacts": ["list of detected artifacts"]"""
+
 class OpenAIVideoDeepfakeDetector:
     """
     Video deepfake detector using OpenAI GPT-4 Vision API
@@ -30,10 +56,19 @@ class OpenAIVideoDeepfakeDetector:
         
         self.client = OpenAI(api_key=self.api_key)
         self.model = "gpt-4o"
+        # Repeated frames (static intros, black frames) reuse cached verdicts
+        self.response_cache = get_response_cache()
         
         # Analysis parameters
         self.max_frames = 10  # Analyze up to 10 frames
-        self.frame_interval = 2  # Analyze every 2nd frame
+        # Candidates hashed per analyzed frame, and dHash distance (bits) at which
+        # a candidate counts as a repeat of an already selected frame
+        self.dedup_oversample = int(os.getenv("VIDEO_DEDUP_OVERSAMPLE", "4"))
+        self.dedup_threshold = int(os.getenv("VIDEO_DEDUP_THRESHOLD", "6"))
+        # Send face crops instead of full frames; VIDEO_FACE_TILES > 1 packs that
+        # many crops into one image per request
+        self.face_crop = os.getenv("VIDEO_FACE_CROP", "1").lower() not in ("0", "false", "no")
+        self.face_tiles = max(1, int(os.getenv("VIDEO_FACE_TILES", "1")))
         
         logger.info("OpenAI Video Deepfake Detector initialized")
     
@@ -63,50 +98,50 @@ class OpenAIVideoDeepfakeDetector:
             logger.error(f"Error getting video info: {e}")
             return {}
     
-    def _extract_frames(self, video_path: str) -> List[Dict]:
-        """Extract frames from video for analysis"""
+    def _extract_frames(self, video_path: str, fps: float = 0.0) -> Tuple[List[Dict], Dict]:
+        """Extract visually distinct frames spread over the video, plus the sampling report"""
         frames_data = []
+        sampling = {}
         
         try:
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                logger.error(f"Could not open video: {video_path}")
-                return frames_data
-            
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            frame_number = 0
-            extracted_count = 0
+            selected, sampling = sample_distinct_frames(
+                video_path,
+                max_frames=self.max_frames,
+                candidates=self.max_frames * self.dedup_oversample,
+                threshold=self.dedup_threshold
+            )
             
-            while cap.isOpened() and extracted_count < self.max_frames:
-                ret, frame = cap.read()
-                if not ret:
-                    break
+            tracker = FaceTracker()
+            for frame_number, frame in selected:
+                box, face_source, face_confidence = tracker.update(frame)
+                crop_box = None
+                image = frame
+                if box is not None and self.face_crop:
+                    image, crop_box = crop_face(frame, box)
                 
-                # Extract frame at intervals
-                if frame_number % self.frame_interval == 0:
-                    # Save frame to temporary file
-                    temp_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
-                    cv2.imwrite(temp_file.name, frame)
-                    
-                    frames_data.append({
-                        'frame_number': frame_number,
-                        'timestamp': frame_number / fps if fps > 0 else 0,
-                        'file_path': temp_file.name
-                    })
-                    
-                    extracted_count += 1
+                # Save frame (or face crop) to temporary file
+                temp_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
+                cv2.imwrite(temp_file.name, image)
                 
-                frame_number += 1
+                frames_data.append({
+                    'frame_number': frame_number,
+                    'timestamp': frame_number / fps if fps > 0 else 0,
+                    'file_path': temp_file.name,
+                    'face_box': box,
+                    'face_source': face_source,
+                    'face_confidence': face_confidence,
+                    'crop_box': crop_box,
+                    'frame_size': (frame.shape[1], frame.shape[0]),
+                    'payload_bytes': os.path.getsize(temp_file.name)
+                })
             
-            cap.release()
+            sampling['face_tracking'] = dict(tracker.counts)
             logger.info(f"Extracted {len(frames_data)} frames from video")
             
         except Exception as e:
             logger.error(f"Error extracting frames: {e}")
         
-        return frames_data
+        return frames_data, sampling
     
     def _encode_image_to_base64(self, image_path: str) -> str:
         """Encode image to base64"""
@@ -117,163 +152,162 @@ class OpenAIVideoDeepfakeDetector:
             logger.error(f"Error encoding image: {e}")
             raise
     
-    def _analyze_frame_with_openai(self, frame_path: str, frame_number: int) -> Dict:
-        """Analyze a single frame with OpenAI"""
+    def _frame_request(self, prompt: str, base64_image: str) -> List[Dict]:
+        """Chat messages carrying one prompt and one JPEG"""
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}"
+                        }
+                    }
+                ]
+            }
+        ]
+    
+    def _frame_result(self, frame_number: int, analysis: Dict, raw_text: str, outcome: str) -> Dict:
+        """Frame result from a normalized FrameAnalysis dump"""
+        # Prediction and scores are already normalized by FrameAnalysis
+        return {
+            'frame_number': frame_number,
+            'prediction': analysis['prediction'],
+            'confidence': analysis['confidence'],
+            'reasoning': analysis['reasoning'] or raw_text,
+            'artifacts': analysis['artifacts'],
+            'border_quality': analysis['border_quality'],
+            'edge_uniformity': analysis['edge_uniformity'],
+            'lighting_consistency': analysis['lighting_consistency'],
+            'skin_texture_score': analysis['skin_texture_score'],
+            'facial_symmetry_score': analysis['facial_symmetry_score'],
+            'parse_outcome': outcome
+        }
+    
+    def _analyze_frame_with_openai(self, frame_path: str, frame_number: int, face_crop: bool = False) -> Dict:
+        """Analyze a single frame (or a face crop from it) with OpenAI"""
         try:
             base64_image = self._encode_image_to_base64(frame_path)
+            subject = (f"this face crop from a video frame (frame {frame_number})" if face_crop
+                       else f"this video frame (frame {frame_number})")
             
-            prompt = f"""Analyze this video frame (frame {frame_number}) comprehensively for signs of deepfake or AI-generated content. Provide detailed metrics.
+            prompt = f"""Analyze {subject} comprehensively for signs of deepfake or AI-generated content. Provide detailed metrics.
 
-Analyze and provide scores (0.0-1.0) for:
-1. Border Quality: Blur artifacts around face boundaries (0.0 = very blurry, 1.0 = sharp)
-2. Edge Uniformity: Edge consistency (0.0 = inconsistent, 1.0 = uniform)
-3. Lighting Consistency: Lighting uniformity (0.0 = inconsistent, 1.0 = uniform)
-4. Skin Texture: Skin texture naturalness (0.0 = unnatural, 1.0 = natural)
-5. Facial Symmetry: Face symmetry (0.0 = asymmetric, 1.0 = symmetric)
-6. Overall Artifacts: List specific artifacts
+{FRAME_CRITERIA}
 
 Respond with JSON:
 {{
-  "prediction": "REAL" or "FAKE",
-  "confidence": 0.0-1.0,
-  "reasoning": "Provide a comprehensive, detailed explanation (3-5 sentences) explaining WHY you determined this video frame is REAL or FAKE. Describe specific visual evidence you observed, such as: unnatural skin texture, inconsistent lighting patterns, blurry edges, artifacts around facial features, temporal inconsistencies, or any other indicators. Be specific about what you see that led to your conclusion. This explanation should help users understand the reasoning behind the detection.",
-  "border_quality": 0.0-1.0,
-  "edge_uniformity": 0.0-1.0,
-  "lighting_consistency": 0.0-1.0,
-  "skin_texture_score": 0.0-1.0,
-  "facial_symmetry_score": 0.0-1.0,
-  "artifacts": ["list of detected artifacts"]
+{FRAME_FIELDS}
 }}"""
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=500,
-                temperature=0.3
+            result = request_structured(
+                self.client, self.model,
+                self._frame_request(prompt, base64_image),
+                FrameAnalysis, max_tokens=500, temperature=0.3,
+                cache=self.response_cache,
+                # Keyed on the frame bytes only: the frame number in the prompt is informational
+                cache_key=(PROMPT_VERSION, hash_bytes(base64_image.encode('ascii')))
             )
+            return self._frame_result(frame_number, result.value.model_dump(), result.raw_text, result.outcome)
             
-            response_text = response.choices[0].message.content
-            
-            # Parse response
-            import json
-            import re
-            
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                try:
-                    analysis = json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    analysis = self._parse_text_response(response_text)
-            else:
-                analysis = self._parse_text_response(response_text)
-            
-            prediction = analysis.get('prediction', 'UNKNOWN').upper()
-            if 'REAL' in prediction or 'AUTHENTIC' in prediction:
-                prediction = 'REAL'
-            elif 'FAKE' in prediction or 'DEEPFAKE' in prediction:
-                prediction = 'FAKE'
-            else:
-                prediction = 'UNKNOWN'
-            
-            confidence = float(analysis.get('confidence', 0.5))
-            
+        except Exception as e:
+            logger.error(f"Error analyzing frame {frame_number}: {e}")
             return {
                 'frame_number': frame_number,
-                'prediction': prediction,
-                'confidence': confidence,
-                'reasoning': analysis.get('reasoning', response_text),
-                'artifacts': analysis.get('artifacts', []),
-                'border_quality': float(analysis.get('border_quality', 0.7)),
-                'edge_uniformity': float(analysis.get('edge_uniformity', 0.7)),
-                'lighting_consistency': float(analysis.get('lighting_consistency', 0.7)),
-                'skin_texture_score': float(analysis.get('skin_texture_score', 0.7)),
-                'facial_symmetry_score': float(analysis.get('facial_symmetry_score', 0.7))
+                'prediction': 'UNKNOWN',
+                'confidence': 0.5,
+                'error': str(e)
             }
+    
+    def _analyze_tiles_with_openai(self, frames_data: List[Dict]) -> List[Dict]:
+        """Analyze several face crops tiled into one image with a single OpenAI request"""
+        frame_numbers = [frame_data['frame_number'] for frame_data in frames_data]
+        try:
+            mosaic = tile_crops([cv2.imread(frame_data['file_path']) for frame_data in frames_data])
+            ok, encoded = cv2.imencode('.jpg', mosaic)
+            if not ok:
+                raise ValueError("could not encode tiled image")
+            base64_image = base64.b64encode(encoded.tobytes()).decode('utf-8')
+            
+            prompt = f"""This image is a grid of {len(frames_data)} numbered face crops taken from frames of one video, in time order (tile 1 = frame {frame_numbers[0]}). Analyze each tile separately and comprehensively for signs of deepfake or AI-generated content, and compare tiles for temporal inconsistencies. Provide detailed metrics for every tile.
+
+{FRAME_CRITERIA}
+
+Respond with JSON:
+{{
+  "tiles": [
+    {{
+  "tile": tile number,
+{FRAME_FIELDS}
+    }}
+  ]
+}}"""
+            
+            result = request_structured(
+                self.client, self.model,
+                self._frame_request(prompt, base64_image),
+                TileAnalyses, max_tokens=150 + 350 * len(frames_data), temperature=0.3,
+                cache=self.response_cache,
+                cache_key=(PROMPT_VERSION, 'tiles', hash_bytes(encoded.tobytes()))
+            )
+            by_tile = {tile.tile: tile.model_dump() for tile in result.value.tiles}
+            
+            results = []
+            for index, frame_number in enumerate(frame_numbers, start=1):
+                if index in by_tile:
+                    results.append(self._frame_result(frame_number, by_tile[index], '', result.outcome))
+                else:
+                    results.append({
+                        'frame_number': frame_number,
+                        'prediction': 'UNKNOWN',
+                        'confidence': 0.5,
+                        'error': f'No verdict for tile {index}'
+                    })
+            return results
             
         except Exception as e:
-            logger.error(f"Error analyzing frame {frame_number}: {e}")
-            return {
+            logger.error(f"Error analyzing tiled frames {frame_numbers}: {e}")
+            return [{
                 'frame_number': frame_number,
                 'prediction': 'UNKNOWN',
                 'confidence': 0.5,
                 'error': str(e)
-            }
+            } for frame_number in frame_numbers]
     
-    def _parse_text_response(self, text: str) -> Dict:
-        """Parse text response"""
-        result = {
-            'prediction': 'UNKNOWN',
-            'confidence': 0.5,
-            'reasoning': text,
-            'artifacts': [],
-            'border_quality': 0.7,
-            'edge_uniformity': 0.7,
-            'lighting_consistency': 0.7,
-            'skin_texture_score': 0.7,
-            'facial_symmetry_score': 0.7
-        }
-        
-        text_upper = text.upper()
-        if 'FAKE' in text_upper or 'DEEPFAKE' in text_upper:
-            result['prediction'] = 'FAKE'
-        elif 'REAL' in text_upper or 'AUTHENTIC' in text_upper:
-            result['prediction'] = 'REAL'
-        
-        import re
-        conf_match = re.search(r'confidence[:\s]+([0-9.]+)', text, re.IGNORECASE)
-        if conf_match:
-            try:
-                conf = float(conf_match.group(1))
-                if conf > 1.0:
-                    conf = conf / 100.0
-                result['confidence'] = conf
-            except ValueError:
-                pass
-        
-        # Try to extract scores
-        score_patterns = {
-            'border_quality': r'border[_\s]?quality[:\s]+([0-9.]+)',
-            'edge_uniformity': r'edge[_\s]?uniformity[:\s]+([0-9.]+)',
-            'lighting_consistency': r'lighting[_\s]?consistency[:\s]+([0-9.]+)',
-            'skin_texture_score': r'skin[_\s]?texture[:\s]+([0-9.]+)',
-            'facial_symmetry_score': r'facial[_\s]?symmetry[:\s]+([0-9.]+)'
-        }
-        
-        for key, pattern in score_patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                try:
-                    score = float(match.group(1))
-                    if score > 1.0:
-                        score = score / 100.0
-                    result[key] = score
-                except ValueError:
-                    pass
-        
-        return result
+    def _iter_frame_results(self, frames_data: List[Dict]):
+        """Yield (frame_data, frame_result) in frame order, tiling face crops when enabled"""
+        index = 0
+        while index < len(frames_data):
+            frame_data = frames_data[index]
+            if self.face_tiles > 1 and frame_data['crop_box'] is not None:
+                group = [frame_data]
+                while (len(group) < self.face_tiles and index + len(group) < len(frames_data)
+                       and frames_data[index + len(group)]['crop_box'] is not None):
+                    group.append(frames_data[index + len(group)])
+                if len(group) > 1:
+                    yield from zip(group, self._analyze_tiles_with_openai(group))
+                    index += len(group)
+                    continue
+            yield frame_data, self._analyze_frame_with_openai(
+                frame_data['file_path'],
+                frame_data['frame_number'],
+                face_crop=frame_data['crop_box'] is not None
+            )
+            index += 1
     
-    def detect_video_deepfake(self, video_path: str) -> Dict:
+    def detect_video_deepfake(self, video_path: str,
+                              progress_callback: Optional[Callable] = None) -> Dict:
         """
         Detect deepfake in video using OpenAI
         
         Args:
             video_path: Path to video file
+            progress_callback: Optional callable(stage, progress, message, **data) for stage events
             
         Returns:
             Dictionary with analysis results
@@ -285,7 +319,11 @@ Respond with JSON:
             video_info = self._get_video_info(video_path)
             
             # Extract frames
-            frames_data = self._extract_frames(video_path)
+            frames_data, sampling = self._extract_frames(video_path, video_info.get('fps', 0.0))
+            if progress_callback:
+                progress_callback('decoded', 0.1, f'Extracted {len(frames_data)} frames',
+                                  video_info=video_info, total_frames=len(frames_data),
+                                  frames_suppressed=sampling.get('suppressed', 0))
             
             if not frames_data:
                 return {
@@ -299,12 +337,7 @@ Respond with JSON:
             real_count = 0
             total_confidence = 0.0
             
-            for frame_data in frames_data:
-                frame_result = self._analyze_frame_with_openai(
-                    frame_data['file_path'],
-                    frame_data['frame_number']
-                )
-                
+            for frame_data, frame_result in self._iter_frame_results(frames_data):
                 frame_result['timestamp'] = frame_data['timestamp']
                 
                 # Extract detailed scores from frame_result
@@ -320,8 +353,12 @@ Respond with JSON:
                     'model_predictions': {'openai_gpt4_vision': frame_result['prediction']},
                     'model_confidences': {'openai_gpt4_vision': frame_result['confidence']},
                     'face_features': {
-                        'face_detected': False,
-                        'face_confidence': 0.0,
+                        'face_detected': frame_data['face_box'] is not None,
+                        'face_confidence': frame_data['face_confidence'],
+                        'face_source': frame_data['face_source'],
+                        'face_region': face_region(frame_data['face_box']) if frame_data['face_box'] else None,
+                        'crop_region': face_region(frame_data['crop_box']) if frame_data['crop_box'] else None,
+                        'payload_bytes': frame_data['payload_bytes'],
                         'artifact_analysis': {
                             'border_analysis': {
                                 'border_quality': border_quality
@@ -370,6 +407,23 @@ Respond with JSON:
                 
                 total_confidence += frame_result['confidence']
                 
+                if progress_callback:
+                    analyzed = len(frame_results)
+                    running_prediction = 'FAKE' if fake_count > real_count else 'REAL' if real_count > fake_count else 'UNKNOWN'
+                    progress_callback(
+                        'frame_analyzed',
+                        0.1 + 0.8 * analyzed / len(frames_data),
+                        f'Frame {analyzed}/{len(frames_data)} analyzed',
+                        frame_index=analyzed,
+                        total_frames=len(frames_data),
+                        frame_number=frame_result['frame_number'],
+                        timestamp=frame_result['timestamp'],
+                        prediction=frame_result['prediction'],
+                        confidence=frame_result['confidence'],
+                        running_prediction=running_prediction,
+                        running_confidence=total_confidence / analyzed * 100
+                    )
+                
                 # Clean up temporary file
                 try:
                     os.unlink(frame_data['file_path'])
@@ -398,6 +452,10 @@ Respond with JSON:
                 'total_frames_analyzed': len(frame_results),
                 'fake_frames': fake_count,
                 'real_frames': real_count,
+                'frames_suppressed': sampling.get('suppressed', 0),
+                'faces_cropped': sum(1 for frame_data in frames_data if frame_data['crop_box'] is not None),
+                'payload_bytes': sum(frame_data['payload_bytes'] for frame_data in frames_data),
+                'sampling': sampling,
                 'frame_results': frame_results
             }
             
@@ -6,11 +6,20 @@ Generates detailed, layman-friendly PDF reports for deepfake detection analysis
 import os
 import json
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, Optional
+from functools import lru_cache
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+
+from file_utils import write_atomic
+from response_cache import get_response_cache, make_key
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
@@ -31,6 +40,89 @@ try:
 except ImportError:
     pass  # Will use HTTP requests instead
 
+# Bump whenever report layout or prompts change so cached reports are re-rendered
+REPORT_TEMPLATE_VERSION = "3"
+
+# Seconds to wait for a connection to the LLM host
+LLM_CONNECT_TIMEOUT = 5.0
+
+# Scores below this (0-1, higher = more natural) or indicators above
+# SALIENT_INDICATOR_LEVEL (higher = more suspicious) are worth explaining
+SALIENT_SCORE_LEVEL = 0.5
+SALIENT_INDICATOR_LEVEL = 0.6
+
+
+@lru_cache(maxsize=1)
+def report_styles() -> Dict[str, ParagraphStyle]:
+    """Paragraph styles shared by every report (built once per process)"""
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#1e40af'),
+            spaceAfter=30,
+            alignment=TA_CENTER
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=16,
+            textColor=colors.HexColor('#1e40af'),
+            spaceAfter=12,
+            spaceBefore=12
+        ),
+        'body': ParagraphStyle(
+            'CustomBody',
+            parent=styles['BodyText'],
+            fontSize=11,
+            leading=14,
+            alignment=TA_JUSTIFY,
+            spaceAfter=12
+        ),
+        'footer': ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.grey,
+            alignment=TA_CENTER
+        ),
+    }
+
+
+def confidence_bucket(confidence: float, width: int = 10) -> str:
+    """Confidence range label such as '80-90%'"""
+    low = min(90, max(0, int(confidence // width) * width))
+    return f"{low}-{low + width}%"
+
+
+def salient_indicators(analysis_result: Dict, limit: int = 3) -> tuple:
+    """
+    Names of the most notable scored indicators in a result, strongest first.
+    
+    Covers the vision detectors' detailed scores (averaged over frames for
+    video) and the audio detector's deepfake indicators.
+    """
+    details = analysis_result.get('details', {}) or {}
+    strengths: Dict[str, List[float]] = {}
+    
+    score_sets = [(details.get('openai_analysis') or {}).get('detailed_scores') or {}]
+    for frame in (details.get('frame_analysis') or {}).get('frame_results', []):
+        score_sets.append(((frame.get('details') or {}).get('openai_analysis') or {}).get('detailed_scores') or {})
+    for scores in score_sets:
+        for name, value in scores.items():
+            if isinstance(value, (int, float)):
+                strengths.setdefault(name, []).append(SALIENT_SCORE_LEVEL - value)
+    
+    for name, value in (details.get('deepfake_indicators') or {}).items():
+        if name != 'overall_suspiciousness' and isinstance(value, (int, float)):
+            strengths.setdefault(name, []).append(value - SALIENT_INDICATOR_LEVEL)
+    
+    averaged = {name: sum(values) / len(values) for name, values in strengths.items()}
+    ranked = sorted((name for name, strength in averaged.items() if strength > 0), key=lambda n: -averaged[n])
+    return tuple(ranked[:limit])
+
 class PDFReportGenerator:
     """Generate detailed PDF reports with LLM-enhanced explanations"""
     
@@ -38,73 +130,185 @@ class PDFReportGenerator:
         self.ollama_available = OLLAMA_AVAILABLE
         self.ollama_model = "llama3.2"  # Default model, can be changed
         self.ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        # Per-call timeout (also the longest silence tolerated mid-stream), and the
+        # deadline for all LLM sections of one report
+        self.llm_timeout = float(os.getenv("REPORT_LLM_TIMEOUT", "60"))
+        self.llm_deadline = float(os.getenv("REPORT_LLM_DEADLINE", "60"))
+        self.ollama_client = None
+        if self.ollama_available:
+            self.ollama_client = ollama.Client(
+                host=self.ollama_base_url, timeout=min(self.llm_timeout, self.llm_deadline)
+            )
+        
+        # Pooled connections to the LLM host, shared by concurrent section requests
+        llm_workers = int(os.getenv("REPORT_LLM_WORKERS", "4"))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=llm_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.llm_pool = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="report-llm")
+        
+        # Generation budget per section, and the shared memo of generated summaries
+        self.section_max_tokens = {
+            'explanation': int(os.getenv("REPORT_SUMMARY_MAX_TOKENS", "500")),
+            'detailed_analysis': int(os.getenv("REPORT_DETAILS_MAX_TOKENS", "1200")),
+        }
+        self.memo = get_response_cache()
+        
+    def _collect_stream(self, chunks, started: float, timeout: float, max_tokens: int,
+                        abandoned: Optional[threading.Event] = None) -> Tuple[str, bool]:
+        """
+        Concatenate streamed generate chunks until done, the token budget, the timeout or abandonment.
+        
+        Returns the text and whether the model finished it (``done`` was reached).
+        """
+        parts = []
+        for count, chunk in enumerate(chunks, start=1):
+            parts.append(chunk.get("response", ""))
+            if chunk.get("done"):
+                return "".join(parts), True
+            if count >= max_tokens:
+                logger.info(f"LLM output cut at the {max_tokens}-token budget")
+                break
+            if time.monotonic() - started > timeout:
+                logger.warning(f"LLM output cut after {timeout:.0f}s")
+                break
+            if abandoned is not None and abandoned.is_set():
+                logger.info("LLM output abandoned after the report deadline")
+                break
+        return "".join(parts), False
+    
+    def _call_llm(self, prompt: str, **kwargs) -> Optional[str]:
+        """Call LLM to generate explanations; None if it failed"""
+        return self._stream_llm(prompt, **kwargs)[0]
+    
+    def _stream_llm(self, prompt: str, max_retries: int = 3, timeout: Optional[float] = None,
+                    max_tokens: int = 800,
+                    abandoned: Optional[threading.Event] = None) -> Tuple[Optional[str], bool]:
+        """
+        Call the LLM, consuming the output as it streams.
+        
+        Returns the text (None if the call failed) and whether it is complete,
+        i.e. not cut by the token budget, the timeout or abandonment. Both
+        transports time out on connect and on a stalled stream, and stop
+        reading once ``abandoned`` is set, so calls a report has given up on
+        release their worker promptly.
+        """
+        timeout = timeout or self.llm_timeout
+        options = {
+            "temperature": 0.7,
+            "top_p": 0.9,
+            # The server stops generating at the budget; the client enforces it too
+            "num_predict": max_tokens,
+        }
+        started = time.monotonic()
         
-    def _call_llm(self, prompt: str, max_retries: int = 3) -> Optional[str]:
-        """Call LLM to generate explanations"""
         # Try using ollama package if available
-        if self.ollama_available:
+        if self.ollama_client is not None:
             try:
-                response = ollama.generate(
-                    model=self.ollama_model,
-                    prompt=prompt,
-                    options={
-                        "temperature": 0.7,
-                        "top_p": 0.9,
-                    }
-                )
-                return response.get("response", "")
+                chunks = self.ollama_client.generate(model=self.ollama_model, prompt=prompt, options=options,
+                                                     stream=True)
+                return self._collect_stream(chunks, started, timeout, max_tokens, abandoned)
             except Exception as e:
                 logger.warning(f"Ollama call failed: {e}, trying HTTP fallback")
         
         # Fallback to HTTP (works even if ollama package not installed)
         try:
-            response = requests.post(
+            with self.session.post(
                 f"{self.ollama_base_url}/api/generate",
                 json={
                     "model": self.ollama_model,
                     "prompt": prompt,
-                    "stream": False
+                    "stream": True,
+                    "options": options
                 },
-                timeout=60
-            )
-            if response.status_code == 200:
-                return response.json().get("response", "")
+                # The read timeout bounds each wait for the next chunk
+                timeout=(LLM_CONNECT_TIMEOUT, timeout),
+                stream=True
+            ) as response:
+                if response.status_code == 200:
+                    chunks = (json.loads(line) for line in response.iter_lines() if line)
+                    return self._collect_stream(chunks, started, timeout, max_tokens, abandoned)
         except Exception as e:
             logger.warning(f"Ollama HTTP request failed: {e}")
         
-        return None
+        return None, False
     
-    def _generate_layman_explanation(self, analysis_result: Dict, file_type: str) -> str:
-        """Generate layman-friendly explanation using LLM"""
+    def _memoized_llm(self, memo_key: str, prompt: str, **kwargs) -> Optional[str]:
+        """
+        _call_llm through the shared memo; concurrent requests for one key generate once.
+        
+        Only complete generations are memoized, so a summary cut short by one
+        report's deadline is not served to every later report.
+        """
+        if self.memo is None:
+            return self._call_llm(prompt, **kwargs)
+        complete = []
+        
+        def generate():
+            text, finished = self._stream_llm(prompt, **kwargs)
+            complete.append(finished)
+            return text
+        
+        text, hit = self.memo.get_or_compute(memo_key, generate,
+                                             cacheable=lambda text: bool(text) and all(complete))
+        if hit:
+            logger.info("Reusing memoized report explanation")
+        return text
+    
+    def _explanation_memo_key(self, analysis_result: Dict, file_type: str) -> str:
+        """Memo key for the executive summary: everything its prompt depends on"""
+        return make_key(
+            'report_explanation', REPORT_TEMPLATE_VERSION, self.ollama_model, file_type,
+            analysis_result.get('prediction', 'UNKNOWN'),
+            confidence_bucket(analysis_result.get('confidence', 0.0)),
+            *salient_indicators(analysis_result)
+        )
+    
+    def _layman_prompt(self, analysis_result: Dict, file_type: str) -> str:
+        """
+        Prompt for the executive summary.
+        
+        Built only from the verdict profile (prediction, confidence range and
+        salient indicators) so the generated text can be reused for other
+        results with the same profile.
+        """
         
         # Extract key information
         prediction = analysis_result.get('prediction', 'UNKNOWN')
-        confidence = analysis_result.get('confidence', 0.0)
-        details = analysis_result.get('details', {})
+        confidence = confidence_bucket(analysis_result.get('confidence', 0.0))
+        indicators = salient_indicators(analysis_result)
+        indicator_text = "\n".join(f"- {name.replace('_', ' ')}" for name in indicators) or "- none stood out"
         
         # Create prompt for LLM
-        prompt = f"""You are an expert in deepfake detection explaining results to a non-technical person.
+        return f"""You are an expert in deepfake detection explaining results to a non-technical person.
 
 Analysis Results:
 - File Type: {file_type}
 - Prediction: {prediction}
-- Confidence: {confidence:.1f}%
+- Confidence: {confidence}
 
-Technical Details (simplify these for the user):
-{json.dumps(details, indent=2)[:1000]}
+Most notable indicators (simplify these for the user):
+{indicator_text}
 
 Please provide a clear, easy-to-understand explanation that:
 1. Explains what a deepfake is in simple terms
 2. Describes what was analyzed (image/video/audio)
 3. Explains the prediction result ({prediction}) and what it means
-4. Explains the confidence level ({confidence:.1f}%) in simple terms
+4. Explains the confidence level ({confidence}) in simple terms
 5. Describes the key indicators that led to this conclusion
 6. Provides context about what this means for the user
 
 Write in a friendly, conversational tone. Avoid technical jargon. Keep it to 3-4 paragraphs maximum.
 """
-        
-        explanation = self._call_llm(prompt)
+    
+    def _generate_layman_explanation(self, analysis_result: Dict, file_type: str) -> str:
+        """Generate layman-friendly explanation using LLM"""
+        explanation = self._memoized_llm(
+            self._explanation_memo_key(analysis_result, file_type),
+            self._layman_prompt(analysis_result, file_type),
+            max_tokens=self.section_max_tokens['explanation']
+        )
         
         # Fallback to template-based explanation if LLM fails
         if not explanation:
@@ -132,8 +336,8 @@ Please note that while this analysis provides valuable insights, no detection sy
         
         return explanation
     
-    def _generate_detailed_analysis_section(self, analysis_result: Dict, file_type: str) -> str:
-        """Generate detailed analysis section using LLM"""
+    def _detailed_analysis_prompt(self, analysis_result: Dict, file_type: str) -> str:
+        """Prompt for the detailed analysis section"""
         details = analysis_result.get('details', {})
         prediction = analysis_result.get('prediction', 'UNKNOWN')
         confidence = analysis_result.get('confidence', 0.0)
@@ -141,7 +345,7 @@ Please note that while this analysis provides valuable insights, no detection sy
         # Create a comprehensive summary of all analysis data for the LLM
         analysis_summary = self._extract_analysis_summary(analysis_result, file_type)
         
-        prompt = f"""You are an expert explaining deepfake detection results to a non-technical person.
+        return f"""You are an expert explaining deepfake detection results to a non-technical person.
 
 Analysis Summary:
 - File Type: {file_type}
@@ -163,8 +367,11 @@ Provide a comprehensive, detailed explanation (6-8 paragraphs) that covers:
 
 Write in clear, conversational language. Avoid jargon. Make it detailed and thorough. Use specific numbers and findings from the data.
 """
-        
-        detailed_analysis = self._call_llm(prompt)
+    
+    def _generate_detailed_analysis_section(self, analysis_result: Dict, file_type: str) -> str:
+        """Generate detailed analysis section using LLM"""
+        detailed_analysis = self._call_llm(self._detailed_analysis_prompt(analysis_result, file_type),
+                                           max_tokens=self.section_max_tokens['detailed_analysis'])
         
         if not detailed_analysis:
             # Fallback - use comprehensive fallback
@@ -172,6 +379,54 @@ Write in clear, conversational language. Avoid jargon. Make it detailed and thor
         
         return detailed_analysis
     
+    def _generate_llm_sections(self, analysis_result: Dict, file_type: str) -> Dict[str, str]:
+        """
+        Generate every LLM-written section concurrently under one deadline.
+        
+        Sections whose call fails or misses the deadline get their template
+        fallback, so a report waits for at most ``llm_deadline`` seconds of LLM time.
+        """
+        timeout = min(self.llm_timeout, self.llm_deadline)
+        # Set at the deadline so late calls stop streaming and free their worker
+        abandoned = threading.Event()
+        # The summary only depends on the verdict profile and is memoized; the
+        # detailed analysis quotes this result's numbers, so it never is
+        calls = {
+            'explanation': lambda: self._memoized_llm(
+                self._explanation_memo_key(analysis_result, file_type),
+                self._layman_prompt(analysis_result, file_type),
+                timeout=timeout, max_tokens=self.section_max_tokens['explanation'], abandoned=abandoned
+            ),
+            'detailed_analysis': lambda: self._call_llm(
+                self._detailed_analysis_prompt(analysis_result, file_type),
+                timeout=timeout, max_tokens=self.section_max_tokens['detailed_analysis'], abandoned=abandoned
+            ),
+        }
+        fallbacks = {
+            'explanation': self._generate_fallback_explanation,
+            'detailed_analysis': self._generate_fallback_detailed_analysis,
+        }
+        deadline = time.monotonic() + self.llm_deadline
+        futures = {name: self.llm_pool.submit(call) for name, call in calls.items()}
+        wait(futures.values(), timeout=max(0.0, deadline - time.monotonic()))
+        # Calls still queued never start; running ones stop at their next chunk
+        abandoned.set()
+        for future in futures.values():
+            future.cancel()
+        
+        results = {}
+        for name, future in futures.items():
+            text = None
+            if future.done() and not future.cancelled():
+                try:
+                    text = future.result()
+                except Exception as e:
+                    logger.warning(f"LLM call for report section '{name}' failed: {e}")
+            else:
+                logger.warning(f"LLM call for report section '{name}' missed the {self.llm_deadline:.0f}s deadline")
+            results[name] = text or fallbacks[name](analysis_result, file_type)
+        return results
+    
     def _extract_analysis_summary(self, analysis_result: Dict, file_type: str) -> str:
         """Extract and format analysis data into a readable summary"""
         details = analysis_result.get('details', {})
@@ -833,209 +1088,226 @@ Write in clear, conversational language. Avoid jargon. Make it detailed and thor
             logger.error(traceback.format_exc())
             return f"Error generating technical details: {str(e)}"
     
-    def generate_report(self, file_id: str, file_info: Dict, analysis_result: Dict, output_path: str) -> str:
-        """Generate complete PDF report"""
-        try:
-            # Create PDF document
-            doc = SimpleDocTemplate(
-                output_path,
-                pagesize=letter,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=18
-            )
-            
-            # Container for the 'Flowable' objects
-            elements = []
-            
-            # Define styles
-            styles = getSampleStyleSheet()
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                textColor=colors.HexColor('#1e40af'),
-                spaceAfter=30,
-                alignment=TA_CENTER
-            )
-            
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=16,
-                textColor=colors.HexColor('#1e40af'),
-                spaceAfter=12,
-                spaceBefore=12
-            )
-            
-            body_style = ParagraphStyle(
-                'CustomBody',
-                parent=styles['BodyText'],
-                fontSize=11,
-                leading=14,
-                alignment=TA_JUSTIFY,
-                spaceAfter=12
-            )
-            
-            # Title
-            elements.append(Paragraph("Deepfake Detection Analysis Report", title_style))
-            elements.append(Spacer(1, 0.2*inch))
-            
-            # Report metadata
-            metadata_data = [
-                ['Report Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
-                ['File ID:', file_id],
-                ['Original Filename:', file_info.get('filename', 'N/A')],
-                ['File Type:', file_info.get('file_type', 'N/A').upper()],
-                ['File Size:', f"{file_info.get('file_size', 0) / 1024:.2f} KB"],
-            ]
-            
-            metadata_table = Table(metadata_data, colWidths=[2*inch, 4*inch])
-            metadata_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ('TOPPADDING', (0, 0), (-1, -1), 12),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-            ]))
-            elements.append(metadata_table)
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Executive Summary
-            elements.append(Paragraph("Executive Summary", heading_style))
-            
-            file_type = file_info.get('file_type', 'file')
-            explanation = self._generate_layman_explanation(analysis_result, file_type)
-            elements.append(Paragraph(explanation, body_style))
-            elements.append(Spacer(1, 0.2*inch))
-            
-            # Key Findings
-            elements.append(Paragraph("Key Findings", heading_style))
-            
-            prediction = analysis_result.get('prediction', 'UNKNOWN')
-            confidence = analysis_result.get('confidence', 0.0)
-            
-            findings_data = [
-                ['Prediction:', prediction],
-                ['Confidence Level:', f"{confidence:.1f}%"],
-                ['Analysis Date:', analysis_result.get('analysis_time', datetime.now().isoformat())],
-            ]
-            
-            if 'model_info' in analysis_result:
-                models_used = analysis_result['model_info'].get('models_used', [])
-                if models_used:
-                    findings_data.append(['Models Used:', ', '.join(models_used)])
-            
-            findings_table = Table(findings_data, colWidths=[2*inch, 4*inch])
-            findings_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#dbeafe')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 11),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-                ('TOPPADDING', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#93c5fd'))
-            ]))
-            elements.append(findings_table)
-            elements.append(Spacer(1, 0.3*inch))
+    def _build_elements(self, file_id: str, file_info: Dict, analysis_result: Dict, sections: Dict[str, str]) -> list:
+        """Flowables for one file's report"""
+        styles = report_styles()
+        file_type = file_info.get('file_type', 'file')
+        
+        # Container for the 'Flowable' objects
+        elements = []
+        
+        # Title
+        elements.append(Paragraph("Deepfake Detection Analysis Report", styles['title']))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Report metadata
+        metadata_data = [
+            ['Report Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+            ['File ID:', file_id],
+            ['Original Filename:', file_info.get('filename', 'N/A')],
+            ['File Type:', file_info.get('file_type', 'N/A').upper()],
+            ['File Size:', f"{file_info.get('file_size', 0) / 1024:.2f} KB"],
+        ]
+        
+        metadata_table = Table(metadata_data, colWidths=[2*inch, 4*inch])
+        metadata_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('TOPPADDING', (0, 0), (-1, -1), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+        ]))
+        elements.append(metadata_table)
+        elements.append(Spacer(1, 0.3*inch))
+        
+        # Executive Summary
+        elements.append(Paragraph("Executive Summary", styles['heading']))
+        
+        explanation = sections['explanation']
+        elements.append(Paragraph(explanation, styles['body']))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Key Findings
+        elements.append(Paragraph("Key Findings", styles['heading']))
+        
+        prediction = analysis_result.get('prediction', 'UNKNOWN')
+        confidence = analysis_result.get('confidence', 0.0)
+        
+        findings_data = [
+            ['Prediction:', prediction],
+            ['Confidence Level:', f"{confidence:.1f}%"],
+            ['Analysis Date:', analysis_result.get('analysis_time', datetime.now().isoformat())],
+        ]
+        
+        if 'model_info' in analysis_result:
+            models_used = analysis_result['model_info'].get('models_used', [])
+            if models_used:
+                findings_data.append(['Models Used:', ', '.join(models_used)])
+        
+        findings_table = Table(findings_data, colWidths=[2*inch, 4*inch])
+        findings_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#dbeafe')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#93c5fd'))
+        ]))
+        elements.append(findings_table)
+        elements.append(Spacer(1, 0.3*inch))
+        
+        # Detailed Analysis
+        elements.append(Paragraph("Detailed Analysis", styles['heading']))
+        detailed_analysis = sections['detailed_analysis']
+        
+        # Split into paragraphs and format properly
+        # Handle markdown-style bold (**text**) and split by double newlines
+        paragraphs = detailed_analysis.split('\n\n')
+        for para_text in paragraphs:
+            if not para_text.strip():
+                continue
             
-            # Detailed Analysis
-            elements.append(Paragraph("Detailed Analysis", heading_style))
-            detailed_analysis = self._generate_detailed_analysis_section(analysis_result, file_type)
+            # Convert markdown bold (**text**) to HTML bold for ReportLab
+            para_text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', para_text)
             
-            # Split into paragraphs and format properly
-            # Handle markdown-style bold (**text**) and split by double newlines
-            paragraphs = detailed_analysis.split('\n\n')
-            for para_text in paragraphs:
-                if not para_text.strip():
+            # Split by single newlines for bullet points
+            lines = para_text.split('\n')
+            formatted_para = []
+            for line in lines:
+                line = line.strip()
+                if not line:
                     continue
-                
-                # Convert markdown bold (**text**) to HTML bold for ReportLab
-                para_text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', para_text)
-                
-                # Split by single newlines for bullet points
-                lines = para_text.split('\n')
-                formatted_para = []
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    # Handle bullet points
-                    if line.startswith('•'):
-                        formatted_para.append(f"&nbsp;&nbsp;&nbsp;&nbsp;{line}")
-                    else:
-                        formatted_para.append(line)
-                
-                para_content = '<br/>'.join(formatted_para)
-                elements.append(Paragraph(para_content, body_style))
-                elements.append(Spacer(1, 0.1*inch))
-            
-            elements.append(Spacer(1, 0.2*inch))
-            
-            # Technical Details
-            elements.append(Paragraph("Technical Details", heading_style))
-            technical_details = self._generate_technical_details(analysis_result, file_type)
+                # Handle bullet points
+                if line.startswith('•'):
+                    formatted_para.append(f"&nbsp;&nbsp;&nbsp;&nbsp;{line}")
+                else:
+                    formatted_para.append(line)
             
-            # Split technical details into paragraphs
-            tech_paragraphs = technical_details.split('\n\n')
-            for tech_para in tech_paragraphs:
-                if not tech_para.strip():
+            para_content = '<br/>'.join(formatted_para)
+            elements.append(Paragraph(para_content, styles['body']))
+            elements.append(Spacer(1, 0.1*inch))
+        
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Technical Details
+        elements.append(Paragraph("Technical Details", styles['heading']))
+        technical_details = self._generate_technical_details(analysis_result, file_type)
+        
+        # Split technical details into paragraphs
+        tech_paragraphs = technical_details.split('\n\n')
+        for tech_para in tech_paragraphs:
+            if not tech_para.strip():
+                continue
+            # Convert markdown bold to HTML
+            tech_para = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', tech_para)
+            # Split by newlines for formatting
+            lines = tech_para.split('\n')
+            formatted_lines = []
+            for line in lines:
+                line = line.strip()
+                if not line:
                     continue
-                # Convert markdown bold to HTML
-                tech_para = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', tech_para)
-                # Split by newlines for formatting
-                lines = tech_para.split('\n')
-                formatted_lines = []
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    if line.startswith('•') or line.startswith('-'):
-                        formatted_lines.append(f"&nbsp;&nbsp;&nbsp;&nbsp;{line}")
-                    else:
-                        formatted_lines.append(line)
-                para_content = '<br/>'.join(formatted_lines)
-                elements.append(Paragraph(para_content, body_style))
-                elements.append(Spacer(1, 0.1*inch))
-            
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Important Notes
-            elements.append(Paragraph("Important Notes", heading_style))
-            notes_text = """
+                if line.startswith('•') or line.startswith('-'):
+                    formatted_lines.append(f"&nbsp;&nbsp;&nbsp;&nbsp;{line}")
+                else:
+                    formatted_lines.append(line)
+            para_content = '<br/>'.join(formatted_lines)
+            elements.append(Paragraph(para_content, styles['body']))
+            elements.append(Spacer(1, 0.1*inch))
+        
+        elements.append(Spacer(1, 0.3*inch))
+        
+        # Important Notes
+        elements.append(Paragraph("Important Notes", styles['heading']))
+        notes_text = """
 • This analysis is based on current deepfake detection technology and is not 100% accurate.
 • Results should be considered alongside other evidence and context.
 • Deepfake technology is constantly evolving, and detection methods may not catch all forms of manipulation.
 • If you have serious concerns about media authenticity, consult with additional experts.
 • This report is for informational purposes and should not be the sole basis for important decisions.
 """
-            elements.append(Paragraph(notes_text, body_style))
-            elements.append(Spacer(1, 0.3*inch))
-            
-            # Footer
-            footer_text = f"Report generated by Deepfake Detection System on {datetime.now().strftime('%B %d, %Y at %H:%M:%S')}"
-            elements.append(Paragraph(footer_text, ParagraphStyle(
-                'Footer',
-                parent=styles['Normal'],
-                fontSize=9,
-                textColor=colors.grey,
-                alignment=TA_CENTER
-            )))
+        elements.append(Paragraph(notes_text, styles['body']))
+        elements.append(Spacer(1, 0.3*inch))
+        
+        # Footer
+        footer_text = f"Report generated by Deepfake Detection System on {datetime.now().strftime('%B %d, %Y at %H:%M:%S')}"
+        elements.append(Paragraph(footer_text, styles['footer']))
+        
+        return elements
+    
+    def template_sections(self, analysis_result: Dict, file_type: str) -> Dict[str, str]:
+        """Template text for every LLM-written section (no LLM calls)"""
+        return {
+            'explanation': self._generate_fallback_explanation(analysis_result, file_type),
+            'detailed_analysis': self._generate_fallback_detailed_analysis(analysis_result, file_type),
+        }
+    
+    def render_report(self, file_id: str, file_info: Dict, analysis_result: Dict,
+                      sections: Optional[Dict[str, str]] = None) -> bytes:
+        """
+        Render a complete PDF report in memory
+        
+        ``sections`` supplies the LLM-written text; by default it is generated
+        (concurrently, under the LLM deadline).
+        """
+        try:
+            if sections is None:
+                sections = self._generate_llm_sections(analysis_result, file_info.get('file_type', 'file'))
             
-            # Build PDF
-            doc.build(elements)
+            # Create PDF document
+            buffer = BytesIO()
+            doc = SimpleDocTemplate(
+                buffer,
+                pagesize=letter,
+                rightMargin=72,
+                leftMargin=72,
+                topMargin=72,
+                bottomMargin=18
+            )
+            doc.build(self._build_elements(file_id, file_info, analysis_result, sections))
             
-            logger.info(f"PDF report generated successfully: {output_path}")
-            return output_path
+            logger.info(f"PDF report rendered for {file_id} ({buffer.tell()} bytes)")
+            return buffer.getvalue()
             
         except Exception as e:
             logger.error(f"Error generating PDF report: {e}")
             raise
-
+    
+    def generate_report(self, file_id: str, file_info: Dict, analysis_result: Dict, output_path: str,
+                        sections: Optional[Dict[str, str]] = None) -> str:
+        """Render a complete PDF report and write it atomically to ``output_path``"""
+        write_atomic(Path(output_path), self.render_report(file_id, file_info, analysis_result, sections))
+        logger.info(f"PDF report generated successfully: {output_path}")
+        return output_path
+    
+    def render_combined_report(self, reports: List[Dict]) -> bytes:
+        """
+        One PDF holding several reports, each starting on a new page.
+        
+        Each entry has 'file_id', 'file_info', 'analysis_result' and 'sections'.
+        """
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=letter,
+            rightMargin=72,
+            leftMargin=72,
+            topMargin=72,
+            bottomMargin=18
+        )
+        elements = []
+        for index, report in enumerate(reports):
+            if index:
+                elements.append(PageBreak())
+            elements.extend(self._build_elements(report['file_id'], report['file_info'],
+                                                 report['analysis_result'], report['sections']))
+        doc.build(elements)
+        logger.info(f"Combined PDF report with {len(reports)} files rendered ({buffer.tell()} bytes)")
+        return buffer.getvalue()
@@ -0,0 +1,37 @@
+"""
+Process Pools
+Lazily created process pools for the CPU-bound work the server hands off
+(audio features, media derivatives, report export), shut down with the app
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+
+class LazyProcessPool:
+    """A spawn process pool created on first use and recreated after shutdown"""
+
+    def __init__(self, max_workers: int = 1):
+        self.max_workers = max(1, int(max_workers))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def get(self, max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+        """The pool, created with ``max_workers`` (or the default) if it is not running"""
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a server process that already runs threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=max(1, int(max_workers or self.max_workers)),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def shutdown(self):
+        """Stop the workers without waiting; queued work is cancelled"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,185 @@
+"""
+Analysis Progress Events
+In-memory broker that fans out stage-level progress events for analysis jobs
+to Server-Sent Events subscribers
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Stages after which no further events are published for a job
+TERMINAL_STAGES = {'completed', 'error'}
+
+
+class ProgressBroker:
+    """
+    Publish/subscribe hub for analysis progress keyed by file_id.
+
+    Detectors run in worker threads and publish through ``reporter()``;
+    events are handed to subscriber queues on the event loop thread.
+    A bounded per-job history lets late subscribers (or reconnecting
+    EventSource clients sending Last-Event-ID) replay what they missed.
+    Event IDs keep increasing across re-analyses of a file, so an ID from
+    an earlier run never hides events of the current one.
+    """
+
+    def __init__(self, history_limit: int = 500, max_jobs: int = 1000):
+        self.history_limit = history_limit
+        self.max_jobs = max_jobs
+        self._history: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        # file_id -> last event ID issued; kept through reset() and eviction so IDs never repeat
+        self._sequence: Dict[str, int] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Remember the server event loop so worker threads can deliver events"""
+        self._loop = loop
+
+    def publish(self, file_id: str, stage: str, progress: Optional[float] = None,
+                message: Optional[str] = None, data: Optional[Dict] = None) -> Dict:
+        """Record an event for a job and deliver it to current subscribers"""
+        with self._lock:
+            history = self._history.get(file_id)
+            if history is None:
+                history = []
+                self._history[file_id] = history
+                self._evict_old_jobs()
+            else:
+                self._history.move_to_end(file_id)
+
+            self._sequence[file_id] = self._sequence.get(file_id, 0) + 1
+            event = {
+                'id': self._sequence[file_id],
+                'file_id': file_id,
+                'stage': stage,
+                'progress': None if progress is None else round(float(progress), 4),
+                'message': message,
+                'data': data or {},
+                'timestamp': time.time()
+            }
+            history.append(event)
+            if len(history) > self.history_limit:
+                # Keep the first event so replays still show when the job started
+                del history[1:len(history) - self.history_limit + 1]
+            subscribers = list(self._subscribers.get(file_id, []))
+
+        for queue in subscribers:
+            self._deliver(queue, event)
+
+        return event
+
+    def reporter(self, file_id: str) -> Callable:
+        """Return a callback detectors can use to publish progress for one job"""
+        def report(stage: str, progress: Optional[float] = None,
+                   message: Optional[str] = None, **data):
+            try:
+                self.publish(file_id, stage, progress=progress, message=message, data=data)
+            except Exception as e:
+                # Progress reporting must never break an analysis
+                logger.warning(f"Failed to publish progress event for {file_id}: {e}")
+        return report
+
+    def history(self, file_id: str, after_id: int = 0) -> List[Dict]:
+        """Return recorded events for a job newer than after_id"""
+        with self._lock:
+            return [e for e in self._history.get(file_id, []) if e['id'] > after_id]
+
+    def finished(self, file_id: str, after_id: int = 0) -> bool:
+        """Whether the job's history ends in a terminal event at or below after_id"""
+        with self._lock:
+            history = self._history.get(file_id)
+            return bool(history) and history[-1]['stage'] in TERMINAL_STAGES and history[-1]['id'] <= after_id
+
+    def reset(self, file_id: str):
+        """Clear a job's history before it runs again, keeping its event ID sequence"""
+        with self._lock:
+            self._history.pop(file_id, None)
+
+    def discard(self, file_id: str):
+        """Forget a job entirely (subscribers are left to time out)"""
+        with self._lock:
+            self._history.pop(file_id, None)
+            self._sequence.pop(file_id, None)
+
+    async def subscribe(self, file_id: str, after_id: int = 0,
+                        keepalive: float = 15.0) -> AsyncIterator[Optional[Dict]]:
+        """
+        Yield events for a job until a terminal stage is reached.
+
+        Yields None every ``keepalive`` seconds without traffic so callers
+        can emit an SSE comment and keep proxies from closing the stream.
+        Ends at once if the caller has already seen the terminal event.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            history = self._history.get(file_id, [])
+            if history and history[-1]['stage'] in TERMINAL_STAGES and history[-1]['id'] <= after_id:
+                return
+            backlog = [e for e in history if e['id'] > after_id]
+            self._subscribers.setdefault(file_id, []).append(queue)
+
+        try:
+            last_id = after_id
+            for event in backlog:
+                last_id = event['id']
+                yield event
+                if event['stage'] in TERMINAL_STAGES:
+                    return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event['id'] <= last_id:
+                    continue
+                last_id = event['id']
+                yield event
+                if event['stage'] in TERMINAL_STAGES:
+                    return
+        finally:
+            with self._lock:
+                queues = self._subscribers.get(file_id, [])
+                if queue in queues:
+                    queues.remove(queue)
+                if not queues:
+                    self._subscribers.pop(file_id, None)
+
+    def _deliver(self, queue: asyncio.Queue, event: Dict):
+        """Put an event on a subscriber queue from any thread"""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is not None and running_loop is self._loop:
+            queue.put_nowait(event)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def _evict_old_jobs(self):
+        """Drop the oldest finished jobs once more than max_jobs are tracked (lock held)"""
+        while len(self._history) > self.max_jobs:
+            for job_id, events in self._history.items():
+                if job_id not in self._subscribers and (not events or events[-1]['stage'] in TERMINAL_STAGES):
+                    del self._history[job_id]
+                    break
+            else:
+                self._history.popitem(last=False)
+
+
+def format_sse(event: Optional[Dict]) -> str:
+    """Serialize an event (or a keepalive when None) in text/event-stream format"""
+    if event is None:
+        return ": keepalive\n\n"
+    return f"id: {event['id']}\nevent: {event['stage']}\ndata: {json.dumps(event, default=str)}\n\n"
@@ -0,0 +1,107 @@
+"""
+PDF Report Cache
+Keeps generated PDF reports keyed by file, analysis result version and report
+template version. Reports are rendered in memory once (ahead of time, when
+analysis completes) and optionally persisted to disk with an atomic write, so
+repeat downloads are served straight from disk
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from file_utils import write_atomic
+
+logger = logging.getLogger(__name__)
+
+
+def result_version(analysis_result: Dict) -> str:
+    """Content hash of an analysis result; changes whenever the result does"""
+    data = json.dumps(analysis_result, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+class ReportCache:
+    """
+    Rendered reports under ``directory/<file_id>/<etag>.pdf``.
+
+    The ETag is derived from (file_id, result version, template version), so
+    a changed result or template gives a new file and older renders of the
+    same file are removed. Concurrent requests for a report that is still
+    rendering wait for the one render in flight. With ``persist`` off,
+    nothing is written and every render is served from memory.
+    """
+
+    def __init__(self, directory: str, render: Callable[[str, Dict, Dict], bytes], template_version: str,
+                 persist: bool = True):
+        self.directory = Path(directory)
+        self.render = render
+        self.template_version = template_version
+        self.persist = persist
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    def etag(self, file_id: str, analysis_result: Dict) -> str:
+        key = f"{file_id}\x1f{result_version(analysis_result)}\x1f{self.template_version}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+    def path_for(self, file_id: str, etag: str) -> Path:
+        return self.directory / file_id / f"{etag}.pdf"
+
+    def _render_and_store(self, file_id: str, file_info: Dict, analysis_result: Dict, path: Path) -> bytes:
+        data = self.render(file_id, file_info, analysis_result)
+        if self.persist:
+            write_atomic(path, data)
+            # Older renders of this file are stale now
+            for old in path.parent.glob("*.pdf"):
+                if old != path:
+                    try:
+                        old.unlink()
+                    except OSError:
+                        pass
+        return data
+
+    async def get_or_render(self, file_id: str, file_info: Dict,
+                            analysis_result: Dict) -> Tuple[Optional[Path], Optional[bytes]]:
+        """
+        ``(path, None)`` when the report is already on disk, otherwise
+        ``(None, pdf_bytes)`` from a render in a worker thread (persisted on the way)
+        """
+        etag = self.etag(file_id, analysis_result)
+        path = self.path_for(file_id, etag)
+        if self.persist and path.exists():
+            return path, None
+
+        task = self._pending.get(etag)
+        if task is None:
+            task = asyncio.create_task(asyncio.to_thread(self._render_and_store, file_id, file_info,
+                                                         analysis_result, path))
+            self._pending[etag] = task
+            task.add_done_callback(lambda _: self._pending.pop(etag, None))
+        return None, await asyncio.shield(task)
+
+    async def pregenerate(self, file_id: str, file_info: Dict, analysis_result: Dict):
+        """Render and persist a report ahead of its first download; failures are only logged"""
+        if not self.persist:
+            return
+        try:
+            await self.get_or_render(file_id, file_info, analysis_result)
+            logger.info(f"Pre-generated PDF report for {file_id}")
+        except Exception as e:
+            logger.warning(f"Report pre-generation failed for {file_id}: {e}")
+
+    def discard(self, file_id: str):
+        """Remove every cached report for a file"""
+        folder = self.directory / file_id
+        if folder.is_dir():
+            for path in folder.iterdir():
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            try:
+                folder.rmdir()
+            except OSError:
+                pass
@@ -0,0 +1,348 @@
+"""
+Bulk Report Export
+Renders PDF reports for many analyzed files as one tracked background job.
+Files are rendered in a process pool whose workers each keep one report
+generator (and its styles), and results are streamed into a ZIP archive
+together with a summary of verdicts
+"""
+
+import asyncio
+import csv
+import functools
+import io
+import logging
+import os
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pdf_report_generator import PDFReportGenerator
+from process_pool import LazyProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Adds one member (name, data) to the archive being written
+ArchiveWrite = Callable[[str, bytes], Awaitable[None]]
+
+# Parquet summaries need pyarrow, which is optional
+PARQUET_AVAILABLE = False
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    pass
+
+EXPORT_FORMATS = ('zip', 'pdf')
+SUMMARY_FORMATS = ('csv', 'parquet')
+SUMMARY_FIELDS = ['file_id', 'filename', 'file_type', 'prediction', 'confidence', 'analysis_time', 'report', 'error']
+
+# One generator per worker process, reused by every report it renders
+_worker_generator: Optional[PDFReportGenerator] = None
+
+
+def _generator() -> PDFReportGenerator:
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = PDFReportGenerator()
+    return _worker_generator
+
+
+def _sections(file_info: Dict, analysis_result: Dict, use_llm: bool) -> Dict[str, str]:
+    generator = _generator()
+    file_type = file_info.get('file_type', 'file')
+    if use_llm:
+        return generator._generate_llm_sections(analysis_result, file_type)
+    return generator.template_sections(analysis_result, file_type)
+
+
+def render_report_worker(file_id: str, file_info: Dict, analysis_result: Dict, use_llm: bool) -> bytes:
+    """Worker: one file's PDF report as bytes"""
+    return _generator().render_report(file_id, file_info, analysis_result,
+                                      sections=_sections(file_info, analysis_result, use_llm))
+
+
+def render_sections_worker(file_info: Dict, analysis_result: Dict, use_llm: bool) -> Dict[str, str]:
+    """Worker: one file's report section text, for a combined report"""
+    return _sections(file_info, analysis_result, use_llm)
+
+
+def render_combined_worker(reports: List[Dict]) -> bytes:
+    """Worker: several reports in one PDF"""
+    return _generator().render_combined_report(reports)
+
+
+def summary_row(file_id: str, file_info: Dict, analysis_result: Optional[Dict],
+                report: Optional[str], error: Optional[str]) -> Dict:
+    analysis_result = analysis_result or {}
+    return {
+        'file_id': file_id,
+        'filename': file_info.get('filename'),
+        'file_type': file_info.get('file_type'),
+        'prediction': analysis_result.get('prediction'),
+        'confidence': analysis_result.get('confidence'),
+        'analysis_time': analysis_result.get('analysis_time'),
+        'report': report,
+        'error': error
+    }
+
+
+def summary_bytes(rows: List[Dict], summary_format: str) -> bytes:
+    """Verdict summary as CSV or Parquet"""
+    if summary_format == 'parquet':
+        table = pyarrow.table({field: [row[field] for row in rows] for field in SUMMARY_FIELDS})
+        buffer = io.BytesIO()
+        pyarrow.parquet.write_table(table, buffer)
+        return buffer.getvalue()
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=SUMMARY_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return text.getvalue().encode('utf-8')
+
+
+class ExportManager:
+    """In-memory registry of export jobs; archives are written under ``output_dir``"""
+
+    def __init__(self, output_dir: str, load_inputs: Callable[[str], Tuple[Dict, Dict]], max_workers: int = 2,
+                 retention_seconds: float = 3600, max_jobs: int = 100):
+        """
+        Args:
+            output_dir: Directory for finished archives
+            load_inputs: Returns (file_info, analysis_result) for a completed
+                analysis, raising if the file is unknown or not analyzed
+            max_workers: Size of the rendering process pool
+            retention_seconds: How long a finished job and its archive stay downloadable
+            max_jobs: Finished jobs kept at most; the oldest are evicted first
+        """
+        self.output_dir = Path(output_dir)
+        self.load_inputs = load_inputs
+        self.max_workers = max(1, int(max_workers))
+        self.retention_seconds = retention_seconds
+        self.max_jobs = max_jobs
+        self.jobs: Dict[str, Dict] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # job_id -> monotonic finish time, oldest first
+        self._finished: Dict[str, float] = {}
+        self._pool = LazyProcessPool(self.max_workers)
+
+    def shutdown(self):
+        self._pool.shutdown()
+
+    def create_job(self, file_ids: List[str], export_format: str = 'zip', use_llm: bool = False,
+                   summary_format: str = 'csv') -> Dict:
+        """Register an export job and start it in the background"""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        if summary_format not in SUMMARY_FORMATS:
+            raise ValueError(f"Unsupported summary format: {summary_format}")
+        if summary_format == 'parquet' and not PARQUET_AVAILABLE:
+            raise ValueError("Parquet summaries need pyarrow, which is not installed")
+
+        self.evict()
+        job_id = str(uuid.uuid4())
+        self.jobs[job_id] = {
+            'job_id': job_id,
+            'format': export_format,
+            'summary_format': summary_format,
+            'use_llm': use_llm,
+            'file_ids': list(dict.fromkeys(file_ids)),
+            'status': 'queued',
+            'rendered': 0,
+            'failed': 0,
+            'errors': {},
+            'created_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'output_path': None,
+            'error': None
+        }
+        self._tasks[job_id] = asyncio.create_task(self._run(job_id))
+        logger.info(f"Export job {job_id} created for {len(self.jobs[job_id]['file_ids'])} files")
+        return self.get_status(job_id)
+
+    def get_status(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        total = len(job['file_ids'])
+        done = job['rendered'] + job['failed']
+        return {
+            'job_id': job_id,
+            'status': job['status'],
+            'format': job['format'],
+            'summary_format': job['summary_format'],
+            'total': total,
+            'rendered': job['rendered'],
+            'failed': job['failed'],
+            'progress': done / total if total else 1.0,
+            'errors': job['errors'],
+            'created_at': job['created_at'],
+            'finished_at': job['finished_at'],
+            'error': job['error']
+        }
+
+    def evict(self, now: Optional[float] = None):
+        """
+        Forget finished jobs past their retention, then the oldest beyond
+        max_jobs, deleting their archives. Archives no job owns, such as
+        those left by an earlier process, are deleted once as old.
+        """
+        now = time.monotonic() if now is None else now
+        expired = [job_id for job_id, finished in self._finished.items()
+                   if now - finished >= self.retention_seconds]
+        overflow = len(self._finished) - len(expired) - self.max_jobs
+        if overflow > 0:
+            expired += [job_id for job_id in self._finished if job_id not in expired][:overflow]
+        for job_id in expired:
+            self._finished.pop(job_id, None)
+            job = self.jobs.pop(job_id, None)
+            if job and job['output_path']:
+                Path(job['output_path']).unlink(missing_ok=True)
+
+        orphaned = 0
+        if self.output_dir.is_dir():
+            cutoff = time.time() - self.retention_seconds
+            for path in self.output_dir.glob('*.zip*'):
+                job_id = path.name.split('.', 1)[0]
+                try:
+                    if job_id not in self.jobs and path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        orphaned += 1
+                except FileNotFoundError:
+                    pass
+        if expired or orphaned:
+            logger.info(f"Evicted {len(expired)} finished export jobs and {orphaned} orphaned archives")
+
+    def output_path(self, job_id: str) -> Optional[Path]:
+        job = self.jobs.get(job_id)
+        if job is None or job['status'] != 'completed':
+            return None
+        return Path(job['output_path'])
+
+    def _record_failure(self, job: Dict, file_id: str, error: str):
+        job['failed'] += 1
+        job['errors'][file_id] = error
+        logger.warning(f"Export job {job['job_id']}: {file_id} failed: {error}")
+
+    async def _run(self, job_id: str):
+        job = self.jobs[job_id]
+        job['status'] = 'processing'
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        final_path = self.output_dir / f"{job_id}.zip"
+        tmp_path = final_path.with_suffix('.zip.tmp')
+        loop = asyncio.get_running_loop()
+        # One thread owns the archive, so compression never runs on the event loop
+        zip_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export-zip")
+        try:
+            archive = await loop.run_in_executor(
+                zip_thread, functools.partial(zipfile.ZipFile, tmp_path, 'w', compression=zipfile.ZIP_DEFLATED)
+            )
+            try:
+                async def write(name: str, data: bytes):
+                    await loop.run_in_executor(zip_thread, archive.writestr, name, data)
+
+                if job['format'] == 'zip':
+                    rows = await self._export_files(job, write)
+                else:
+                    rows = await self._export_combined(job, write)
+                await write(f"summary.{job['summary_format']}", summary_bytes(rows, job['summary_format']))
+            finally:
+                await loop.run_in_executor(zip_thread, archive.close)
+            os.replace(tmp_path, final_path)
+            job['output_path'] = str(final_path)
+            job['status'] = 'completed'
+        except Exception as e:
+            logger.error(f"Export job {job_id} failed: {e}")
+            job['status'] = 'error'
+            job['error'] = str(e)
+            if tmp_path.exists():
+                tmp_path.unlink()
+        finally:
+            zip_thread.shutdown(wait=False)
+            job['finished_at'] = datetime.now().isoformat()
+            self._finished[job_id] = time.monotonic()
+            self._tasks.pop(job_id, None)
+
+    def _inputs(self, job: Dict) -> List[Tuple[str, Dict, Optional[Dict]]]:
+        """(file_id, file_info, analysis_result) per file; unknown files are recorded as failed"""
+        inputs = []
+        for file_id in job['file_ids']:
+            try:
+                file_info, analysis_result = self.load_inputs(file_id)
+            except Exception as e:
+                self._record_failure(job, file_id, getattr(e, 'detail', None) or str(e))
+                inputs.append((file_id, {}, None))
+                continue
+            inputs.append((file_id, file_info, analysis_result))
+        return inputs
+
+    async def _export_files(self, job: Dict, write: ArchiveWrite) -> List[Dict]:
+        """One PDF per file, written into the archive as each render finishes"""
+        loop = asyncio.get_running_loop()
+        pool = self._pool.get()
+        rows = {}
+
+        async def render(file_id, file_info, analysis_result):
+            try:
+                pdf_bytes = await loop.run_in_executor(pool, render_report_worker, file_id, file_info,
+                                                       analysis_result, job['use_llm'])
+                return file_id, file_info, analysis_result, pdf_bytes, None
+            except Exception as e:
+                return file_id, file_info, analysis_result, None, str(e)
+
+        renders = []
+        for file_id, file_info, analysis_result in self._inputs(job):
+            if analysis_result is None:
+                rows[file_id] = summary_row(file_id, file_info, None, None, job['errors'][file_id])
+            else:
+                renders.append(render(file_id, file_info, analysis_result))
+
+        for finished in asyncio.as_completed(renders):
+            file_id, file_info, analysis_result, pdf_bytes, error = await finished
+            report_name = None
+            if pdf_bytes is not None:
+                report_name = f"reports/{file_id}_report.pdf"
+                await write(report_name, pdf_bytes)
+                job['rendered'] += 1
+            else:
+                self._record_failure(job, file_id, error)
+            rows[file_id] = summary_row(file_id, file_info, analysis_result, report_name, error)
+
+        return [rows[file_id] for file_id in job['file_ids']]
+
+    async def _export_combined(self, job: Dict, write: ArchiveWrite) -> List[Dict]:
+        """Section text for every file in parallel, then one combined PDF"""
+        loop = asyncio.get_running_loop()
+        pool = self._pool.get()
+        inputs = self._inputs(job)
+        report_name = "reports.pdf"
+
+        async def sections_for(file_id, file_info, analysis_result):
+            try:
+                sections = await loop.run_in_executor(pool, render_sections_worker, file_info,
+                                                      analysis_result, job['use_llm'])
+            except Exception as e:
+                self._record_failure(job, file_id, str(e))
+                return None
+            job['rendered'] += 1
+            return {'file_id': file_id, 'file_info': file_info,
+                    'analysis_result': analysis_result, 'sections': sections}
+
+        reports = await asyncio.gather(*(
+            sections_for(file_id, file_info, analysis_result)
+            for file_id, file_info, analysis_result in inputs if analysis_result is not None
+        ))
+        reports = [report for report in reports if report is not None]
+        if reports:
+            await write(report_name, await loop.run_in_executor(pool, render_combined_worker, reports))
+
+        included = {report['file_id'] for report in reports}
+        return [
+            summary_row(file_id, file_info, analysis_result,
+                        report_name if file_id in included else None, job['errors'].get(file_id))
+            for file_id, file_info, analysis_result in inputs
+        ]
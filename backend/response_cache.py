@@ -0,0 +1,216 @@
+"""
+Model Response Cache
+Request-level cache for OpenAI calls keyed on model, prompt template version
+and a hash of the input bytes, with a size-bounded on-disk store, an optional
+in-memory LRU in front of it, TTL expiry and single-flight de-duplication
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(*parts: Any) -> str:
+    """Stable cache key from ordered parts"""
+    return hash_bytes('\x1f'.join(str(part) for part in parts).encode('utf-8'))
+
+
+class ResponseCache:
+    """
+    Two-level cache of JSON-serializable model responses.
+
+    Entries are files named by key under ``directory``; when their total size
+    passes ``max_bytes`` the least recently used are deleted. The in-memory
+    level holds the ``memory_items`` most recent entries (0 disables it).
+    Concurrent misses on one key wait for the first caller instead of
+    repeating the request.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024,
+                 ttl_seconds: float = 7 * 24 * 3600, memory_items: int = 256):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.memory_items = memory_items
+        self._lock = threading.Lock()
+        self._memory: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        # key -> (size, last access); built from the directory on first use
+        self._index: Optional[Dict[str, Tuple[int, float]]] = None
+        self._total_bytes = 0
+        self._inflight: Dict[str, threading.Event] = {}
+        self._counts = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        self._total_bytes = 0
+        if self.directory.exists():
+            for path in self.directory.glob("*/*.json"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                self._index[path.stem] = (stat.st_size, stat.st_mtime)
+                self._total_bytes += stat.st_size
+
+    def _remember(self, key: str, created: float, value: Any):
+        if self.memory_items <= 0:
+            return
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _drop(self, key: str):
+        self._memory.pop(key, None)
+        entry = self._index.pop(key, None) if self._index is not None else None
+        if entry:
+            self._total_bytes -= entry[0]
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value, or None if absent or expired"""
+        now = time.time()
+        with self._lock:
+            if key in self._memory:
+                created, value = self._memory[key]
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counts['memory_hits'] += 1
+                    return value
+                self._drop(key)
+
+            self._load_index()
+            if key in self._index:
+                path = self._path(key)
+                try:
+                    with open(path) as f:
+                        entry = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+                    self._drop(key)
+                else:
+                    if now - entry['created'] <= self.ttl_seconds:
+                        os.utime(path, (now, now))
+                        self._index[key] = (self._index[key][0], now)
+                        self._remember(key, entry['created'], entry['value'])
+                        self._counts['disk_hits'] += 1
+                        return entry['value']
+                    self._drop(key)
+
+            self._counts['misses'] += 1
+            return None
+
+    def put(self, key: str, value: Any):
+        """Store a value, evicting least recently used entries past the size bound"""
+        now = time.time()
+        data = json.dumps({'created': now, 'value': value}).encode('utf-8')
+        path = self._path(key)
+        with self._lock:
+            self._load_index()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            previous = self._index.get(key)
+            if previous:
+                self._total_bytes -= previous[0]
+            self._index[key] = (len(data), now)
+            self._total_bytes += len(data)
+            self._remember(key, now, value)
+
+            if self._total_bytes > self.max_bytes:
+                for old_key, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+                    if self._total_bytes <= self.max_bytes or old_key == key:
+                        break
+                    self._drop(old_key)
+                    self._counts['evictions'] += 1
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       cacheable: Callable[[Any], bool] = lambda value: True) -> Tuple[Any, bool]:
+        """
+        ``(value, hit)`` for a key, calling ``compute`` on a miss.
+
+        Results rejected by ``cacheable`` are returned but not stored.
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value, True
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            if owner:
+                break
+            event.wait()
+            # The owner may have produced an uncacheable result; then compute here
+            value = self.get(key)
+            if value is not None:
+                return value, True
+            return compute(), False
+
+        try:
+            value = compute()
+            if cacheable(value):
+                self.put(key, value)
+            return value, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._load_index()
+            return {
+                **self._counts,
+                'entries': len(self._index),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'memory_entries': len(self._memory)
+            }
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide cache configured from the environment, or None when LLM_CACHE=0"""
+    global _response_cache
+    if os.getenv("LLM_CACHE", "1").lower() in ("0", "false", "no"):
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                os.getenv("LLM_CACHE_DIR", os.path.join("uploads", "llm_cache")),
+                max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024),
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600,
+                memory_items=int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "256"))
+            )
+        return _response_cache
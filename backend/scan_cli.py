@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Headless Deepfake Scanner
+Walks a directory tree and analyzes every supported file with the OpenAI
+detectors in a process pool, without running the web server.
+
+Progress is checkpointed to an append-only manifest so an interrupted scan
+(or a nightly cron run over the same archive) only processes new or changed
+files.
+
+Usage:
+    python scan_cli.py /data/archive --output results.jsonl
+    python scan_cli.py /data/archive --format parquet --output results_parquet/ --workers 8
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from media_types import get_file_type
+
+logger = logging.getLogger("scan_cli")
+
+# Detectors are created once per worker process
+_worker_detectors: Dict[str, object] = {}
+
+
+def _get_worker_detector(file_type: str):
+    """Lazily create the detector for a file type inside a worker process"""
+    if file_type not in _worker_detectors:
+        if file_type == 'image':
+            from openai_image_detector import OpenAIImageDeepfakeDetector
+            _worker_detectors[file_type] = OpenAIImageDeepfakeDetector()
+        elif file_type == 'video':
+            from openai_video_detector import OpenAIVideoDeepfakeDetector
+            _worker_detectors[file_type] = OpenAIVideoDeepfakeDetector()
+        elif file_type == 'audio':
+            from openai_audio_detector import OpenAIAudioDeepfakeDetector
+            # Scan workers are already separate processes; extract features in-process
+            _worker_detectors[file_type] = OpenAIAudioDeepfakeDetector(feature_workers=0)
+    return _worker_detectors[file_type]
+
+
+def _to_builtin(obj):
+    """Convert numpy values in detector output to JSON-serializable types"""
+    if isinstance(obj, dict):
+        return {k: _to_builtin(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_builtin(v) for v in obj]
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    return obj
+
+
+def _new_record(path: str, file_type: str) -> Dict:
+    """Result record with every column present so Parquet parts share one schema"""
+    return {
+        'path': path,
+        'file_type': file_type,
+        'status': 'completed',
+        'prediction': None,
+        'confidence': None,
+        'error': None,
+        'analyzed_at': datetime.now().isoformat(),
+        'duration_seconds': None
+    }
+
+
+def scan_file(path: str, file_type: str, include_details: bool = False) -> Dict:
+    """Analyze a single file (runs in a worker process)"""
+    started = time.monotonic()
+    record = _new_record(path, file_type)
+    if include_details:
+        record['details'] = None
+    try:
+        detector = _get_worker_detector(file_type)
+        if file_type == 'video':
+            results = detector.detect_video_deepfake(path)
+            details = results
+            prediction = results.get('prediction', 'UNKNOWN')
+            confidence = results.get('confidence', 0.0)
+            if results.get('error'):
+                record['error'] = str(results['error'])
+        else:
+            confidence, prediction, details = detector.detect_deepfake(path)
+            if details.get('error'):
+                record['error'] = str(details['error'])
+
+        record['prediction'] = str(prediction)
+        record['confidence'] = float(confidence)
+        if record['error']:
+            record['status'] = 'error'
+        if include_details:
+            record['details'] = json.dumps(_to_builtin(details), default=str)
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = str(e)
+
+    record['duration_seconds'] = round(time.monotonic() - started, 3)
+    return record
+
+
+def walk_media_files(root: Path, follow_symlinks: bool = False) -> Iterator[Tuple[str, str, os.stat_result]]:
+    """Yield (path, file_type, stat) for supported files without building the full list"""
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=follow_symlinks):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=follow_symlinks):
+                            file_type = get_file_type(entry.name)
+                            if file_type != 'unknown':
+                                yield entry.path, file_type, entry.stat(follow_symlinks=follow_symlinks)
+                    except OSError as e:
+                        logger.warning(f"Skipping {entry.path}: {e}")
+        except OSError as e:
+            logger.warning(f"Cannot read directory {directory}: {e}")
+
+
+def manifest_key(path: str, stat: os.stat_result) -> str:
+    """Identity of a file version: a changed size or mtime means it is scanned again"""
+    return f"{path}\t{stat.st_size}\t{int(stat.st_mtime)}"
+
+
+class ScanManifest:
+    """
+    Append-only JSONL checkpoint of files that have already been scanned.
+
+    ``record`` only buffers; ``flush`` fsyncs, and the scanner calls it once
+    per committed batch of results so a crash loses at most that batch (one
+    file for JSONL output). Files lost that way are scanned, and billed,
+    again on the next run.
+    """
+
+    def __init__(self, path: Path, retry_errors: bool = False):
+        self.path = path
+        self.done: Set[str] = set()
+
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from an interrupted run
+                        continue
+                    if retry_errors and entry.get('status') == 'error':
+                        self.done.discard(entry['key'])
+                    else:
+                        self.done.add(entry['key'])
+            logger.info(f"Resuming: {len(self.done)} files already recorded in {path}")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.done
+
+    def record(self, key: str, status: str):
+        """Checkpoint a finished file (durable after the next flush)"""
+        self._file.write(json.dumps({'key': key, 'status': status}) + "\n")
+        self.done.add(key)
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class JsonlResultWriter:
+    """Appends one JSON record per scanned file"""
+
+    # Records written between flushes (and manifest checkpoints)
+    batch_size = 1
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record: Dict):
+        self._file.write(json.dumps(record, default=str) + "\n")
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """
+    Buffers records and writes them as Parquet part files in a directory.
+
+    Parquet files cannot be appended to, so each flush (and each resumed
+    run) produces a new part; readers load the directory as one dataset.
+    """
+
+    def __init__(self, directory: Path, rows_per_file: int = 5000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self._pa = pa
+        self._pq = pq
+        self.directory = directory
+        self.batch_size = rows_per_file
+        self._rows: List[Dict] = []
+        self._run_id = datetime.now().strftime('%Y%m%d%H%M%S')
+        self._part = 0
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def write(self, record: Dict):
+        self._rows.append(record)
+
+    def flush(self):
+        if not self._rows:
+            return
+        table = self._pa.Table.from_pylist(self._rows)
+        part_path = self.directory / f"results-{self._run_id}-{self._part:05d}.parquet"
+        self._pq.write_table(table, part_path)
+        self._part += 1
+        self._rows = []
+
+    def close(self):
+        self.flush()
+
+
+def run_scan(root: Path, writer, manifest: ScanManifest, workers: int,
+             include_details: bool = False, limit: Optional[int] = None) -> Dict[str, int]:
+    """Scan every new file under root, keeping a bounded number of files in flight"""
+    stats = {'submitted': 0, 'completed': 0, 'errors': 0, 'skipped': 0}
+    max_in_flight = workers * 4
+    in_flight = {}
+    started = time.monotonic()
+
+    # Files whose results are buffered in the writer but not yet on disk
+    uncommitted: List[Tuple[str, str]] = []
+
+    def commit():
+        # Results reach disk before the checkpoint so a crash never records
+        # a file as done without its result
+        writer.flush()
+        for key, status in uncommitted:
+            manifest.record(key, status)
+        manifest.flush()
+        uncommitted.clear()
+
+    def collect(done_futures):
+        for future in done_futures:
+            key, path, file_type = in_flight.pop(future)
+            try:
+                record = future.result()
+            except Exception as e:
+                # Worker process crashed; recorded so --retry-errors picks the file up again
+                record = _new_record(path, file_type)
+                record.update({'status': 'error', 'error': str(e)})
+                if include_details:
+                    record['details'] = None
+            writer.write(record)
+            uncommitted.append((key, record['status']))
+            if len(uncommitted) >= writer.batch_size:
+                commit()
+            if record['status'] == 'error':
+                stats['errors'] += 1
+            else:
+                stats['completed'] += 1
+            finished = stats['completed'] + stats['errors']
+            if finished % 100 == 0:
+                rate = finished / max(time.monotonic() - started, 1e-6)
+                logger.info(f"{finished} files scanned ({rate:.2f} files/s, {stats['errors']} errors)")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            for path, file_type, stat in walk_media_files(root):
+                key = manifest_key(path, stat)
+                if key in manifest:
+                    stats['skipped'] += 1
+                    continue
+                if limit is not None and stats['submitted'] >= limit:
+                    break
+
+                while len(in_flight) >= max_in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+                future = pool.submit(scan_file, path, file_type, include_details)
+                in_flight[future] = (key, path, file_type)
+                stats['submitted'] += 1
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            commit()
+        except KeyboardInterrupt:
+            # Checkpoint what already finished; interrupted files stay unrecorded
+            # so the next run picks them up
+            logger.warning("Interrupted: checkpointing finished files")
+            collect([f for f in list(in_flight)
+                     if f.done() and not f.cancelled() and f.exception() is None])
+            commit()
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Scan a directory tree for deepfakes without the web server")
+    parser.add_argument("root", help="Directory to scan recursively")
+    parser.add_argument("--output", "-o", default="scan_results.jsonl",
+                        help="JSONL file, or directory of part files for --format parquet")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="Result format")
+    parser.add_argument("--manifest", "-m", default=None,
+                        help="Checkpoint manifest (default: <output>.manifest.jsonl)")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 4, help="Worker processes")
+    parser.add_argument("--retry-errors", action="store_true", help="Re-scan files that failed in earlier runs")
+    parser.add_argument("--include-details", action="store_true", help="Store full detector details as JSON")
+    parser.add_argument("--limit", type=int, default=None, help="Scan at most this many new files")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Debug logging")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    root = Path(args.root)
+    if not root.is_dir():
+        logger.error(f"Not a directory: {root}")
+        return 2
+    if not os.getenv("OPENAI_API_KEY"):
+        logger.error("OPENAI_API_KEY environment variable is required")
+        return 2
+
+    output = Path(args.output)
+    manifest_path = Path(args.manifest) if args.manifest else output.with_name(output.name + ".manifest.jsonl")
+
+    writer = ParquetResultWriter(output) if args.format == "parquet" else JsonlResultWriter(output)
+    manifest = ScanManifest(manifest_path, retry_errors=args.retry_errors)
+
+    try:
+        stats = run_scan(root, writer, manifest, max(1, args.workers),
+                         include_details=args.include_details, limit=args.limit)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        writer.close()
+        manifest.close()
+
+    logger.info(
+        f"Scan finished: {stats['completed']} completed, {stats['errors']} errors, "
+        f"{stats['skipped']} already scanned"
+    )
+    return 1 if stats['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
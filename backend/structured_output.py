@@ -0,0 +1,438 @@
+"""
+Structured Model Output
+Typed response models for every GPT call, strict JSON-schema requests, one
+tolerant parser with precompiled patterns, and per-model parse-failure
+counters
+"""
+
+import json
+import logging
+import math
+import re
+import threading
+from typing import Any, ClassVar, Dict, List, NamedTuple, Optional, Pattern, Sequence, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+from response_cache import ResponseCache, make_key
+
+logger = logging.getLogger(__name__)
+
+# Parse outcomes, best to worst
+OUTCOMES = ('structured', 'recovered', 'fallback', 'failed')
+
+_CODE_BLOCK = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+# Key-value patterns also accept quoted keys, as in truncated JSON
+_VALUE = r'["\']?[:\s]+([0-9]+(?:\.[0-9]+)?)'
+_CONFIDENCE = re.compile(r'confidence' + _VALUE, re.IGNORECASE)
+_DECODER = json.JSONDecoder()
+
+
+def unit_score(value: Any) -> float:
+    """Number in [0, 1]; percentages (values above 1) are scaled down"""
+    score = float(value)
+    if not math.isfinite(score):
+        raise ValueError(f"score is not finite: {value!r}")
+    if score > 1.0:
+        score = score / 100.0
+    return max(0.0, min(1.0, score))
+
+
+def normalize_prediction(value: Any) -> str:
+    """REAL, FAKE or UNKNOWN from the free-form labels models return"""
+    label = str(value or '').upper().strip()
+    if label in ('REAL', 'FAKE'):
+        return label
+    if any(word in label for word in ('FAKE', 'SYNTHETIC', 'AI-GENERATED')):
+        return 'FAKE'
+    if any(word in label for word in ('REAL', 'AUTHENTIC', 'GENUINE')):
+        return 'REAL'
+    return 'UNKNOWN'
+
+
+def _text_patterns(keywords: Dict[str, str]) -> Dict[str, Pattern]:
+    return {field: re.compile(keyword + _VALUE, re.IGNORECASE) for field, keyword in keywords.items()}
+
+
+class StructuredResponse(BaseModel):
+    """Base for model responses: lenient on input, strict in the requested schema"""
+
+    model_config = ConfigDict(extra='ignore')
+
+    # Free-text fallback: score fields recovered with these patterns
+    text_patterns: ClassVar[Dict[str, Pattern]] = {}
+    # Fields that receive the raw response text in the fallback
+    text_fields: ClassVar[Tuple[str, ...]] = ()
+    # Fields a JSON reply must set to count as a real answer rather than defaults
+    required_fields: ClassVar[Tuple[str, ...]] = ()
+
+    @classmethod
+    def from_text(cls, text: str) -> Tuple['StructuredResponse', bool]:
+        """Best-effort instance from prose; the flag says whether anything was recognized"""
+        data: Dict[str, Any] = {field: text for field in cls.text_fields}
+        for field, pattern in cls.text_patterns.items():
+            match = pattern.search(text)
+            if match:
+                try:
+                    data[field] = unit_score(match.group(1))
+                except ValueError:
+                    pass
+        return cls.model_validate(data), len(data) > len(cls.text_fields)
+
+
+class DetectionResponse(StructuredResponse):
+    """Verdict fields shared by the image, video and audio analyses"""
+
+    prediction: str = Field('UNKNOWN', json_schema_extra={'enum': ['REAL', 'FAKE']})
+    confidence: float = 0.5
+    reasoning: str = ''
+
+    text_fields: ClassVar[Tuple[str, ...]] = ('reasoning',)
+    required_fields: ClassVar[Tuple[str, ...]] = ('prediction', 'confidence')
+    # Free-text verdict keywords; any FAKE keyword wins
+    fake_keywords: ClassVar[Tuple[str, ...]] = ('FAKE', 'DEEPFAKE', 'SYNTHETIC', 'AI-GENERATED')
+    real_keywords: ClassVar[Tuple[str, ...]] = ('REAL', 'AUTHENTIC', 'GENUINE')
+
+    @field_validator('prediction', mode='before')
+    @classmethod
+    def check_prediction(cls, value: Any) -> str:
+        return normalize_prediction(value)
+
+    @field_validator('confidence', mode='before')
+    @classmethod
+    def check_confidence(cls, value: Any) -> float:
+        return unit_score(value)
+
+    @classmethod
+    def from_text(cls, text: str) -> Tuple['StructuredResponse', bool]:
+        instance, recognized = super().from_text(text)
+        updates = {}
+        # Same keyword order the detectors always used: any FAKE mention wins
+        upper = text.upper()
+        if any(word in upper for word in cls.fake_keywords):
+            updates['prediction'] = 'FAKE'
+        elif any(word in upper for word in cls.real_keywords):
+            updates['prediction'] = 'REAL'
+        match = _CONFIDENCE.search(text)
+        if match:
+            try:
+                updates['confidence'] = unit_score(match.group(1))
+            except ValueError:
+                pass
+        return instance.model_copy(update=updates), recognized or bool(updates)
+
+
+def _string_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value] if value else []
+    return [str(item) for item in value]
+
+
+class VisualScores(DetectionResponse):
+    """Face-region quality scores returned for images and video frames"""
+
+    border_quality: float = 0.7
+    edge_uniformity: float = 0.7
+    lighting_consistency: float = 0.7
+    skin_texture_score: float = 0.7
+    facial_symmetry_score: float = 0.7
+
+    text_patterns: ClassVar[Dict[str, Pattern]] = _text_patterns({
+        'border_quality': r'border[_\s]?quality',
+        'edge_uniformity': r'edge[_\s]?uniformity',
+        'lighting_consistency': r'lighting[_\s]?consistency',
+        'skin_texture_score': r'skin[_\s]?texture',
+        'facial_symmetry_score': r'facial[_\s]?symmetry',
+    })
+
+    @field_validator('border_quality', 'edge_uniformity', 'lighting_consistency',
+                     'skin_texture_score', 'facial_symmetry_score', mode='before')
+    @classmethod
+    def check_scores(cls, value: Any) -> float:
+        return unit_score(value)
+
+
+class ImageAnalysis(VisualScores):
+    """GPT-4 Vision verdict for a still image"""
+
+    artifacts_detected: List[str] = []
+    confidence_factors: List[str] = []
+
+    @field_validator('artifacts_detected', 'confidence_factors', mode='before')
+    @classmethod
+    def check_lists(cls, value: Any) -> List[str]:
+        return _string_list(value)
+
+
+class FrameAnalysis(VisualScores):
+    """GPT-4 Vision verdict for one video frame"""
+
+    artifacts: List[str] = []
+
+    real_keywords: ClassVar[Tuple[str, ...]] = ('REAL', 'AUTHENTIC')
+
+    @field_validator('artifacts', mode='before')
+    @classmethod
+    def check_lists(cls, value: Any) -> List[str]:
+        return _string_list(value)
+
+
+class TileAnalysis(FrameAnalysis):
+    """Verdict for one numbered face crop in a tiled image"""
+
+    tile: int
+
+
+class TileAnalyses(StructuredResponse):
+    """Verdicts for every tile of a tiled face-crop image"""
+
+    tiles: List[TileAnalysis] = []
+
+
+class AudioAnalysis(DetectionResponse):
+    """GPT-4 verdict on a transcript and its acoustic features"""
+
+    naturalness_score: float = 0.5
+    prosody_consistency: float = 0.5
+    voice_quality: float = 0.5
+    linguistic_coherence: float = 0.5
+    pause_patterns: float = 0.5
+    audio_quality_score: float = 0.5
+    indicators: List[str] = []
+    detailed_analysis: str = ''
+
+    text_fields: ClassVar[Tuple[str, ...]] = ('reasoning', 'detailed_analysis')
+    # Prose about natural-sounding speech has always counted as a REAL verdict for audio
+    real_keywords: ClassVar[Tuple[str, ...]] = ('REAL', 'AUTHENTIC', 'NATURAL')
+    text_patterns: ClassVar[Dict[str, Pattern]] = _text_patterns({
+        'naturalness_score': 'naturalness',
+        'prosody_consistency': 'prosody',
+        'voice_quality': r'voice[_\s]?quality',
+        'linguistic_coherence': 'coherence',
+        'pause_patterns': 'pause',
+        'audio_quality_score': r'audio[_\s]?quality',
+    })
+
+    @field_validator('naturalness_score', 'prosody_consistency', 'voice_quality',
+                     'linguistic_coherence', 'pause_patterns', 'audio_quality_score', mode='before')
+    @classmethod
+    def check_scores(cls, value: Any) -> float:
+        return unit_score(value)
+
+    @field_validator('indicators', mode='before')
+    @classmethod
+    def check_lists(cls, value: Any) -> List[str]:
+        return _string_list(value)
+
+
+class SegmentVerdict(StructuredResponse):
+    """Verdict for one transcript segment"""
+
+    index: int
+    prediction: str = Field('UNKNOWN', json_schema_extra={'enum': ['REAL', 'FAKE']})
+    suspicion: float
+    reason: str = ''
+
+    @field_validator('prediction', mode='before')
+    @classmethod
+    def check_prediction(cls, value: Any) -> str:
+        return normalize_prediction(value)
+
+    @field_validator('suspicion', mode='before')
+    @classmethod
+    def check_suspicion(cls, value: Any) -> float:
+        return unit_score(value)
+
+
+class SegmentVerdicts(StructuredResponse):
+    """Verdicts for a group of transcript segments"""
+
+    segments: List[SegmentVerdict] = []
+
+
+def _make_strict(node: Any) -> Any:
+    """Strip keywords strict mode rejects and require every property"""
+    if isinstance(node, dict):
+        node = {key: _make_strict(value) for key, value in node.items() if key not in ('title', 'default')}
+        if node.get('type') == 'object' and 'properties' in node:
+            node['required'] = list(node['properties'])
+            node['additionalProperties'] = False
+        return node
+    if isinstance(node, list):
+        return [_make_strict(item) for item in node]
+    return node
+
+
+_strict_schemas: Dict[Type[BaseModel], Dict] = {}
+
+
+def strict_schema(response_model: Type[BaseModel]) -> Dict:
+    """``response_format`` payload requesting strict JSON-schema output for a model"""
+    if response_model not in _strict_schemas:
+        _strict_schemas[response_model] = {
+            'type': 'json_schema',
+            'json_schema': {
+                'name': response_model.__name__,
+                'strict': True,
+                'schema': _make_strict(response_model.model_json_schema())
+            }
+        }
+    return _strict_schemas[response_model]
+
+
+class ParseStats:
+    """Thread-safe parse outcome counters per (LLM model, response model)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+    def record(self, model: str, schema: str, outcome: str):
+        with self._lock:
+            counts = self._counts.setdefault((model, schema), dict.fromkeys(OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict]]:
+        """Counts and failure rate (fallback + failed share) keyed by model, then schema"""
+        with self._lock:
+            snapshot: Dict[str, Dict[str, Dict]] = {}
+            for (model, schema), counts in self._counts.items():
+                total = sum(counts.values())
+                snapshot.setdefault(model, {})[schema] = {
+                    **counts,
+                    'total': total,
+                    'failure_rate': round((counts['fallback'] + counts['failed']) / total, 4) if total else 0.0
+                }
+            return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+parse_stats = ParseStats()
+
+T = TypeVar('T', bound=StructuredResponse)
+
+
+class StructuredResult(NamedTuple):
+    value: StructuredResponse
+    outcome: str
+    raw_text: str
+    cached: bool = False
+
+
+def _json_candidates(text: str):
+    """JSON objects embedded in a response: fenced blocks first, then any top-level object"""
+    for match in _CODE_BLOCK.finditer(text):
+        yield match.group(1)
+    start = text.find('{')
+    while start != -1:
+        try:
+            obj, end = _DECODER.raw_decode(text, start)
+            if isinstance(obj, dict):
+                yield obj
+            start = text.find('{', end)
+        except json.JSONDecodeError:
+            start = text.find('{', start + 1)
+
+
+def parse_response(text: Optional[str], response_model: Type[T], model: str = 'unknown',
+                   record: bool = True) -> StructuredResult:
+    """
+    Validate a model response into ``response_model``.
+
+    Tries the whole body as JSON, then embedded JSON, then the model's
+    free-text patterns. JSON missing any of the model's ``required_fields``
+    is kept but only counts as a fallback. Never raises; unless ``record``
+    is off the outcome is counted in :data:`parse_stats`.
+    """
+    text = text or ''
+    schema = response_model.__name__
+    outcome, value, incomplete = None, None, None
+    required = set(response_model.required_fields)
+
+    try:
+        value = response_model.model_validate_json(text)
+        outcome = 'structured'
+    except ValidationError:
+        pass
+    if value is not None and not required <= value.model_fields_set:
+        incomplete, value = value, None
+    if value is None:
+        for candidate in _json_candidates(text):
+            try:
+                data = json.loads(candidate) if isinstance(candidate, str) else candidate
+                candidate_value = response_model.model_validate(data)
+            except (ValidationError, json.JSONDecodeError, ValueError):
+                continue
+            if required <= candidate_value.model_fields_set:
+                value, outcome = candidate_value, 'recovered'
+                break
+            incomplete = incomplete or candidate_value
+
+    if value is None and incomplete is not None:
+        # Valid JSON without a verdict must not pass for one built from defaults
+        value, outcome = incomplete, 'fallback' if incomplete.model_fields_set else 'failed'
+        logger.warning(f"{model} {schema} response is missing {sorted(required - incomplete.model_fields_set)}: "
+                       f"{text[:200]!r}")
+    elif value is None:
+        value, recognized = response_model.from_text(text)
+        outcome = 'fallback' if recognized else 'failed'
+        logger.warning(f"{model} {schema} response was not valid JSON ({outcome}): {text[:200]!r}")
+
+    if record:
+        parse_stats.record(model, schema, outcome)
+    return StructuredResult(value, outcome, text)
+
+
+def request_structured(client, model: str, messages: List[Dict], response_model: Type[T],
+                       max_tokens: int = 2000, temperature: float = 0.2,
+                       cache: Optional[ResponseCache] = None,
+                       cache_key: Optional[Sequence[Any]] = None) -> StructuredResult:
+    """
+    Chat completion constrained to ``response_model``'s strict JSON schema.
+
+    Falls back to an unconstrained request if the schema request is
+    rejected; either way the reply goes through :func:`parse_response`.
+    With a ``cache``, replies that parsed as JSON are stored under
+    ``cache_key`` (prompt template version plus a hash of the varying input)
+    together with the model and request parameters.
+    """
+    if cache is None or cache_key is None:
+        return _request_uncached(client, model, messages, response_model, max_tokens, temperature)
+
+    key = make_key(model, response_model.__name__, max_tokens, temperature, *cache_key)
+
+    def compute() -> Dict:
+        result = _request_uncached(client, model, messages, response_model, max_tokens, temperature)
+        return {'raw_text': result.raw_text, 'outcome': result.outcome}
+
+    entry, hit = cache.get_or_compute(
+        key, compute, cacheable=lambda entry: entry['outcome'] in ('structured', 'recovered')
+    )
+    # The outcome was counted when the request was made
+    return parse_response(entry['raw_text'], response_model, model, record=False)._replace(cached=hit)
+
+
+def _request_uncached(client, model: str, messages: List[Dict], response_model: Type[T],
+                      max_tokens: int, temperature: float) -> StructuredResult:
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            response_format=strict_schema(response_model)
+        )
+    except Exception as e:
+        logger.warning(f"Structured output request failed, using standard format: {e}")
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+    return parse_response(response.choices[0].message.content, response_model, model)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: audio feature extraction time per minute of audio
+
+Compares the previous per-feature extraction (every librosa call recomputing
+its own STFT from the waveform) against the shared-STFT AudioFeatureEngine
+for each feature profile.
+
+Usage:
+    python benchmarks/bench_audio_features.py --minutes 1 5 --repeat 3
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from audio_features import AudioFeatureEngine, FEATURE_PROFILES  # noqa: E402
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_speech(minutes: float, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Voiced tone with vibrato, syllable-rate envelope and background noise"""
+    t = np.arange(int(minutes * 60 * sr)) / sr
+    freq = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(freq) / sr
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t)) ** 2
+    rng = np.random.default_rng(0)
+    signal = envelope * (np.sin(phase) + 0.4 * np.sin(2 * phase)) + 0.02 * rng.standard_normal(len(t))
+    return (0.3 * signal).astype(np.float32)
+
+
+def legacy_features(waveform: np.ndarray, sr: int = SAMPLE_RATE):
+    """The pre-engine extraction: every feature starts from the raw waveform"""
+    import librosa
+
+    librosa.feature.zero_crossing_rate(waveform)
+    librosa.feature.spectral_centroid(y=waveform, sr=sr)
+    librosa.feature.spectral_rolloff(y=waveform, sr=sr)
+    librosa.feature.spectral_bandwidth(y=waveform, sr=sr)
+    librosa.feature.mfcc(y=waveform, sr=sr, n_mfcc=13)
+    librosa.feature.chroma_stft(y=waveform, sr=sr)
+    librosa.feature.tonnetz(y=waveform, sr=sr)
+    librosa.feature.spectral_contrast(y=waveform, sr=sr)
+    pitches, magnitudes = librosa.piptrack(y=waveform, sr=sr)
+    pitch_values = []
+    for t in range(pitches.shape[1]):
+        index = magnitudes[:, t].argmax()
+        if pitches[index, t] > 0:
+            pitch_values.append(pitches[index, t])
+    librosa.beat.beat_track(y=waveform, sr=sr)
+    librosa.effects.hpss(waveform)
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1.0], help="Audio lengths to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only benchmark the engine")
+    args = parser.parse_args()
+
+    # Warm up librosa's lazy imports and filter caches
+    warmup = synthetic_speech(0.05)
+    AudioFeatureEngine(profile='full').extract(warmup)
+    if not args.skip_legacy:
+        legacy_features(warmup)
+
+    print(f"{'audio':>8}  {'variant':<16} {'seconds':>9} {'s / audio-min':>14}")
+    for minutes in args.minutes:
+        waveform = synthetic_speech(minutes)
+        variants = []
+        if not args.skip_legacy:
+            variants.append(('legacy', lambda: legacy_features(waveform)))
+        for profile in FEATURE_PROFILES:
+            engine = AudioFeatureEngine(profile=profile)
+            variants.append((f'engine:{profile}', lambda engine=engine: engine.extract(waveform)))
+
+        for name, fn in variants:
+            seconds = best_of(fn, args.repeat)
+            print(f"{minutes:>6.1f}m  {name:<16} {seconds:>9.3f} {seconds / minutes:>14.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: F0 statistics from the per-frame loop vs the vectorized and pYIN modes
+
+The piptrack spectrogram is computed once and shared by the loop and the
+vectorized variant, so their timings isolate the F0 selection step. pYIN is
+timed end to end on the raw waveform.
+
+Usage:
+    python benchmarks/bench_pitch.py --minutes 1 10 --repeat 3
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from audio_pitch import f0_statistics, piptrack_f0, pyin_statistics  # noqa: E402
+from bench_audio_features import SAMPLE_RATE, best_of, synthetic_speech  # noqa: E402
+
+
+def loop_statistics(pitches: np.ndarray, magnitudes: np.ndarray):
+    """The previous per-column loop over piptrack output"""
+    pitch_values = []
+    for t in range(pitches.shape[1]):
+        index = magnitudes[:, t].argmax()
+        pitch = pitches[index, t]
+        if pitch > 0:
+            pitch_values.append(pitch)
+    return {
+        'f0_mean': float(np.mean(pitch_values)) if pitch_values else 0.0,
+        'f0_std': float(np.std(pitch_values)) if pitch_values else 0.0
+    }
+
+
+def main() -> int:
+    import librosa
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1.0], help="Audio lengths to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--skip-pyin", action="store_true", help="Skip the pYIN mode")
+    args = parser.parse_args()
+
+    print(f"{'audio':>8}  {'variant':<12} {'seconds':>9} {'s / audio-min':>14}  f0_mean / f0_std")
+    for minutes in args.minutes:
+        waveform = synthetic_speech(minutes)
+        magnitude = np.abs(librosa.stft(waveform))
+        pitches, magnitudes = librosa.piptrack(S=magnitude, sr=SAMPLE_RATE)
+
+        variants = [
+            ('loop', lambda: loop_statistics(pitches, magnitudes)),
+            ('vectorized', lambda: f0_statistics(piptrack_f0(pitches, magnitudes))),
+        ]
+        if not args.skip_pyin:
+            variants.append(('pyin@8k', lambda: pyin_statistics(waveform, SAMPLE_RATE)))
+
+        for name, fn in variants:
+            seconds = best_of(fn, args.repeat)
+            stats = fn()
+            print(f"{minutes:>6.1f}m  {name:<12} {seconds:>9.4f} {seconds / minutes:>14.4f}  "
+                  f"{stats['f0_mean']:.2f} / {stats['f0_std']:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the detectors' previous regex parsing cascade vs the shared
+structured-output parser, over the recorded responses in tests/test_data
+and fuzzed variants of them
+
+Reports time per response and how many responses each parser had to
+answer from free-text fallback (i.e. degraded to default scores).
+
+Usage:
+    python benchmarks/bench_structured_output.py --fuzz 20 --repeat 5
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tests"))
+
+from structured_output import AudioAnalysis, FrameAnalysis, ImageAnalysis, SegmentVerdicts, parse_response  # noqa: E402
+from test_structured_output import mutations  # noqa: E402
+
+SCHEMAS = {model.__name__: model for model in (AudioAnalysis, FrameAnalysis, ImageAnalysis, SegmentVerdicts)}
+RECORDED = Path(__file__).resolve().parent.parent / "tests" / "test_data" / "llm_responses.jsonl"
+
+
+def legacy_parse(response_text: str):
+    """The cascade previously inlined in each detector; returns (analysis, used_text_fallback)"""
+    json_block_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
+    if json_block_match:
+        try:
+            return json.loads(json_block_match.group(1)), False
+        except json.JSONDecodeError:
+            pass
+    json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response_text, re.DOTALL)
+    if json_match:
+        try:
+            return json.loads(json_match.group()), False
+        except json.JSONDecodeError:
+            pass
+    try:
+        return json.loads(response_text.strip()), False
+    except json.JSONDecodeError:
+        pass
+
+    result = {'prediction': 'UNKNOWN', 'confidence': 0.5, 'reasoning': response_text}
+    if 'FAKE' in response_text.upper():
+        result['prediction'] = 'FAKE'
+    elif 'REAL' in response_text.upper():
+        result['prediction'] = 'REAL'
+    conf_match = re.search(r'confidence[:\s]+([0-9.]+)', response_text, re.IGNORECASE)
+    if conf_match:
+        try:
+            result['confidence'] = float(conf_match.group(1))
+        except ValueError:
+            pass
+    return result, True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fuzz", type=int, default=20, help="Fuzz rounds over the recorded responses")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with open(RECORDED) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    rng = random.Random(0)
+    corpus = [(r['schema'], r['response']) for r in records]
+    for _ in range(args.fuzz):
+        for r in records:
+            corpus.extend((r['schema'], text) for text in mutations(r['response'], rng))
+
+    def run_legacy():
+        return sum(legacy_parse(text)[1] for _, text in corpus)
+
+    def run_shared():
+        return sum(parse_response(text, SCHEMAS[schema], 'bench').outcome in ('fallback', 'failed')
+                   for schema, text in corpus)
+
+    print(f"{len(corpus)} responses ({len(records)} recorded, rest fuzzed)")
+    print(f"{'parser':<8} {'us / response':>14} {'text fallbacks':>15}")
+    for name, fn in (('legacy', run_legacy), ('shared', run_shared)):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            fallbacks = fn()
+            timings.append(time.perf_counter() - started)
+        print(f"{name:<8} {min(timings) / len(corpus) * 1e6:>14.1f} {fallbacks:>15}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
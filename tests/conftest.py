@@ -2,10 +2,14 @@
 Pytest configuration and shared fixtures
 """
 
+import os
 import pytest
 import sys
 from pathlib import Path
 
+# Tests must not share model responses through the on-disk cache
+os.environ.setdefault("LLM_CACHE", "0")
+
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
@@ -0,0 +1,94 @@
+"""
+Unit tests for the per-request audio context
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import numpy as np
+import soundfile as sf
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import openai_audio_detector
+from audio_context import AudioContext
+from audio_pipeline import extract_features_worker
+from openai_audio_detector import OpenAIAudioDeepfakeDetector
+
+
+@pytest.fixture
+def audio_path(tmp_path):
+    sr = 16000
+    t = np.arange(sr * 2) / sr
+    path = tmp_path / "tone.wav"
+    sf.write(path, 0.3 * np.sin(2 * np.pi * 200 * t), sr)
+    return str(path)
+
+
+class FailingTranscriptions:
+    def create(self, **kwargs):
+        raise RuntimeError("network down")
+
+
+class TestAudioContext:
+    def test_decodes_and_resamples_once(self, audio_path):
+        context = AudioContext(audio_path)
+        assert not context.is_decoded
+        assert context.header_duration == pytest.approx(2.0)
+
+        assert context.waveform is context.waveform
+        low = context.waveform_at(8000)
+        assert low is context.waveform_at(8000)
+        assert len(low) == 16000
+
+    def test_fallback_reuses_computed_features(self, audio_path):
+        detector = OpenAIAudioDeepfakeDetector(api_key="test", feature_workers=0)
+        detector.client.audio.transcriptions = FailingTranscriptions()
+
+        calls = []
+        extract = detector.feature_engine.extract
+
+        def counting_extract(*args, **kwargs):
+            calls.append(1)
+            return extract(*args, **kwargs)
+
+        detector.feature_engine.extract = counting_extract
+
+        confidence, prediction, details = detector.detect_deepfake(audio_path)
+        assert prediction == 'UNKNOWN'
+        assert 'network down' in details['error']
+        assert details['audio_features']['duration'] == pytest.approx(2.0)
+        assert len(calls) == 1
+
+    def test_worker_featurizes_the_shared_decode(self, audio_path):
+        waveform = AudioContext(audio_path).waveform
+        features, _ = extract_features_worker('not-read.wav', 16000, 'fast', 'piptrack', 600.0,
+                                              waveform=waveform)
+        assert features['duration'] == pytest.approx(2.0)
+
+    def test_worker_path_decodes_and_detects_speech_once(self, audio_path, monkeypatch):
+        import audio_context
+        import librosa
+
+        loads, vad_runs = [], []
+        load = librosa.load
+        detect = audio_context.detect_speech_regions
+        monkeypatch.setattr(librosa, 'load', lambda *args, **kwargs: loads.append(args) or load(*args, **kwargs))
+        monkeypatch.setattr(audio_context, 'detect_speech_regions',
+                            lambda *args, **kwargs: vad_runs.append(args) or detect(*args, **kwargs))
+        # Threads stand in for the worker processes so every decode is counted here
+        pool = ThreadPoolExecutor(max_workers=1)
+        monkeypatch.setattr(openai_audio_detector, 'get_feature_pool', lambda workers: pool)
+
+        detector = OpenAIAudioDeepfakeDetector(api_key="test", feature_workers=1)
+        detector.client.audio.transcriptions = FailingTranscriptions()
+        _, prediction, details = detector.detect_deepfake(audio_path)
+        pool.shutdown()
+
+        assert prediction == 'UNKNOWN'
+        assert details['audio_features']['duration'] == pytest.approx(2.0)
+        assert 'vad' in details['audio_features']
+        assert len(loads) == 1 and len(vad_runs) == 1
@@ -0,0 +1,99 @@
+"""
+Unit tests for the shared-STFT audio feature engine
+"""
+
+import pytest
+import numpy as np
+import librosa
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from audio_features import AudioFeatureEngine, FEATURE_PROFILES
+from audio_pitch import PITCH_MODES, piptrack_f0, pitch_statistics
+
+
+@pytest.fixture(scope="module")
+def waveform():
+    """Three seconds of a vibrato tone with noise and an amplitude pulse"""
+    sr = 16000
+    t = np.linspace(0, 3.0, int(sr * 3.0), endpoint=False)
+    freq = 220 + 20 * np.sin(2 * np.pi * 3 * t)
+    phase = 2 * np.pi * np.cumsum(freq) / sr
+    pulse = 0.6 + 0.4 * (np.sin(2 * np.pi * 2 * t) > 0)
+    rng = np.random.default_rng(0)
+    return (0.5 * pulse * np.sin(phase) + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+class TestAudioFeatureEngine:
+    """Shared-intermediate features must match librosa's waveform-based calls"""
+
+    def test_spectral_features_match_librosa(self, waveform):
+        engine = AudioFeatureEngine(sr=16000, profile='fast')
+        features = engine.extract(waveform)['comprehensive_features']
+        sr = 16000
+
+        expected = {
+            'spectral_centroid_mean': np.mean(librosa.feature.spectral_centroid(y=waveform, sr=sr)),
+            'spectral_rolloff_mean': np.mean(librosa.feature.spectral_rolloff(y=waveform, sr=sr)),
+            'spectral_bandwidth_mean': np.mean(librosa.feature.spectral_bandwidth(y=waveform, sr=sr)),
+            'zcr_mean': np.mean(librosa.feature.zero_crossing_rate(waveform)),
+        }
+        for key, value in expected.items():
+            assert features[key] == pytest.approx(float(value), rel=1e-4)
+
+        np.testing.assert_allclose(
+            features['mfcc_mean'],
+            np.mean(librosa.feature.mfcc(y=waveform, sr=sr, n_mfcc=13), axis=1),
+            rtol=1e-3, atol=1e-3
+        )
+        np.testing.assert_allclose(
+            features['chroma_mean'],
+            np.mean(librosa.feature.chroma_stft(y=waveform, sr=sr), axis=1),
+            rtol=1e-3, atol=1e-4
+        )
+
+    def test_profiles_select_optional_features(self, waveform):
+        fast = AudioFeatureEngine(profile='fast').extract(waveform)['comprehensive_features']
+        full = AudioFeatureEngine(profile='full').extract(waveform)['comprehensive_features']
+
+        for key in ('tempo', 'beat_count', 'harmonic_ratio', 'tonnetz_mean'):
+            assert key not in fast
+            assert key in full
+        assert isinstance(full['tempo'], float)
+        assert len(full['tonnetz_mean']) == 6
+
+    def test_unknown_profile_rejected(self):
+        with pytest.raises(ValueError):
+            AudioFeatureEngine(profile='extreme')
+        assert set(FEATURE_PROFILES) == {'fast', 'standard', 'full'}
+
+
+class TestPitchExtraction:
+    """Vectorized pitch statistics must reproduce the per-frame loop"""
+
+    def test_vectorized_matches_loop(self, waveform):
+        sr = 16000
+        pitches, magnitudes = librosa.piptrack(y=waveform, sr=sr)
+        pitch_values = []
+        for t in range(pitches.shape[1]):
+            index = magnitudes[:, t].argmax()
+            if pitches[index, t] > 0:
+                pitch_values.append(pitches[index, t])
+
+        f0 = piptrack_f0(pitches, magnitudes)
+        assert f0[f0 > 0].tolist() == pytest.approx(pitch_values)
+
+        stats = pitch_statistics('piptrack', waveform, sr)
+        assert stats['f0_mean'] == pytest.approx(float(np.mean(pitch_values)), rel=1e-5)
+        assert stats['f0_std'] == pytest.approx(float(np.std(pitch_values)), rel=1e-5)
+
+    def test_pyin_mode_reports_voicing(self, waveform):
+        stats = pitch_statistics('pyin', waveform, 16000)
+        assert set(stats) >= {'f0_mean', 'f0_std', 'voiced_ratio', 'voiced_probability_mean'}
+        # The tone glides between 200 and 240 Hz and is voiced throughout
+        assert 195 < stats['f0_mean'] < 245
+        assert stats['voiced_ratio'] > 0.8
+        assert 'pyin' in PITCH_MODES
@@ -0,0 +1,111 @@
+"""
+Unit tests for multi-resolution waveform peaks
+"""
+
+import numpy as np
+import soundfile as sf
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import audio_peaks
+from audio_peaks import PeaksFile, compute_peaks, encode_peaks, reduce_peaks, to_bits
+
+SR = 8000
+
+
+def write_audio(path: Path, seconds: float = 20.0) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    samples = (rng.uniform(-1, 1, int(seconds * SR)) * np.linspace(0.05, 0.95, int(seconds * SR))).astype(np.float32)
+    sf.write(path, samples, SR, subtype='FLOAT')
+    return samples
+
+
+def stored_peaks(tmp_path, seconds: float = 20.0):
+    samples = write_audio(tmp_path / 'clip.wav', seconds)
+    path = tmp_path / 'clip.dat'
+    path.write_bytes(encode_peaks(*compute_peaks(str(tmp_path / 'clip.wav'))))
+    return samples, PeaksFile(str(path))
+
+
+class TestComputePeaks:
+    def test_streaming_matches_whole_file(self, tmp_path):
+        samples = write_audio(tmp_path / 'clip.wav')
+        # Blocks of 0.3 s do not line up with 256-sample peaks
+        sr, total, levels = compute_peaks(str(tmp_path / 'clip.wav'), block_seconds=0.3)
+        assert (sr, total) == (SR, len(samples))
+
+        starts = np.arange(0, len(samples), 256)
+        np.testing.assert_array_equal(levels[0][:, 0], np.minimum.reduceat(samples, starts))
+        np.testing.assert_array_equal(levels[0][:, 1], np.maximum.reduceat(samples, starts))
+        assert len(levels[0]) == 625
+
+    def test_coarser_levels(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(audio_peaks, 'MIN_LEVEL_PEAKS', 16)
+        write_audio(tmp_path / 'clip.wav')
+        _, _, levels = compute_peaks(str(tmp_path / 'clip.wav'))
+        assert [len(level) for level in levels] == [625, 157, 40]
+        np.testing.assert_array_equal(levels[1], reduce_peaks(levels[0], 4))
+        assert levels[2][:, 0].min() == levels[0][:, 0].min()
+
+
+class TestPeaksFile:
+    def test_round_trip_and_zoom(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(audio_peaks, 'MIN_LEVEL_PEAKS', 16)
+        samples, peaks = stored_peaks(tmp_path)
+        assert peaks.sample_rate == SR and abs(peaks.duration - 20.0) < 1e-9
+        assert [len(level) for level in peaks.levels] == [625, 157, 40]
+
+        # The coarsest level has 39.06 peaks' worth of audio, so 40 points come from the middle one
+        overview, spp = peaks.select(0.0, peaks.duration, 40)
+        assert len(overview) == 40 and spp == 1024 * 157 / 40
+        overview, spp = peaks.select(0.0, peaks.duration, 39)
+        assert len(overview) == 39 and spp == 4096 * 40 / 39
+
+        # Zoomed into one second: the finest level, sliced to the range
+        rows, spp = peaks.select(10.0, 11.0, 1000)
+        assert spp == 256 and len(rows) == 32
+        # Rows start at the peak containing 10 s (sample 80000 lies in peak 312)
+        expected = np.round(samples[312 * 256:313 * 256].max() * 32767)
+        assert abs(int(rows[0, 1]) - expected) <= 1
+
+        rows, spp = peaks.select(0.0, 20.0, 100)
+        assert len(rows) == 100 and spp == 256 * 4 * 157 / 100
+        assert rows[:, 1].max() == np.asarray(peaks.levels[0])[:, 1].max()
+
+    def test_bits(self):
+        rows = np.array([[-32767, 32767], [-256, 512]], dtype='<i2')
+        assert to_bits(rows, 8).tolist() == [[-127, 127], [-1, 2]]
+        assert to_bits(rows, 16).dtype == np.dtype('<i2')
+
+
+class TestPeaksEndpoint:
+    def test_zoomed_peaks(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        from fastapi.testclient import TestClient
+        import app as backend_app
+        from derivatives import DerivativeStore, render_derivatives
+        from media_server import MediaIndex
+
+        write_audio(tmp_path / 'voice.wav')
+        content_hash = 'cd' * 32
+        store = DerivativeStore(str(tmp_path / 'derivatives'))
+        render_derivatives(str(tmp_path / 'voice.wav'), 'audio', content_hash, str(store.directory))
+        entry = {'path': str(tmp_path / 'voice.wav'), 'filename': 'voice.wav', 'file_type': 'audio',
+                 'content_hash': content_hash}
+        monkeypatch.setattr(backend_app, 'derivative_store', store)
+        monkeypatch.setattr(backend_app, 'media_index', MediaIndex(lambda file_id: entry if file_id == 'a1' else None))
+        http = TestClient(backend_app.app)
+
+        body = http.get('/audio/a1/peaks', params={'start': 5, 'end': 6, 'width': 2000}).json()
+        assert body['samples_per_peak'] == 256 and body['bits'] == 8
+        assert body['length'] == 32 and len(body['data']) == 64
+
+        binary = http.get('/audio/a1/peaks', params={'width': 50, 'bits': 16, 'format': 'binary'})
+        assert binary.headers['x-peaks-length'] == '50'
+        assert len(binary.content) == 50 * 2 * 2
+
+        assert http.get('/audio/a1/peaks', params={'bits': 4}).status_code == 400
+        assert http.get('/audio/missing/peaks').status_code == 404
@@ -0,0 +1,65 @@
+"""
+Unit tests for the audio stage graph
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from audio_pipeline import StageGraph
+
+
+class TestStageGraph:
+    def test_independent_stages_overlap(self):
+        completed = []
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            graph = StageGraph()
+            graph.add('features', lambda: time.sleep(0.3) or 'f', executor=pool,
+                      on_complete=completed.append)
+            graph.add('transcription', lambda: time.sleep(0.2) or 't', executor=pool,
+                      on_complete=completed.append)
+            graph.add('analysis', lambda results: results['features'] + results['transcription'],
+                      deps=('features', 'transcription'))
+            results = graph.run()
+
+        assert results['analysis'] == 'ft'
+        assert completed == ['t', 'f']
+        timings = graph.timings
+        assert timings['analysis']['start'] >= timings['features']['end']
+        # Roughly max(0.3, 0.2), not their sum
+        assert timings['total']['seconds'] < 0.45
+
+    def test_inline_stage_overlaps_executor_stages_ready_with_it(self):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            graph = StageGraph()
+            graph.add('features', lambda: 'f', executor=pool)
+            graph.add('transcription', lambda: 't', executor=pool)
+            # Same shape as the detector: inline whole-file analysis registered before segment scoring
+            graph.add('analysis', lambda results: time.sleep(0.3) or 'a', deps=('features', 'transcription'))
+            graph.add('segments', lambda results: time.sleep(0.3) or 's', deps=('features', 'transcription'),
+                      executor=pool)
+            results = graph.run()
+
+        assert results['analysis'] == 'a' and results['segments'] == 's'
+        timings = graph.timings
+        assert timings['segments']['start'] <= timings['analysis']['start']
+        assert timings['segments']['start'] < timings['analysis']['end'] - 0.2
+        assert timings['total']['seconds'] < 0.5
+
+    def test_stage_failure_is_raised(self):
+        def fail(results):
+            raise ValueError("transcription failed")
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            graph = StageGraph()
+            graph.add('transcription', lambda: {}, executor=pool)
+            graph.add('analysis', fail, deps=('transcription',))
+            with pytest.raises(ValueError):
+                graph.run()
+        assert 'seconds' in graph.timings['transcription']
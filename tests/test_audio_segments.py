@@ -0,0 +1,146 @@
+"""
+Unit tests for per-segment audio scoring
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+import numpy as np
+import soundfile as sf
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from audio_features import AudioFeatureEngine
+from audio_segments import FeatureTrack, SegmentScorer, segment_features, suspicious_spans
+from audio_stream import StreamingFeatureExtractor
+from openai_audio_detector import OpenAIAudioDeepfakeDetector
+
+
+def tone(freq, seconds, sr=16000, amplitude=0.3):
+    t = np.arange(int(sr * seconds)) / sr
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+class FakeCompletions:
+    """Marks every segment whose text contains 'spliced' as FAKE"""
+
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        prompt = kwargs['messages'][-1]['content']
+        verdicts = []
+        for line in prompt.splitlines():
+            if line.startswith('[') and '] ' in line:
+                index = int(line[1:line.index(']')])
+                fake = 'spliced' in line
+                verdicts.append({'index': index, 'prediction': 'FAKE' if fake else 'REAL',
+                                 'suspicion': 0.9 if fake else 0.1, 'reason': 'pitch jump' if fake else ''})
+        content = json.dumps({'segments': verdicts})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class TestFeatureTrack:
+    def test_bin_statistics_match_frames(self):
+        track = FeatureTrack(bin_seconds=0.5)
+        times = np.arange(40) * 0.1
+        values = np.arange(40, dtype=float)
+        track.add(times, {'rms': values, 'f0': np.where(values % 2 == 0, 100.0, 0.0)})
+
+        stats = track.stats(1.0, 2.0)
+        assert stats['rms']['mean'] == pytest.approx(np.mean(values[10:20]))
+        assert stats['rms']['std'] == pytest.approx(np.std(values[10:20]))
+        assert stats['f0']['mean'] == pytest.approx(100.0)
+        assert track.frame_count(1.0, 2.0, 'f0') == 5
+        assert stats['zcr'] is None
+
+    def test_vad_track_uses_original_offsets(self):
+        sr = 16000
+        audio = np.concatenate([tone(150, 2.0), np.zeros(sr * 3, dtype=np.float32), tone(300, 2.0)])
+        engine = AudioFeatureEngine(sr=sr, profile='fast')
+        from audio_vad import TrimmedTimeline, detect_speech_regions, extract_regions
+
+        regions = detect_speech_regions(audio, sr)
+        track = FeatureTrack()
+        engine.extract(extract_regions(audio, sr, regions), track=track,
+                       time_map=TrimmedTimeline(regions).to_original_array)
+
+        assert track.frame_count(2.6, 4.6) == 0
+        low = track.stats(0.3, 1.7)['spectral_centroid']['mean']
+        high = track.stats(5.3, 6.7)['spectral_centroid']['mean']
+        assert high > low * 1.5
+
+    def test_streamed_track_matches_whole_file(self, tmp_path):
+        sr = 16000
+        audio = np.concatenate([tone(200, 3.0), tone(320, 3.0)])
+        path = tmp_path / "two_tones.wav"
+        sf.write(path, audio, sr, subtype='FLOAT')
+        engine = AudioFeatureEngine(sr=sr, profile='fast')
+
+        whole, streamed = FeatureTrack(), FeatureTrack()
+        engine.extract(audio, track=whole)
+        StreamingFeatureExtractor(engine, block_seconds=2.0).extract_file(str(path), track=streamed)
+
+        for start, end in ((0.5, 2.5), (3.5, 5.5)):
+            assert streamed.stats(start, end)['f0']['mean'] == pytest.approx(
+                whole.stats(start, end)['f0']['mean'], rel=0.05)
+
+
+class TestSegmentScoring:
+    def test_suspicious_spans_merge_neighbours(self):
+        scored = [
+            {'index': 0, 'start': 0.0, 'end': 2.0, 'suspicion': 0.1},
+            {'index': 1, 'start': 2.0, 'end': 4.0, 'suspicion': 0.8, 'reason': 'a'},
+            {'index': 2, 'start': 4.2, 'end': 6.0, 'suspicion': 0.7, 'reason': 'b'},
+            {'index': 3, 'start': 9.0, 'end': 10.0, 'suspicion': 0.9},
+        ]
+        spans = suspicious_spans(scored, threshold=0.6, merge_gap=1.0)
+        assert [(s['start'], s['end']) for s in spans] == [(2.0, 6.0), (9.0, 10.0)]
+        assert spans[0]['segment_indices'] == [1, 2]
+        assert spans[0]['max_suspicion'] == 0.8
+
+    def test_groups_are_batched(self):
+        completions = FakeCompletions()
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        segments = segment_features(None, [
+            {'start': i, 'end': i + 1, 'text': 'spliced words' if i in (21, 22) else 'normal words'}
+            for i in range(45)
+        ])
+
+        result = SegmentScorer(client, group_size=20).score(segments, {})
+        assert len(completions.calls) == 3
+        assert result['group_count'] == 3
+        assert result['scored_count'] == 45
+        assert completions.calls[0]['response_format']['type'] == 'json_schema'
+        assert [(s['start'], s['end']) for s in result['suspicious_spans']] == [(21.0, 23.0)]
+
+    def test_detector_reports_segment_timeline(self, tmp_path):
+        sr = 16000
+        path = tmp_path / "speech.wav"
+        sf.write(path, np.concatenate([tone(200, 2.0), tone(320, 2.0)]), sr)
+
+        detector = OpenAIAudioDeepfakeDetector(api_key="test", feature_workers=0)
+        detector.vad_enabled = False
+        detector._transcribe_file = lambda audio_file: {
+            'text': 'hello there spliced words', 'language': 'en', 'duration': 4.0,
+            'segments': [{'start': 0.0, 'end': 2.0, 'text': 'hello there'},
+                         {'start': 2.0, 'end': 4.0, 'text': 'spliced words'}]
+        }
+        completions = FakeCompletions()
+        detector.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        detector.segment_scorer.client = detector.client
+        detector._analyze_with_gpt4 = lambda text, features: {'prediction': 'REAL', 'confidence': 0.7}
+
+        confidence, prediction, details = detector.detect_deepfake(str(path))
+        segment_analysis = details['segment_analysis']
+        assert [s['prediction'] for s in segment_analysis['segments']] == ['REAL', 'FAKE']
+        assert segment_analysis['segments'][1]['features']['f0_mean'] > \
+            segment_analysis['segments'][0]['features']['f0_mean']
+        assert segment_analysis['suspicious_spans'][0]['start'] == 2.0
+        assert details['deepfake_indicators']['segment_suspicion'] == 0.9
+        assert 'segments' in details['stage_timings']
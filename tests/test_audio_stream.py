@@ -0,0 +1,95 @@
+"""
+Unit tests for block-streamed audio features and segmented transcription
+"""
+
+import pytest
+import numpy as np
+import soundfile as sf
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from audio_features import AudioFeatureEngine
+from audio_stream import (
+    RunningStats, StreamingFeatureExtractor, merge_transcripts,
+    plan_transcription_segments, transcribe_in_segments
+)
+
+
+@pytest.fixture(scope="module")
+def long_audio_path(tmp_path_factory):
+    """Ninety seconds of a gliding tone with a syllable-rate envelope"""
+    sr = 16000
+    t = np.arange(sr * 90) / sr
+    freq = 150 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    waveform = (0.3 * envelope * np.sin(2 * np.pi * np.cumsum(freq) / sr)).astype(np.float32)
+    path = tmp_path_factory.mktemp("audio") / "long.wav"
+    sf.write(path, waveform, sr, subtype='FLOAT')
+    return str(path), waveform
+
+
+class TestRunningStats:
+    def test_matches_numpy_over_uneven_blocks(self):
+        rng = np.random.default_rng(1)
+        data = rng.normal(3.0, 2.0, size=(4, 1000))
+        stats = RunningStats()
+        for chunk in np.array_split(data, [7, 300, 301, 820], axis=1):
+            stats.update(chunk)
+        np.testing.assert_allclose(stats.mean, data.mean(axis=1))
+        np.testing.assert_allclose(stats.std, data.std(axis=1))
+
+
+class TestStreamingFeatures:
+    def test_streamed_features_close_to_whole_file(self, long_audio_path):
+        path, waveform = long_audio_path
+        engine = AudioFeatureEngine(profile='fast')
+        whole = engine.extract(waveform)
+        streamed = StreamingFeatureExtractor(engine, block_seconds=20).extract_file(path)
+
+        assert streamed['streamed'] is True
+        assert streamed['duration'] == pytest.approx(whole['duration'])
+        assert streamed['rms_energy'] == pytest.approx(whole['rms_energy'], rel=1e-5)
+        for key in ('spectral_centroid_mean', 'spectral_rolloff_mean', 'zcr_mean', 'f0_mean'):
+            assert streamed['comprehensive_features'][key] == pytest.approx(
+                whole['comprehensive_features'][key], rel=0.01
+            )
+
+
+class TestSegmentedTranscription:
+    def test_plan_overlaps_segments(self):
+        assert plan_transcription_segments(300) == [(0.0, 300)]
+        spans = plan_transcription_segments(1500, segment_seconds=600, overlap_seconds=5)
+        assert spans == [(0.0, 600.0), (595.0, 1195.0), (1190.0, 1500)]
+
+    def test_merge_drops_overlap_duplicates(self):
+        spans = [(0.0, 60.0), (55.0, 115.0)]
+        transcripts = [
+            {'text': '', 'language': 'en', 'segments': [
+                {'start': 0.0, 'end': 30.0, 'text': 'one'},
+                {'start': 30.0, 'end': 56.0, 'text': 'two'},
+                {'start': 56.0, 'end': 60.0, 'text': 'three'},
+            ]},
+            {'text': '', 'language': 'en', 'segments': [
+                {'start': 0.0, 'end': 5.0, 'text': 'three'},
+                {'start': 5.0, 'end': 60.0, 'text': 'four'},
+            ]},
+        ]
+        merged = merge_transcripts(spans, transcripts, overlap_seconds=5.0)
+        assert merged['text'] == 'one two three four'
+        assert [s['start'] for s in merged['segments']] == [0.0, 30.0, 55.0, 60.0]
+
+    def test_segments_are_sent_as_bounded_wav_chunks(self, long_audio_path):
+        path, _ = long_audio_path
+        lengths = []
+
+        def fake_transcribe(buffer):
+            data, sr = sf.read(buffer)
+            lengths.append(len(data) / sr)
+            return {'text': 'chunk', 'language': 'en', 'segments': []}
+
+        merged = transcribe_in_segments(path, 90.0, fake_transcribe, segment_seconds=40, overlap_seconds=4)
+        assert sorted(lengths) == pytest.approx([18.0, 40.0, 40.0])
+        assert merged['chunk_count'] == 3
@@ -0,0 +1,61 @@
+"""
+Unit tests for voice activity detection and trimmed-time mapping
+"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from audio_vad import TrimmedTimeline, detect_speech_regions, extract_regions, speech_summary
+
+SR = 16000
+
+
+def burst(seconds):
+    t = np.arange(int(SR * seconds)) / SR
+    return 0.3 * 0.5 * (1 + np.sin(2 * np.pi * 4 * t)) * np.sin(2 * np.pi * 180 * t)
+
+
+def silence(seconds, rng):
+    return 0.001 * rng.standard_normal(int(SR * seconds))
+
+
+class TestVoiceActivityDetection:
+    def test_finds_speech_between_silences(self):
+        rng = np.random.default_rng(0)
+        waveform = np.concatenate([silence(1, rng), burst(2), silence(5, rng), burst(2), silence(1, rng)])
+        regions = detect_speech_regions(waveform, SR)
+
+        assert len(regions) == 2
+        (first_start, first_end), (second_start, second_end) = regions
+        assert 0.7 < first_start < 1.1 and 2.9 < first_end < 3.3
+        assert 7.7 < second_start < 8.1 and 9.9 < second_end < 10.3
+
+        trimmed = extract_regions(waveform, SR, regions)
+        summary = speech_summary(regions, len(waveform) / SR)
+        assert len(trimmed) / SR == pytest.approx(summary['speech_seconds'], abs=0.01)
+        assert summary['silence_ratio'] > 0.5
+
+    def test_constant_signal_is_all_speech(self):
+        waveform = 0.2 * np.sin(2 * np.pi * 200 * np.arange(SR * 3) / SR)
+        assert detect_speech_regions(waveform, SR) == [(0.0, 3.0)]
+
+
+class TestTrimmedTimeline:
+    def test_maps_trimmed_times_to_original_offsets(self):
+        timeline = TrimmedTimeline([(1.0, 3.0), (8.0, 10.0)])
+        assert timeline.to_original(0.5) == pytest.approx(1.5)
+        assert timeline.to_original(2.5) == pytest.approx(8.5)
+
+        segments = timeline.remap_segments([
+            {'start': 0.0, 'end': 2.0, 'text': 'a'},
+            {'start': 2.0, 'end': 3.5, 'text': 'b'},
+        ])
+        assert segments[0]['start'] == pytest.approx(1.0)
+        assert segments[0]['end'] == pytest.approx(3.0)
+        assert segments[1]['start'] == pytest.approx(8.0)
+        assert segments[1]['end'] == pytest.approx(9.5)
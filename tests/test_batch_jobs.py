@@ -0,0 +1,168 @@
+"""
+Unit tests for batch scheduling under a shared rate budget
+"""
+
+import asyncio
+import time
+
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from batch_jobs import BatchManager, RateBudget
+
+
+def full_result(file_id: str) -> dict:
+    return {'type': 'image', 'prediction': 'FAKE', 'confidence': 0.9,
+            'visual_evidence': {'image_data': 'data:image/png;base64,' + 'A' * 10000}, 'file': file_id}
+
+
+class Analyzer:
+    """Fake run_item recording concurrency and call order"""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+
+    async def __call__(self, file_id: str):
+        self.calls.append(file_id)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delays.get(file_id, 0.01))
+        finally:
+            self.running -= 1
+        if file_id.startswith('bad'):
+            return {'status': 'error', 'error': 'unreadable'}
+        return {'status': 'completed', 'result': full_result(file_id)}
+
+
+async def drain(manager: BatchManager, batch_id: str):
+    return [record async for record in manager.stream_results(batch_id)]
+
+
+class TestRateBudget:
+    def test_concurrency_cap(self):
+        analyzer = Analyzer()
+        budget = RateBudget(max_concurrency=2, rate_per_minute=0)
+
+        async def main():
+            await asyncio.gather(*(budget.run(lambda i=i: analyzer(f'f{i}')) for i in range(6)))
+
+        asyncio.run(main())
+        assert analyzer.peak == 2 and len(analyzer.calls) == 6
+
+    def test_rate_limits_starts_after_the_burst(self):
+        # A burst of max_concurrency starts, then one start per 50ms
+        budget = RateBudget(max_concurrency=2, rate_per_minute=1200)
+        starts = []
+
+        async def start():
+            starts.append(time.monotonic())
+
+        async def main():
+            await asyncio.gather(*(budget.run(start) for _ in range(4)))
+
+        began = time.monotonic()
+        asyncio.run(main())
+        offsets = sorted(t - began for t in starts)
+        assert offsets[1] < 0.03
+        assert 0.04 < offsets[2] and 0.09 < offsets[3] < 0.3
+
+
+class TestBatchManager:
+    def test_results_stream_in_completion_order_with_verdicts_only(self):
+        analyzer = Analyzer(delays={'slow': 0.1, 'fast': 0.01})
+
+        async def main():
+            manager = BatchManager(analyzer, RateBudget(max_concurrency=4, rate_per_minute=0))
+            batch = manager.create_batch([
+                {'source': 'slow.jpg', 'file_id': 'slow'},
+                {'source': 'fast.jpg', 'file_id': 'fast'},
+                {'source': 'bad.jpg', 'file_id': 'bad1'},
+                {'source': 'notes.txt', 'error': 'Unsupported file type'}
+            ])
+            records = await drain(manager, batch['batch_id'])
+            return manager, batch, records
+
+        manager, batch, records = asyncio.run(main())
+        assert [r['source'] for r in records] == ['notes.txt', 'fast.jpg', 'bad.jpg', 'slow.jpg']
+        assert records[1]['prediction'] == 'FAKE' and records[2]['error'] == 'unreadable'
+
+        status = manager.get_status(batch['batch_id'])
+        assert status['status'] == 'completed' and status['progress'] == 1.0
+        assert status['counts'] == {'completed': 2, 'error': 1, 'skipped': 1}
+        # Evidence and details stay with the file, not the batch
+        assert batch['items'][0]['verdict'] == {'type': 'image', 'prediction': 'FAKE', 'confidence': 0.9}
+        assert all('result' not in item for item in batch['items'])
+
+    def test_duplicates_reuse_one_analysis_inside_the_budget(self):
+        analyzer = Analyzer(delays={'earlier': 0.05})
+        budget = RateBudget(max_concurrency=1, rate_per_minute=0)
+
+        async def main():
+            manager = BatchManager(analyzer, budget)
+            batch = manager.create_batch([
+                {'source': 'a.jpg', 'file_id': 'a'},
+                {'source': 'a-copy.jpg', 'duplicate_of': 'a'},
+                {'source': 'old1.jpg', 'duplicate_of': 'earlier'},
+                {'source': 'old2.jpg', 'duplicate_of': 'earlier'}
+            ])
+            return await drain(manager, batch['batch_id'])
+
+        records = asyncio.run(main())
+        # One analysis per distinct file, never more than the budget allows at once
+        assert sorted(analyzer.calls) == ['a', 'earlier'] and analyzer.peak == 1
+        by_source = {r['source']: r for r in records}
+        assert by_source['a-copy.jpg']['status'] == 'deduplicated'
+        assert by_source['a-copy.jpg']['prediction'] == 'FAKE'
+        assert by_source['old2.jpg']['file_id'] == 'earlier' and by_source['old2.jpg']['confidence'] == 0.9
+
+    def test_finished_batches_are_evicted(self):
+        async def main():
+            manager = BatchManager(Analyzer(), RateBudget(rate_per_minute=0), retention_seconds=60, max_batches=2)
+            ids = []
+            for i in range(3):
+                batch = manager.create_batch([{'source': f'{i}.jpg', 'file_id': f'f{i}'}])
+                await drain(manager, batch['batch_id'])
+                ids.append(batch['batch_id'])
+            running = manager.create_batch([{'source': 'x.jpg', 'file_id': 'x'}])
+            # Over max_batches: the oldest finished batch goes, running ones stay
+            assert manager.get_status(ids[0]) is None
+            assert manager.get_status(ids[1]) and manager.get_status(ids[2])
+
+            manager.evict(now=time.monotonic() + 61)
+            assert list(manager.batches) == [running['batch_id']]
+            await drain(manager, running['batch_id'])
+
+        asyncio.run(main())
+
+
+def test_item_already_processing_waits_for_its_terminal_event(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import app as backend_app
+    from progress_events import ProgressBroker
+
+    broker = ProgressBroker()
+    monkeypatch.setattr(backend_app, 'progress_broker', broker)
+    monkeypatch.setattr(backend_app, 'analysis_results', {'f1': {'status': 'processing'}})
+    broker.publish('f1', 'queued')
+
+    async def finish_elsewhere():
+        await asyncio.sleep(0.05)
+        backend_app.analysis_results['f1'].update(status='completed', result=full_result('f1'))
+        broker.publish('f1', 'completed')
+
+    async def main():
+        broker.bind_loop(asyncio.get_running_loop())
+        started = time.monotonic()
+        outcome, _ = await asyncio.gather(backend_app.run_batch_item('f1'), finish_elsewhere())
+        return outcome, time.monotonic() - started
+
+    outcome, elapsed = asyncio.run(main())
+    # Woken by the event rather than a one-second poll
+    assert outcome['status'] == 'completed' and elapsed < 0.5
@@ -0,0 +1,131 @@
+"""
+Unit tests for the persistent cleanup queue
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import cleanup_queue
+from cleanup_queue import CleanupQueue, create_cleanup_queue_table
+
+
+@pytest.fixture
+def connect(tmp_path):
+    db_path = tmp_path / 'metadata.db'
+    conn = sqlite3.connect(str(db_path))
+    create_cleanup_queue_table(conn.cursor())
+    conn.commit()
+    conn.close()
+    return lambda: sqlite3.connect(str(db_path))
+
+
+def make_files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f'upload-{i}.wav'
+        path.write_bytes(b'RIFF')
+        paths.append(path)
+    return paths
+
+
+class TestCleanupQueue:
+    def test_deletes_only_due_files_in_batches(self, tmp_path, connect):
+        queue = CleanupQueue(connect, batch_size=7)
+        threads_before = threading.active_count()
+        due = make_files(tmp_path, 20)
+        later = tmp_path / 'later.wav'
+        later.write_bytes(b'RIFF')
+        for path in due:
+            queue.schedule(str(path), 0)
+        queue.schedule(str(later), 3600)
+
+        # Scheduling costs no threads
+        assert threading.active_count() == threads_before
+        assert queue.reap() == 20
+        assert not any(path.exists() for path in due)
+        assert later.exists() and queue.pending() == 1
+
+        assert queue.reap(now=time.time() + 3601) == 1
+        assert not later.exists() and queue.pending() == 0
+
+    def test_schedule_survives_restart(self, tmp_path, connect):
+        path, = make_files(tmp_path, 1)
+        CleanupQueue(connect).schedule(str(path), 0.01)
+        time.sleep(0.02)
+        # A new queue over the same database (as after a restart) recovers the overdue deletion
+        assert CleanupQueue(connect).reap() == 1
+        assert not path.exists()
+
+    def test_missing_files_are_dropped(self, tmp_path, connect):
+        queue = CleanupQueue(connect)
+        queue.schedule(str(tmp_path / 'already-gone.wav'), 0)
+        assert queue.reap() == 0 and queue.pending() == 0
+
+    def test_failed_deletions_back_off_then_give_up(self, tmp_path, connect, monkeypatch):
+        queue = CleanupQueue(connect)
+        path, = make_files(tmp_path, 1)
+        queue.schedule(str(path), 0)
+
+        def deny(_):
+            raise PermissionError("busy")
+
+        monkeypatch.setattr(cleanup_queue.os, 'remove', deny)
+        now = time.time()
+        assert queue.reap(now) == 0 and queue.pending() == 1
+        # Not retried until the backoff has passed
+        queue.reap(now + 1)
+        assert connect().execute('SELECT attempts FROM cleanup_queue').fetchone()[0] == 1
+        for attempt in range(cleanup_queue.MAX_ATTEMPTS):
+            now += cleanup_queue.RETRY_MAX_SECONDS + 1
+            queue.reap(now)
+        assert queue.pending() == 0 and path.exists()
+
+    def test_removed_files_are_reported_after_commit(self, tmp_path, connect):
+        reported = []
+
+        def on_removed(file_id):
+            # The batch is committed, so the callback can write to the database
+            conn = connect()
+            conn.execute('CREATE TABLE IF NOT EXISTS seen (file_id TEXT)')
+            conn.execute('INSERT INTO seen VALUES (?)', (file_id,))
+            conn.commit()
+            conn.close()
+            reported.append(file_id)
+
+        queue = CleanupQueue(connect, on_removed=on_removed)
+        present, = make_files(tmp_path, 1)
+        queue.schedule(str(present), 0, file_id='f1')
+        queue.schedule(str(tmp_path / 'already-gone.wav'), 0, file_id='f2')
+        queue.schedule(str(tmp_path / 'anonymous.wav'), 0)
+        assert queue.reap() == 1
+        assert sorted(reported) == ['f1', 'f2']
+
+    def test_reaped_uploads_are_marked_deleted(self, tmp_path, connect, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        import app as backend_app
+        from media_server import MediaIndex
+
+        path, = make_files(tmp_path, 1)
+        statuses = []
+        monkeypatch.setattr(backend_app, 'update_file_status',
+                            lambda file_id, status: statuses.append((file_id, status)))
+        monkeypatch.setattr(backend_app, 'media_index', MediaIndex(
+            lambda file_id: {'path': str(path), 'filename': 'a.wav', 'file_type': 'audio', 'content_hash': None}))
+        queue = CleanupQueue(connect, on_removed=backend_app.file_cleaned_up)
+        monkeypatch.setattr(backend_app, 'cleanup_queue', queue)
+
+        backend_app.cleanup_file(str(path), delay_audio=True, file_id='f1')
+        assert connect().execute('SELECT path, file_id FROM cleanup_queue').fetchall() == [(str(path), 'f1')]
+        assert backend_app.media_index.get('f1') and len(backend_app.media_index) == 1 and path.exists()
+
+        assert queue.reap(now=time.time() + backend_app.CLEANUP_DELAY_SECONDS + 1) == 1
+        assert statuses == [('f1', 'deleted')] and not path.exists()
+        assert len(backend_app.media_index) == 0
@@ -0,0 +1,126 @@
+"""
+Unit tests for thumbnail, poster and waveform derivatives
+"""
+
+import asyncio
+import json
+
+import cv2
+import numpy as np
+import soundfile as sf
+from PIL import Image
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from derivatives import DerivativeStore, derivative_name, render_derivatives
+
+HASH = 'ab' * 32
+
+
+def write_image(path: Path, size=(2000, 1500)) -> str:
+    gradient = np.linspace(0, 255, size[0], dtype=np.uint8)
+    Image.fromarray(np.stack([np.tile(gradient, (size[1], 1))] * 3, axis=-1)).save(path, quality=95)
+    return str(path)
+
+
+def write_video(path: Path, frames: int = 40) -> str:
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 10.0, (320, 240))
+    for i in range(frames):
+        writer.write(np.full((240, 320, 3), 5 * i, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def write_audio(path: Path, seconds: float = 3.0, sr: int = 16000) -> str:
+    t = np.arange(int(seconds * sr)) / sr
+    # Loud first half, quiet second half
+    envelope = np.where(t < seconds / 2, 0.8, 0.1)
+    sf.write(path, (envelope * np.sin(2 * np.pi * 220 * t)).astype(np.float32), sr)
+    return str(path)
+
+
+class TestRenderDerivatives:
+    def test_image_thumbnail_and_preview(self, tmp_path):
+        source = write_image(tmp_path / 'photo.jpg')
+        names = render_derivatives(source, 'image', HASH, str(tmp_path / 'out'))
+        assert names == {'thumbnail': derivative_name(HASH, 'thumbnail'), 'preview': derivative_name(HASH, 'preview')}
+
+        with Image.open(tmp_path / 'out' / names['thumbnail']) as thumb:
+            assert thumb.format == 'WEBP' and thumb.size == (256, 192)
+        with Image.open(tmp_path / 'out' / names['preview']) as preview:
+            assert preview.size == (1024, 768)
+        assert (tmp_path / 'out' / names['preview']).stat().st_size < Path(source).stat().st_size
+
+    def test_video_poster_skips_lead_in(self, tmp_path):
+        names = render_derivatives(write_video(tmp_path / 'clip.avi'), 'video', HASH, str(tmp_path))
+        with Image.open(tmp_path / names['poster']) as poster:
+            assert poster.size == (320, 240)
+            # Frame 4 (40 frames // 10), not the black first frame
+            assert 10 < np.asarray(poster).mean() < 30
+
+    def test_audio_waveform(self, tmp_path):
+        names = render_derivatives(write_audio(tmp_path / 'voice.wav'), 'audio', HASH, str(tmp_path))
+        assert set(names) == {'peaks', 'waveform', 'waveform_data'}
+        peaks = json.loads((tmp_path / names['waveform_data']).read_text())
+        half = len(peaks['max']) // 2
+        assert 0 < len(peaks['min']) == len(peaks['max']) <= 800
+        assert abs(peaks['duration'] - 3.0) < 0.01
+        assert max(peaks['max'][:half - 1]) > 90 and max(peaks['max'][half + 1:]) < 20
+        with Image.open(tmp_path / names['waveform']) as image:
+            assert image.size == (800, 120)
+
+    def test_existing_derivatives_are_not_regenerated(self, tmp_path):
+        source = write_image(tmp_path / 'photo.jpg')
+        names = render_derivatives(source, 'image', HASH, str(tmp_path))
+        Path(source).unlink()
+        assert render_derivatives(source, 'image', HASH, str(tmp_path)) == names
+
+
+class TestDerivativeStore:
+    def test_ensure_shares_one_render(self, tmp_path):
+        store = DerivativeStore(str(tmp_path / 'derivatives'), max_workers=1)
+        source = write_image(tmp_path / 'photo.jpg')
+
+        async def main():
+            return await asyncio.gather(*(store.ensure(source, 'image', HASH) for _ in range(3)))
+
+        try:
+            results = asyncio.run(main())
+        finally:
+            store.shutdown()
+        assert all(result == results[0] for result in results) and set(results[0]) == {'thumbnail', 'preview'}
+        assert store.names(HASH, 'image') == results[0]
+        assert store.urls(results[0])['thumbnail'] == f"/derivatives/{results[0]['thumbnail']}"
+
+    def test_failures_and_lookups(self, tmp_path):
+        store = DerivativeStore(str(tmp_path), max_workers=1)
+        try:
+            assert asyncio.run(store.ensure(str(tmp_path / 'missing.mp4'), 'video', HASH)) == {}
+        finally:
+            store.shutdown()
+        assert asyncio.run(store.ensure('x.txt', 'unknown', HASH)) == {}
+        assert store.path_for('../uploads/file_metadata.db') is None
+        assert store.path_for(derivative_name(HASH, 'poster')) is None
+
+        (tmp_path / derivative_name(HASH, 'poster')).write_bytes(b'webp')
+        assert store.path_for(derivative_name(HASH, 'poster')) == tmp_path / derivative_name(HASH, 'poster')
+        store.discard(HASH)
+        assert list(tmp_path.iterdir()) == []
+
+    def test_endpoint_serves_immutable_files(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        from fastapi.testclient import TestClient
+        import app as backend_app
+
+        store = DerivativeStore(str(tmp_path / 'derivatives'))
+        names = render_derivatives(write_image(tmp_path / 'photo.jpg'), 'image', HASH, str(store.directory))
+        monkeypatch.setattr(backend_app, 'derivative_store', store)
+        http = TestClient(backend_app.app)
+
+        response = http.get(store.urls(names)['thumbnail'])
+        assert response.status_code == 200 and response.headers['content-type'] == 'image/webp'
+        assert 'immutable' in response.headers['cache-control']
+        assert http.get('/derivatives/nothing_here_v1.webp').status_code == 404
@@ -0,0 +1,113 @@
+"""
+Unit tests for video face tracking and face-crop frame analysis
+"""
+
+import json
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from face_tracking import FaceTracker, crop_face, tile_crops
+
+
+def textured_patch(size=60, seed=3) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (6, 6, 3), dtype=np.uint8)
+    return cv2.resize(small, (size, size), interpolation=cv2.INTER_CUBIC)
+
+
+def frame_with_patch(x: int, y: int, shape=(240, 320)) -> np.ndarray:
+    frame = np.full((*shape, 3), 90, dtype=np.uint8)
+    frame[y:y + 60, x:x + 60] = textured_patch()
+    return frame
+
+
+class StubDetector(FaceTracker):
+    """Tracker whose 'detection' reports a fixed box and counts calls"""
+
+    def __init__(self, box, **kwargs):
+        super().__init__(**kwargs)
+        self.box = box
+        self.detect_calls = 0
+
+    def _detect(self, gray):
+        self.detect_calls += 1
+        return self.box
+
+
+class TestFaceTracker:
+    def test_detects_once_then_tracks(self):
+        tracker = StubDetector((100, 80, 60, 60), redetect_every=10)
+        positions = [(100, 80), (108, 84), (117, 86), (125, 90)]
+        boxes = [tracker.update(frame_with_patch(x, y)) for x, y in positions]
+
+        assert tracker.detect_calls == 1
+        assert [source for _, source, _ in boxes] == ['detected', 'tracked', 'tracked', 'tracked']
+        for (x, y), (box, _, confidence) in zip(positions, boxes):
+            assert box[:2] == (x, y)
+            assert confidence > 0.9
+
+    def test_lost_face_triggers_redetection(self):
+        tracker = StubDetector((100, 80, 60, 60))
+        tracker.update(frame_with_patch(100, 80))
+        tracker.box = None
+        box, source, _ = tracker.update(np.full((240, 320, 3), 90, dtype=np.uint8))
+        assert box is None and source == 'missed'
+        assert tracker.detect_calls == 2
+        assert tracker.counts == {'detected': 1, 'tracked': 0, 'missed': 1}
+
+
+class TestCrops:
+    def test_crop_keeps_margin_and_stays_inside_frame(self):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        crop, (x, y, w, h) = crop_face(frame, (600, 10, 40, 40), margin=0.5)
+        assert w == h == 80
+        assert x + w <= 640 and y >= 0
+        assert crop.shape == (80, 80, 3)
+
+        crop, _ = crop_face(frame, (100, 100, 300, 300), max_side=128)
+        assert crop.shape == (128, 128, 3)
+
+    def test_tiles_form_a_grid(self):
+        mosaic = tile_crops([textured_patch(seed=i) for i in range(3)], cell=64)
+        assert mosaic.shape == (128, 128, 3)
+        assert not mosaic[64:, 64:].any()
+
+
+class TestTiledAnalysis:
+    def test_face_crops_share_one_request(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        monkeypatch.setenv("VIDEO_FACE_TILES", "4")
+        from openai_video_detector import OpenAIVideoDeepfakeDetector
+
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            content = json.dumps({'tiles': [{'tile': 1, 'prediction': 'FAKE', 'confidence': 0.9},
+                                            {'tile': 2, 'prediction': 'REAL', 'confidence': 0.8}]})
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+        detector = OpenAIVideoDeepfakeDetector()
+        detector.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+        frames_data = []
+        for number, has_face in ((0, True), (5, True), (9, False)):
+            path = tmp_path / f"{number}.jpg"
+            cv2.imwrite(str(path), textured_patch(seed=number))
+            frames_data.append({'frame_number': number, 'file_path': str(path),
+                                'crop_box': (0, 0, 60, 60) if has_face else None})
+
+        results = [result for _, result in detector._iter_frame_results(frames_data)]
+        assert [r['frame_number'] for r in results] == [0, 5, 9]
+        assert [r['prediction'] for r in results[:2]] == ['FAKE', 'REAL']
+        # Two tiled crops in one request, the uncropped frame in another
+        assert len(calls) == 2
+        assert 'grid of 2 numbered face crops' in calls[0]['messages'][0]['content'][0]['text']
@@ -0,0 +1,85 @@
+"""
+Unit tests for distinct frame sampling
+"""
+
+import cv2
+import numpy as np
+import pytest
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from frame_dedup import coverage_order, dhash, hamming, sample_distinct_frames, select_distinct
+
+
+def scene(seed: int, size=(120, 160)) -> np.ndarray:
+    """Smooth random pattern, distinct per seed and stable under re-encoding"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return cv2.resize(small, (size[1], size[0]), interpolation=cv2.INTER_CUBIC)
+
+
+def write_video(path: Path, frames) -> str:
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 10.0, (160, 120))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+
+class TestSignatures:
+    def test_dhash_ignores_small_changes(self):
+        frame = scene(1)
+        noisy = np.clip(frame.astype(int) + np.random.default_rng(0).integers(-3, 4, frame.shape), 0, 255)
+        assert hamming(dhash(frame), dhash(noisy.astype(np.uint8))) <= 4
+        assert hamming(dhash(frame), dhash(scene(2))) > 10
+
+    def test_coverage_order_spreads_prefixes(self):
+        order = coverage_order(9)
+        assert sorted(order) == list(range(9))
+        assert order[:3] == [0, 8, 4]
+
+    def test_duplicates_free_their_slots(self):
+        static, other = dhash(scene(1)), dhash(scene(2))
+        signatures = [static] * 7 + [other, dhash(scene(3)), dhash(scene(4))]
+        kept, suppressed = select_distinct(signatures, max_frames=3, threshold=6)
+        assert len(kept) == 3
+        assert sum(1 for i in kept if signatures[i] == static) == 1
+        assert suppressed > 0
+
+
+class TestSampling:
+    def test_static_video_is_sampled_once(self, tmp_path):
+        path = write_video(tmp_path / "static.avi", [scene(1)] * 60)
+        selected, report = sample_distinct_frames(path, max_frames=10, candidates=40)
+        assert len(selected) == 1
+        assert report['suppressed'] == report['candidates'] - 1
+
+    def test_budget_goes_to_distinct_content(self, tmp_path):
+        # Long static intro followed by four short distinct shots
+        frames = [scene(0)] * 160 + [scene(seed) for seed in range(1, 5) for _ in range(10)]
+        path = write_video(tmp_path / "intro.avi", frames)
+        selected, report = sample_distinct_frames(path, max_frames=5, candidates=40)
+
+        numbers = [number for number, _ in selected]
+        assert numbers == sorted(numbers)
+        assert len(selected) == 5
+        assert sum(1 for number in numbers if number < 160) == 1
+        assert report['suppressed'] > 0
+        signatures = [dhash(frame) for _, frame in selected]
+        assert all(hamming(a, b) > 6 for i, a in enumerate(signatures) for b in signatures[i + 1:])
+
+    def test_sparse_candidates_are_seeked(self, tmp_path):
+        frames = [scene(seed) for seed in range(4) for _ in range(100)]
+        path = write_video(tmp_path / "long.avi", frames)
+        selected, report = sample_distinct_frames(path, max_frames=10, candidates=8)
+        assert report['candidates'] == 8
+        assert len(selected) == 4 and report['suppressed'] == 4
+        assert [number // 100 for number, _ in selected] == [0, 1, 2, 3]
+
+    def test_unreadable_video(self, tmp_path):
+        path = tmp_path / "broken.mp4"
+        path.write_bytes(b"not a video")
+        assert sample_distinct_frames(str(path)) == ([], {})
@@ -0,0 +1,137 @@
+"""
+Unit tests for range-aware media serving
+"""
+
+import pytest
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from media_server import AccelRedirect, MediaIndex, parse_range
+
+BODY = bytes(range(256)) * 40
+
+
+class TestParseRange:
+    def test_ranges(self):
+        assert parse_range('bytes=0-99', 1000) == (0, 99)
+        assert parse_range('bytes=900-', 1000) == (900, 999)
+        assert parse_range('bytes=-100', 1000) == (900, 999)
+        assert parse_range('bytes=500-5000', 1000) == (500, 999)
+
+    def test_whole_file_for_unusable_headers(self):
+        for header in (None, 'items=0-1', 'bytes=0-1,5-9', 'bytes=abc', 'bytes=9-2'):
+            assert parse_range(header, 1000) is None
+
+    def test_unsatisfiable(self):
+        with pytest.raises(ValueError):
+            parse_range('bytes=1000-', 1000)
+        with pytest.raises(ValueError):
+            parse_range('bytes=-0', 1000)
+
+
+class TestMediaEndpoint:
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        from fastapi.testclient import TestClient
+        import app as backend_app
+
+        media = tmp_path / 'clip1.mp4'
+        media.write_bytes(BODY)
+        lookups = []
+
+        def lookup(file_id):
+            lookups.append(file_id)
+            if file_id == 'clip1':
+                return {'path': str(media), 'filename': 'clip.mp4', 'file_type': 'video', 'content_hash': None}
+            return None
+
+        monkeypatch.setattr(backend_app, 'media_index', MediaIndex(lookup))
+        return TestClient(backend_app.app), lookups
+
+    def test_partial_content_and_single_lookup(self, client):
+        http, lookups = client
+        full = http.get('/uploads/clip1.mp4')
+        assert full.status_code == 200 and full.content == BODY
+        assert full.headers['content-type'] == 'video/mp4'
+        assert full.headers['accept-ranges'] == 'bytes'
+
+        for start in range(0, 8000, 1000):
+            part = http.get('/uploads/clip1.mp4', headers={'Range': f'bytes={start}-{start + 499}'})
+            assert part.status_code == 206
+            assert part.content == BODY[start:start + 500]
+            assert part.headers['content-range'] == f'bytes {start}-{start + 499}/{len(BODY)}'
+        assert lookups == ['clip1']
+
+    def test_conditional_requests(self, client):
+        http, _ = client
+        first = http.get('/uploads/clip1.mp4')
+        etag, modified = first.headers['etag'], first.headers['last-modified']
+
+        assert http.get('/uploads/clip1.mp4', headers={'If-None-Match': etag}).status_code == 304
+        assert http.get('/uploads/clip1.mp4', headers={'If-Modified-Since': modified}).status_code == 304
+
+        stale = http.get('/uploads/clip1.mp4', headers={'Range': 'bytes=0-9', 'If-Range': '"other"'})
+        assert stale.status_code == 200 and len(stale.content) == len(BODY)
+        fresh = http.get('/uploads/clip1.mp4', headers={'Range': 'bytes=0-9', 'If-Range': etag})
+        assert fresh.status_code == 206 and fresh.content == BODY[:10]
+
+        unsatisfiable = http.get('/uploads/clip1.mp4', headers={'Range': f'bytes={len(BODY)}-'})
+        assert unsatisfiable.status_code == 416
+        assert unsatisfiable.headers['content-range'] == f'bytes */{len(BODY)}'
+
+    def test_unknown_file(self, client):
+        http, _ = client
+        assert http.get('/uploads/nope.mp4').status_code == 404
+
+    def test_head_is_served_from_the_index_only(self, client, tmp_path):
+        http, _ = client
+        head = http.head('/uploads/clip1.mp4')
+        assert head.status_code == 200 and head.content == b''
+        assert head.headers['etag'] and head.headers['content-length'] == str(len(BODY))
+
+        # Caches, reports and exports stored under uploads/ are never served directly
+        for name in ('llm_cache/entry.json', 'reports/f1.pdf', 'exports/job.zip'):
+            stored = tmp_path / 'uploads' / name
+            stored.parent.mkdir(parents=True, exist_ok=True)
+            stored.write_bytes(b'private')
+            assert http.head(f'/uploads/{name}').status_code == 404
+            assert http.get(f'/uploads/{name}').status_code == 404
+
+
+class TestAccelRedirect:
+    def test_offloads_files_under_root(self, tmp_path):
+        media = tmp_path / 'uploads' / 'a b.mp4'
+        media.parent.mkdir()
+        media.write_bytes(BODY)
+        accel = AccelRedirect('/protected-media', str(tmp_path / 'uploads'))
+
+        response = accel.response(str(media), {'Cache-Control': 'private'}, 'video/mp4')
+        assert response.headers['x-accel-redirect'] == '/protected-media/a%20b.mp4'
+        assert response.body == b'' and response.headers['cache-control'] == 'private'
+
+        outside = tmp_path / 'other.mp4'
+        outside.write_bytes(BODY)
+        assert accel.response(str(outside), {}, 'video/mp4') is None
+        assert AccelRedirect('', str(tmp_path)).response(str(media), {}, 'video/mp4') is None
+        with pytest.raises(FileNotFoundError):
+            accel.response(str(tmp_path / 'uploads' / 'gone.mp4'), {}, 'video/mp4')
+
+    def test_endpoint_returns_redirect(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        from fastapi.testclient import TestClient
+        import app as backend_app
+
+        media = tmp_path / 'clip1.mp4'
+        media.write_bytes(BODY)
+        entry = {'path': str(media), 'filename': 'clip.mp4', 'file_type': 'video', 'content_hash': None}
+        monkeypatch.setattr(backend_app, 'media_index', MediaIndex(lambda file_id: entry))
+        monkeypatch.setattr(backend_app, 'media_accel', AccelRedirect('/protected-media/', str(tmp_path)))
+
+        response = TestClient(backend_app.app).get('/uploads/clip1.mp4', headers={'Range': 'bytes=0-9'})
+        assert response.status_code == 200 and response.content == b''
+        assert response.headers['x-accel-redirect'] == '/protected-media/clip1.mp4'
+        assert response.headers['content-type'] == 'video/mp4'
@@ -0,0 +1,181 @@
+"""
+Unit tests for PDF report generation and its LLM-written sections
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from pdf_report_generator import LLM_CONNECT_TIMEOUT, PDFReportGenerator, confidence_bucket, salient_indicators
+from response_cache import ResponseCache
+
+RESULT = {'prediction': 'FAKE', 'confidence': 87.5, 'details': {}, 'model_info': {'models_used': ['gpt-4o']}}
+FILE_INFO = {'filename': 'face.jpg', 'file_type': 'image', 'file_size': 2048}
+
+
+@pytest.fixture
+def generator():
+    generator = PDFReportGenerator()
+    generator.ollama_available = False
+    generator.ollama_client = None
+    return generator
+
+
+def slow_llm(delays):
+    """Fake _stream_llm that answers after a per-section delay"""
+    def call(prompt, **kwargs):
+        key = 'explanation' if 'deepfake detection explaining' in prompt else 'detailed_analysis'
+        time.sleep(delays[key])
+        return f"LLM {key}", True
+    return call
+
+
+class TestLLMSections:
+    def test_sections_run_concurrently(self, generator, monkeypatch):
+        monkeypatch.setattr(generator, '_stream_llm', slow_llm({'explanation': 0.3, 'detailed_analysis': 0.3}))
+        started = time.monotonic()
+        sections = generator._generate_llm_sections(RESULT, 'image')
+        assert time.monotonic() - started < 0.55
+        assert sections == {'explanation': 'LLM explanation', 'detailed_analysis': 'LLM detailed_analysis'}
+
+    def test_late_section_falls_back_at_deadline(self, generator, monkeypatch):
+        generator.llm_deadline = 0.3
+        monkeypatch.setattr(generator, '_stream_llm', slow_llm({'explanation': 0.05, 'detailed_analysis': 2.0}))
+        started = time.monotonic()
+        sections = generator._generate_llm_sections(RESULT, 'image')
+        assert time.monotonic() - started < 0.6
+        assert sections['explanation'] == 'LLM explanation'
+        assert sections['detailed_analysis'] == generator._generate_fallback_detailed_analysis(RESULT, 'image')
+
+    def test_failed_section_uses_template(self, generator, monkeypatch):
+        monkeypatch.setattr(generator, '_stream_llm', lambda prompt, **kwargs: (None, False))
+        sections = generator._generate_llm_sections(RESULT, 'image')
+        assert sections['explanation'] == generator._generate_fallback_explanation(RESULT, 'image')
+
+
+class FakeStreamResponse:
+    def __init__(self, chunks, delay: float = 0.0):
+        self.status_code = 200
+        self.lines = [json.dumps(chunk).encode() for chunk in chunks]
+        self.delay = delay
+        self.closed = False
+
+    def iter_lines(self):
+        for line in self.lines:
+            time.sleep(self.delay)
+            yield line
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+
+class TestStreamingAndMemo:
+    def test_stream_stops_at_token_budget(self, generator):
+        chunks = [{'response': f'w{i} ', 'done': False} for i in range(50)] + [{'response': '', 'done': True}]
+        response = FakeStreamResponse(chunks)
+        requests_seen = []
+
+        def post(url, **kwargs):
+            requests_seen.append(kwargs)
+            return response
+
+        generator.session = SimpleNamespace(post=post)
+        text = generator._call_llm("prompt", max_tokens=5)
+        assert text == 'w0 w1 w2 w3 w4 '
+        assert requests_seen[0]['json']['stream'] is True
+        # A stalled stream times out between chunks, not only at the end
+        assert requests_seen[0]['timeout'] == (LLM_CONNECT_TIMEOUT, generator.llm_timeout)
+        assert requests_seen[0]['json']['options']['num_predict'] == 5
+        assert response.closed
+
+    def test_calls_past_the_deadline_free_their_workers(self, generator):
+        # A slow model that would stream for 10 seconds
+        chunks = [{'response': 'w ', 'done': False}] * 200
+        generator.session = SimpleNamespace(post=lambda url, **kwargs: FakeStreamResponse(chunks, delay=0.05))
+        generator.llm_pool = ThreadPoolExecutor(max_workers=2)
+        generator.llm_deadline = 0.2
+
+        started = time.monotonic()
+        sections = generator._generate_llm_sections(RESULT, 'image')
+        assert sections['explanation'] == generator._generate_fallback_explanation(RESULT, 'image')
+        # Both workers are free again within about a chunk of the deadline
+        assert generator.llm_pool.submit(time.monotonic).result() - started < 0.45
+        generator.llm_pool.shutdown()
+
+    def test_ollama_client_uses_configured_host_and_timeout(self, monkeypatch):
+        monkeypatch.setenv('OLLAMA_BASE_URL', 'http://llm.internal:11434')
+        monkeypatch.setenv('REPORT_LLM_TIMEOUT', '20')
+        generator = PDFReportGenerator()
+        if generator.ollama_client is None:
+            pytest.skip("ollama package not installed")
+        client = generator.ollama_client._client
+        assert str(client.base_url).startswith('http://llm.internal:11434')
+        assert client.timeout.read == 20.0
+
+    def test_indicator_profile(self):
+        result = {'details': {'deepfake_indicators': {'pitch_inconsistency': 0.9, 'zcr_anomaly': 0.7,
+                                                      'mfcc_anomaly': 0.2, 'overall_suspiciousness': 0.95}}}
+        assert salient_indicators(result) == ('pitch_inconsistency', 'zcr_anomaly')
+        assert confidence_bucket(87.5) == '80-90%' and confidence_bucket(100.0) == '90-100%'
+
+    def test_same_profile_reuses_summary(self, generator, monkeypatch, tmp_path):
+        generator.memo = ResponseCache(str(tmp_path))
+        calls = []
+        monkeypatch.setattr(generator, '_stream_llm', lambda prompt, **kwargs: (calls.append(prompt) or "Summary", True))
+
+        similar = dict(RESULT, confidence=84.0)
+        assert generator._generate_llm_sections(RESULT, 'image')['explanation'] == "Summary"
+        assert generator._generate_llm_sections(similar, 'image')['explanation'] == "Summary"
+        # One summary for both; the detailed analysis is generated per result
+        assert sum('deepfake detection explaining' in prompt for prompt in calls) == 1
+        assert len(calls) == 3
+
+        generator._generate_llm_sections(dict(RESULT, prediction='REAL'), 'image')
+        assert sum('deepfake detection explaining' in prompt for prompt in calls) == 2
+
+    def test_truncated_summary_is_not_memoized(self, generator, tmp_path):
+        generator.memo = ResponseCache(str(tmp_path))
+        requests_seen = []
+
+        def post(url, **kwargs):
+            requests_seen.append(kwargs)
+            # The first generation runs into the token budget, the second finishes
+            chunks = [{'response': f'w{i} ', 'done': False} for i in range(10)]
+            if len(requests_seen) > 1:
+                chunks = [{'response': 'Short summary.', 'done': True}]
+            return FakeStreamResponse(chunks)
+
+        generator.session = SimpleNamespace(post=post)
+        key = generator._explanation_memo_key(RESULT, 'image')
+        prompt = generator._layman_prompt(RESULT, 'image')
+
+        assert generator._memoized_llm(key, prompt, max_tokens=5) == 'w0 w1 w2 w3 w4 '
+        assert generator.memo.get(key) is None
+        assert generator._memoized_llm(key, prompt, max_tokens=5) == 'Short summary.'
+        assert generator._memoized_llm(key, prompt, max_tokens=5) == 'Short summary.'
+        assert len(requests_seen) == 2
+
+
+class TestReport:
+    def test_generate_report_writes_pdf(self, generator, monkeypatch, tmp_path):
+        monkeypatch.setattr(generator, '_stream_llm', lambda prompt, **kwargs: ("Plain **summary** text.", True))
+        output = tmp_path / "report.pdf"
+        generator.generate_report('abc', FILE_INFO, RESULT, str(output))
+        assert output.read_bytes().startswith(b'%PDF')
+
+    def test_render_report_returns_bytes(self, generator, tmp_path):
+        sections = generator.template_sections(RESULT, 'image')
+        data = generator.render_report('abc', FILE_INFO, RESULT, sections=sections)
+        assert data.startswith(b'%PDF') and data.rstrip().endswith(b'%%EOF')
+        assert list(tmp_path.iterdir()) == []
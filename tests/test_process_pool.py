@@ -0,0 +1,47 @@
+"""
+Unit tests for the lazily created process pools and their shutdown with the app
+"""
+
+import asyncio
+import os
+
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from process_pool import LazyProcessPool
+
+
+class TestLazyProcessPool:
+    def test_created_on_first_use_and_recreated_after_shutdown(self):
+        pool = LazyProcessPool(max_workers=1)
+        assert pool._pool is None
+        first = pool.get()
+        assert first is pool.get()
+        assert first.submit(os.getpid).result(timeout=60) != os.getpid()
+
+        pool.shutdown()
+        assert pool._pool is None
+        second = pool.get()
+        assert second is not first
+        pool.shutdown()
+
+    def test_first_caller_sets_the_size(self):
+        pool = LazyProcessPool()
+        assert pool.get(3)._max_workers == 3
+        assert pool.get(5)._max_workers == 3
+        pool.shutdown()
+
+
+def test_app_shutdown_stops_every_pool(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import app as backend_app
+    import audio_pipeline
+
+    pools = [audio_pipeline._feature_pool, backend_app.derivative_store._pool, backend_app.export_manager._pool]
+    for pool in pools:
+        pool.get()
+    asyncio.run(backend_app.shutdown_event())
+    assert all(pool._pool is None for pool in pools)
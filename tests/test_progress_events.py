@@ -0,0 +1,125 @@
+"""
+Unit tests for the analysis progress broker
+"""
+
+import asyncio
+import threading
+
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from progress_events import ProgressBroker, format_sse
+
+
+async def collect(broker: ProgressBroker, file_id: str, after_id: int = 0, limit: int = 20):
+    events = []
+    async for event in broker.subscribe(file_id, after_id=after_id, keepalive=0.05):
+        if event is None:
+            break
+        events.append(event)
+        if len(events) >= limit:
+            break
+    return events
+
+
+class TestProgressBroker:
+    def test_replay_stops_at_terminal_event(self):
+        broker = ProgressBroker()
+        for stage in ('queued', 'analyzing', 'completed'):
+            broker.publish('f1', stage)
+
+        events = asyncio.run(collect(broker, 'f1'))
+        assert [e['stage'] for e in events] == ['queued', 'analyzing', 'completed']
+        assert [e['id'] for e in events] == [1, 2, 3]
+        assert [e['stage'] for e in asyncio.run(collect(broker, 'f1', after_id=2))] == ['completed']
+
+    def test_live_events_from_worker_threads(self):
+        broker = ProgressBroker()
+
+        async def main():
+            broker.bind_loop(asyncio.get_running_loop())
+            broker.publish('f1', 'queued')
+            task = asyncio.ensure_future(collect(broker, 'f1'))
+            await asyncio.sleep(0.01)
+            worker = threading.Thread(target=lambda: [broker.reporter('f1')(stage, 0.5)
+                                                      for stage in ('analyzing', 'completed')])
+            worker.start()
+            worker.join()
+            return await task
+
+        events = asyncio.run(main())
+        assert [e['stage'] for e in events] == ['queued', 'analyzing', 'completed']
+
+    def test_reanalysis_stream_starts_fresh(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        import app as backend_app
+
+        broker = ProgressBroker()
+        for stage in ['queued'] + ['analyzing'] * 7 + ['completed']:
+            broker.publish('f1', stage)
+        monkeypatch.setattr(backend_app, 'progress_broker', broker)
+
+        backend_app.announce_queued('f1', 'audio')
+        # Only the new run is replayed, and the stream stays open for its events
+        events = asyncio.run(collect(broker, 'f1'))
+        assert [(e['id'], e['stage']) for e in events] == [(10, 'queued')]
+        assert events[0]['data'] == {'file_type': 'audio'}
+
+        # A client reconnecting with the old run's Last-Event-ID still sees the new run end
+        broker.publish('f1', 'analyzing')
+        broker.publish('f1', 'completed')
+        events = asyncio.run(collect(broker, 'f1', after_id=9))
+        assert [(e['id'], e['stage']) for e in events] == [(10, 'queued'), (11, 'analyzing'), (12, 'completed')]
+
+    def test_stream_ends_when_terminal_event_was_seen(self):
+        broker = ProgressBroker()
+        for stage in ('queued', 'completed'):
+            broker.publish('f1', stage)
+        assert broker.finished('f1', after_id=2) and not broker.finished('f1', after_id=1)
+
+        async def main():
+            return [event async for event in broker.subscribe('f1', after_id=2, keepalive=0.01)]
+
+        # No keepalives: the generator returns at once
+        assert asyncio.run(asyncio.wait_for(main(), timeout=1)) == []
+
+    def test_endpoint_answers_204_after_the_terminal_event(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        from fastapi.testclient import TestClient
+        import app as backend_app
+
+        broker = ProgressBroker()
+        for stage in ('queued', 'completed'):
+            broker.publish('f1', stage)
+        monkeypatch.setattr(backend_app, 'progress_broker', broker)
+        monkeypatch.setattr(backend_app, 'analysis_results', {
+            'f1': {'status': 'completed', 'result': {}},
+            'old': {'status': 'completed', 'result': {'prediction': 'REAL'}}
+        })
+        http = TestClient(backend_app.app)
+
+        assert http.get('/results/f1/events', headers={'Last-Event-ID': '2'}).status_code == 204
+        replay = http.get('/results/f1/events', headers={'Last-Event-ID': '1'})
+        assert replay.status_code == 200 and 'event: completed' in replay.text
+        # Results from before a restart get one snapshot, then 204
+        assert 'event: completed' in http.get('/results/old/events').text
+        assert http.get('/results/old/events', headers={'Last-Event-ID': '1'}).status_code == 204
+
+    def test_history_is_bounded(self):
+        broker = ProgressBroker(history_limit=5, max_jobs=2)
+        for i in range(20):
+            broker.publish('f1', 'analyzing', i / 20)
+        history = broker.history('f1')
+        assert len(history) == 5 and history[0]['id'] == 1 and history[-1]['id'] == 20
+
+        broker.publish('f2', 'completed')
+        broker.publish('f3', 'queued')
+        assert broker.history('f2') == [] and broker.history('f1') and broker.history('f3')
+
+    def test_format_sse(self):
+        event = ProgressBroker().publish('f1', 'queued', 0.0, 'Analysis queued')
+        assert format_sse(event).startswith('id: 1\nevent: queued\ndata: {')
+        assert format_sse(None) == ': keepalive\n\n'
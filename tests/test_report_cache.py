@@ -0,0 +1,111 @@
+"""
+Unit tests for the PDF report cache and the cached report endpoint
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from report_cache import ReportCache
+
+RESULT = {'prediction': 'FAKE', 'confidence': 91.0, 'details': {}}
+FILE_INFO = {'filename': 'clip.mp4', 'file_type': 'video', 'file_size': 1024}
+
+
+class FakeRenderer:
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, file_id, file_info, analysis_result):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("render failed")
+        return b'%PDF-1.4 ' + analysis_result['prediction'].encode()
+
+
+class TestReportCache:
+    def test_renders_once_for_concurrent_requests(self, tmp_path):
+        render = FakeRenderer(delay=0.1)
+        cache = ReportCache(str(tmp_path), render, template_version="1")
+
+        async def main():
+            return await asyncio.gather(*(cache.get_or_render('f1', FILE_INFO, RESULT) for _ in range(5)))
+
+        results = asyncio.run(main())
+        assert render.calls == 1
+        assert all(result == (None, b'%PDF-1.4 FAKE') for result in results)
+
+        path, data = asyncio.run(cache.get_or_render('f1', FILE_INFO, RESULT))
+        assert render.calls == 1
+        assert data is None and path.read_bytes() == b'%PDF-1.4 FAKE'
+
+    def test_new_result_or_template_gets_new_etag(self, tmp_path):
+        render = FakeRenderer()
+        cache = ReportCache(str(tmp_path), render, template_version="1")
+        asyncio.run(cache.get_or_render('f1', FILE_INFO, RESULT))
+        first = cache.path_for('f1', cache.etag('f1', RESULT))
+
+        changed = dict(RESULT, prediction='REAL')
+        assert cache.etag('f1', changed) != cache.etag('f1', RESULT)
+        assert ReportCache(str(tmp_path), render, template_version="2").etag('f1', RESULT) != cache.etag('f1', RESULT)
+
+        asyncio.run(cache.get_or_render('f1', FILE_INFO, changed))
+        second = cache.path_for('f1', cache.etag('f1', changed))
+        assert second != first and not first.exists()
+        assert list((tmp_path / 'f1').iterdir()) == [second]
+
+    def test_failed_render_leaves_nothing_behind(self, tmp_path):
+        cache = ReportCache(str(tmp_path), FakeRenderer(fail=True), template_version="1")
+        with pytest.raises(RuntimeError):
+            asyncio.run(cache.get_or_render('f1', FILE_INFO, RESULT))
+        assert not (tmp_path / 'f1').exists() or list((tmp_path / 'f1').iterdir()) == []
+
+    def test_without_persistence_nothing_is_written(self, tmp_path):
+        render = FakeRenderer()
+        cache = ReportCache(str(tmp_path), render, template_version="1", persist=False)
+        for _ in range(2):
+            assert asyncio.run(cache.get_or_render('f1', FILE_INFO, RESULT)) == (None, b'%PDF-1.4 FAKE')
+        asyncio.run(cache.pregenerate('f1', FILE_INFO, RESULT))
+        assert render.calls == 2
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestReportEndpoint:
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        from fastapi.testclient import TestClient
+        import app as backend_app
+
+        render = FakeRenderer()
+        monkeypatch.setattr(backend_app, 'report_cache', ReportCache(str(tmp_path / 'reports'), render, "1"))
+        monkeypatch.setitem(backend_app.analysis_results, 'f1', {
+            'file_info': FILE_INFO, 'result': RESULT, 'status': 'completed'
+        })
+        return TestClient(backend_app.app), render
+
+    def test_repeat_download_is_not_modified(self, client):
+        http, render = client
+        first = http.get('/report/f1')
+        assert first.status_code == 200
+        assert first.headers['content-type'] == 'application/pdf'
+        assert first.content == b'%PDF-1.4 FAKE'
+        assert first.headers['content-length'] == str(len(first.content))
+
+        etag = first.headers['etag']
+        second = http.get('/report/f1', headers={'If-None-Match': etag})
+        assert second.status_code == 304 and second.headers['etag'] == etag
+        assert http.get('/report/f1').status_code == 200
+        assert render.calls == 1
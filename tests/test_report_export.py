@@ -0,0 +1,134 @@
+"""
+Unit tests for bulk report export jobs
+"""
+
+import asyncio
+import csv
+import io
+import os
+import threading
+import time
+import zipfile
+
+import pytest
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from report_export import ExportManager
+
+ANALYSES = {
+    f"file-{i}": (
+        {'filename': f'clip{i}.mp4', 'file_type': 'video', 'file_size': 4096},
+        {'prediction': 'FAKE' if i % 2 else 'REAL', 'confidence': 60.0 + i, 'details': {}}
+    )
+    for i in range(3)
+}
+
+
+def load_inputs(file_id):
+    if file_id not in ANALYSES:
+        raise KeyError(f"{file_id} not analyzed")
+    return ANALYSES[file_id]
+
+
+def run_export(tmp_path, file_ids, export_format):
+    manager = ExportManager(str(tmp_path), load_inputs, max_workers=2)
+
+    async def main():
+        job = manager.create_job(file_ids, export_format)
+        while manager.get_status(job['job_id'])['status'] in ('queued', 'processing'):
+            await asyncio.sleep(0.05)
+        return manager.get_status(job['job_id']), manager.output_path(job['job_id'])
+
+    try:
+        return asyncio.run(main())
+    finally:
+        manager.shutdown()
+
+
+def summary(archive):
+    return list(csv.DictReader(io.StringIO(archive.read('summary.csv').decode())))
+
+
+class TestReportExport:
+    def test_zip_of_reports_with_summary(self, tmp_path):
+        status, path = run_export(tmp_path, ['file-0', 'missing', 'file-1', 'file-2'], 'zip')
+        assert status['status'] == 'completed'
+        assert (status['rendered'], status['failed'], status['progress']) == (3, 1, 1.0)
+        assert 'missing' in status['errors']
+
+        with zipfile.ZipFile(path) as archive:
+            reports = [name for name in archive.namelist() if name.startswith('reports/')]
+            assert len(reports) == 3
+            assert all(archive.read(name).startswith(b'%PDF') for name in reports)
+            rows = summary(archive)
+        assert [row['file_id'] for row in rows] == ['file-0', 'missing', 'file-1', 'file-2']
+        assert rows[2]['prediction'] == 'FAKE' and rows[2]['report'] == 'reports/file-1_report.pdf'
+        assert rows[1]['report'] == '' and rows[1]['error']
+
+    def test_combined_pdf(self, tmp_path):
+        status, path = run_export(tmp_path, list(ANALYSES), 'pdf')
+        assert status['status'] == 'completed' and status['rendered'] == 3
+        with zipfile.ZipFile(path) as archive:
+            assert archive.read('reports.pdf').startswith(b'%PDF')
+            assert all(row['report'] == 'reports.pdf' for row in summary(archive))
+
+    def test_unknown_format_is_rejected(self, tmp_path):
+        manager = ExportManager(str(tmp_path), load_inputs)
+        with pytest.raises(ValueError):
+            manager.create_job(['file-0'], 'tar')
+
+    def test_archive_is_written_off_the_event_loop(self, tmp_path, monkeypatch):
+        writers = set()
+        writestr = zipfile.ZipFile.writestr
+
+        def record(archive, name, data, *args, **kwargs):
+            writers.add(threading.current_thread().name)
+            return writestr(archive, name, data, *args, **kwargs)
+
+        monkeypatch.setattr(zipfile.ZipFile, 'writestr', record)
+        status, _ = run_export(tmp_path, ['file-0', 'file-1'], 'zip')
+        assert status['status'] == 'completed'
+        assert writers and all(name.startswith('export-zip') for name in writers)
+
+
+class TestRetention:
+    def test_finished_jobs_and_their_archives_are_evicted(self, tmp_path):
+        manager = ExportManager(str(tmp_path), load_inputs, retention_seconds=60, max_jobs=1)
+
+        async def main():
+            ids = []
+            for _ in range(2):
+                job = manager.create_job(['missing'], 'zip')
+                while manager.get_status(job['job_id'])['status'] in ('queued', 'processing'):
+                    await asyncio.sleep(0.01)
+                ids.append(job['job_id'])
+            return ids
+
+        try:
+            first, second = asyncio.run(main())
+        finally:
+            manager.shutdown()
+        first_path = tmp_path / f"{first}.zip"
+        second_path = manager.output_path(second)
+        assert first_path.exists() and second_path.exists()
+
+        # Over max_jobs the oldest finished job goes with its archive
+        manager.evict()
+        assert manager.get_status(first) is None and not first_path.exists()
+        assert manager.get_status(second)['status'] == 'completed'
+
+        manager.evict(now=time.monotonic() + 61)
+        assert manager.jobs == {} and not second_path.exists()
+
+    def test_orphaned_archives_expire_by_age(self, tmp_path):
+        old, fresh = tmp_path / 'old-job.zip', tmp_path / 'new-job.zip'
+        for path in (old, fresh):
+            path.write_bytes(b'PK')
+        os.utime(old, (time.time() - 120, time.time() - 120))
+
+        ExportManager(str(tmp_path), load_inputs, retention_seconds=60).evict()
+        assert not old.exists() and fresh.exists()
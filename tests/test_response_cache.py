@@ -0,0 +1,105 @@
+"""
+Unit tests for the model response cache
+"""
+
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from response_cache import ResponseCache, make_key
+from structured_output import FrameAnalysis, request_structured
+
+
+def fake_client(content: str, calls: list):
+    def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+class TestResponseCache:
+    def test_disk_entries_survive_restart(self, tmp_path):
+        cache = ResponseCache(str(tmp_path))
+        cache.put('a' * 64, {'text': 'hello'})
+        assert cache.get('a' * 64) == {'text': 'hello'}
+
+        reopened = ResponseCache(str(tmp_path), memory_items=0)
+        assert reopened.get('a' * 64) == {'text': 'hello'}
+        assert reopened.stats()['disk_hits'] == 1
+
+    def test_expired_entries_are_dropped(self, tmp_path):
+        cache = ResponseCache(str(tmp_path), ttl_seconds=0.05)
+        cache.put('b' * 64, 1)
+        time.sleep(0.1)
+        assert cache.get('b' * 64) is None
+        assert cache.stats()['entries'] == 0
+
+    def test_least_recently_used_is_evicted(self, tmp_path):
+        cache = ResponseCache(str(tmp_path), max_bytes=250, memory_items=0)
+        keys = [make_key(i) for i in range(3)]
+        cache.put(keys[0], 'x' * 50)
+        time.sleep(0.01)
+        cache.put(keys[1], 'x' * 50)
+        time.sleep(0.01)
+        cache.get(keys[0])
+        time.sleep(0.01)
+        cache.put(keys[2], 'x' * 50)
+
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+        assert cache.stats()['bytes'] <= 250
+
+    def test_concurrent_misses_compute_once(self, tmp_path):
+        cache = ResponseCache(str(tmp_path))
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('c' * 64, compute)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert sorted(hit for _, hit in results) == [False, True, True, True, True]
+
+
+class TestCachedRequests:
+    def test_repeated_input_costs_no_calls(self, tmp_path):
+        cache = ResponseCache(str(tmp_path))
+        calls = []
+        client = fake_client(json.dumps({'prediction': 'REAL', 'confidence': 0.8}), calls)
+        messages = [{'role': 'user', 'content': 'frame 1'}]
+
+        first = request_structured(client, 'gpt-4o', messages, FrameAnalysis, cache=cache, cache_key=('1', 'abc'))
+        second = request_structured(client, 'gpt-4o', [{'role': 'user', 'content': 'frame 7'}], FrameAnalysis,
+                                    cache=cache, cache_key=('1', 'abc'))
+        assert len(calls) == 1
+        assert not first.cached and second.cached
+        assert second.value == first.value
+
+        request_structured(client, 'gpt-4o', messages, FrameAnalysis, cache=cache, cache_key=('2', 'abc'))
+        assert len(calls) == 2
+
+    def test_unparseable_replies_are_not_cached(self, tmp_path):
+        cache = ResponseCache(str(tmp_path))
+        calls = []
+        client = fake_client("I can't help with that.", calls)
+        for _ in range(2):
+            result = request_structured(client, 'gpt-4o', [], FrameAnalysis, cache=cache, cache_key=('1', 'x'))
+            assert result.outcome == 'failed'
+        assert len(calls) == 2
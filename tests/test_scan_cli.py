@@ -0,0 +1,119 @@
+"""
+Unit tests for the headless directory scanner
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import scan_cli
+from scan_cli import JsonlResultWriter, ScanManifest, manifest_key, run_scan
+
+
+class FakeDetector:
+    def __init__(self, calls: list, fail: str = None):
+        self.calls = calls
+        self.fail = fail
+
+    def detect_deepfake(self, path):
+        self.calls.append(Path(path).name)
+        if self.fail and path.endswith(self.fail):
+            raise RuntimeError("model unavailable")
+        return 0.8, 'REAL', {}
+
+
+@pytest.fixture
+def scanner(tmp_path, monkeypatch):
+    """Scan in threads with a fake detector instead of worker processes calling the API"""
+    calls = []
+    detector = FakeDetector(calls)
+    monkeypatch.setattr(scan_cli, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(scan_cli, '_get_worker_detector', lambda file_type: detector)
+
+    root = tmp_path / 'archive'
+    (root / 'nested').mkdir(parents=True)
+    for name in ('a.jpg', 'b.png', 'nested/c.wav'):
+        (root / name).write_bytes(b'x' * 10)
+    (root / 'notes.txt').write_text('not media')
+
+    def scan(**kwargs):
+        output = tmp_path / 'results.jsonl'
+        writer = JsonlResultWriter(output)
+        manifest = ScanManifest(tmp_path / 'manifest.jsonl', retry_errors=kwargs.pop('retry_errors', False))
+        try:
+            stats = run_scan(root, writer, manifest, workers=2, **kwargs)
+            # Checkpoints are on disk before the manifest is closed
+            checkpointed = (tmp_path / 'manifest.jsonl').read_text().splitlines()
+        finally:
+            writer.close()
+            manifest.close()
+        return stats, checkpointed
+
+    return root, scan, detector
+
+
+def read_jsonl(path: Path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestScan:
+    def test_scans_supported_files_and_checkpoints_each(self, scanner, tmp_path):
+        _, scan, detector = scanner
+        stats, checkpointed = scan()
+        assert stats == {'submitted': 3, 'completed': 3, 'errors': 0, 'skipped': 0}
+        assert sorted(detector.calls) == ['a.jpg', 'b.png', 'c.wav']
+        assert len(checkpointed) == 3
+
+        records = read_jsonl(tmp_path / 'results.jsonl')
+        assert {Path(r['path']).name for r in records} == {'a.jpg', 'b.png', 'c.wav'}
+        assert all(r['prediction'] == 'REAL' and r['confidence'] == 0.8 for r in records)
+
+    def test_resume_skips_already_scanned_files(self, scanner, tmp_path):
+        root, scan, detector = scanner
+        scan()
+        detector.calls.clear()
+
+        stats, _ = scan()
+        assert stats['skipped'] == 3 and stats['submitted'] == 0 and detector.calls == []
+
+        # A changed file is a new version and is scanned again
+        (root / 'a.jpg').write_bytes(b'x' * 20)
+        stats, _ = scan()
+        assert stats['skipped'] == 2 and detector.calls == ['a.jpg']
+        assert len(read_jsonl(tmp_path / 'results.jsonl')) == 4
+
+    def test_errors_are_retried_only_on_request(self, scanner):
+        _, scan, detector = scanner
+        detector.fail = 'b.png'
+        stats, _ = scan()
+        assert stats['errors'] == 1 and stats['completed'] == 2
+
+        detector.fail = None
+        detector.calls.clear()
+        assert scan()[0]['submitted'] == 0
+        stats, _ = scan(retry_errors=True)
+        assert stats['submitted'] == 1 and detector.calls == ['b.png']
+
+    def test_limit(self, scanner):
+        _, scan, _ = scanner
+        assert scan(limit=2)[0]['submitted'] == 2
+        assert scan()[0] == {'submitted': 1, 'completed': 1, 'errors': 0, 'skipped': 2}
+
+
+class TestManifest:
+    def test_torn_last_line_is_ignored(self, tmp_path):
+        stat = os.stat(__file__)
+        key = manifest_key(__file__, stat)
+        path = tmp_path / 'manifest.jsonl'
+        path.write_text(json.dumps({'key': key, 'status': 'completed'}) + '\n{"key": "/archive/par')
+
+        manifest = ScanManifest(path)
+        manifest.close()
+        assert key in manifest and len(manifest.done) == 1
@@ -0,0 +1,135 @@
+"""
+Unit and fuzz tests for the shared structured-output parser
+"""
+
+import json
+import random
+from types import SimpleNamespace
+
+import pytest
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import structured_output
+from structured_output import (
+    AudioAnalysis, FrameAnalysis, ImageAnalysis, ParseStats, SegmentVerdicts,
+    parse_response, request_structured, strict_schema
+)
+
+SCHEMAS = {model.__name__: model for model in (AudioAnalysis, FrameAnalysis, ImageAnalysis, SegmentVerdicts)}
+
+
+def recorded_responses():
+    path = Path(__file__).parent / "test_data" / "llm_responses.jsonl"
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def mutations(text: str, rng: random.Random):
+    """Damaged variants of a response of the kinds seen from chat models"""
+    cut = rng.randint(0, len(text))
+    yield text[:cut]
+    yield "Sure! Here is the analysis:\n" + text + "\nHope this helps."
+    yield "```json\n" + text + "\n```"
+    yield text.replace('"', "'")
+    yield text.replace('{', '{{', 1)
+    chars = list(text)
+    for _ in range(max(1, len(chars) // 50)):
+        if chars:
+            chars[rng.randrange(len(chars))] = rng.choice('{}[]":,0.9xN\n')
+    yield ''.join(chars)
+
+
+class TestRecordedResponses:
+    @pytest.mark.parametrize("record", recorded_responses(), ids=lambda r: f"{r['schema']}-{r['outcome']}")
+    def test_recorded_outcomes(self, record):
+        result = parse_response(record['response'], SCHEMAS[record['schema']], 'recorded')
+        assert result.outcome == record['outcome']
+        if 'prediction' in record:
+            assert result.value.prediction == record['prediction']
+            assert result.value.confidence == pytest.approx(record['confidence'])
+
+    def test_fuzzed_responses_always_validate(self):
+        rng = random.Random(1234)
+        for record in recorded_responses():
+            model = SCHEMAS[record['schema']]
+            for text in mutations(record['response'], rng):
+                result = parse_response(text, model, 'fuzz')
+                assert isinstance(result.value, model)
+                if hasattr(result.value, 'confidence'):
+                    assert 0.0 <= result.value.confidence <= 1.0
+                    assert result.value.prediction in ('REAL', 'FAKE', 'UNKNOWN')
+
+
+class TestVerdicts:
+    def test_text_keywords_per_detector(self):
+        text = 'The voice sounds natural throughout.'
+        assert parse_response(text, AudioAnalysis, 'test').value.prediction == 'REAL'
+        assert parse_response(text, ImageAnalysis, 'test').value.prediction == 'UNKNOWN'
+        assert parse_response('Looks genuine.', ImageAnalysis, 'test').value.prediction == 'REAL'
+        assert parse_response('Looks genuine.', FrameAnalysis, 'test').value.prediction == 'UNKNOWN'
+        assert parse_response('Natural, but synthetic.', AudioAnalysis, 'test').value.prediction == 'FAKE'
+
+    def test_json_without_a_verdict_is_not_structured(self):
+        empty = parse_response('{}', AudioAnalysis, 'gpt-4o')
+        assert empty.outcome == 'failed' and empty.value.prediction == 'UNKNOWN'
+
+        partial = parse_response('{"confidence": 0.8, "naturalness_score": 0.2}', AudioAnalysis, 'gpt-4o')
+        assert partial.outcome == 'fallback'
+        assert partial.value.confidence == 0.8 and partial.value.naturalness_score == 0.2
+
+        complete = json.dumps({'prediction': 'FAKE', 'confidence': 0.9})
+        assert parse_response(complete, AudioAnalysis, 'gpt-4o').outcome == 'structured'
+        # A complete object later in the reply beats an incomplete one before it
+        mixed = parse_response('{"confidence": 0.1} then ' + complete, AudioAnalysis, 'gpt-4o')
+        assert mixed.outcome == 'recovered' and mixed.value.prediction == 'FAKE'
+        # Schemas without verdict fields are unaffected
+        assert parse_response('{"segments": []}', SegmentVerdicts, 'gpt-4o').outcome == 'structured'
+
+    def test_incomplete_json_counts_as_a_failure(self, monkeypatch):
+        stats = ParseStats()
+        monkeypatch.setattr(structured_output, 'parse_stats', stats)
+        parse_response('{"reasoning": "ok"}', ImageAnalysis, 'gpt-4o')
+        counts = stats.snapshot()['gpt-4o']['ImageAnalysis']
+        assert counts['fallback'] == 1 and counts['structured'] == 0 and counts['failure_rate'] == 1.0
+
+
+class TestStructuredRequests:
+    def test_strict_schema_requires_every_property(self):
+        def check(node):
+            if isinstance(node, dict):
+                assert 'default' not in node
+                if node.get('type') == 'object':
+                    assert node['additionalProperties'] is False
+                    assert set(node['required']) == set(node['properties'])
+                for value in node.values():
+                    check(value)
+
+        for model in SCHEMAS.values():
+            payload = strict_schema(model)
+            assert payload['json_schema']['strict'] is True
+            check(payload['json_schema']['schema'])
+
+    def test_rejected_schema_falls_back_to_plain_request(self, monkeypatch):
+        stats = ParseStats()
+        monkeypatch.setattr(structured_output, 'parse_stats', stats)
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            if 'response_format' in kwargs:
+                raise RuntimeError("response_format not supported")
+            content = 'Verdict: FAKE, confidence: 0.9'
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        result = request_structured(client, 'gpt-4o', [{'role': 'user', 'content': 'x'}], FrameAnalysis)
+
+        assert len(calls) == 2
+        assert result.outcome == 'fallback'
+        assert result.value.prediction == 'FAKE'
+        counts = stats.snapshot()['gpt-4o']['FrameAnalysis']
+        assert counts['fallback'] == 1 and counts['failure_rate'] == 1.0
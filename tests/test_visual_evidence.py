@@ -0,0 +1,92 @@
+"""
+Unit tests for versioned visual evidence and its background repair
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+from PIL import Image
+from pathlib import Path
+import sys
+
+# Backend modules use flat imports of each other
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import app as backend_app
+
+    monkeypatch.setattr(backend_app, 'analysis_results', {})
+    return backend_app
+
+
+def write_image(path: Path) -> str:
+    Image.fromarray(np.full((64, 64, 3), 128, dtype=np.uint8)).save(path)
+    return str(path)
+
+
+def legacy_entry(file_path: str, result_type: str = 'image', status: str = 'completed') -> dict:
+    return {
+        'status': status,
+        'file_path': file_path,
+        'timestamp': datetime.now(),
+        'result': {'type': result_type, 'prediction': 'REAL', 'confidence': 0.9, 'details': {}}
+    }
+
+
+class TestAttachVisualEvidence:
+    def test_image_results_are_versioned(self, backend, tmp_path):
+        result = backend.attach_visual_evidence({'type': 'image', 'details': {}}, write_image(tmp_path / 'a.png'))
+        assert result['visual_evidence_version'] == backend.VISUAL_EVIDENCE_VERSION
+        assert result['visual_evidence']['image_data'].startswith('data:image/png;base64,')
+        assert not backend.visual_evidence_needs_repair(result)
+
+    def test_other_results_are_left_alone(self, backend):
+        result = backend.attach_visual_evidence({'type': 'audio'}, 'missing.wav')
+        assert result == {'type': 'audio'}
+        assert not backend.visual_evidence_needs_repair(result)
+        assert not backend.visual_evidence_needs_repair(None)
+
+    def test_older_versions_need_repair(self, backend):
+        assert backend.visual_evidence_needs_repair({'type': 'image'})
+        assert backend.visual_evidence_needs_repair(
+            {'type': 'video', 'visual_evidence_version': backend.VISUAL_EVIDENCE_VERSION - 1})
+
+
+class TestRepair:
+    def test_repairs_only_completed_legacy_results(self, backend, tmp_path):
+        image = write_image(tmp_path / 'a.png')
+        backend.analysis_results.update({
+            'legacy': legacy_entry(image),
+            'processing': legacy_entry(image, status='processing'),
+            'gone': legacy_entry(str(tmp_path / 'deleted.png')),
+            'audio': legacy_entry(str(tmp_path / 'a.wav'), result_type='audio')
+        })
+        before = backend.analysis_results['legacy']['result']
+
+        from fastapi.testclient import TestClient
+        http = TestClient(backend.app)
+        response = http.post('/maintenance/repair-visual-evidence')
+        assert response.status_code == 200 and response.json()['repaired'] == 1
+
+        repaired = backend.analysis_results['legacy']['result']
+        # Readers holding the old result never see it change underneath them
+        assert repaired is not before and 'visual_evidence' not in before
+        assert repaired['visual_evidence_version'] == backend.VISUAL_EVIDENCE_VERSION
+        for file_id in ('processing', 'gone', 'audio'):
+            assert 'visual_evidence_version' not in backend.analysis_results[file_id]['result']
+
+        # Already repaired results are not regenerated
+        assert http.post('/maintenance/repair-visual-evidence').json()['repaired'] == 0
+
+    def test_results_lookup_does_not_generate_evidence(self, backend, tmp_path):
+        backend.analysis_results['legacy'] = legacy_entry(write_image(tmp_path / 'a.png'))
+
+        from fastapi.testclient import TestClient
+        response = TestClient(backend.app).get('/results/legacy')
+        assert response.status_code == 200
+        assert 'visual_evidence' not in response.json()['result']
+        assert 'visual_evidence' not in backend.analysis_results['legacy']['result']